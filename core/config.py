@@ -55,14 +55,28 @@ DEFAULT_SETTINGS: Dict[str, Any] = {
             'remote_path': '/stickynote/',
         },
         'local_folder': '',
+        'local': {
+            'sync_dir': '',
+            'watch': True,
+            'debounce_ms': 2000,
+        },
         'auto_sync': False,
         'sync_interval_minutes': 30,
+        'max_concurrent_transfers': 4,
+        'mode': 'files',
+        'quiet_period_seconds': 5,
+        # 选择性同步配置，每项: {name, provider, webdav, local, mode,
+        #   include_tags, exclude_tags, include_ids, exclude_ids, include_pinned}
+        'profiles': [],
     },
     'plugins': {
         'enabled': True,
         'disabled': [],
         'configs': {},
     },
+    'performance': {
+        'note_cache_max_mb': 32,
+    },
 }
 
 
@@ -58,6 +58,14 @@ class SearchError(StickyNoteError):
     """搜索异常 — 索引构建失败、搜索执行错误等"""
 
 
+class SyncError(StickyNoteError):
+    """同步异常 — 远端不可用、传输失败等"""
+
+
+class SyncConflictError(SyncError):
+    """同步写入冲突 — 条件请求的前置条件不满足（远端已被其他设备修改）"""
+
+
 # ═══════════════════════════════════════════════════════════════
 # 统一错误处理
 # ═══════════════════════════════════════════════════════════════
@@ -27,15 +27,15 @@ from PyQt5.QtCore import Qt, QCoreApplication, QTimer
 from PyQt5.QtGui import QIcon
 from PyQt5.QtWidgets import QStyle
 
-from core.note import StickyNote, NoteLoadWorker
+from core.note import StickyNote, NoteLoadWorker, write_note_file
 from core.settings import SettingsDialog
 from core import get_project_root, get_styles_dir, get_user_data_dir, __version__
 from core.config import get_config
 
 logger = logging.getLogger(__name__)
 from features.search import SearchManager
+from features.performance import get_note_cache
 from features.shortcuts import ShortcutManager
-from features.backup import BackupManager
 from features.positioning import get_position_manager
 from features.reminder import ReminderManager
 from features.tag import TagManager
@@ -94,6 +94,8 @@ class StickyNoteManager:
         # 初始化核心功能模块（启动必需）
         self.search_manager = SearchManager(self)
         self.shortcut_manager = ShortcutManager()
+        # 延迟导入：features.backup 与 features.theme_helper 导入 core 包，模块级导入会形成循环
+        from features.backup import BackupManager
         self.backup_manager = BackupManager(self)
         self.position_manager = get_position_manager()
 
@@ -102,6 +104,8 @@ class StickyNoteManager:
         self._tag_manager = None
         self._template_manager = None
         self._link_manager = None
+        self.sync_engine = None
+        self.sync_engines = []
         QTimer.singleShot(500, self._init_deferred_modules)  # 500ms 后加载
 
         # 插件系统（延迟加载）
@@ -199,6 +203,8 @@ class StickyNoteManager:
         if self._link_manager is None:
             self._link_manager = NoteLinkManager(self.notes_dir)
             logger.debug('延迟初始化: NoteLinkManager')
+        if self.sync_engine is None and self.config.get('sync.enabled', False):
+            self.setup_sync_engine()
 
     def _init_deferred_plugins(self) -> None:
         """初始化延迟加载的插件系统"""
@@ -221,6 +227,204 @@ class StickyNoteManager:
                     logger.error(f'加载插件时出错: {e}')
             logger.debug('延迟初始化: 插件系统')
 
+    # ==================== 同步 ====================
+
+    def setup_sync_engine(self) -> None:
+        """
+        按当前设置创建（或重建）同步引擎
+
+        便签保存/删除后增量同步，sync_interval_minutes 只控制低频全量对账。
+        sync.profiles 中的每个选择性同步配置各自对应一个引擎（独立的元数据文件），
+        与默认引擎并行运行；self.sync_engine 始终指向第一个引擎。
+        """
+        for engine in getattr(self, 'sync_engines', []):
+            engine.close()
+        self.sync_engines = []
+        self.sync_engine = None
+        if not self.config.get('sync.enabled', False):
+            return
+        targets = [{}] + list(self.config.get('sync.profiles', []) or [])
+        for target in targets:
+            if target.get('enabled', True) is False:
+                continue
+            engine = self._create_sync_engine(target)
+            if engine:
+                self.sync_engines.append(engine)
+        if self.sync_engines:
+            self.sync_engine = self.sync_engines[0]
+
+    def _create_sync_engine(self, target: dict):
+        """
+        创建单个同步引擎
+
+        Args:
+            target: 选择性同步配置（空字典表示默认配置）；
+                    provider / webdav / local / mode 缺省时沿用 sync.* 顶层设置
+        """
+        try:
+            from features.sync.engine import SyncEngine
+            from features.sync.profile import SyncProfile
+            profile = SyncProfile.from_dict(target)
+
+            def setting(key, default=None):
+                section, _, sub = key.partition('.')
+                value = target.get(section, {}).get(sub) if sub else target.get(section)
+                if value is None or value == '':
+                    value = self.config.get('sync.' + key, default)
+                return value
+
+            if setting('provider', 'webdav') == 'local':
+                from features.sync.local_client import LocalSyncClient
+                sync_dir = setting('local.sync_dir', '')
+                if not sync_dir:
+                    logger.warning(f'未设置本地同步目录，同步引擎未启动 ({profile.name})')
+                    return None
+                client = LocalSyncClient(
+                    sync_dir,
+                    watch=setting('local.watch', True),
+                    debounce_ms=setting('local.debounce_ms', 2000),
+                )
+            else:
+                from features.sync.webdav_client import WebDAVClient
+                url = setting('webdav.url', '')
+                if not url:
+                    logger.warning(f'未设置 WebDAV 地址，同步引擎未启动 ({profile.name})')
+                    return None
+                client = WebDAVClient(
+                    url,
+                    setting('webdav.username', ''),
+                    setting('webdav.password', ''),
+                    setting('webdav.remote_path', '/StickyNote/') or '/StickyNote/',
+                )
+            engine = SyncEngine(self.notes_dir, self.config, mode=target.get('mode'), profile=profile)
+            engine.set_catalog_provider(self._sync_catalog)
+            engine.set_client(client)
+            if self.config.get('sync.auto_sync', False):
+                engine.start_auto_sync(self.config.get('sync.sync_interval_minutes', 30))
+            logger.info(f'同步引擎已启动 ({profile.name})')
+            return engine
+        except Exception as e:
+            logger.error(f'初始化同步引擎失败: {e}')
+            return None
+
+    def _sync_catalog(self) -> dict:
+        """同步筛选使用的便签属性 {filename: note_data}（内存中的数据，无需读文件）"""
+        return {f'note_{note_id}.json': note.note_data for note_id, note in list(self.notes.items())}
+
+    def flush_pending_saves(self) -> None:
+        """把所有便签防抖中的修改写入磁盘并等待写入完成（备份前调用）"""
+        for note in list(self.notes.values()):
+            try:
+                note.flush_pending_save()
+            except Exception as e:
+                logger.error(f'写出便签 {note.note_id} 失败: {e}')
+
+    def notify_note_saved(self, file_path: str) -> None:
+        """便签写入磁盘后调用：登记增量同步，更新链接索引"""
+        for engine in getattr(self, 'sync_engines', []):
+            engine.notify_note_changed(file_path)
+        self._update_link_index(file_path)
+
+    def _update_link_index(self, file_path: str) -> None:
+        """按内存中的便签数据更新其出链记录（标题与链接未变化时不写盘）"""
+        try:
+            note_id = int(os.path.basename(file_path).split('_')[1].split('.')[0])
+        except (IndexError, ValueError):
+            return
+        note = self.notes.get(note_id)
+        if note is None:
+            return
+        try:
+            data = note.note_data
+            self.link_manager.update_index(note.note_id, data.get('title', ''), data.get('content', ''))
+        except Exception as e:
+            logger.debug(f'更新链接索引失败: {e}')
+
+    def propagate_link_rename(self, old_title: str, new_title: str) -> dict:
+        """
+        便签改名后，把其他便签中的 [[old_title]] 链接改为 [[new_title]]
+
+        只访问反向索引中引用旧标题的便签：已打开的便签通过编辑器修改（可在便签内撤销），
+        其余便签直接改写文件。全部修改在一个链接索引事务中完成，索引只写盘一次。
+
+        Returns:
+            dict: 撤销记录 {'old_title', 'new_title', 'note_ids', 'snapshots'}，
+                  snapshots 保存各便签改写前的 content/plain_content，传给 undo_link_rename 可整体撤销
+        """
+        link_manager = self.link_manager
+        note_ids, snapshots = [], {}
+        with link_manager.transaction():
+            for note_id in sorted(int(i) for i in link_manager.get_backlink_ids(old_title)):
+                try:
+                    note = self.notes.get(note_id)
+                    if note is not None:
+                        before = {'content': note.text_edit.toHtml(), 'plain_content': note.text_edit.toPlainText()}
+                        count = note.rename_link_target(old_title, new_title)
+                        data = note.note_data
+                    else:
+                        count, data, before = self._rename_link_in_file(note_id, old_title, new_title)
+                    if count:
+                        link_manager.update_index(note_id, data.get('title', ''), data.get('content', ''))
+                        note_ids.append(note_id)
+                        snapshots[note_id] = before
+                except Exception as e:
+                    logger.error(f'更新便签 {note_id} 中的链接失败: {e}')
+        logger.info(f'链接重命名 “{old_title}” -> “{new_title}”：更新 {len(note_ids)} 篇便签')
+        return {'old_title': old_title, 'new_title': new_title, 'note_ids': note_ids, 'snapshots': snapshots}
+
+    def undo_link_rename(self, record: dict) -> None:
+        """
+        撤销 propagate_link_rename：把记录中各便签恢复为改写前的内容
+
+        直接恢复快照而不是反向替换，便签中原本就存在的 [[new_title]] 不受影响。
+        """
+        link_manager = self.link_manager
+        with link_manager.transaction():
+            for note_id in record['note_ids']:
+                before = record['snapshots'][note_id]
+                try:
+                    note = self.notes.get(note_id)
+                    if note is not None:
+                        note.restore_content(before['content'])
+                        data = note.note_data
+                    else:
+                        file_path = os.path.join(self.notes_dir, f'note_{note_id}.json')
+                        with open(file_path, 'r', encoding='utf-8') as f:
+                            data = json.load(f)
+                        data['content'] = before['content']
+                        data['plain_content'] = before['plain_content']
+                        write_note_file(file_path, data)
+                        self.notify_note_saved(file_path)
+                    link_manager.update_index(note_id, data.get('title', ''), data.get('content', ''))
+                except Exception as e:
+                    logger.error(f'撤销便签 {note_id} 中的链接更新失败: {e}')
+
+    def _rename_link_in_file(self, note_id: int, old_title: str, new_title: str) -> Tuple[int, dict, dict]:
+        """改写未打开便签文件中的链接（原子写入并登记同步），同时返回改写前的 content/plain_content"""
+        file_path = os.path.join(self.notes_dir, f'note_{note_id}.json')
+        with open(file_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        before = {'content': data.get('content', ''), 'plain_content': data.get('plain_content', '')}
+        content, count = NoteLinkManager.rename_link_in_html(data.get('content', ''), old_title, new_title)
+        if count:
+            data['content'] = content
+            data['plain_content'] = data.get('plain_content', '').replace(f'[[{old_title}]]', f'[[{new_title}]]')
+            write_note_file(file_path, data)
+            self.notify_note_saved(file_path)
+        return count, data, before
+
+    def _index_unlinked_notes(self) -> None:
+        """为尚未登记到链接索引的便签（如旧版本创建的便签）补录出链，合并为一次写盘"""
+        try:
+            link_manager = self.link_manager
+            with link_manager.transaction():
+                for note_id, note in list(self.notes.items()):
+                    if not link_manager.has_note(note_id):
+                        data = note.note_data
+                        link_manager.update_index(note_id, data.get('title', ''), data.get('content', ''))
+        except Exception as e:
+            logger.debug(f'补录链接索引失败: {e}')
+
     # ==================== 全局快捷键 ====================
 
     def setup_global_shortcuts(self) -> None:
@@ -475,6 +679,46 @@ class StickyNoteManager:
                 except Exception as e:
                     logger.debug(f'插件钩子 on_note_opened 失败: {e}')
 
+    def suspend_note_saves(self, note_id: int) -> Optional[StickyNote]:
+        """
+        停止已打开便签的写盘（从外部替换便签文件前调用，如从备份恢复）
+
+        取消防抖中的保存并等待进行中的后台写入结束，此后窗口不再回写，
+        旧内容不会覆盖随后写入的新文件。
+
+        Returns:
+            StickyNote: 已打开的便签，未打开时返回 None
+        """
+        note = self.notes.get(note_id)
+        if note is None:
+            return None
+        note.is_deleted = True
+        note._save_timer.stop()
+        if note._save_worker is not None:
+            note._save_worker.wait()
+        return note
+
+    def hot_load_note(self, note_id: int, data: dict) -> None:
+        """
+        载入已写入磁盘的便签数据（如从备份恢复的便签），无需重启
+
+        同 ID 的便签窗口会被关闭并以新数据重建，关闭时不回写旧内容。
+        """
+        self.suspend_note_saves(note_id)
+        old = self.notes.pop(note_id, None)
+        if old is not None:
+            old.close()
+        note = StickyNote(
+            note_id, self.notes_dir,
+            manager=self,
+            theme_css=self.get_default_theme_css(),
+            preloaded_data=data
+        )
+        note.show()
+        self.notes[note_id] = note
+        self.notify_note_saved(note.note_file)
+        self.update_tray_menu()
+
     def delete_note(self, note_id: int) -> None:
         if note_id in self.notes:
             note = self.notes[note_id]
@@ -489,6 +733,8 @@ class StickyNoteManager:
                     self.link_manager.remove_note(str(note_id))
                 except Exception as e:
                     logger.debug(f'清理链接索引失败: {e}')
+            for engine in getattr(self, 'sync_engines', []):
+                engine.notify_note_deleted(f'note_{note_id}.json')
             del self.notes[note_id]
             self.update_tray_menu()
 
@@ -529,6 +775,7 @@ class StickyNoteManager:
                             data['tags'] = tags
                             with open(note_file, 'w', encoding='utf-8') as f:
                                 json.dump(data, f, ensure_ascii=False, indent=4)
+                            get_note_cache().invalidate(note_id)
                             count += 1
                     except Exception as e:
                         logger.warning(f'批量标签失败 note_{note_id}: {e}')
@@ -723,6 +970,7 @@ class StickyNoteManager:
         if self._loaded_note_count >= self._total_note_files:
             logger.info(f'便签加载完成: {len(self.notes)} 个便签已就绪')
             self.update_tray_menu()
+            self._index_unlinked_notes()
             # 如果异步加载后仍无便签，创建默认便签
             if not self.notes:
                 self.add_note()
@@ -884,25 +1132,57 @@ class StickyNoteManager:
         self.config.set('default_theme', theme_css)
 
     def apply_theme_to_all_notes(self) -> None:
+        """
+        将默认主题应用到所有便签。
+
+        主题只编译一次；先统一切换各便签的 objectName 作用域，
+        再安装应用级样式表——若样式表有变化，Qt 的全局重绘已覆盖所有便签，
+        否则仅对作用域变化的便签逐个重新应用样式。
+        """
+        theme_css = self.get_default_theme_css()
+        theme = StickyNote.compile_theme(theme_css)
+        changed = []
         for note in self.notes.values():
-            note.set_theme(self.get_default_theme_css())
+            note.theme = theme_css
+            if note.apply_compiled_theme(theme):
+                changed.append(note)
+        from features.theme_helper import get_theme_registry
+        if not get_theme_registry().install():
+            for note in changed:
+                note.repolish_theme()
+        for note in self.notes.values():
+            if not note.is_deleted:
+                note.queue_theme_save()
 
     def _init_theme_watcher(self) -> None:
         """初始化主题文件热加载监视器"""
         try:
-            from features.theme_helper import setup_theme_watcher, invalidate_cache
+            from features.theme_helper import setup_theme_watcher
             styles_dir = get_styles_dir()
             setup_theme_watcher(styles_dir, self._on_theme_files_changed)
         except Exception as e:
             logger.debug(f'初始化主题监视器失败: {e}')
 
-    def _on_theme_files_changed(self) -> None:
-        """主题文件变更回调 — 重新应用主题到所有便签"""
+    def _on_theme_files_changed(self, changed_themes: Set[str]) -> None:
+        """
+        主题文件变更回调（已防抖并按内容哈希过滤）。
+
+        只重新编译并应用到使用了变化主题的便签和打开中的对话框；
+        没有便签使用的主题仅失效缓存，不触发任何重绘。
+        """
         try:
-            from features.theme_helper import invalidate_cache
-            invalidate_cache()
-            self.apply_theme_to_all_notes()
-            logger.debug('主题文件已变更，已重新应用到所有便签')
+            from features.theme_helper import get_theme_registry, refresh_dialog_themes
+            affected = [note for note in self.notes.values() if note.theme in changed_themes]
+            if affected:
+                for note in affected:
+                    note.apply_compiled_theme(StickyNote.compile_theme(note.theme))
+                # 样式表内容已变化，Qt 会在安装时统一重新应用
+                get_theme_registry().install()
+                for note in affected:
+                    note.update()
+            dialog_count = refresh_dialog_themes(changed_themes)
+            logger.debug(f'主题热加载: {sorted(changed_themes)}，'
+                         f'刷新 {len(affected)} 个便签、{dialog_count} 个对话框')
         except Exception as e:
             logger.debug(f'热加载主题失败: {e}')
 
@@ -1257,12 +1537,11 @@ class StickyNoteManager:
                 self.plugin_loader.unload_all()
             except Exception as e:
                 logger.error(f'卸载插件时出错: {e}')
-        # 保存链接索引
-        if hasattr(self, 'link_manager'):
-            try:
-                self.link_manager.save_index()
-            except Exception as e:
-                logger.error(f'保存链接索引时出错: {e}')
+        # 等待进行中的备份/恢复结束
+        try:
+            self.backup_manager.shutdown()
+        except Exception as e:
+            logger.error(f'停止备份任务时出错: {e}')
         # 同步保存所有便签后关闭
         for note in list(self.notes.values()):
             note.is_deleted = True
@@ -1272,6 +1551,13 @@ class StickyNoteManager:
             except Exception as e:
                 logger.error(f'关闭时保存便签 {note.note_id} 失败: {e}')
             note.close()
+        # 便签最后一次保存会更新链接索引并启动延迟写盘的守护定时器，
+        # 定时器随进程退出而丢失：在此取消定时器并立即写盘
+        if hasattr(self, 'link_manager'):
+            try:
+                self.link_manager.save_index()
+            except Exception as e:
+                logger.error(f'保存链接索引时出错: {e}')
         self.tray_icon.hide()
         QCoreApplication.quit()
 
@@ -9,7 +9,6 @@
 import os
 import json
 import logging
-import re
 import time
 import copy
 
@@ -22,7 +21,7 @@ from PyQt5.QtWidgets import (
 )
 from PyQt5.QtCore import Qt, QPoint, QRect, QMimeData, QTimer, QThread, QSize, QPropertyAnimation, QEasingCurve, QEvent, pyqtSignal
 from PyQt5.QtGui import (
-    QFont, QColor, QPalette, QCursor, QPainter, QPen, QTextCharFormat
+    QFont, QColor, QPalette, QCursor, QPainter, QPen, QTextCharFormat, QTextCursor, QTextDocument
 )
 
 from features.undo_redo import UndoRedoLineEdit, UndoRedoTextEdit, UndoRedoManager
@@ -30,7 +29,9 @@ from features.positioning import get_position_manager
 from features.formatter import ContentFormatter
 from features.tag import TagChipWidget
 from features.richtext import RichTextActions
-from core import get_styles_dir, __version__
+from core import __version__
+
+logger = logging.getLogger(__name__)
 
 # 窗口调整大小检测边界宽度
 RESIZE_MARGIN = 10
@@ -42,14 +43,27 @@ SNAP_THRESHOLD = 15
 SAVE_DEBOUNCE_MS = 500
 
 
+def write_note_file(file_path: str, note_data: dict) -> None:
+    """
+    原子写入便签文件（临时文件 + os.replace）
+
+    备份、同步等后台读取方在任何时刻都只会看到完整的旧版本或新版本。
+    """
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    tmp_path = file_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(note_data, f, ensure_ascii=False, indent=4)
+    os.replace(tmp_path, file_path)
+
+
 class NoteSaveWorker(QThread):
     """
     便签异步保存工作线程
 
     在后台执行 JSON 序列化和文件写入，避免阻塞 UI 主线程。
     """
-    save_completed = None  # 保留备用信号
-    save_failed = None
+    save_completed = pyqtSignal(str)  # 写入成功后发出文件路径
+    save_failed = None  # 保留备用信号
 
     def __init__(self, note_data: dict, file_path: str):
         super().__init__()
@@ -58,9 +72,8 @@ class NoteSaveWorker(QThread):
 
     def run(self):
         try:
-            os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
-            with open(self.file_path, 'w', encoding='utf-8') as f:
-                json.dump(self.note_data, f, ensure_ascii=False, indent=4)
+            write_note_file(self.file_path, self.note_data)
+            self.save_completed.emit(self.file_path)
         except Exception as e:
             print(f"[NoteSaveWorker] 保存失败: {self.file_path} - {e}")
 
@@ -228,6 +241,8 @@ class StickyNote(QWidget):
         self.title_edit.setFixedHeight(40)
         self.title_edit.setText(self.note_data.get('title', f'\u4fbf\u7b7e {self.note_id}'))
         self.title_edit.textChanged.connect(self.update_title)
+        self.title_edit.editingFinished.connect(self._on_title_committed)
+        self._committed_title = self.title_edit.text().strip() or f'\u4fbf\u7b7e {self.note_id}'
         self.title_edit.setMaxLength(50)
         main_layout.addWidget(self.title_edit)
 
@@ -250,13 +265,7 @@ class StickyNote(QWidget):
         self.editor_stack.addWidget(self.text_edit)  # page 0: 富文本编辑器
         self.md_preview = QTextBrowser()
         self.md_preview.setOpenExternalLinks(True)
-        # 设置独立样式，防止被便签主题样式覆盖列表标号
-        self.md_preview.setStyleSheet('''
-            QTextBrowser {
-                background-color: #FFFFFF;
-                border: 1px solid #ddd;
-            }
-        ''')
+        # 背景/边框由主题补充 CSS 中的 QTextBrowser 规则按深浅色提供
         self.editor_stack.addWidget(self.md_preview)  # page 1: Markdown 预览
         main_layout.addWidget(self.editor_stack)
 
@@ -538,6 +547,7 @@ class StickyNote(QWidget):
 
         self.setLayout(main_layout)
 
+        self._assign_style_object_names()
         self.apply_theme()
 
         # 应用字体设置
@@ -685,24 +695,30 @@ class StickyNote(QWidget):
             if not self.is_deleted:
                 self.save_note()
 
-    def _apply_font_to_content_only(self):
-        """仅将字体设置应用到内容编辑器，不影响标题"""
-        font_settings = getattr(self, 'font_settings', {})
-        if not font_settings:
-            return
+    def _font_style_sheet(self, font_settings):
+        """由字体设置生成控件样式表（apply_font 与仅内容字体共用）"""
         font_family = font_settings.get('family', '微软雅黑')
         font_size = font_settings.get('size', 12)
         font_weight = 'bold' if font_settings.get('bold', False) else 'normal'
         font_style = 'italic' if font_settings.get('italic', False) else 'normal'
         font_color = getattr(self, 'font_color', '#000000')
-        font_style_sheet = f'''
+        return f'''
             font-family: "{font_family}" !important;
             font-size: {font_size}pt !important;
             font-weight: {font_weight} !important;
             font-style: {font_style} !important;
             color: {font_color} !important;
         '''
-        self.text_edit.setStyleSheet(self.text_edit.styleSheet() + font_style_sheet)
+
+    def _apply_font_to_content_only(self):
+        """仅将字体设置应用到内容编辑器，不影响标题"""
+        font_settings = getattr(self, 'font_settings', {})
+        if not font_settings:
+            return
+        # 整体替换样式表，不在旧样式表上追加（否则每次调整字号样式表都会变长）
+        font_style_sheet = self._font_style_sheet(font_settings)
+        if self.text_edit.styleSheet() != font_style_sheet:
+            self.text_edit.setStyleSheet(font_style_sheet)
 
     def toggle_bold(self):
         current_editor = self._get_focused_editor()
@@ -785,25 +801,11 @@ class StickyNote(QWidget):
 
     def is_dark_theme(self, theme_css_content):
         """检测主题是否为深色主题（基于背景色 W3C 相对亮度）"""
-        bg_match = re.search(r'StickyNote\s*{[^}]*background-color:\s*([^;]+);', theme_css_content)
-        if bg_match:
-            bg_color = bg_match.group(1).strip()
-            hex_match = re.match(r'#([0-9a-fA-F]{3,8})', bg_color)
-            if hex_match:
-                hex_str = hex_match.group(1)
-                if len(hex_str) == 3:
-                    r, g, b = int(hex_str[0]*2, 16), int(hex_str[1]*2, 16), int(hex_str[2]*2, 16)
-                elif len(hex_str) >= 6:
-                    r, g, b = int(hex_str[0:2], 16), int(hex_str[2:4], 16), int(hex_str[4:6], 16)
-                else:
-                    return False
-                luminance = (0.2126 * r + 0.7152 * g + 0.0722 * b) / 255
-                return luminance < 0.5
-            dark_keywords = ['#2', '#3', '#4', '#5', 'black', 'dark']
-            return any(keyword in bg_color.lower() for keyword in dark_keywords)
-        return False
-
-    def get_adaptive_control_styles(self, is_dark):
+        from features.theme_helper import is_dark_theme_css
+        return is_dark_theme_css(theme_css_content)
+
+    @staticmethod
+    def get_adaptive_control_styles(is_dark):
         if is_dark:
             return {
                 'separator_color': '#CCCCCC', 'bg': '#555555',
@@ -819,57 +821,67 @@ class StickyNote(QWidget):
                 'checked_color': '#FFFFFF'
             }
 
-    def apply_adaptive_control_styles(self, styles):
-        # 分隔符标签样式
-        for sep in ['separator1', 'separator2', 'separator3', 'separator4',
-                     'separator5', 'separator6', 'separator7']:
-            if hasattr(self, sep):
-                getattr(self, sep).setStyleSheet(f'color: {styles["separator_color"]}; margin: 0 5px;')
-        if hasattr(self, 'transparency_label'):
-            self.transparency_label.setStyleSheet(f'color: {styles["separator_color"]}; margin: 0 5px;')
+    # 主题自适应控件（按 objectName 在作用域样式表中定位）
+    SEPARATOR_LABELS = ('separator1', 'separator2', 'separator3', 'separator4',
+                        'separator5', 'separator6', 'separator7', 'transparency_label')
+    TOOLBAR_BUTTONS = ('decrease_font_btn', 'increase_font_btn', 'bold_btn',
+                       'underline_btn', 'strikethrough_btn', 'superscript_btn',
+                       'subscript_btn', 'align_left_btn', 'align_center_btn',
+                       'align_right_btn', 'ordered_list_btn', 'unordered_list_btn',
+                       'highlight_btn', 'clear_highlight_btn',
+                       'undo_btn', 'redo_btn', 'tag_btn', 'reminder_btn',
+                       'lock_btn', 'link_btn', 'image_btn', 'md_toggle_btn',
+                       'backlink_btn', 'help_btn', 'hide_btn')
+
+    def _assign_style_object_names(self):
+        """为主题自适应控件设置 objectName，供作用域样式表选择"""
+        for name in self.SEPARATOR_LABELS + self.TOOLBAR_BUTTONS + ('italic_btn', 'color_btn', 'delete_btn'):
+            widget = getattr(self, name, None)
+            if widget is not None:
+                widget.setObjectName(name)
+
+    @classmethod
+    def _get_adaptive_control_css(cls, styles):
+        """生成主题自适应控件的 CSS（分隔符、工具栏按钮、删除按钮）"""
+        def selector(widget_type, names, suffix=''):
+            return ', '.join(f'{widget_type}#{name}{suffix}' for name in names)
 
-        # 通用按钮模板
         button_template = '''
-            QPushButton {{
+            {sel} {{
                 background-color: {bg}; color: {color}; border: 1px solid {border};
-                border-radius: 3px; font-weight: bold;
+                border-radius: 3px; font-weight: bold;{extra}
             }}
-            QPushButton:hover {{ background-color: {hover_bg}; }}
-            QPushButton:checked {{ background-color: {checked_bg}; color: {checked_color}; border: 1px solid {checked_bg}; }}
-            QPushButton:disabled {{ color: #888; background-color: #444; }}
+            {sel_hover} {{ background-color: {hover_bg}; }}
+            {sel_checked} {{ background-color: {checked_bg}; color: {checked_color}; border: 1px solid {checked_bg}; }}
+            {sel_disabled} {{ color: #888; background-color: #444; }}
         '''
-        base_style = button_template.format(**styles)
-
-        # 字体工具栏按钮
-        for btn in ['decrease_font_btn', 'increase_font_btn', 'bold_btn',
-                     'underline_btn', 'strikethrough_btn', 'superscript_btn',
-                     'subscript_btn', 'align_left_btn', 'align_center_btn',
-                     'align_right_btn', 'ordered_list_btn', 'unordered_list_btn',
-                     'highlight_btn', 'clear_highlight_btn']:
-            if hasattr(self, btn):
-                getattr(self, btn).setStyleSheet(base_style)
-
-        # 斜体按钮（加 italic 样式）
-        if hasattr(self, 'italic_btn'):
-            italic_style = button_template.replace('font-weight: bold;', 'font-weight: bold; font-style: italic;').format(**styles)
-            self.italic_btn.setStyleSheet(italic_style)
-
-        # 颜色按钮（红色文字）
-        if hasattr(self, 'color_btn'):
-            color_style = button_template.replace('color: {color}', 'color: red').format(**styles)
-            self.color_btn.setStyleSheet(color_style)
-
-        # 功能按钮（撤销/重做/标签/提醒/锁定/链接/图片/MD/反链/删除/帮助/隐藏）
-        for btn in ['undo_btn', 'redo_btn', 'tag_btn', 'reminder_btn',
-                     'lock_btn', 'link_btn', 'image_btn', 'md_toggle_btn',
-                     'backlink_btn', 'help_btn', 'hide_btn']:
-            if hasattr(self, btn):
-                getattr(self, btn).setStyleSheet(base_style)
-
-        # 删除按钮特殊样式（红色调）
-        if hasattr(self, 'delete_btn'):
-            danger_style = base_style.replace(styles['bg'], '#e74c3c').replace(styles['hover_bg'], '#c0392b')
-            self.delete_btn.setStyleSheet(danger_style)
+
+        def buttons(names, extra='', **overrides):
+            values = dict(styles, **overrides)
+            return button_template.format(
+                sel=selector('QPushButton', names),
+                sel_hover=selector('QPushButton', names, ':hover'),
+                sel_checked=selector('QPushButton', names, ':checked'),
+                sel_disabled=selector('QPushButton', names, ':disabled'),
+                extra=extra, **values)
+
+        return (
+            f'{selector("QLabel", cls.SEPARATOR_LABELS)} '
+            f'{{ color: {styles["separator_color"]}; margin: 0 5px; }}'
+            + buttons(cls.TOOLBAR_BUTTONS)
+            # 斜体按钮（加 italic 样式）
+            + buttons(('italic_btn',), extra=' font-style: italic;')
+            # 颜色按钮（红色文字）
+            + buttons(('color_btn',), color='red')
+            # 删除按钮特殊样式（红色调）
+            + buttons(('delete_btn',), bg='#e74c3c', hover_bg='#c0392b')
+        )
+
+    @classmethod
+    def compose_theme_extras(cls, is_dark):
+        """主题注册表的补充 CSS：通用控件样式 + 自适应控件样式"""
+        return cls._get_extra_theme_css(is_dark) + cls._get_adaptive_control_css(
+            cls.get_adaptive_control_styles(is_dark))
 
     @staticmethod
     def _get_extra_theme_css(is_dark):
@@ -933,95 +945,60 @@ class StickyNote(QWidget):
                 QLabel { background: transparent; }
             '''
 
+    @staticmethod
+    def compile_theme(theme_css):
+        """从进程级主题注册表获取已编译主题（每个主题只加载、分析一次）"""
+        # 延迟导入：features.theme_helper 导入 core 包，而 core 包导入本模块
+        from features.theme_helper import get_theme_registry
+        registry = get_theme_registry()
+        registry.set_extra_css_provider(StickyNote.compose_theme_extras)
+        return registry.get(theme_css)
+
     def apply_theme(self):
         """
-        加载并应用主题样式
-        
-        优先从 styles/ 目录加载，失败时回退到硬编码默认样式，
-        启动阶段不弹窗阻塞，仅输出日志。
+        应用主题样式
+
+        主题样式表由 ThemeRegistry 编译并以应用级样式表的形式共享，
+        便签仅切换自身 objectName 作用域；主题文件缺失时注册表回退到默认样式。
         """
-        project_root = get_styles_dir()
-        theme_css_file = os.path.join(project_root, self.theme)
+        from features.theme_helper import get_theme_registry
+        try:
+            theme = self.compile_theme(self.theme)
+            scope_changed = self.apply_compiled_theme(theme)
+            if not get_theme_registry().install() and scope_changed:
+                self.repolish_theme()
+        except Exception as e:
+            logger.warning(f'[StickyNote] 应用主题失败: {self.theme} - {e}')
 
-        if not os.path.exists(theme_css_file):
-            print(f'[StickyNote] 样式文件不存在: {theme_css_file}，使用默认样式')
-            self._apply_default_style()
-            return
+    def apply_compiled_theme(self, theme):
+        """
+        切换到已编译主题的作用域（不触发重绘）。
 
-        try:
-            with open(theme_css_file, 'r', encoding='utf-8') as f:
-                style = f.read()
-            if not style.strip():
-                print(f'[StickyNote] 样式文件为空: {theme_css_file}，使用默认样式')
-                self._apply_default_style()
-                return
+        Returns:
+            作用域是否变化（变化且控件已应用过样式时需调用 repolish_theme）
+        """
+        self._is_dark_theme = theme.is_dark
+        # 更新边框画笔颜色以匹配主题
+        self._border_pen.setColor(QColor(100, 100, 100) if theme.is_dark else QColor(200, 200, 200))
+        if self.objectName() == theme.scope:
+            return False
+        self.setObjectName(theme.scope)
+        return self.testAttribute(Qt.WA_WState_Polished)
 
-            is_dark = self.is_dark_theme(style)
-            # 追加通用补充 CSS（QScrollBar / QSlider groove / QStackedWidget 等）
-            extra_css = self._get_extra_theme_css(is_dark)
-            full_style = style + extra_css
-            self.setStyleSheet(full_style)
-            self.text_edit.setStyleSheet(full_style)
-            self.title_edit.setStyleSheet(full_style)
-            adaptive_styles = self.get_adaptive_control_styles(is_dark)
-            self.apply_adaptive_control_styles(adaptive_styles)
-            # md_preview 根据深色/浅色主题设置独立样式
-            if hasattr(self, 'md_preview'):
-                md_bg = '#2b2b2b' if is_dark else '#FFFFFF'
-                md_border = '#555' if is_dark else '#ddd'
-                md_text = '#e0e0e0' if is_dark else '#333333'
-                self.md_preview.setStyleSheet(f'''
-                    QTextBrowser {{
-                        background-color: {md_bg};
-                        color: {md_text};
-                        border: 1px solid {md_border};
-                    }}
-                ''')
-            # 更新边框画笔颜色以匹配主题
-            self._border_pen.setColor(QColor(100, 100, 100) if is_dark else QColor(200, 200, 200))
-            if hasattr(self, 'font_settings') and self.font_settings:
-                self.apply_font()
-        except Exception as e:
-            print(f'[StickyNote] 加载样式文件失败: {theme_css_file} - {e}')
-            self._apply_default_style()
-
-    def _apply_default_style(self):
-        """应用硬编码的默认回退样式"""
-        default_style = '''
-            StickyNote { background-color: #FFF9C4; }
-            QLineEdit {
-                background-color: #FFFDE7; border: 2px solid #E0D89C;
-                border-radius: 5px; padding: 5px; font-family: "Microsoft YaHei";
-                font-weight: bold; text-align: center; color: #333333;
-            }
-            QTextEdit {
-                background-color: #FFFDE7; border: 2px solid #E0D89C;
-                border-radius: 5px; padding: 5px; font-family: "Microsoft YaHei";
-                color: #333333;
-            }
-        '''
-        self.setStyleSheet(default_style)
-        self.text_edit.setStyleSheet(default_style)
-        self.title_edit.setStyleSheet(default_style)
-        is_dark = self.is_dark_theme(default_style)
-        adaptive_styles = self.get_adaptive_control_styles(is_dark)
-        self.apply_adaptive_control_styles(adaptive_styles)
-        # md_preview 根据深色/浅色主题设置独立样式
-        if hasattr(self, 'md_preview'):
-            md_bg = '#2b2b2b' if is_dark else '#FFFFFF'
-            md_border = '#555' if is_dark else '#ddd'
-            md_text = '#e0e0e0' if is_dark else '#333333'
-            self.md_preview.setStyleSheet(f'''
-                QTextBrowser {{
-                    background-color: {md_bg};
-                    color: {md_text};
-                    border: 1px solid {md_border};
-                }}
-            ''')
-        # 更新边框画笔颜色
-        self._border_pen.setColor(QColor(100, 100, 100) if is_dark else QColor(200, 200, 200))
-        if hasattr(self, 'font_settings') and self.font_settings:
-            self.apply_font()
+    def repolish_theme(self):
+        """objectName 作用域变化后重新应用样式"""
+        from features.theme_helper import repolish_widget_tree
+        repolish_widget_tree(self)
+
+    def queue_theme_save(self):
+        """
+        仅持久化主题变更（批量切换主题时使用）。
+
+        note_data 中的其他字段在每次编辑时已同步更新，这里只写入主题并
+        重启防抖定时器，避免为每个便签重新收集 toHtml() 等 UI 状态。
+        """
+        self.note_data['theme'] = self.theme
+        self._save_timer.start(SAVE_DEBOUNCE_MS)
 
     def set_theme(self, theme_css):
         self.theme = theme_css
@@ -1041,20 +1018,12 @@ class StickyNote(QWidget):
         })
         if not font_settings:
             return
-        font_family = font_settings.get('family', '\u5fae\u8f6f\u96c5\u9ed1')
         font_size = font_settings.get('size', 12)
-        font_weight = 'bold' if font_settings.get('bold', False) else 'normal'
-        font_style = 'italic' if font_settings.get('italic', False) else 'normal'
-        font_color = getattr(self, 'font_color', '#000000')
-        font_style_sheet = f'''
-            font-family: "{font_family}" !important;
-            font-size: {font_size}pt !important;
-            font-weight: {font_weight} !important;
-            font-style: {font_style} !important;
-            color: {font_color} !important;
-        '''
-        self.text_edit.setStyleSheet(self.text_edit.styleSheet() + font_style_sheet)
-        self.title_edit.setStyleSheet(self.title_edit.styleSheet() + font_style_sheet)
+        font_style_sheet = self._font_style_sheet(font_settings)
+        # 主题样式来自应用级样式表，控件自身样式表只承载字体设置
+        if self.text_edit.styleSheet() != font_style_sheet:
+            self.text_edit.setStyleSheet(font_style_sheet)
+            self.title_edit.setStyleSheet(font_style_sheet)
         base_height = 30
         font_height_factor = 2.5
         calculated_height = max(base_height, int(font_size * font_height_factor))
@@ -1170,6 +1139,7 @@ class StickyNote(QWidget):
             # 深拷贝数据，避免后台线程访问时数据被修改
             data_copy = copy.deepcopy(self.note_data)
             self._save_worker = NoteSaveWorker(data_copy, self.note_file)
+            self._save_worker.save_completed.connect(self._on_saved_to_disk)
             self._save_worker.start()
         except Exception as e:
             print(f"[StickyNote] 启动保存线程失败: {e}")
@@ -1186,12 +1156,28 @@ class StickyNote(QWidget):
         # 立即停止防抖并同步写入
         self._save_timer.stop()
         try:
-            os.makedirs(os.path.dirname(self.note_file), exist_ok=True)
-            with open(self.note_file, 'w', encoding='utf-8') as f:
-                json.dump(self.note_data, f, ensure_ascii=False, indent=4)
+            write_note_file(self.note_file, self.note_data)
+            self._on_saved_to_disk(self.note_file)
         except Exception as e:
             print(f"[StickyNote] 同步保存失败: {e}")
 
+    def flush_pending_save(self):
+        """
+        立即写出防抖中的修改，并等待进行中的后台写入完成
+
+        供备份等需要一致磁盘状态的操作在开始前调用。
+        """
+        if self._save_timer.isActive() and not self.is_deleted:
+            self._save_timer.stop()
+            self._do_save_to_disk()
+        if self._save_worker is not None:
+            self._save_worker.wait()
+
+    def _on_saved_to_disk(self, file_path: str):
+        """写入完成后通知管理器（登记增量同步）"""
+        if self.manager and hasattr(self.manager, 'notify_note_saved'):
+            self.manager.notify_note_saved(file_path)
+
     # ==================== UI 事件处理 ====================
 
     def update_title(self):
@@ -1416,7 +1402,7 @@ class StickyNote(QWidget):
             return
         try:
             title = self.title_edit.text().strip()
-            backlinks = self.manager.link_manager.get_backlinks(self.note_id, title)
+            backlinks = self.manager.link_manager.get_backlinks(title)
             if backlinks:
                 lines = [f'• {link_title} (ID: {link_id})' for link_id, link_title in backlinks]
                 QMessageBox.information(self, f'“{title}” 的反向链接',
@@ -1428,6 +1414,76 @@ class StickyNote(QWidget):
             logger.debug(f'获取反向链接失败: {e}')
             QMessageBox.information(self, '反向链接', f'无法获取反向链接: {e}')
 
+    def _on_title_committed(self):
+        """标题编辑完成：若有其他便签链接到旧标题，询问是否同步更新这些链接"""
+        new_title = self.title_edit.text().strip() or f'\u4fbf\u7b7e {self.note_id}'
+        old_title, self._committed_title = self._committed_title, new_title
+        if old_title == new_title or not self.manager or not hasattr(self.manager, 'propagate_link_rename'):
+            return
+        try:
+            count = len(self.manager.link_manager.get_backlink_ids(old_title))
+            # 仍有其他便签使用旧标题时，链接并未失效
+            if not count or any(note is not self and note.note_data.get('title') == old_title
+                                for note in self.manager.notes.values()):
+                return
+        except Exception as e:
+            logger.debug(f'查询反向链接失败: {e}')
+            return
+        reply = QMessageBox.question(
+            self, '更新链接',
+            f'有 {count} 篇便签链接到“{old_title}”。\n是否把这些链接更新为“{new_title}”？',
+            QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
+        if reply != QMessageBox.Yes:
+            return
+        record = self.manager.propagate_link_rename(old_title, new_title)
+        box = QMessageBox(QMessageBox.Information, '更新链接',
+                          f'已更新 {len(record["note_ids"])} 篇便签中的链接', parent=self)
+        undo_btn = box.addButton('撤销', QMessageBox.RejectRole)
+        box.addButton(QMessageBox.Ok)
+        box.exec_()
+        if box.clickedButton() is undo_btn:
+            self.manager.undo_link_rename(record)
+
+    def rename_link_target(self, old_title: str, new_title: str) -> int:
+        """
+        通过编辑器把正文中的 [[old_title]] 改为 [[new_title]]
+
+        替换在一个编辑块中完成，前后各记录一次撤销状态，可在便签内单独撤销。
+
+        Returns:
+            int: 替换次数
+        """
+        document = self.text_edit.document()
+        pattern = f'[[{old_title}]]'
+        found = document.find(pattern, 0, QTextDocument.FindCaseSensitively)
+        if found.isNull():
+            return 0
+        self.undo_redo_manager.save_current_state(force=True)
+        block = QTextCursor(document)
+        block.beginEditBlock()
+        count = 0
+        while not found.isNull():
+            found.insertText(f'[[{new_title}]]')
+            count += 1
+            found = document.find(pattern, found.position(), QTextDocument.FindCaseSensitively)
+        block.endEditBlock()
+        self.undo_redo_manager.save_current_state(force=True)
+        if not self.is_deleted:
+            self.save_note()
+        return count
+
+    def restore_content(self, content: str) -> None:
+        """
+        通过编辑器把正文整体恢复为给定 HTML（用于撤销链接重命名）
+
+        前后各记录一次撤销状态，可在便签内单独撤销。
+        """
+        self.undo_redo_manager.save_current_state(force=True)
+        self.text_edit.setHtml(content)
+        self.undo_redo_manager.save_current_state(force=True)
+        if not self.is_deleted:
+            self.save_note()
+
     def _toggle_lock(self):
         """切换便签锁定状态"""
         self.is_locked = not self.is_locked
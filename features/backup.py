@@ -2,28 +2,91 @@
 """
 数据备份功能模块
 
-提供自动和手动备份功能，确保用户数据安全
+提供自动和手动备份功能，确保用户数据安全。
+默认使用增量备份（features/backup_store.py）：内容寻址对象 + 每次快照的清单，
+仍可选择 zip 格式（backup_format = 'zip'），zip 备份的导入/导出/恢复保持不变。
 """
 
 import os
+import re
 import json
+import time
 import shutil
 import zipfile
 import hashlib
 import logging
+import difflib
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from PyQt5.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, 
     QListWidget, QListWidgetItem, QMessageBox, QProgressBar,
-    QFileDialog, QCheckBox, QSpinBox, QGroupBox, QFormLayout
+    QFileDialog, QCheckBox, QSpinBox, QGroupBox, QFormLayout,
+    QAbstractItemView, QTextEdit, QSplitter
 )
 from PyQt5.QtCore import QTimer, QThread, pyqtSignal, Qt
 from PyQt5.QtGui import QFont
 
-from core import get_styles_dir, get_user_data_dir
+from core import get_styles_dir, get_user_data_dir, __version__
+from core.note import write_note_file
+from features import backup_compression
+from features.backup_store import BackupStore, VERIFY_CHUNK
 
 logger = logging.getLogger(__name__)
 
+# 备份中的便签文件归档路径
+NOTE_ARCNAME_RE = re.compile(r'^notes/note_(\d+)\.json$')
+
+# zip 备份内嵌的清单（逐文件 SHA-256 与大小、便签数量、程序版本）
+ZIP_MANIFEST_NAME = 'backup_manifest.json'
+
+# 备份完成后在后台校验的最新备份数量
+VERIFY_RECENT_COUNT = 3
+
+# 超过该大小的文件流式写入 zip，不整体读入内存并行压缩
+PARALLEL_ENTRY_LIMIT = 8 * 1024 * 1024
+
+# 备份索引格式版本
+BACKUP_INDEX_VERSION = 1
+
+# 分级保留的默认时长：每小时保留 24 小时、每天保留 30 天、每周保留 52 周
+DEFAULT_RETENTION = {'hourly_hours': 24, 'daily_days': 30, 'weekly_weeks': 52}
+
+
+def select_tiered_retention(timestamps, now, hourly_hours=24, daily_days=30, weekly_weeks=52):
+    """
+    分级（祖父-父-子）保留：一次遍历决定保留哪些备份
+    
+    从新到旧遍历，最近 hourly_hours 小时内每小时、最近 daily_days 天内每天、
+    最近 weekly_weeks 周内每周各保留最新的一个备份；最新的备份总是保留。
+    
+    Args:
+        timestamps: {备份名: 创建时间戳}
+        now: 当前时间戳
+        
+    Returns:
+        set: 需要保留的备份名
+    """
+    keep = set()
+    seen_slots = set()
+    for name, ts in sorted(timestamps.items(), key=lambda x: x[1], reverse=True):
+        age = now - ts
+        moment = datetime.fromtimestamp(ts)
+        if age < hourly_hours * 3600:
+            slot = ('hour', moment.strftime('%Y%m%d%H'))
+        elif age < daily_days * 86400:
+            slot = ('day', moment.date())
+        elif age < weekly_weeks * 7 * 86400:
+            slot = ('week', moment.isocalendar()[:2])
+        else:
+            slot = None
+        if not keep or (slot is not None and slot not in seen_slots):
+            seen_slots.add(slot)
+            keep.add(name)
+    return keep
+
 
 class BackupWorker(QThread):
     """
@@ -35,28 +98,40 @@ class BackupWorker(QThread):
     progress_updated = pyqtSignal(int)  # 进度更新信号
     backup_completed = pyqtSignal(str)  # 备份完成信号
     backup_failed = pyqtSignal(str)     # 备份失败信号
+    backup_skipped = pyqtSignal()       # 自动备份时数据无变化，未创建备份
     
-    def __init__(self, backup_manager, backup_name=None):
+    def __init__(self, backup_manager, backup_name=None, auto=False):
         """
         初始化备份工作线程
         
         Args:
             backup_manager: 备份管理器实例
             backup_name: 备份名称
+            auto: 是否为自动备份（数据无变化时跳过，并在备份前清理旧备份）
         """
         super().__init__()
         self.backup_manager = backup_manager
         self.backup_name = backup_name
+        self.auto = auto
     
     def run(self):
         """
         执行备份操作
         """
         try:
+            state_hash = ''
+            if self.auto:
+                state_hash = self.backup_manager._get_notes_state_hash()
+                if state_hash and state_hash == self.backup_manager._last_backup_hash:
+                    self.backup_skipped.emit()
+                    return
+                self.backup_manager.cleanup_old_backups()
             backup_path = self.backup_manager.create_backup_internal(
                 self.backup_name, self.progress_updated
             )
             if backup_path:
+                if self.auto:
+                    self.backup_manager._last_backup_hash = state_hash
                 self.backup_completed.emit(backup_path)
             else:
                 self.backup_failed.emit("备份创建失败")
@@ -103,6 +178,57 @@ class RestoreWorker(QThread):
             self.restore_failed.emit(str(e))
 
 
+class VerifyWorker(QThread):
+    """
+    备份校验工作线程
+    
+    逐个流式校验备份，结果记录在备份管理器中
+    """
+    
+    verify_completed = pyqtSignal(dict)  # {备份路径: 校验结果}
+    
+    def __init__(self, backup_manager, backup_paths):
+        """
+        Args:
+            backup_manager: 备份管理器实例
+            backup_paths: 要校验的备份路径
+        """
+        super().__init__()
+        self.backup_manager = backup_manager
+        self.backup_paths = list(backup_paths)
+    
+    def run(self):
+        results = {}
+        for path in self.backup_paths:
+            try:
+                results[path] = self.backup_manager.verify_backup(path)
+            except Exception as e:
+                logger.error(f'校验备份失败: {path} - {e}')
+        self.verify_completed.emit(results)
+
+
+class GcWorker(QThread):
+    """
+    备份对象回收线程
+    
+    删除快照后在后台回收不再被引用的对象（耗时与对象数量成正比，不在界面线程执行）
+    """
+    
+    gc_completed = pyqtSignal(int)  # 删除的对象数量
+    
+    def __init__(self, store):
+        super().__init__()
+        self.store = store
+    
+    def run(self):
+        try:
+            removed = self.store.gc()
+        except Exception as e:
+            logger.error(f'回收备份对象失败: {e}')
+            removed = 0
+        self.gc_completed.emit(removed)
+
+
 class BackupDialog(QDialog):
     """
     备份管理对话框
@@ -124,6 +250,10 @@ class BackupDialog(QDialog):
         self.restore_worker = None
         self.initUI()
         self.refresh_backup_list()
+        # 打开时若自动备份正在进行，显示其进度
+        worker = self.backup_manager.active_worker
+        if isinstance(worker, BackupWorker) and worker.isRunning():
+            self._attach_backup_worker(worker, notify=False)
         # 应用主题适配
         try:
             from features.theme_helper import apply_dialog_theme, get_current_theme_css
@@ -185,6 +315,13 @@ class BackupDialog(QDialog):
         max_backup_layout.addStretch()
         backup_layout.addRow(max_backup_layout)
         
+        # 分级保留设置（启用时不按数量清理）
+        self.tiered_checkbox = QCheckBox('分级保留（每小时保留一天、每天保留一个月、每周保留一年）')
+        self.tiered_checkbox.setChecked(self.backup_manager.retention_policy == 'tiered')
+        self.tiered_checkbox.stateChanged.connect(self.on_retention_changed)
+        self.max_backup_spinbox.setEnabled(not self.tiered_checkbox.isChecked())
+        backup_layout.addRow(self.tiered_checkbox)
+        
         backup_group.setLayout(backup_layout)
         layout.addWidget(backup_group)
         
@@ -228,10 +365,22 @@ class BackupDialog(QDialog):
         self.restore_btn.clicked.connect(self.restore_backup)
         self.restore_btn.setEnabled(False)
         
+        self.browse_btn = QPushButton('恢复单个便签')
+        self.browse_btn.clicked.connect(self.browse_backup_notes)
+        self.browse_btn.setEnabled(False)
+        
+        self.diff_btn = QPushButton('与上一备份比较')
+        self.diff_btn.clicked.connect(self.diff_with_previous)
+        self.diff_btn.setEnabled(False)
+        
         self.delete_btn = QPushButton('删除选中备份')
         self.delete_btn.clicked.connect(self.delete_backup)
         self.delete_btn.setEnabled(False)
         
+        self.verify_btn = QPushButton('校验')
+        self.verify_btn.clicked.connect(self.verify_selected_backup)
+        self.verify_btn.setEnabled(False)
+        
         self.refresh_btn = QPushButton('刷新列表')
         self.refresh_btn.clicked.connect(self.refresh_backup_list)
         
@@ -239,7 +388,10 @@ class BackupDialog(QDialog):
         self.close_btn.clicked.connect(self.close)
         
         bottom_layout.addWidget(self.restore_btn)
+        bottom_layout.addWidget(self.browse_btn)
+        bottom_layout.addWidget(self.diff_btn)
         bottom_layout.addWidget(self.delete_btn)
+        bottom_layout.addWidget(self.verify_btn)
         bottom_layout.addStretch()
         bottom_layout.addWidget(self.refresh_btn)
         bottom_layout.addWidget(self.close_btn)
@@ -266,6 +418,17 @@ class BackupDialog(QDialog):
         """
         self.backup_manager.set_auto_backup_interval(value * 3600)
     
+    def on_retention_changed(self, state):
+        """
+        处理保留策略变化
+        
+        Args:
+            state: 复选框状态
+        """
+        tiered = state == Qt.Checked
+        self.max_backup_spinbox.setEnabled(not tiered)
+        self.backup_manager.set_retention_policy('tiered' if tiered else 'count')
+    
     def on_max_backup_changed(self, value):
         """
         处理最大备份数量变化
@@ -279,27 +442,41 @@ class BackupDialog(QDialog):
         """
         创建新备份
         """
+        worker = self.backup_manager.start_backup(setup=self._attach_backup_worker)
+        if worker is None:
+            QMessageBox.information(self, '请稍候', '已有备份或恢复任务正在进行')
+    
+    def _attach_backup_worker(self, worker, notify=True):
+        """
+        显示备份任务的进度
+        
+        Args:
+            worker: 备份工作线程
+            notify: 完成时是否弹出提示（自动备份只刷新列表）
+        """
         self.progress_bar.setVisible(True)
         self.progress_bar.setValue(0)
         self.create_backup_btn.setEnabled(False)
         
-        self.backup_worker = BackupWorker(self.backup_manager)
-        self.backup_worker.progress_updated.connect(self.progress_bar.setValue)
-        self.backup_worker.backup_completed.connect(self.on_backup_completed)
-        self.backup_worker.backup_failed.connect(self.on_backup_failed)
-        self.backup_worker.start()
+        self.backup_worker = worker
+        worker.progress_updated.connect(self.progress_bar.setValue)
+        worker.backup_completed.connect(lambda path: self.on_backup_completed(path, notify))
+        worker.backup_failed.connect(self.on_backup_failed)
+        worker.backup_skipped.connect(lambda: self.on_backup_completed(None, False))
     
-    def on_backup_completed(self, backup_path):
+    def on_backup_completed(self, backup_path, notify=True):
         """
         处理备份完成事件
         
         Args:
             backup_path: 备份文件路径
+            notify: 是否弹出提示
         """
         self.progress_bar.setVisible(False)
         self.create_backup_btn.setEnabled(True)
         self.refresh_backup_list()
-        QMessageBox.information(self, '备份完成', f'备份已成功创建:\n{backup_path}')
+        if notify:
+            QMessageBox.information(self, '备份完成', f'备份已成功创建:\n{backup_path}')
     
     def on_backup_failed(self, error_message):
         """
@@ -346,8 +523,10 @@ class BackupDialog(QDialog):
             return
         
         item = selected_items[0]
-        backup_name = item.text().split(' - ')[0]
-        backup_path = os.path.join(self.backup_manager.backup_dir, backup_name)
+        backup_path = item.data(Qt.UserRole)
+        backup_name = os.path.basename(backup_path)
+        if self.backup_manager.is_snapshot(backup_path):
+            backup_name = os.path.splitext(backup_name)[0] + '.zip'
         
         if not os.path.exists(backup_path):
             QMessageBox.warning(self, '错误', '备份文件不存在')
@@ -359,7 +538,7 @@ class BackupDialog(QDialog):
         
         if save_path:
             try:
-                shutil.copy2(backup_path, save_path)
+                self.backup_manager.export_backup(backup_path, save_path)
                 QMessageBox.information(self, '导出成功', f'备份文件已导出到:\n{save_path}')
             except Exception as e:
                 QMessageBox.warning(self, '导出失败', f'导出备份文件时出错:\n{e}')
@@ -381,18 +560,20 @@ class BackupDialog(QDialog):
         
         if reply == QMessageBox.Yes:
             item = selected_items[0]
-            backup_name = item.text().split(' - ')[0]
-            backup_path = os.path.join(self.backup_manager.backup_dir, backup_name)
+            backup_path = item.data(Qt.UserRole)
+            
+            self.restore_worker = self.backup_manager.start_restore(backup_path)
+            if self.restore_worker is None:
+                QMessageBox.information(self, '请稍候', '已有备份或恢复任务正在进行')
+                return
             
             self.progress_bar.setVisible(True)
             self.progress_bar.setValue(0)
             self.restore_btn.setEnabled(False)
             
-            self.restore_worker = RestoreWorker(self.backup_manager, backup_path)
             self.restore_worker.progress_updated.connect(self.progress_bar.setValue)
             self.restore_worker.restore_completed.connect(self.on_restore_completed)
             self.restore_worker.restore_failed.connect(self.on_restore_failed)
-            self.restore_worker.start()
     
     def on_restore_completed(self):
         """
@@ -416,6 +597,68 @@ class BackupDialog(QDialog):
         self.restore_btn.setEnabled(True)
         QMessageBox.warning(self, '恢复失败', f'恢复备份时出错:\n{error_message}')
     
+    def verify_selected_backup(self):
+        """
+        在后台校验选中的备份
+        """
+        selected_items = self.backup_list.selectedItems()
+        if not selected_items:
+            return
+        worker = self.backup_manager.start_verify([selected_items[0].data(Qt.UserRole)])
+        if worker is None:
+            QMessageBox.information(self, '请稍候', '校验任务正在进行')
+            return
+        self.verify_btn.setEnabled(False)
+        worker.verify_completed.connect(self.on_verify_completed)
+    
+    def on_verify_completed(self, results):
+        """
+        显示校验结果
+        
+        Args:
+            results: {备份路径: 校验结果}
+        """
+        self.verify_btn.setEnabled(bool(self.backup_list.selectedItems()))
+        self.refresh_backup_list()
+        damaged = [r for r in results.values() if not r['ok']]
+        if damaged:
+            QMessageBox.warning(self, '校验失败', '备份已损坏:\n' + '\n'.join(damaged[0]['errors'][:10]))
+        else:
+            QMessageBox.information(self, '校验通过', '备份完整')
+    
+    def diff_with_previous(self):
+        """
+        比较选中的备份与其前一个（更早的）备份
+        """
+        row = self.backup_list.currentRow()
+        if row < 0 or row >= self.backup_list.count() - 1:
+            return
+        new_path = self.backup_list.item(row).data(Qt.UserRole)
+        old_path = self.backup_list.item(row + 1).data(Qt.UserRole)
+        try:
+            rows = self.backup_manager.diff_backups(old_path, new_path)
+        except Exception as e:
+            QMessageBox.warning(self, '比较失败', f'读取备份清单时出错:\n{e}')
+            return
+        dialog = BackupDiffDialog(self.backup_manager, old_path, new_path, rows, self)
+        dialog.exec_()
+    
+    def browse_backup_notes(self):
+        """
+        浏览选中备份中的便签，恢复选中的便签（无需重启）
+        """
+        selected_items = self.backup_list.selectedItems()
+        if not selected_items:
+            return
+        backup_path = selected_items[0].data(Qt.UserRole)
+        try:
+            notes = self.backup_manager.list_backup_notes(backup_path)
+        except Exception as e:
+            QMessageBox.warning(self, '读取失败', f'读取备份内容时出错:\n{e}')
+            return
+        dialog = BackupNotesDialog(self.backup_manager, backup_path, notes, self)
+        dialog.exec_()
+    
     def delete_backup(self):
         """
         删除选中的备份
@@ -433,11 +676,10 @@ class BackupDialog(QDialog):
         
         if reply == QMessageBox.Yes:
             item = selected_items[0]
-            backup_name = item.text().split(' - ')[0]
-            backup_path = os.path.join(self.backup_manager.backup_dir, backup_name)
+            backup_path = item.data(Qt.UserRole)
             
             try:
-                os.remove(backup_path)
+                self.backup_manager.delete_backup(backup_path)
                 self.refresh_backup_list()
                 QMessageBox.information(self, '删除成功', '备份文件已删除')
             except Exception as e:
@@ -449,7 +691,11 @@ class BackupDialog(QDialog):
         """
         has_selection = len(self.backup_list.selectedItems()) > 0
         self.restore_btn.setEnabled(has_selection)
+        self.browse_btn.setEnabled(has_selection)
+        self.diff_btn.setEnabled(
+            has_selection and self.backup_list.currentRow() < self.backup_list.count() - 1)
         self.delete_btn.setEnabled(has_selection)
+        self.verify_btn.setEnabled(has_selection)
         self.export_backup_btn.setEnabled(has_selection)
     
     def refresh_backup_list(self):
@@ -462,11 +708,155 @@ class BackupDialog(QDialog):
         
         for backup_info in backup_files:
             item_text = f"{backup_info['filename']} - {backup_info['date']} ({backup_info['size']})"
+            tooltip = f"文件: {backup_info['filename']}\n日期: {backup_info['date']}\n大小: {backup_info['size']}"
+            verify = backup_info.get('verify')
+            if verify and not verify['ok']:
+                item_text = f"[已损坏] {item_text}"
+                tooltip += '\n校验失败:\n' + '\n'.join(verify['errors'][:5])
+            elif verify:
+                tooltip += '\n校验通过'
             item = QListWidgetItem(item_text)
-            item.setToolTip(f"文件: {backup_info['filename']}\n日期: {backup_info['date']}\n大小: {backup_info['size']}")
+            item.setData(Qt.UserRole, backup_info['path'])
+            if verify and not verify['ok']:
+                item.setForeground(Qt.red)
+            item.setToolTip(tooltip)
             self.backup_list.addItem(item)
 
 
+class BackupDiffDialog(QDialog):
+    """
+    备份比较对话框
+    
+    列出两个备份之间新增、删除、修改的便签；选中修改的便签时才读取并显示文本差异
+    """
+    
+    STATUS_TEXT = {'added': '新增', 'removed': '删除', 'modified': '修改'}
+    
+    def __init__(self, backup_manager, old_path, new_path, rows, parent=None):
+        """
+        Args:
+            backup_manager: 备份管理器实例
+            old_path: 较早的备份
+            new_path: 较新的备份
+            rows: diff_backups() 的结果
+            parent: 父窗口
+        """
+        super().__init__(parent)
+        self.backup_manager = backup_manager
+        self.old_path = old_path
+        self.new_path = new_path
+        self._text_diffs = {}
+        self.setWindowTitle('备份比较')
+        self.resize(640, 520)
+        
+        layout = QVBoxLayout()
+        layout.addWidget(QLabel(f'{os.path.basename(old_path)} → {os.path.basename(new_path)}：'
+                                f'{len(rows)} 个便签有变化'))
+        splitter = QSplitter(Qt.Vertical)
+        self.row_list = QListWidget()
+        for info in rows:
+            text = f"[{self.STATUS_TEXT[info['status']]}] #{info['note_id']} "
+            if info['status'] == 'modified' and info['old_title'] != info['new_title']:
+                text += f"{info['old_title']} → {info['new_title']}"
+            else:
+                text += info['new_title'] or info['old_title']
+            item = QListWidgetItem(text)
+            item.setData(Qt.UserRole, info)
+            self.row_list.addItem(item)
+        self.row_list.currentItemChanged.connect(self.show_text_diff)
+        splitter.addWidget(self.row_list)
+        self.diff_view = QTextEdit()
+        self.diff_view.setReadOnly(True)
+        self.diff_view.setPlaceholderText('选择修改的便签查看文本差异')
+        splitter.addWidget(self.diff_view)
+        layout.addWidget(splitter)
+        
+        close_btn = QPushButton('关闭')
+        close_btn.clicked.connect(self.close)
+        button_layout = QHBoxLayout()
+        button_layout.addStretch()
+        button_layout.addWidget(close_btn)
+        layout.addLayout(button_layout)
+        self.setLayout(layout)
+    
+    def show_text_diff(self, current, previous=None):
+        """
+        显示选中便签的文本差异（首次选中时计算）
+        """
+        if current is None:
+            return
+        info = current.data(Qt.UserRole)
+        if info['status'] != 'modified':
+            self.diff_view.clear()
+            return
+        note_id = info['note_id']
+        if note_id not in self._text_diffs:
+            self._text_diffs[note_id] = self.backup_manager.diff_note_text(
+                self.old_path, self.new_path, note_id) or '（正文未变化）'
+        self.diff_view.setPlainText(self._text_diffs[note_id])
+
+
+class BackupNotesDialog(QDialog):
+    """
+    备份便签浏览对话框
+    
+    列出备份中的便签（只读取备份索引），把选中的便签直接恢复到当前数据并立即载入
+    """
+    
+    def __init__(self, backup_manager, backup_path, notes, parent=None):
+        """
+        Args:
+            backup_manager: 备份管理器实例
+            backup_path: 备份路径
+            notes: list_backup_notes() 的结果
+            parent: 父窗口
+        """
+        super().__init__(parent)
+        self.backup_manager = backup_manager
+        self.backup_path = backup_path
+        self.setWindowTitle('恢复单个便签')
+        self.resize(420, 480)
+        
+        layout = QVBoxLayout()
+        layout.addWidget(QLabel('选择要恢复的便签（同 ID 的当前便签将被替换）:'))
+        self.note_list = QListWidget()
+        self.note_list.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        for info in notes:
+            status = '当前存在' if info['exists'] else '已删除'
+            title = info.get('title') or f"便签 {info['note_id']}"
+            item = QListWidgetItem(f"#{info['note_id']} {title}（{status}，"
+                                   f"{backup_manager.format_file_size(info['size'])}）")
+            item.setData(Qt.UserRole, info['note_id'])
+            self.note_list.addItem(item)
+        layout.addWidget(self.note_list)
+        
+        button_layout = QHBoxLayout()
+        restore_btn = QPushButton('恢复所选')
+        restore_btn.clicked.connect(self.restore_selected)
+        close_btn = QPushButton('关闭')
+        close_btn.clicked.connect(self.close)
+        button_layout.addStretch()
+        button_layout.addWidget(restore_btn)
+        button_layout.addWidget(close_btn)
+        layout.addLayout(button_layout)
+        self.setLayout(layout)
+    
+    def restore_selected(self):
+        """
+        恢复选中的便签
+        """
+        note_ids = [item.data(Qt.UserRole) for item in self.note_list.selectedItems()]
+        if not note_ids:
+            return
+        restored = self.backup_manager.restore_notes(self.backup_path, note_ids)
+        if len(restored) == len(note_ids):
+            QMessageBox.information(self, '恢复完成', f'已恢复 {len(restored)} 个便签')
+            self.accept()
+        else:
+            QMessageBox.warning(self, '恢复未完成',
+                                f'已恢复 {len(restored)} / {len(note_ids)} 个便签，其余便签读取失败')
+
+
 class BackupManager:
     """
     备份管理器
@@ -485,10 +875,21 @@ class BackupManager:
         self.backup_dir = os.path.join(get_user_data_dir(), 'backups')
         os.makedirs(self.backup_dir, exist_ok=True)
         
+        # 增量备份存储（内容寻址对象 + 快照清单）
+        self.store = BackupStore(os.path.join(self.backup_dir, 'store'))
+        
         # 备份设置
         self.auto_backup_enabled = True
         self.auto_backup_interval = 3600  # 1小时
         self.max_backup_count = 10
+        self.backup_format = 'incremental'  # 'incremental' / 'zip'
+        self.retention_policy = 'tiered'    # 'tiered'（分级保留）/ 'count'（保留最新 max_backup_count 个）
+        self.retention = dict(DEFAULT_RETENTION)
+        
+        # 备份索引：get_backup_list 从索引读取元数据，不再逐个 stat 备份文件
+        self._index_file = os.path.join(self.backup_dir, 'backup_index.json')
+        self._index_lock = threading.Lock()
+        self._index = None
         
         # 自动备份定时器
         self.auto_backup_timer = QTimer()
@@ -497,6 +898,19 @@ class BackupManager:
         # 上次备份时的数据状态哈希（用于跳过无变化的备份）
         self._last_backup_hash = ''
         
+        # 正在进行的备份/恢复任务（同一时间只允许一个）
+        self.active_worker = None
+        
+        # 后台对象回收任务；运行中又有快照被删除时，结束后再回收一次
+        self.gc_worker = None
+        self._gc_again = False
+        
+        # 后台校验任务与校验结果 {备份文件名: 结果}
+        self.verify_worker = None
+        self._verify_status_file = os.path.join(self.backup_dir, 'verify_status.json')
+        self._verify_lock = threading.Lock()
+        self._verify_status = self._load_verify_status()
+        
         # 加载设置
         self.load_backup_settings()
         
@@ -504,6 +918,168 @@ class BackupManager:
         if self.auto_backup_enabled:
             self.auto_backup_timer.start(self.auto_backup_interval * 1000)
     
+    def is_busy(self):
+        """是否有备份或恢复任务正在进行"""
+        return self.active_worker is not None and self.active_worker.isRunning()
+    
+    def start_backup(self, backup_name=None, auto=False, setup=None):
+        """
+        在后台线程创建备份
+        
+        Args:
+            backup_name: 备份名称，如果为None则使用时间戳
+            auto: 是否为自动备份
+            setup: 线程启动前调用 setup(worker) 连接信号（启动后再连接可能错过很快完成的备份）
+            
+        Returns:
+            BackupWorker: 已启动的工作线程；已有任务进行中时返回None
+        """
+        if self.is_busy():
+            return None
+        # 先把防抖中的便签修改写入磁盘，备份的是一致的已保存状态
+        flush = getattr(self.manager, 'flush_pending_saves', None)
+        if flush:
+            flush()
+        worker = BackupWorker(self, backup_name, auto=auto)
+        worker.backup_completed.connect(lambda path: logger.info(f'备份已创建: {path}'))
+        worker.backup_completed.connect(lambda path: self.start_verify())
+        worker.backup_failed.connect(lambda msg: logger.error(f'备份失败: {msg}'))
+        worker.backup_skipped.connect(lambda: logger.info('本次检查无修改，跳过本次备份'))
+        if setup is not None:
+            setup(worker)
+        self.active_worker = worker
+        worker.start()
+        return worker
+    
+    def start_restore(self, backup_path):
+        """
+        在后台线程恢复备份
+        
+        Returns:
+            RestoreWorker: 已启动的工作线程；已有任务进行中时返回None
+        """
+        if self.is_busy():
+            return None
+        worker = RestoreWorker(self, backup_path)
+        self.active_worker = worker
+        worker.start()
+        return worker
+    
+    def start_verify(self, backup_paths=None):
+        """
+        在后台线程校验备份
+        
+        Args:
+            backup_paths: 要校验的备份，None 表示最新的 VERIFY_RECENT_COUNT 个
+            
+        Returns:
+            VerifyWorker: 已启动的工作线程；已有校验进行中时返回None
+        """
+        if self.verify_worker is not None and self.verify_worker.isRunning():
+            return None
+        if backup_paths is None:
+            backup_paths = [info['path'] for info in self.get_backup_list()[:VERIFY_RECENT_COUNT]]
+        worker = VerifyWorker(self, backup_paths)
+        worker.verify_completed.connect(self._on_verify_completed)
+        self.verify_worker = worker
+        worker.start()
+        return worker
+    
+    def _on_verify_completed(self, results):
+        damaged = [os.path.basename(path) for path, result in results.items() if not result['ok']]
+        if damaged:
+            logger.warning(f'备份校验失败: {damaged}')
+    
+    def verify_backup(self, backup_path):
+        """
+        流式校验备份的完整性（内存占用与备份大小无关）
+        
+        zip 备份按内嵌清单逐文件校验 SHA-256 与大小（同时由 zipfile 校验 CRC），
+        没有清单的旧备份只校验 CRC；增量备份校验快照引用的全部对象。
+        结果记录在 verify_status.json 中，供备份列表标记已损坏的备份。
+        
+        Returns:
+            dict: {'ok', 'errors', 'files', 'bytes', 'has_manifest', 'checked_at'}
+        """
+        if self.is_snapshot(backup_path):
+            result = self.store.verify_snapshot(self._snapshot_name(backup_path))
+            result['has_manifest'] = True
+        else:
+            result = self._verify_zip(backup_path)
+        result['checked_at'] = time.time()
+        with self._verify_lock:
+            self._verify_status[os.path.basename(backup_path)] = result
+            self._save_verify_status()
+        return result
+    
+    def _verify_zip(self, backup_path):
+        errors = []
+        file_count = 0
+        total_bytes = 0
+        manifest = None
+        try:
+            with zipfile.ZipFile(backup_path, 'r') as zipf:
+                try:
+                    manifest = json.loads(zipf.read(ZIP_MANIFEST_NAME).decode('utf-8'))
+                    expected = manifest['files']
+                except KeyError:
+                    expected = {info.filename: None for info in zipf.infolist()}
+                names = set(zipf.namelist())
+                for arcname, entry in expected.items():
+                    if arcname not in names:
+                        errors.append(f'{arcname}: 缺失')
+                        continue
+                    digest = hashlib.sha256()
+                    size = 0
+                    try:
+                        with zipf.open(arcname) as f:
+                            for chunk in iter(lambda: f.read(VERIFY_CHUNK), b''):
+                                digest.update(chunk)
+                                size += len(chunk)
+                    except Exception as e:
+                        # CRC 错误、解压失败、截断等
+                        errors.append(f'{arcname}: {e}')
+                        continue
+                    file_count += 1
+                    total_bytes += size
+                    if entry is not None and (digest.hexdigest() != entry['sha256'] or size != entry['size']):
+                        errors.append(f'{arcname}: 内容与清单不符')
+        except (zipfile.BadZipFile, OSError, ValueError) as e:
+            errors.append(f'备份文件无法读取: {e}')
+        return {'ok': not errors, 'errors': errors, 'files': file_count, 'bytes': total_bytes,
+                'has_manifest': manifest is not None}
+    
+    def get_verify_status(self, backup_path):
+        """最近一次校验结果，未校验过时返回None"""
+        with self._verify_lock:
+            return self._verify_status.get(os.path.basename(backup_path))
+    
+    def _load_verify_status(self):
+        try:
+            with open(self._verify_status_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def _save_verify_status(self):
+        tmp_path = self._verify_status_file + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._verify_status, f, ensure_ascii=False)
+            os.replace(tmp_path, self._verify_status_file)
+        except Exception as e:
+            logger.warning(f'保存备份校验结果失败: {e}')
+    
+    def shutdown(self):
+        """停止自动备份并等待进行中的任务结束（应用退出时调用）"""
+        self.auto_backup_timer.stop()
+        if self.active_worker is not None:
+            self.active_worker.wait()
+        if self.verify_worker is not None:
+            self.verify_worker.wait()
+        if self.gc_worker is not None:
+            self.gc_worker.wait()
+    
     def create_backup(self, backup_name=None):
         """
         创建备份（公共接口）
@@ -525,75 +1101,432 @@ class BackupManager:
             progress_callback: 进度回调函数
             
         Returns:
-            str: 备份文件路径，失败返回None
+            str: 备份文件路径（增量备份为快照清单路径），失败返回None
         """
         if backup_name is None:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             backup_name = f"stickynote_backup_{timestamp}"
         
+        files = self._collect_backup_files()
+        
+        if self.backup_format == 'incremental':
+            manifest = self.store.create_snapshot(backup_name, files, progress_callback, __version__,
+                                                  describe=self._describe_entry)
+            if manifest is None:
+                return None
+            logger.info(f"增量备份: {manifest['count']} 个文件，"
+                        f"新增 {manifest['added_objects']} 个对象 ({self.format_file_size(manifest['added_bytes'])})")
+            self._register_backup(self._snapshot_index_entry(backup_name, manifest))
+            return self.store.snapshot_path(backup_name)
+        
         backup_path = os.path.join(self.backup_dir, f"{backup_name}.zip")
         
         try:
             with zipfile.ZipFile(backup_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                total_files = 0
-                processed_files = 0
-                
-                # 计算总文件数
-                notes_dir = self.manager.notes_dir
-                if os.path.exists(notes_dir):
-                    for filename in os.listdir(notes_dir):
-                        if filename.endswith('.json'):
-                            total_files += 1
-                
-                settings_file = self.manager.settings_file
-                if os.path.exists(settings_file):
-                    total_files += 1
+                entries = self._write_zip_entries(zipf, files, progress_callback)
                 
-                styles_dir = get_styles_dir()
-                if os.path.exists(styles_dir):
-                    for filename in os.listdir(styles_dir):
-                        if filename.endswith('.css'):
-                            total_files += 1
-                
-                # 备份便签数据
-                if os.path.exists(notes_dir):
-                    for filename in os.listdir(notes_dir):
-                        if filename.endswith('.json'):
-                            file_path = os.path.join(notes_dir, filename)
-                            zipf.write(file_path, f"notes/{filename}")
-                            processed_files += 1
-                            if progress_callback:
-                                progress = int((processed_files / total_files) * 100)
-                                progress_callback.emit(progress)
-                
-                # 备份设置文件
-                if os.path.exists(settings_file):
-                    zipf.write(settings_file, "settings.json")
-                    processed_files += 1
-                    if progress_callback:
-                        progress = int((processed_files / total_files) * 100)
-                        progress_callback.emit(progress)
-                
-                # 备份主题文件
-                if os.path.exists(styles_dir):
-                    for filename in os.listdir(styles_dir):
-                        if filename.endswith('.css'):
-                            file_path = os.path.join(styles_dir, filename)
-                            zipf.write(file_path, f"styles/{filename}")
-                            processed_files += 1
-                            if progress_callback:
-                                progress = int((processed_files / total_files) * 100)
-                                progress_callback.emit(progress)
+                # 清单写在最后：逐文件哈希在写入时顺带计算，无需再次读取
+                manifest = {
+                    'version': 1,
+                    'app_version': __version__,
+                    'created': time.time(),
+                    'note_count': sum(1 for arcname in entries if arcname.startswith('notes/')),
+                    'files': entries,
+                }
+                zipf.writestr(ZIP_MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False))
                 
                 if progress_callback:
                     progress_callback.emit(100)
             
+            self._register_backup(self._zip_index_entry(os.path.basename(backup_path)))
             return backup_path
         
         except Exception as e:
             print(f'创建备份时出错: {e}')
             return None
     
+    def _write_zip_entries(self, zipf, files, progress_callback=None):
+        """
+        写入全部 zip 条目
+        
+        每个条目按抽样选择压缩方式（原样保存 / 最快的 deflate 级别 / 标准级别），
+        读取、哈希与抽样在线程池中并行进行（hashlib 与 zlib 处理大块数据时释放 GIL），
+        再按原顺序经 ZipFile.writestr 逐个压缩写入；同时在途的条目数有上限，内存占用不随备份大小增长。
+        
+        Returns:
+            dict: {归档路径: 清单条目}
+        """
+        entries = {}
+        total_files = len(files)
+        workers = os.cpu_count() or 1
+        pending = deque()
+        remaining = iter(files)
+        
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            def submit_next():
+                for arcname, file_path in remaining:
+                    pending.append((arcname, file_path,
+                                    pool.submit(self._prepare_zip_entry, file_path, arcname)))
+                    return
+            
+            for _ in range(workers * 2):
+                submit_next()
+            processed_files = 0
+            while pending:
+                arcname, file_path, future = pending.popleft()
+                submit_next()
+                prepared = future.result()
+                if prepared is None:
+                    entries[arcname] = self._write_zip_entry(zipf, file_path, arcname)
+                else:
+                    zinfo, data, mode, entry = prepared
+                    self._write_prepared_entry(zipf, zinfo, data, mode)
+                    entries[arcname] = entry
+                processed_files += 1
+                if progress_callback:
+                    progress = int((processed_files / total_files) * 100)
+                    progress_callback.emit(progress)
+        return entries
+    
+    @staticmethod
+    def _prepare_zip_entry(file_path, arcname):
+        """
+        读取文件、计算哈希并选择压缩方式（在工作线程中执行）
+        
+        Returns:
+            (ZipInfo, 文件内容, 压缩方式, 清单条目)；文件超过 PARALLEL_ENTRY_LIMIT 时返回 None
+        """
+        if os.path.getsize(file_path) > PARALLEL_ENTRY_LIMIT:
+            return None
+        zinfo = zipfile.ZipInfo.from_file(file_path, arcname)
+        with open(file_path, 'rb') as f:
+            data = f.read()
+        mode = backup_compression.choose_mode(data)
+        entry = {'sha256': hashlib.sha256(data).hexdigest(), 'size': len(data)}
+        entry.update(BackupManager._describe_entry(arcname, data))
+        return zinfo, data, mode, entry
+    
+    @staticmethod
+    def _write_prepared_entry(zipf, zinfo, data, mode):
+        """按条目选定的压缩方式与级别写入归档"""
+        compress_type, level = backup_compression.zip_compression(mode)
+        zipf.writestr(zinfo, data, compress_type=compress_type, compresslevel=level)
+    
+    @staticmethod
+    def _write_zip_entry(zipf, file_path, arcname):
+        """
+        流式写入 zip 条目并计算 SHA-256（用于大文件；便签条目同时记录标题）
+        
+        压缩方式由第一块数据抽样决定：几乎不可压缩时原样保存。
+        
+        Returns:
+            dict: {'sha256', 'size'[, 'title']}
+        """
+        zinfo = zipfile.ZipInfo.from_file(file_path, arcname)
+        digest = hashlib.sha256()
+        size = 0
+        note_chunks = [] if NOTE_ARCNAME_RE.match(arcname) else None
+        with open(file_path, 'rb') as src:
+            chunk = src.read(VERIFY_CHUNK)
+            store = backup_compression.sample_ratio(chunk) >= backup_compression.STORE_RATIO
+            zinfo.compress_type = zipfile.ZIP_STORED if store else zipfile.ZIP_DEFLATED
+            with zipf.open(zinfo, 'w') as dst:
+                while chunk:
+                    digest.update(chunk)
+                    size += len(chunk)
+                    dst.write(chunk)
+                    if note_chunks is not None:
+                        note_chunks.append(chunk)
+                    chunk = src.read(VERIFY_CHUNK)
+        entry = {'sha256': digest.hexdigest(), 'size': size}
+        if note_chunks is not None:
+            entry.update(BackupManager._describe_entry(arcname, b''.join(note_chunks)))
+        return entry
+    
+    @staticmethod
+    def _describe_entry(arcname, data):
+        """清单中便签条目的附加字段：标题（用于快照比较）"""
+        if not NOTE_ARCNAME_RE.match(arcname):
+            return {}
+        try:
+            return {'title': json.loads(data.decode('utf-8')).get('title', '')}
+        except (ValueError, AttributeError):
+            return {'title': ''}
+    
+    def _collect_backup_files(self):
+        """
+        需要备份的文件
+        
+        Returns:
+            list: [(归档路径, 本地路径)]，包含便签数据、设置文件与主题文件
+        """
+        files = []
+        notes_dir = self.manager.notes_dir
+        if os.path.exists(notes_dir):
+            for filename in os.listdir(notes_dir):
+                if filename.endswith('.json'):
+                    files.append((f"notes/{filename}", os.path.join(notes_dir, filename)))
+        
+        settings_file = self.manager.settings_file
+        if os.path.exists(settings_file):
+            files.append(("settings.json", settings_file))
+        
+        styles_dir = get_styles_dir()
+        if os.path.exists(styles_dir):
+            for filename in os.listdir(styles_dir):
+                if filename.endswith('.css'):
+                    files.append((f"styles/{filename}", os.path.join(styles_dir, filename)))
+        return files
+    
+    def start_gc(self):
+        """
+        在后台线程回收无引用的备份对象
+        
+        回收与创建快照共用存储锁，进行中的备份写完清单后才开始回收。
+        
+        Returns:
+            GcWorker: 已启动的工作线程；已有回收进行中时返回None（结束后会再回收一次）
+        """
+        if self.gc_worker is not None and self.gc_worker.isRunning():
+            self._gc_again = True
+            return None
+        self._gc_again = False
+        worker = GcWorker(self.store)
+        worker.gc_completed.connect(self._on_gc_completed)
+        self.gc_worker = worker
+        worker.start()
+        return worker
+    
+    def _on_gc_completed(self, removed):
+        if removed:
+            logger.info(f'已回收 {removed} 个无引用的备份对象')
+        if self._gc_again:
+            self.start_gc()
+    
+    def is_snapshot(self, backup_path):
+        """备份路径是否为增量备份的快照清单"""
+        return os.path.dirname(os.path.abspath(backup_path)) == os.path.abspath(self.store.snapshots_dir)
+    
+    @staticmethod
+    def _snapshot_name(backup_path):
+        return os.path.splitext(os.path.basename(backup_path))[0]
+    
+    def delete_backup(self, backup_path):
+        """
+        删除备份（增量备份随后在后台回收不再被引用的对象）
+        
+        Raises:
+            RuntimeError: 备份或恢复任务正在进行
+        """
+        if self.is_busy():
+            raise RuntimeError('备份或恢复任务正在进行，请稍后再删除')
+        if self.is_snapshot(backup_path):
+            self.store.delete_snapshot(self._snapshot_name(backup_path), collect=False)
+            self.start_gc()
+        else:
+            os.remove(backup_path)
+        self._unregister_backups([self._index_key(backup_path)])
+        with self._verify_lock:
+            if self._verify_status.pop(os.path.basename(backup_path), None) is not None:
+                self._save_verify_status()
+    
+    def export_backup(self, backup_path, save_path):
+        """导出备份为 zip 文件（增量备份按快照重新组装）"""
+        if self.is_snapshot(backup_path):
+            if not self.store.export_zip(self._snapshot_name(backup_path), save_path):
+                raise ValueError('快照清单无法读取')
+        else:
+            shutil.copy2(backup_path, save_path)
+    
+    def list_backup_notes(self, backup_path):
+        """
+        列出备份中的便签（只读取 zip 中央目录或快照文件表，不解压便签内容）
+        
+        当前已不存在的便签（恢复的主要对象）会额外读取标题。
+        
+        Returns:
+            list: [{'note_id', 'size', 'exists', 'title'}]，按 ID 排序
+        """
+        live_notes = getattr(self.manager, 'notes', {})
+        entries = []
+        if self.is_snapshot(backup_path):
+            files = self.store.snapshot_files(self._snapshot_name(backup_path))
+            if files is None:
+                raise ValueError('快照清单无法读取')
+            sizes = {arcname: entry['size'] for arcname, entry in files.items()}
+        else:
+            with zipfile.ZipFile(backup_path, 'r') as zipf:
+                sizes = {info.filename: info.file_size for info in zipf.infolist()}
+        
+        for arcname, size in sizes.items():
+            match = NOTE_ARCNAME_RE.match(arcname)
+            if not match:
+                continue
+            note_id = int(match.group(1))
+            exists = note_id in live_notes or os.path.exists(
+                os.path.join(self.manager.notes_dir, f'note_{note_id}.json'))
+            title = ''
+            if note_id in live_notes:
+                title = live_notes[note_id].note_data.get('title', '')
+            entries.append({'note_id': note_id, 'size': size, 'exists': exists, 'title': title})
+        entries.sort(key=lambda x: x['note_id'])
+        
+        for info in entries:
+            if not info['exists']:
+                data = self.read_backup_note(backup_path, info['note_id'])
+                info['title'] = (data or {}).get('title', '')
+        return entries
+    
+    def read_backup_note(self, backup_path, note_id):
+        """
+        读取备份中单个便签的数据（只解压该便签）
+        
+        Returns:
+            dict: 便签数据，不存在或无法解析时返回None
+        """
+        arcname = f'notes/note_{note_id}.json'
+        try:
+            if self.is_snapshot(backup_path):
+                raw = self.store.read_file(self._snapshot_name(backup_path), arcname)
+                if raw is None:
+                    return None
+                data = json.loads(raw.decode('utf-8'))
+            else:
+                with zipfile.ZipFile(backup_path, 'r') as zipf:
+                    with zipf.open(arcname) as f:
+                        data = json.load(f)
+            return data if isinstance(data, dict) else None
+        except KeyError:
+            return None
+        except Exception as e:
+            logger.warning(f'读取备份便签 {note_id} 失败: {e}')
+            return None
+    
+    def _backup_file_table(self, backup_path):
+        """
+        备份的文件表 {归档路径: {'sha'[, 'title']}}（只读取清单或 zip 中央目录）
+        
+        没有清单的旧版 zip 以 CRC 与大小代替内容哈希，且没有标题。
+        """
+        if self.is_snapshot(backup_path):
+            files = self.store.snapshot_files(self._snapshot_name(backup_path))
+            if files is None:
+                raise ValueError('快照清单无法读取')
+            return files
+        with zipfile.ZipFile(backup_path, 'r') as zipf:
+            try:
+                manifest = json.loads(zipf.read(ZIP_MANIFEST_NAME).decode('utf-8'))
+            except KeyError:
+                return {info.filename: {'sha': f'crc:{info.CRC:08x}:{info.file_size}'}
+                        for info in zipf.infolist()}
+        return {arcname: dict(entry, sha=entry['sha256']) for arcname, entry in manifest['files'].items()}
+    
+    def diff_backups(self, old_path, new_path):
+        """
+        比较两个备份中的便签（新增、删除、修改及标题变化）
+        
+        只比较清单中的哈希，不读取便签内容；两个增量备份之间只读取有差异的文件表分桶。
+        
+        Returns:
+            list: [{'note_id', 'status'('added'/'removed'/'modified'), 'old_title', 'new_title'}]，按 ID 排序
+        """
+        if self.is_snapshot(old_path) and self.is_snapshot(new_path):
+            changes = self.store.diff_snapshots(self._snapshot_name(old_path), self._snapshot_name(new_path))
+            if changes is None:
+                raise ValueError('快照清单无法读取')
+        else:
+            old_files = self._backup_file_table(old_path)
+            new_files = self._backup_file_table(new_path)
+            changes = {}
+            for arcname in set(old_files) | set(new_files):
+                before = old_files.get(arcname)
+                after = new_files.get(arcname)
+                if before is None or after is None or before['sha'] != after['sha']:
+                    changes[arcname] = (before, after)
+        
+        rows = []
+        for arcname, (before, after) in changes.items():
+            match = NOTE_ARCNAME_RE.match(arcname)
+            if not match:
+                continue
+            if before is None:
+                status = 'added'
+            elif after is None:
+                status = 'removed'
+            else:
+                status = 'modified'
+            rows.append({
+                'note_id': int(match.group(1)),
+                'status': status,
+                'old_title': (before or {}).get('title', ''),
+                'new_title': (after or {}).get('title', ''),
+            })
+        rows.sort(key=lambda x: x['note_id'])
+        return rows
+    
+    def diff_note_text(self, old_path, new_path, note_id):
+        """
+        便签在两个备份之间的纯文本差异（unified diff，只读取该便签）
+        
+        Returns:
+            str: 差异文本，两侧都无法读取时返回空字符串
+        """
+        old = self.read_backup_note(old_path, note_id) or {}
+        new = self.read_backup_note(new_path, note_id) or {}
+        return ''.join(difflib.unified_diff(
+            old.get('plain_content', '').splitlines(True),
+            new.get('plain_content', '').splitlines(True),
+            fromfile=os.path.basename(old_path), tofile=os.path.basename(new_path),
+        ))
+    
+    def restore_notes(self, backup_path, note_ids):
+        """
+        从备份恢复指定便签，不影响其他便签，恢复后立即载入运行中的程序
+        
+        便签内容直接从备份读取后原子写入便签目录，不解压整个备份。
+        写入前先停止同 ID 已打开便签的写盘，进行中的旧保存不会覆盖恢复的文件。
+        
+        Args:
+            backup_path: 备份路径
+            note_ids: 要恢复的便签 ID
+            
+        Returns:
+            list: 成功恢复的便签 ID
+        """
+        restored = []
+        for note_id in note_ids:
+            data = self.read_backup_note(backup_path, note_id)
+            if data is None:
+                continue
+            file_path = os.path.join(self.manager.notes_dir, f'note_{note_id}.json')
+            suspend = getattr(self.manager, 'suspend_note_saves', None)
+            held = suspend(note_id) if suspend else None
+            try:
+                write_note_file(file_path, data)
+            except Exception as e:
+                logger.error(f'恢复便签 {note_id} 失败: {e}')
+                if held is not None:
+                    # 写入失败：恢复旧窗口的保存，重新写出被取消的修改
+                    held.is_deleted = False
+                    held.save_note()
+                continue
+            hot_load = getattr(self.manager, 'hot_load_note', None)
+            if hot_load:
+                try:
+                    hot_load(note_id, data)
+                except Exception as e:
+                    logger.error(f'载入恢复的便签 {note_id} 失败: {e}')
+            restored.append(note_id)
+        if restored:
+            self._invalidate_note_cache()
+        logger.info(f'已从备份恢复便签: {restored}')
+        return restored
+    
+    def _invalidate_note_cache(self):
+        """恢复备份后使便签数据缓存失效"""
+        from features.performance import get_note_cache
+        get_note_cache().bump_version()
+    
     def restore_backup_internal(self, backup_path, progress_callback=None):
         """
         恢复备份（内部实现）
@@ -612,9 +1545,13 @@ class BackupManager:
                 shutil.rmtree(temp_dir)
             os.makedirs(temp_dir)
             
-            # 解压备份文件
-            with zipfile.ZipFile(backup_path, 'r') as zipf:
-                zipf.extractall(temp_dir)
+            # 解压备份文件（增量备份按快照清单从对象组装）
+            if self.is_snapshot(backup_path):
+                if not self.store.extract_snapshot(self._snapshot_name(backup_path), temp_dir):
+                    raise ValueError('快照清单无法读取')
+            else:
+                with zipfile.ZipFile(backup_path, 'r') as zipf:
+                    zipf.extractall(temp_dir)
             
             if progress_callback:
                 progress_callback.emit(30)
@@ -655,6 +1592,9 @@ class BackupManager:
             # 清理临时目录
             shutil.rmtree(temp_dir)
             
+            # 便签目录已整体替换，旧的缓存条目全部作废
+            self._invalidate_note_cache()
+            
             if progress_callback:
                 progress_callback.emit(100)
             
@@ -696,56 +1636,151 @@ class BackupManager:
             logger.debug(f'计算便签状态哈希失败: {e}')
             return ''
     
-    def auto_backup(self):
+    def auto_backup(self, setup=None):
         """
         自动备份
         
-        每次定时触发时先检测数据是否有变化，
+        在后台线程执行：先检测数据是否有变化，
         若与上次备份状态一致则跳过，避免产生大量重复备份文件。
+        手动备份或恢复正在进行时本次不启动。
+        
+        Args:
+            setup: 同 start_backup
+            
+        Returns:
+            BackupWorker: 已启动的工作线程，未启动时返回None
         """
         if not self.auto_backup_enabled:
-            return
-        
-        # 检测数据是否有变化
-        current_hash = self._get_notes_state_hash()
-        if current_hash and current_hash == self._last_backup_hash:
-            logger.info('本次检查无修改，跳过本次备份')
-            return
-        
-        # 清理旧备份
-        self.cleanup_old_backups()
-        
-        # 创建新备份
-        backup_path = self.create_backup()
-        if backup_path:
-            self._last_backup_hash = current_hash
-            logger.info(f'自动备份已创建: {backup_path}')
+            return None
+        if self.is_busy():
+            logger.info('已有备份或恢复任务正在进行，跳过本次自动备份')
+            return None
+        return self.start_backup(auto=True, setup=setup)
     
-    def cleanup_old_backups(self):
+    def cleanup_old_backups(self, now=None):
         """
         清理旧的备份文件
+        
+        默认按分级保留（每小时/每天/每周）在一次遍历中决定保留的备份，
+        retention_policy 为 'count' 时只保留最新的 max_backup_count 个。
         """
         try:
-            backup_files = []
-            for filename in os.listdir(self.backup_dir):
-                if filename.startswith('stickynote_backup_') and filename.endswith('.zip'):
-                    file_path = os.path.join(self.backup_dir, filename)
-                    backup_files.append((file_path, os.path.getmtime(file_path)))
+            backup_files = [
+                info for info in self.get_backup_list()
+                if info['filename'].startswith('stickynote_backup_')
+            ]
             
-            # 按修改时间排序
-            backup_files.sort(key=lambda x: x[1], reverse=True)
+            if self.retention_policy == 'tiered':
+                keep = select_tiered_retention(
+                    {info['filename']: info['timestamp'] for info in backup_files},
+                    now if now is not None else time.time(),
+                    self.retention['hourly_hours'], self.retention['daily_days'],
+                    self.retention['weekly_weeks'])
+                expired = [info for info in backup_files if info['filename'] not in keep]
+            else:
+                # 删除多余的备份（get_backup_list 已按时间排序）
+                expired = backup_files[self.max_backup_count:]
             
-            # 删除多余的备份
-            for file_path, _ in backup_files[self.max_backup_count:]:
-                os.remove(file_path)
-                print(f"已删除旧备份: {os.path.basename(file_path)}")
+            removed_snapshot = False
+            for info in expired:
+                if info['kind'] == 'snapshot':
+                    self.store.delete_snapshot(self._snapshot_name(info['path']), collect=False)
+                    removed_snapshot = True
+                else:
+                    os.remove(info['path'])
+                print(f"已删除旧备份: {info['filename']}")
+            self._unregister_backups([self._index_key(info['path']) for info in expired])
+            if removed_snapshot:
+                # 在备份线程中、创建新快照之前执行；与其他快照的创建由存储锁互斥
+                self.store.gc()
         
         except Exception as e:
             print(f"清理备份文件时出错: {e}")
     
+    # ---------- 备份索引 ----------
+    
+    def _index_key(self, backup_path):
+        """索引键：zip 为文件名，增量备份为 'snapshot:' + 快照名"""
+        if self.is_snapshot(backup_path):
+            return 'snapshot:' + self._snapshot_name(backup_path)
+        return os.path.basename(backup_path)
+    
+    def _zip_index_entry(self, filename):
+        stat = os.stat(os.path.join(self.backup_dir, filename))
+        return {'key': filename, 'kind': 'zip', 'filename': filename,
+                'size_bytes': stat.st_size, 'timestamp': stat.st_mtime}
+    
+    def _snapshot_index_entry(self, name, manifest):
+        return {'key': 'snapshot:' + name, 'kind': 'snapshot', 'filename': name,
+                'size_bytes': manifest['size'], 'added_bytes': manifest['added_bytes'],
+                'timestamp': manifest['created']}
+    
+    def _load_index_locked(self):
+        if self._index is not None:
+            return
+        self._index = {}
+        try:
+            with open(self._index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == BACKUP_INDEX_VERSION:
+                self._index = data.get('entries', {})
+        except (OSError, ValueError):
+            pass
+    
+    def _save_index_locked(self):
+        tmp_path = self._index_file + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': BACKUP_INDEX_VERSION, 'entries': self._index}, f, ensure_ascii=False)
+            os.replace(tmp_path, self._index_file)
+        except Exception as e:
+            logger.warning(f'保存备份索引失败: {e}')
+    
+    def _register_backup(self, entry):
+        with self._index_lock:
+            self._load_index_locked()
+            self._index[entry['key']] = entry
+            self._save_index_locked()
+    
+    def _unregister_backups(self, keys):
+        with self._index_lock:
+            self._load_index_locked()
+            removed = [key for key in keys if self._index.pop(key, None) is not None]
+            if removed:
+                self._save_index_locked()
+    
+    def _reconcile_index_locked(self):
+        """
+        用两次 listdir 核对索引：只为索引中没有的备份（如导入的 zip、旧版本创建的备份）读取元数据，
+        并移除已不存在的条目
+        """
+        present = {f for f in os.listdir(self.backup_dir) if f.endswith('.zip')}
+        present.update('snapshot:' + name for name in self.store.list_snapshots())
+        changed = False
+        for key in list(self._index):
+            if key not in present:
+                del self._index[key]
+                changed = True
+        for key in present - set(self._index):
+            try:
+                if key.startswith('snapshot:'):
+                    name = key[len('snapshot:'):]
+                    manifest = self.store.load_manifest(name)
+                    if manifest is None:
+                        continue
+                    entry = self._snapshot_index_entry(name, manifest)
+                else:
+                    entry = self._zip_index_entry(key)
+            except OSError:
+                continue
+            self._index[key] = entry
+            changed = True
+        if changed:
+            self._save_index_locked()
+    
     def get_backup_list(self):
         """
-        获取备份文件列表
+        获取备份文件列表（元数据来自备份索引）
         
         Returns:
             list: 备份文件信息列表
@@ -753,19 +1788,28 @@ class BackupManager:
         backup_files = []
         
         try:
-            for filename in os.listdir(self.backup_dir):
-                if filename.endswith('.zip'):
-                    file_path = os.path.join(self.backup_dir, filename)
-                    stat = os.stat(file_path)
-                    
-                    backup_info = {
-                        'filename': filename,
-                        'path': file_path,
-                        'size': self.format_file_size(stat.st_size),
-                        'date': datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S'),
-                        'timestamp': stat.st_mtime
-                    }
-                    backup_files.append(backup_info)
+            with self._index_lock:
+                self._load_index_locked()
+                self._reconcile_index_locked()
+                entries = list(self._index.values())
+            
+            for entry in entries:
+                if entry['kind'] == 'snapshot':
+                    path = self.store.snapshot_path(entry['filename'])
+                    size = (f"{self.format_file_size(entry['size_bytes'])}，"
+                            f"增量 {self.format_file_size(entry['added_bytes'])}")
+                else:
+                    path = os.path.join(self.backup_dir, entry['filename'])
+                    size = self.format_file_size(entry['size_bytes'])
+                backup_files.append({
+                    'filename': entry['filename'],
+                    'path': path,
+                    'kind': entry['kind'],
+                    'verify': self.get_verify_status(path),
+                    'size': size,
+                    'date': datetime.fromtimestamp(entry['timestamp']).strftime('%Y-%m-%d %H:%M:%S'),
+                    'timestamp': entry['timestamp']
+                })
             
             # 按时间排序（最新的在前）
             backup_files.sort(key=lambda x: x['timestamp'], reverse=True)
@@ -823,6 +1867,16 @@ class BackupManager:
         
         self.save_backup_settings()
     
+    def set_retention_policy(self, policy):
+        """
+        设置保留策略
+        
+        Args:
+            policy: 'tiered'（分级保留）或 'count'（按数量保留）
+        """
+        self.retention_policy = policy
+        self.save_backup_settings()
+    
     def set_max_backup_count(self, count):
         """
         设置最大备份数量
@@ -847,6 +1901,9 @@ class BackupManager:
                 self.auto_backup_enabled = settings.get('auto_backup_enabled', True)
                 self.auto_backup_interval = settings.get('auto_backup_interval', 3600)
                 self.max_backup_count = settings.get('max_backup_count', 10)
+                self.backup_format = settings.get('backup_format', 'incremental')
+                self.retention_policy = settings.get('retention_policy', 'tiered')
+                self.retention = dict(DEFAULT_RETENTION, **settings.get('retention', {}))
             
             except Exception as e:
                 print(f"加载备份设置时出错: {e}")
@@ -860,7 +1917,10 @@ class BackupManager:
         settings = {
             'auto_backup_enabled': self.auto_backup_enabled,
             'auto_backup_interval': self.auto_backup_interval,
-            'max_backup_count': self.max_backup_count
+            'max_backup_count': self.max_backup_count,
+            'backup_format': self.backup_format,
+            'retention_policy': self.retention_policy,
+            'retention': self.retention
         }
         
         try:
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+备份条目的自适应压缩
+
+按条目抽样估计可压缩性，再为每个条目选择压缩方式：
+- store：几乎不可压缩（已压缩的图片等二进制内容），原样保存
+- fast：熵较高的内容（如 base64 编码的 JPEG/PNG），只做 Huffman 编码——
+  base64 的冗余只在于每字节仅使用 6 位，字符串匹配几乎找不到重复，
+  仅 Huffman 编码得到的大小与完整 deflate 相当，耗时约为其五分之一
+- strong：文本等可压缩内容，使用标准 deflate 级别（更高级别对便签文本几乎不再变小，耗时却成倍增加）
+
+增量备份对象直接用 zlib 压缩，三种方式都可用。zip 备份只通过 zipfile 的公共接口
+按条目指定 compress_type / compresslevel，无法指定压缩策略，fast 退化为最快的 deflate 级别。
+两者输出的都是标准 deflate 数据，任何解压工具都能读取。
+"""
+
+import zlib
+import zipfile
+
+STORE = 'store'
+FAST = 'fast'
+STRONG = 'strong'
+
+# 抽样：从条目开头、中间、结尾各取一段
+SAMPLE_SIZE = 4 * 1024
+
+# 抽样压缩比（压缩后/原始）不低于该值时原样保存
+STORE_RATIO = 0.95
+
+# 抽样压缩比不低于该值时只做 Huffman 编码
+FAST_RATIO = 0.6
+
+# 可压缩内容的压缩级别
+STRONG_LEVEL = 6
+
+# 抽样估计使用的压缩级别
+SAMPLE_LEVEL = 1
+
+# zip 条目 fast 方式的压缩级别（zipfile 不支持仅 Huffman 编码，取最快的级别）
+ZIP_FAST_LEVEL = 1
+
+# 小于该大小的条目不抽样，直接使用 STRONG（压缩本身很便宜，抽样反而占比可观）
+MIN_SAMPLED_SIZE = 16 * 1024
+
+
+def sample_ratio(data: bytes) -> float:
+    """抽样估计的压缩比，空数据返回 1.0"""
+    if len(data) <= SAMPLE_SIZE * 3:
+        sample = data
+    else:
+        middle = (len(data) - SAMPLE_SIZE) // 2
+        sample = data[:SAMPLE_SIZE] + data[middle:middle + SAMPLE_SIZE] + data[-SAMPLE_SIZE:]
+    if not sample:
+        return 1.0
+    return len(zlib.compress(sample, SAMPLE_LEVEL)) / len(sample)
+
+
+def choose_mode(data: bytes) -> str:
+    """按抽样结果选择 STORE / FAST / STRONG"""
+    if len(data) < MIN_SAMPLED_SIZE:
+        return STRONG
+    ratio = sample_ratio(data)
+    if ratio >= STORE_RATIO:
+        return STORE
+    if ratio >= FAST_RATIO:
+        return FAST
+    return STRONG
+
+
+def compressor(mode: str, wbits: int = zlib.MAX_WBITS):
+    """
+    按压缩方式创建压缩对象（STORE 返回 None）
+
+    Args:
+        wbits: zlib.MAX_WBITS 输出 zlib 流；-zlib.MAX_WBITS 输出 zip 条目使用的原始 deflate 流
+    """
+    if mode == STORE:
+        return None
+    if mode == FAST:
+        return zlib.compressobj(1, zlib.DEFLATED, wbits, 8, zlib.Z_HUFFMAN_ONLY)
+    return zlib.compressobj(STRONG_LEVEL, zlib.DEFLATED, wbits)
+
+
+def zip_compression(mode: str) -> tuple:
+    """zip 条目使用的 (compress_type, compresslevel)"""
+    if mode == STORE:
+        return zipfile.ZIP_STORED, None
+    if mode == FAST:
+        return zipfile.ZIP_DEFLATED, ZIP_FAST_LEVEL
+    return zipfile.ZIP_DEFLATED, STRONG_LEVEL
+
+
+def compress(data: bytes, mode: str, wbits: int = zlib.MAX_WBITS) -> bytes:
+    """按压缩方式压缩（STORE 原样返回）"""
+    comp = compressor(mode, wbits)
+    if comp is None:
+        return data
+    return comp.compress(data) + comp.flush()
@@ -0,0 +1,454 @@
+# -*- coding: utf-8 -*-
+"""
+增量备份存储（内容寻址）
+
+每个文件的内容按 SHA-256 压缩保存为一个对象（objects/ab/cdef...）。
+文件表 {归档路径: 对象哈希} 按路径散列拆成 TREE_FANOUT 个分桶，每个分桶同样作为对象保存；
+每次快照只写一份很小的清单（snapshots/<name>.json），记录各分桶的哈希。
+内容未变化的文件和分桶与上一次快照共享对象，因此一次自动备份只需写入变化便签
+及其所在分桶的字节；文件是否变化先由 (size, mtime_ns, inode) 哈希缓存判断，未变化的文件不读取。
+
+恢复任意快照时按清单从共享对象重新组装；删除快照后由 gc() 回收不再被引用的对象。
+快照先写对象、最后写清单，因此 gc() 与 create_snapshot() 共用同一存储目录的锁，
+回收时不会把正在创建的快照的对象当作无引用对象删除。
+"""
+
+import os
+import json
+import time
+import zlib
+import hashlib
+import logging
+import zipfile
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from features import backup_compression
+
+logger = logging.getLogger(__name__)
+
+# 快照清单格式版本
+SNAPSHOT_VERSION = 1
+
+# 对象文件首字节：压缩方式（zlib 流，或几乎不可压缩的内容原样保存）
+CODEC_ZLIB = b'Z'
+CODEC_RAW = b'R'
+
+# 文件表分桶数量
+TREE_FANOUT = 256
+
+# 流式校验每次读取/解压的字节数（校验的内存占用上限）
+VERIFY_CHUNK = 1024 * 1024
+
+
+def tree_bucket(arcname: str) -> int:
+    """归档路径所属的文件表分桶"""
+    return zlib.crc32(arcname.encode('utf-8')) % TREE_FANOUT
+
+
+# 各存储目录的锁：同一目录的多个 BackupStore 实例共用
+_root_locks: Dict[str, threading.RLock] = {}
+_root_locks_guard = threading.Lock()
+
+
+def _root_lock(root: str) -> threading.RLock:
+    key = os.path.normcase(os.path.realpath(root))
+    with _root_locks_guard:
+        lock = _root_locks.get(key)
+        if lock is None:
+            lock = _root_locks[key] = threading.RLock()
+        return lock
+
+
+class BackupStore:
+    """内容寻址的增量备份存储"""
+
+    def __init__(self, root: str):
+        """
+        Args:
+            root: 存储根目录（包含 objects/ 与 snapshots/）
+        """
+        self.root = root
+        self.objects_dir = os.path.join(root, 'objects')
+        self.snapshots_dir = os.path.join(root, 'snapshots')
+        # 创建快照与回收对象互斥：快照的对象写在清单之前，回收时必须等快照写完
+        self._lock = _root_lock(root)
+        # 延迟导入：features.sync 包经 core 间接导入本模块
+        from features.sync.hash_cache import FileHashCache
+        self.hash_cache = FileHashCache(os.path.join(root, 'hash_cache.json'))
+
+    # ── 对象 ──────────────────────────────────────────────
+
+    def object_path(self, sha: str) -> str:
+        return os.path.join(self.objects_dir, sha[:2], sha[2:])
+
+    def has_object(self, sha: str) -> bool:
+        return os.path.exists(self.object_path(sha))
+
+    def write_object(self, data: bytes) -> Tuple[str, int]:
+        """
+        保存对象（已存在时跳过）
+
+        Returns:
+            (sha, 新写入的字节数)
+        """
+        sha = hashlib.sha256(data).hexdigest()
+        path = self.object_path(sha)
+        if os.path.exists(path):
+            return sha, 0
+        mode = backup_compression.choose_mode(data)
+        if mode == backup_compression.STORE:
+            payload = CODEC_RAW + data
+        else:
+            payload = CODEC_ZLIB + backup_compression.compress(data, mode)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+        return sha, len(payload)
+
+    def read_object(self, sha: str) -> bytes:
+        """读取对象内容，校验哈希；缺失或损坏时抛出 OSError / ValueError"""
+        with open(self.object_path(sha), 'rb') as f:
+            payload = f.read()
+        codec = payload[:1]
+        if codec == CODEC_ZLIB:
+            data = zlib.decompress(payload[1:])
+        elif codec == CODEC_RAW:
+            data = payload[1:]
+        else:
+            raise ValueError(f'未知的备份对象格式: {sha}')
+        if hashlib.sha256(data).hexdigest() != sha:
+            raise ValueError(f'备份对象已损坏: {sha}')
+        return data
+
+    def verify_object(self, sha: str, expected_size: Optional[int] = None) -> Optional[str]:
+        """
+        流式校验对象（分块解压并计算哈希，内存占用不超过 VERIFY_CHUNK 量级）
+
+        Returns:
+            错误描述，对象完好时返回 None
+        """
+        try:
+            with open(self.object_path(sha), 'rb') as f:
+                codec = f.read(1)
+                if codec not in (CODEC_ZLIB, CODEC_RAW):
+                    return f'未知的对象格式: {sha}'
+                digest = hashlib.sha256()
+                size = 0
+                if codec == CODEC_RAW:
+                    for chunk in iter(lambda: f.read(VERIFY_CHUNK), b''):
+                        digest.update(chunk)
+                        size += len(chunk)
+                else:
+                    decompressor = zlib.decompressobj()
+                    for chunk in iter(lambda: f.read(VERIFY_CHUNK), b''):
+                        while chunk:
+                            data = decompressor.decompress(chunk, VERIFY_CHUNK)
+                            digest.update(data)
+                            size += len(data)
+                            chunk = decompressor.unconsumed_tail
+                    data = decompressor.flush()
+                    digest.update(data)
+                    size += len(data)
+                    if not decompressor.eof:
+                        return f'对象不完整: {sha}'
+        except FileNotFoundError:
+            return f'对象缺失: {sha}'
+        except (OSError, zlib.error) as e:
+            return f'对象无法读取: {sha} - {e}'
+        if digest.hexdigest() != sha:
+            return f'对象内容与哈希不符: {sha}'
+        if expected_size is not None and size != expected_size:
+            return f'对象大小不符: {sha}'
+        return None
+
+    # ── 快照 ──────────────────────────────────────────────
+
+    def snapshot_path(self, name: str) -> str:
+        return os.path.join(self.snapshots_dir, f'{name}.json')
+
+    def create_snapshot(self, name: str, files: Iterable[Tuple[str, str]],
+                        progress_callback=None, app_version: str = '',
+                        describe: Optional[Callable[[str, bytes], dict]] = None) -> Optional[dict]:
+        """
+        创建快照
+
+        Args:
+            name: 快照名称
+            files: [(归档路径, 本地文件路径)]
+            progress_callback: 进度信号（emit(int)）
+            app_version: 写入清单的程序版本
+            describe: describe(归档路径, 内容) -> 写入文件表的附加字段（如便签标题）；
+                      只对新内容调用，未变化的文件沿用上一次快照中的值
+
+        Returns:
+            快照清单，失败返回 None
+        """
+        with self._lock:
+            return self._create_snapshot(name, list(files), progress_callback, app_version, describe)
+
+    def _create_snapshot(self, name, files, progress_callback, app_version, describe) -> Optional[dict]:
+        """create_snapshot 的实现（持有存储锁）"""
+        entries: Dict[str, dict] = {}
+        known_extras = self._latest_extras() if describe else {}
+        total_size = 0
+        added_bytes = 0
+        added_objects = 0
+        try:
+            for index, (arcname, file_path) in enumerate(files, 1):
+                sha = self.hash_cache.get_hash(file_path)
+                if not sha:
+                    continue
+                if not self.has_object(sha):
+                    with open(file_path, 'rb') as f:
+                        data = f.read()
+                    data_sha, written = self.write_object(data)
+                    if data_sha != sha:
+                        # 文件在哈希与读取之间被修改，以实际读取的内容为准
+                        self.hash_cache.invalidate(file_path)
+                        sha = data_sha
+                    if written:
+                        added_objects += 1
+                        added_bytes += written
+                    size = len(data)
+                    extras = describe(arcname, data) if describe else {}
+                else:
+                    size = os.path.getsize(file_path)
+                    extras = known_extras.get(sha)
+                    if extras is None and describe:
+                        extras = describe(arcname, self.read_object(sha))
+                entries[arcname] = dict(extras or {}, sha=sha, size=size)
+                total_size += size
+                if progress_callback and files:
+                    progress_callback.emit(int(index / len(files) * 100))
+
+            buckets: List[Dict[str, dict]] = [{} for _ in range(TREE_FANOUT)]
+            for arcname, entry in entries.items():
+                buckets[tree_bucket(arcname)][arcname] = entry
+            tree = []
+            for bucket in buckets:
+                data = json.dumps(bucket, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+                sha, written = self.write_object(data.encode('utf-8'))
+                if written:
+                    added_objects += 1
+                    added_bytes += written
+                tree.append(sha)
+
+            manifest = {
+                'version': SNAPSHOT_VERSION,
+                'name': name,
+                'created': time.time(),
+                'app_version': app_version,
+                'tree': tree,
+                'count': len(entries),
+                'note_count': sum(1 for arcname in entries if arcname.startswith('notes/')),
+                'size': total_size,
+                'added_bytes': added_bytes,
+                'added_objects': added_objects,
+            }
+            os.makedirs(self.snapshots_dir, exist_ok=True)
+            path = self.snapshot_path(name)
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, path)
+            self.hash_cache.save()
+            if progress_callback:
+                progress_callback.emit(100)
+            return manifest
+        except Exception as e:
+            logger.error(f'创建增量备份失败: {e}')
+            return None
+
+    def load_manifest(self, name: str) -> Optional[dict]:
+        try:
+            with open(self.snapshot_path(name), 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f'读取快照清单失败: {name} - {e}')
+            return None
+        if manifest.get('version') != SNAPSHOT_VERSION:
+            return None
+        return manifest
+
+    def load_bucket(self, sha: str) -> Dict[str, dict]:
+        return json.loads(self.read_object(sha).decode('utf-8'))
+
+    def snapshot_files(self, name: str, manifest: Optional[dict] = None) -> Optional[Dict[str, dict]]:
+        """快照的完整文件表 {归档路径: {'sha', 'size'}}，清单无法读取时返回 None"""
+        manifest = manifest or self.load_manifest(name)
+        if manifest is None:
+            return None
+        files: Dict[str, dict] = {}
+        for sha in manifest['tree']:
+            files.update(self.load_bucket(sha))
+        return files
+
+    def verify_snapshot(self, name: str) -> dict:
+        """
+        校验快照引用的全部对象
+
+        Returns:
+            {'ok', 'errors', 'files', 'bytes'}
+        """
+        errors: List[str] = []
+        checked = set()
+        file_count = 0
+        total_bytes = 0
+        manifest = self.load_manifest(name)
+        if manifest is None:
+            return {'ok': False, 'errors': ['快照清单无法读取'], 'files': 0, 'bytes': 0}
+        for bucket_sha in manifest['tree']:
+            error = self.verify_object(bucket_sha)
+            if error:
+                errors.append(f'文件表{error}')
+                continue
+            for arcname, entry in self.load_bucket(bucket_sha).items():
+                file_count += 1
+                total_bytes += entry['size']
+                if entry['sha'] in checked:
+                    continue
+                checked.add(entry['sha'])
+                error = self.verify_object(entry['sha'], entry['size'])
+                if error:
+                    errors.append(f'{arcname}: {error}')
+        if file_count != manifest.get('count', file_count):
+            errors.append(f"文件数量不符: {file_count} / {manifest['count']}")
+        return {'ok': not errors, 'errors': errors, 'files': file_count, 'bytes': total_bytes}
+
+    def latest_snapshot(self) -> Optional[dict]:
+        """创建时间最新的快照清单"""
+        latest = None
+        for name in self.list_snapshots():
+            manifest = self.load_manifest(name)
+            if manifest and (latest is None or manifest['created'] > latest['created']):
+                latest = manifest
+        return latest
+
+    def _latest_extras(self) -> Dict[str, dict]:
+        """最新快照中各对象的附加字段 {sha: extras}"""
+        latest = self.latest_snapshot()
+        if latest is None:
+            return {}
+        try:
+            files = self.snapshot_files(latest['name'], latest)
+        except (OSError, ValueError):
+            return {}
+        return {entry['sha']: {k: v for k, v in entry.items() if k not in ('sha', 'size')}
+                for entry in files.values()}
+
+    def diff_snapshots(self, old_name: str, new_name: str) -> Optional[Dict[str, Tuple[Optional[dict], Optional[dict]]]]:
+        """
+        比较两个快照的文件表
+
+        分桶哈希相同的部分直接跳过，只读取有差异的分桶，
+        耗时与变化量成正比，不读取任何文件内容。
+
+        Returns:
+            {归档路径: (旧条目, 新条目)}，新增/删除的一侧为 None；清单无法读取时返回 None
+        """
+        old = self.load_manifest(old_name)
+        new = self.load_manifest(new_name)
+        if old is None or new is None:
+            return None
+        changes: Dict[str, Tuple[Optional[dict], Optional[dict]]] = {}
+        for old_sha, new_sha in zip(old['tree'], new['tree']):
+            if old_sha == new_sha:
+                continue
+            old_bucket = self.load_bucket(old_sha)
+            new_bucket = self.load_bucket(new_sha)
+            for arcname in set(old_bucket) | set(new_bucket):
+                before = old_bucket.get(arcname)
+                after = new_bucket.get(arcname)
+                if before is None or after is None or before['sha'] != after['sha']:
+                    changes[arcname] = (before, after)
+        return changes
+
+    def list_snapshots(self) -> List[str]:
+        """全部快照名称"""
+        if not os.path.isdir(self.snapshots_dir):
+            return []
+        return sorted(f[:-len('.json')] for f in os.listdir(self.snapshots_dir) if f.endswith('.json'))
+
+    def read_file(self, name: str, arcname: str) -> Optional[bytes]:
+        """读取快照中的单个文件"""
+        manifest = self.load_manifest(name)
+        if manifest is None:
+            return None
+        entry = self.load_bucket(manifest['tree'][tree_bucket(arcname)]).get(arcname)
+        if not entry:
+            return None
+        return self.read_object(entry['sha'])
+
+    def extract_snapshot(self, name: str, dest_dir: str, progress_callback=None) -> bool:
+        """按清单把快照还原为目录（布局与 zip 备份相同）"""
+        files = self.snapshot_files(name)
+        if files is None:
+            return False
+        for index, (arcname, entry) in enumerate(files.items(), 1):
+            target = os.path.join(dest_dir, *arcname.split('/'))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as f:
+                f.write(self.read_object(entry['sha']))
+            if progress_callback:
+                progress_callback.emit(int(index / len(files) * 100))
+        return True
+
+    def export_zip(self, name: str, zip_path: str) -> bool:
+        """把快照导出为独立的 zip 备份文件"""
+        files = self.snapshot_files(name)
+        if files is None:
+            return False
+        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+            for arcname, entry in files.items():
+                zipf.writestr(arcname, self.read_object(entry['sha']))
+        return True
+
+    def delete_snapshot(self, name: str, collect: bool = True) -> None:
+        """删除快照清单，collect 为 True 时随后回收无引用的对象"""
+        try:
+            os.remove(self.snapshot_path(name))
+        except FileNotFoundError:
+            pass
+        if collect:
+            self.gc()
+
+    def gc(self) -> int:
+        """
+        删除不被任何快照引用的对象，返回删除数量
+
+        持有存储锁执行：正在进行的 create_snapshot 写完清单后才开始，
+        期间开始的快照等待回收结束，因此不会删除尚未写入清单的对象。
+        耗时与对象数量成正比，应在后台线程中调用。
+        """
+        with self._lock:
+            return self._gc()
+
+    def _gc(self) -> int:
+        referenced = set()
+        for name in self.list_snapshots():
+            manifest = self.load_manifest(name)
+            try:
+                files = self.snapshot_files(name, manifest)
+            except (OSError, ValueError):
+                files = None
+            if files is None:
+                # 无法读取的清单可能仍引用对象，保守起见本次不回收
+                return 0
+            referenced.update(manifest['tree'])
+            referenced.update(entry['sha'] for entry in files.values())
+        removed = 0
+        if not os.path.isdir(self.objects_dir):
+            return 0
+        for prefix in os.listdir(self.objects_dir):
+            prefix_dir = os.path.join(self.objects_dir, prefix)
+            for rest in os.listdir(prefix_dir):
+                if prefix + rest not in referenced:
+                    try:
+                        os.remove(os.path.join(prefix_dir, rest))
+                        removed += 1
+                    except OSError:
+                        pass
+        return removed
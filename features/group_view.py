@@ -23,6 +23,8 @@ from PyQt5.QtWidgets import (
 from PyQt5.QtCore import Qt, pyqtSignal, QSize
 from PyQt5.QtGui import QFont, QColor, QIcon
 
+from features.html_text import note_plain_text
+
 logger = logging.getLogger(__name__)
 
 
@@ -263,7 +265,7 @@ class GroupViewDialog(QDialog):
                     with open(fpath, 'r', encoding='utf-8') as f:
                         data = json.load(f)
                     title = data.get('title', f'便签 {nid}')
-                    plain = data.get('plain_content', '')
+                    plain = note_plain_text(data)
                     tags = data.get('tags', [])
                     is_open = False
                 except Exception:
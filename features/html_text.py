@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+"""
+HTML 纯文本提取模块
+
+基于标准库 html.parser 的流式 HTML → 纯文本提取器，不依赖 Qt，
+可在后台线程或未打开便签的场景下使用（搜索、导出、字数统计、链接解析、分组预览）。
+
+针对 QTextDocument.toHtml() 生成的富文本方言：
+- 忽略 <head>/<style>/<script> 等非正文内容
+- <p>/<li>/<h1-6>/<td> 等块元素以换行分隔，与 toPlainText() 的段落语义一致
+- <br> 转为换行；Qt 的空段落（-qt-paragraph-type:empty）视为空行
+- 解析字符实体，&nbsp; 转为普通空格
+- 图片不输出占位符（toPlainText() 会输出 U+FFFC），便于搜索与字数统计
+- 样式声明 white-space: pre-wrap 时保留空白，否则按 HTML 规则折叠空白
+
+提取结果按内容哈希缓存，相同 HTML 不重复解析。
+"""
+
+import hashlib
+import logging
+import re
+import threading
+from collections import OrderedDict
+from html import unescape
+from html.parser import HTMLParser
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 块级元素：开始与结束处断行
+BLOCK_TAGS = frozenset({
+    'p', 'div', 'li', 'ul', 'ol', 'dl', 'dt', 'dd', 'blockquote', 'pre',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'table', 'tr', 'td', 'th',
+    'thead', 'tbody', 'tfoot', 'hr', 'body', 'center',
+})
+
+# 可直接承载文本的块元素（pre-wrap 下其内部的纯空白需要保留）
+TEXT_BLOCK_TAGS = frozenset({
+    'p', 'div', 'li', 'pre', 'dt', 'dd',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+})
+
+# 内容整体忽略的元素
+SKIP_TAGS = frozenset({'head', 'style', 'script', 'title'})
+
+# 无结束标签的元素
+VOID_TAGS = frozenset({'br', 'hr', 'img', 'meta', 'link', 'input', 'col', 'area', 'base', 'wbr'})
+
+_WS_RE = re.compile(r'[ \t\r\n\f]+')
+_PRE_WRAP_RE = re.compile(r'white-space\s*:\s*pre', re.IGNORECASE)
+
+# toPlainText() 同样会做的字符替换
+_CHAR_MAP = str.maketrans({'\xa0': ' ', '\u2028': '\n', '\u2029': '\n'})
+
+
+class HtmlTextExtractor(HTMLParser):
+    """
+    流式 HTML 纯文本提取器。
+
+    可多次 feed() 分块输入，最后调用 get_text() 获取结果。
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._parts: List[str] = []
+        self._block_stack: List[str] = []
+        self._skip_depth = 0
+        self._started = False          # 是否已输出过任何块
+        self._need_break = False       # 下一段内容前是否需要换行
+        self._block_has_content = False
+        self._empty_paragraph = False  # 当前块是否为 Qt 空段落
+        self._preserve_ws = False
+        self._last_closed_table = False
+
+    # ── 内部状态 ──────────────────────────────────────────
+
+    def _start_block(self) -> None:
+        if self._started and (self._need_break or self._block_has_content):
+            self._parts.append('\n')
+        self._started = True
+        self._need_break = False
+        self._block_has_content = False
+
+    def _emit(self, text: str) -> None:
+        if self._need_break:
+            self._start_block()
+        self._started = True
+        self._parts.append(text)
+        self._block_has_content = True
+        self._last_closed_table = False
+
+    # ── HTMLParser 回调 ──────────────────────────────────
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+            return
+        if self._skip_depth:
+            return
+        if tag == 'br':
+            if not self._empty_paragraph:
+                self._emit('\n')
+            return
+        if tag in BLOCK_TAGS:
+            style = dict(attrs).get('style') or ''
+            if tag == 'pre' or _PRE_WRAP_RE.search(style):
+                self._preserve_ws = True
+            if tag == 'body':
+                return
+            if tag == 'table' and not self._started:
+                # QTextDocument 中表格前总有一个块，文档以表格开头时即为空行
+                self._parts.append('\n')
+                self._started = True
+            self._start_block()
+            self._empty_paragraph = '-qt-paragraph-type:empty' in style
+            self._last_closed_table = False
+            if tag == 'hr':
+                self._need_break = True
+            elif tag not in VOID_TAGS:
+                self._block_stack.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            if self._skip_depth:
+                self._skip_depth -= 1
+            return
+        if self._skip_depth:
+            return
+        if tag in BLOCK_TAGS and tag != 'body':
+            # 弹出到匹配的开始标签（容忍未闭合的内层标签）
+            if tag in self._block_stack:
+                while self._block_stack:
+                    if self._block_stack.pop() == tag:
+                        break
+            self._need_break = True
+            self._empty_paragraph = False
+            # QTextDocument 在表格之后总会补一个空块
+            self._last_closed_table = tag == 'table'
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            # 识别 Qt 文档头部的 white-space: pre-wrap 样式声明
+            if _PRE_WRAP_RE.search(data):
+                self._preserve_ws = True
+            return
+        if not data:
+            return
+        if not data.strip() and self._preserve_ws:
+            # pre-wrap 下的纯空白：仅在可承载文本的块内输出
+            if self._need_break:
+                return
+            if not self._block_stack or self._block_stack[-1] not in TEXT_BLOCK_TAGS:
+                return
+        if not self._preserve_ws:
+            # 折叠空白；内联元素之间的纯空白折叠为一个空格（与前文的空格合并）
+            data = _WS_RE.sub(' ', data)
+            if (not self._block_has_content or self._need_break
+                    or self._parts[-1][-1:] in (' ', '\n')):
+                data = data.lstrip()
+                if not data:
+                    return
+        self._emit(data)
+
+    # ── 结果 ──────────────────────────────────────────────
+
+    def get_text(self) -> str:
+        """结束解析并返回提取的纯文本"""
+        self.close()
+        if self._last_closed_table:
+            self._parts.append('\n')
+            self._last_closed_table = False
+        return ''.join(self._parts).translate(_CHAR_MAP)
+
+
+def _plain_text(text: str) -> str:
+    """不含标签的内容：解析字符实体（&amp; 等），与标签路径的字符替换一致"""
+    if '&' not in text:
+        return text
+    return unescape(text).translate(_CHAR_MAP)
+
+
+def extract_text(html: str) -> str:
+    """
+    将 HTML 转为纯文本（不缓存）。
+
+    非 HTML 内容（不含 '<'）只解析字符实体。
+    """
+    if not html:
+        return ''
+    if '<' not in html:
+        return _plain_text(html)
+    parser = HtmlTextExtractor()
+    # Qt 文档头部只有 <meta>/<style>，直接跳过，仅识别其中的 pre-wrap 声明
+    body_pos = html.find('<body')
+    if body_pos > 0:
+        if _PRE_WRAP_RE.search(html, 0, body_pos):
+            parser._preserve_ws = True
+        html = html[body_pos:]
+    parser.feed(html)
+    return parser.get_text()
+
+
+# ==================== 按内容哈希缓存 ====================
+
+class _TextCache:
+    """以内容哈希为键的 LRU 缓存，避免持有原始 HTML 作为键"""
+
+    def __init__(self, max_size: int = 1024):
+        self._cache: OrderedDict = OrderedDict()
+        self._max_size = max_size
+        self._lock = threading.Lock()
+
+    def get(self, key: bytes) -> Optional[str]:
+        with self._lock:
+            text = self._cache.get(key)
+            if text is not None:
+                self._cache.move_to_end(key)
+            return text
+
+    def put(self, key: bytes, text: str) -> None:
+        with self._lock:
+            self._cache[key] = text
+            self._cache.move_to_end(key)
+            while len(self._cache) > self._max_size:
+                self._cache.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+
+_text_cache = _TextCache()
+
+
+def html_to_text(html: str) -> str:
+    """
+    将 HTML 转为纯文本，结果按内容哈希缓存。
+
+    Args:
+        html: QTextEdit.toHtml() 或其他 HTML 片段
+
+    Returns:
+        与 QTextDocument.toPlainText() 语义一致的纯文本
+    """
+    if not html:
+        return ''
+    if '<' not in html:
+        return _plain_text(html)
+    key = hashlib.blake2b(html.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+    text = _text_cache.get(key)
+    if text is None:
+        try:
+            text = extract_text(html)
+        except Exception as e:
+            logger.debug(f'HTML 文本提取失败，回退到去标签: {e}')
+            text = re.sub(r'<[^>]+>', '', html)
+        _text_cache.put(key, text)
+    return text
+
+
+def clear_text_cache() -> None:
+    """清空提取结果缓存"""
+    _text_cache.clear()
+
+
+def note_plain_text(note_data: dict) -> str:
+    """
+    获取便签数据的纯文本内容。
+
+    优先从富文本 HTML 提取（plain_content 可能因外部修改而过期），
+    Markdown 模式下返回 markdown_content，均为空时回退到 plain_content。
+    """
+    if note_data.get('edit_mode') == 'markdown' and note_data.get('markdown_content'):
+        return note_data['markdown_content']
+    content = note_data.get('content', '')
+    if content:
+        return html_to_text(content)
+    return note_data.get('plain_content', '')
@@ -4,19 +4,33 @@
 
 支持 [[便签名称]] 语法创建便签间的内部链接，
 维护全局链接索引，支持反向链接查询。
+
+除持久化的出链索引外，内存中维护 {目标标题: 来源便签 ID 集合} 反向索引，
+随 update_index / remove_note 增量更新，反向链接查询不再遍历全部便签。
+
+索引变更只标记为脏，由后台定时器在 SAVE_DELAY 秒后合并写盘；
+批量修改放在 transaction() 中，结束时只写一次。写盘为原子替换。
 """
 
 import os
 import json
 import re
+import html
 import logging
-from typing import List, Dict, Tuple, Set
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Optional, Tuple, Set, Union
+
+from features.html_text import html_to_text
 
 logger = logging.getLogger(__name__)
 
 # 链接解析正则
 LINK_PATTERN = re.compile(r'\[\[([^\]]+)\]\]')
 
+# 索引变更后合并写盘的延迟（秒）
+SAVE_DELAY = 2.0
+
 
 class NoteLinkManager:
     """便签链接管理器"""
@@ -25,6 +39,12 @@ class NoteLinkManager:
         self.notes_dir = notes_dir
         self.index_file = os.path.join(notes_dir, 'links_index.json')
         self._index: Dict[str, dict] = {}  # {note_id_str: {outgoing: [...], title: "..."}}
+        self._backlinks: Dict[str, Set[str]] = {}  # {目标标题: {note_id_str, ...}}
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()  # 串行化索引文件的写入与替换
+        self._dirty = False
+        self._batch_depth = 0
+        self._save_timer: Optional[threading.Timer] = None
         self.load_index()
 
     # ── 链接解析 ──────────────────────────────────────────
@@ -40,8 +60,8 @@ class NoteLinkManager:
         Returns:
             目标标题列表
         """
-        # 先从 HTML 中提取纯文本部分
-        plain = re.sub(r'<[^>]+>', '', content)
+        # 先从 HTML 中提取纯文本部分（解析实体，避免标签切断 [[...]]）
+        plain = html_to_text(content)
         matches = LINK_PATTERN.findall(plain)
         return list(dict.fromkeys(matches))  # 去重且保序
 
@@ -67,30 +87,88 @@ class NoteLinkManager:
 
         return LINK_PATTERN.sub(replace_link, text)
 
+    @staticmethod
+    def rename_link_in_html(content: str, old_title: str, new_title: str) -> Tuple[str, int]:
+        """
+        把 HTML 内容中的 [[old_title]] 改为 [[new_title]]（标题在 HTML 中可能经过实体转义）
+
+        Returns:
+            (新内容, 替换次数)
+        """
+        count = 0
+        variants = []
+        for quote in (False, True):
+            variant = (html.escape(old_title, quote), html.escape(new_title, quote))
+            if variant not in variants:
+                variants.append(variant)
+        for old, new in variants:
+            pattern = f'[[{old}]]'
+            found = content.count(pattern)
+            if found:
+                count += found
+                content = content.replace(pattern, f'[[{new}]]')
+        return content, count
+
     # ── 索引管理 ──────────────────────────────────────────
 
-    def update_index(self, note_id: int, note_title: str, outgoing_links: List[str]) -> None:
+    def update_index(self, note_id: int, note_title: str, outgoing_links: Union[List[str], str]) -> None:
         """
-        更新某便签的出链记录
+        更新某便签的出链记录（与已有记录相同时不标记变更）
 
         Args:
             note_id: 便签 ID
             note_title: 便签标题
-            outgoing_links: 该便签中的 [[...]] 链接目标标题列表
+            outgoing_links: 该便签中的 [[...]] 链接目标标题列表，或便签内容（自动解析链接）
         """
+        if isinstance(outgoing_links, str):
+            outgoing_links = self.parse_links(outgoing_links)
         key = str(note_id)
-        self._index[key] = {
-            'outgoing': outgoing_links,
+        entry = {
+            'outgoing': list(outgoing_links),
             'title': note_title,
         }
-        self.save_index()
+        with self._lock:
+            old = self._index.get(key)
+            if old == entry:
+                return
+            if old is not None:
+                self._unlink_backlinks(key, old.get('outgoing', []))
+            self._index[key] = entry
+            self._link_backlinks(key, entry['outgoing'])
+            self._mark_dirty()
 
     def remove_note(self, note_id: int) -> None:
         """从索引中移除便签"""
         key = str(note_id)
-        if key in self._index:
-            del self._index[key]
-            self.save_index()
+        with self._lock:
+            if key in self._index:
+                self._unlink_backlinks(key, self._index.pop(key).get('outgoing', []))
+                self._mark_dirty()
+
+    def has_note(self, note_id: int) -> bool:
+        """便签是否已在索引中"""
+        return str(note_id) in self._index
+
+    @contextmanager
+    def transaction(self):
+        """
+        批量修改索引：期间的变更不触发定时写盘，最外层结束时写盘一次
+
+        用法：
+            with link_manager.transaction():
+                for ...:
+                    link_manager.update_index(...)
+        """
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                flush = self._batch_depth == 0 and self._dirty
+            if flush:
+                self.save_index()
 
     def get_backlinks(self, note_title: str) -> List[Tuple[int, str]]:
         """
@@ -102,14 +180,32 @@ class NoteLinkManager:
         Returns:
             [(note_id, title), ...] 引用了该标题的便签列表
         """
-        backlinks = []
-        for note_id_str, data in self._index.items():
-            if note_title in data.get('outgoing', []):
-                backlinks.append((
-                    int(note_id_str),
-                    data.get('title', f'便签 {note_id_str}')
-                ))
-        return backlinks
+        return [
+            (int(note_id_str), self._index[note_id_str].get('title', f'便签 {note_id_str}'))
+            for note_id_str in sorted(self._backlinks.get(note_title, ()), key=int)
+        ]
+
+    def get_backlink_ids(self, note_title: str) -> Set[str]:
+        """引用了指定标题的便签 ID 集合（反向索引中的只读视图，调用方不应修改）"""
+        return self._backlinks.get(note_title, set())
+
+    def _link_backlinks(self, key: str, outgoing: List[str]) -> None:
+        for target in outgoing:
+            self._backlinks.setdefault(target, set()).add(key)
+
+    def _unlink_backlinks(self, key: str, outgoing: List[str]) -> None:
+        for target in outgoing:
+            sources = self._backlinks.get(target)
+            if sources is not None:
+                sources.discard(key)
+                if not sources:
+                    del self._backlinks[target]
+
+    def _rebuild_backlinks(self) -> None:
+        """由出链索引重建反向索引（加载索引后调用）"""
+        self._backlinks = {}
+        for key, data in self._index.items():
+            self._link_backlinks(key, data.get('outgoing', []))
 
     def get_all_note_titles(self) -> Set[str]:
         """获取所有已索引便签的标题集合"""
@@ -122,14 +218,40 @@ class NoteLinkManager:
 
     # ── 持久化 ──────────────────────────────────────────
 
+    def _mark_dirty(self) -> None:
+        """标记索引已变更，事务外安排一次延迟写盘（已安排时合并）"""
+        self._dirty = True
+        if self._batch_depth == 0 and self._save_timer is None:
+            self._save_timer = threading.Timer(SAVE_DELAY, self.save_index)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
     def save_index(self) -> None:
-        """保存链接索引到磁盘"""
-        try:
-            os.makedirs(os.path.dirname(self.index_file), exist_ok=True)
-            with open(self.index_file, 'w', encoding='utf-8') as f:
-                json.dump(self._index, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            logger.error(f'保存链接索引失败: {e}')
+        """
+        立即把未保存的变更写入磁盘（无变更时跳过）
+
+        定时器线程与主线程可能同时保存：取快照、写临时文件与替换整体持有写锁，
+        较旧的快照不会覆盖较新的快照；写文件期间不持有索引锁，不阻塞索引更新。
+        """
+        with self._write_lock:
+            with self._lock:
+                if self._save_timer is not None:
+                    self._save_timer.cancel()
+                    self._save_timer = None
+                if not self._dirty:
+                    return
+                data = dict(self._index)
+                self._dirty = False
+            tmp_path = self.index_file + '.tmp'
+            try:
+                os.makedirs(os.path.dirname(self.index_file), exist_ok=True)
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+                os.replace(tmp_path, self.index_file)
+            except Exception as e:
+                logger.error(f'保存链接索引失败: {e}')
+                with self._lock:
+                    self._dirty = True
 
     def load_index(self) -> None:
         """从磁盘加载链接索引"""
@@ -142,3 +264,4 @@ class NoteLinkManager:
                 self._index = {}
         else:
             self._index = {}
+        self._rebuild_backlinks()
@@ -4,7 +4,7 @@
 
 提供：
 - AsyncFileWorker: 通用异步文件读写工作线程
-- NoteDataCache: 便签数据 LRU 缓存
+- NoteDataCache: 便签数据 LRU 缓存（字节预算 + 文件校验）
 - LazyLoader: 延迟加载包装器
 """
 
@@ -95,79 +95,207 @@ def async_read_json(file_path: str, parent=None) -> AsyncFileWorker:
 
 # ==================== 6.2 便签数据 LRU 缓存 ====================
 
+# 默认内存预算（字节）
+DEFAULT_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+
+def estimate_data_size(data: Any) -> int:
+    """
+    粗略估算 JSON 数据的内存占用（字节）。
+
+    仅统计字符串/容器的主要负载，用于缓存预算而非精确计量；
+    内嵌 base64 图片的便签会按其字符串长度被正确计入。
+    """
+    if isinstance(data, str):
+        return len(data) + 49
+    if isinstance(data, dict):
+        return 64 + sum(estimate_data_size(k) + estimate_data_size(v) for k, v in data.items())
+    if isinstance(data, (list, tuple)):
+        return 56 + sum(estimate_data_size(v) for v in data)
+    return 28
+
+
+def _file_stamp(file_path: str) -> Optional[tuple]:
+    """返回文件的 (mtime_ns, size) 校验戳，文件不存在时返回 None"""
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
 class NoteDataCache:
     """
     便签数据 LRU 缓存。
 
     缓存最近访问的便签 JSON 数据，避免搜索时重复读取磁盘文件。
+    - 同时受条目数与近似字节数两个上限约束，超出即按 LRU 淘汰
+    - 条目可携带文件校验戳 (mtime_ns, size)，读取时按文件当前状态校验，
+      同步下载或外部修改后的过期数据会被自动丢弃
+    - 全局版本号 bump_version() 可一次性使所有条目失效
     线程安全（使用锁保护）。
     """
 
-    def __init__(self, max_size: int = 100):
+    def __init__(self, max_size: int = 100, max_bytes: int = DEFAULT_CACHE_MAX_BYTES):
         """
         Args:
             max_size: 最大缓存条目数
+            max_bytes: 近似内存预算（字节），<= 0 表示不限
         """
+        # {note_id: (data, nbytes, stamp, version)}
         self._cache: OrderedDict = OrderedDict()
         self._max_size = max_size
+        self._max_bytes = max_bytes
+        self._bytes = 0
+        self._version = 0
         self._lock = threading.Lock()
         self._hits = 0
         self._misses = 0
+        self._evictions = 0
+        self._stale = 0
+
+    def get(self, note_id: int, file_path: Optional[str] = None) -> Optional[dict]:
+        """
+        获取缓存的便签数据（LRU 提升）。
 
-    def get(self, note_id: int) -> Optional[dict]:
-        """获取缓存的便签数据（LRU 提升）"""
+        Args:
+            note_id: 便签 ID
+            file_path: 若提供，则按文件当前 (mtime_ns, size) 校验条目，不一致视为未命中
+        """
+        stamp = _file_stamp(file_path) if file_path else None
         with self._lock:
-            if note_id in self._cache:
-                self._hits += 1
-                # 移到末尾（最近使用）
-                self._cache.move_to_end(note_id)
-                return self._cache[note_id]
+            entry = self._cache.get(note_id)
+            if entry is not None:
+                data, nbytes, cached_stamp, version = entry
+                stale = version != self._version or (
+                    file_path is not None and (stamp is None or stamp != cached_stamp))
+                if not stale:
+                    self._hits += 1
+                    # 移到末尾（最近使用）
+                    self._cache.move_to_end(note_id)
+                    return data
+                self._stale += 1
+                self._remove_locked(note_id)
             self._misses += 1
             return None
 
-    def put(self, note_id: int, data: dict) -> None:
-        """存入或更新缓存"""
+    def put(self, note_id: int, data: dict, file_path: Optional[str] = None,
+            nbytes: Optional[int] = None) -> None:
+        """
+        存入或更新缓存。
+
+        Args:
+            note_id: 便签 ID
+            data: 便签数据
+            file_path: 数据来源文件，用于记录校验戳
+            nbytes: 已知的数据大小（如文件字节数），省略时估算
+        """
+        stamp = _file_stamp(file_path) if file_path else None
+        if nbytes is None:
+            nbytes = estimate_data_size(data)
+        with self._lock:
+            self._remove_locked(note_id)
+            if self._max_bytes > 0 and nbytes > self._max_bytes:
+                # 单条超出预算，不缓存
+                return
+            self._cache[note_id] = (data, nbytes, stamp, self._version)
+            self._bytes += nbytes
+            self._evict_locked()
+
+    def load(self, note_id: int, file_path: str) -> dict:
+        """
+        读取便签数据：缓存有效则直接返回，否则从磁盘读取并缓存。
+
+        Raises:
+            OSError / ValueError: 文件读取或 JSON 解析失败
+        """
+        data = self.get(note_id, file_path)
+        if data is not None:
+            return data
+        stamp = _file_stamp(file_path)
+        with open(file_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        # 以读取前的校验戳入库，读取期间文件若被改写，下次访问时会重新加载
+        nbytes = estimate_data_size(data)
         with self._lock:
-            if note_id in self._cache:
-                self._cache.move_to_end(note_id)
-                self._cache[note_id] = data
-            else:
-                if len(self._cache) >= self._max_size:
-                    # 淘汰最久未使用的
-                    self._cache.popitem(last=False)
-                self._cache[note_id] = data
+            self._remove_locked(note_id)
+            if self._max_bytes <= 0 or nbytes <= self._max_bytes:
+                self._cache[note_id] = (data, nbytes, stamp, self._version)
+                self._bytes += nbytes
+                self._evict_locked()
+        return data
+
+    def _remove_locked(self, note_id: int) -> None:
+        entry = self._cache.pop(note_id, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def _evict_locked(self) -> None:
+        """淘汰最久未使用的条目，直到满足条目数与字节预算"""
+        while self._cache and (
+                len(self._cache) > self._max_size
+                or (self._max_bytes > 0 and self._bytes > self._max_bytes)):
+            _, entry = self._cache.popitem(last=False)
+            self._bytes -= entry[1]
+            self._evictions += 1
 
     def invalidate(self, note_id: int) -> None:
         """使指定便签缓存失效（删除/更新时调用）"""
         with self._lock:
-            self._cache.pop(note_id, None)
+            self._remove_locked(note_id)
+
+    def bump_version(self) -> None:
+        """递增存储版本号，使所有现有条目失效（如同步下载、恢复备份后调用）"""
+        with self._lock:
+            self._version += 1
+
+    def set_max_bytes(self, max_bytes: int) -> None:
+        """调整内存预算，立即按新预算淘汰"""
+        with self._lock:
+            self._max_bytes = max_bytes
+            self._evict_locked()
 
     def clear(self) -> None:
         """清空所有缓存"""
         with self._lock:
             self._cache.clear()
+            self._bytes = 0
             self._hits = 0
             self._misses = 0
+            self._evictions = 0
+            self._stale = 0
 
     @property
     def size(self) -> int:
         with self._lock:
             return len(self._cache)
 
+    @property
+    def bytes_used(self) -> int:
+        with self._lock:
+            return self._bytes
+
+    def _hit_rate_locked(self) -> float:
+        total = self._hits + self._misses
+        return self._hits / total if total > 0 else 0.0
+
     @property
     def hit_rate(self) -> float:
         with self._lock:
-            total = self._hits + self._misses
-            return self._hits / total if total > 0 else 0.0
+            return self._hit_rate_locked()
 
     def stats(self) -> dict:
         with self._lock:
             return {
                 'size': len(self._cache),
                 'max_size': self._max_size,
+                'bytes': self._bytes,
+                'max_bytes': self._max_bytes,
                 'hits': self._hits,
                 'misses': self._misses,
-                'hit_rate': self.hit_rate,
+                'evictions': self._evictions,
+                'stale': self._stale,
+                'hit_rate': self._hit_rate_locked(),
             }
 
 
@@ -176,10 +304,18 @@ _note_cache: Optional[NoteDataCache] = None
 
 
 def get_note_cache() -> NoteDataCache:
-    """获取全局便签数据缓存单例"""
+    """获取全局便签数据缓存单例（内存预算取自配置 performance.note_cache_max_mb）"""
     global _note_cache
     if _note_cache is None:
-        _note_cache = NoteDataCache(max_size=100)
+        max_bytes = DEFAULT_CACHE_MAX_BYTES
+        try:
+            from core.config import get_config
+            max_mb = get_config().get('performance.note_cache_max_mb')
+            if max_mb is not None:
+                max_bytes = int(float(max_mb) * 1024 * 1024)
+        except Exception as e:
+            logger.debug(f'[NoteDataCache] 读取缓存预算配置失败，使用默认值: {e}')
+        _note_cache = NoteDataCache(max_size=100, max_bytes=max_bytes)
     return _note_cache
 
 
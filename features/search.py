@@ -18,6 +18,8 @@ from PyQt5.QtWidgets import (
 from PyQt5.QtCore import Qt, pyqtSignal
 from PyQt5.QtGui import QFont
 
+from features.html_text import note_plain_text
+
 
 class SearchDialog(QDialog):
     """
@@ -166,7 +168,7 @@ class SearchDialog(QDialog):
         # 搜索已打开的便签（带相关度评分）
         for note_id, note in self.manager.notes.items():
             title = note.note_data.get('title', '').lower()
-            content = note.note_data.get('content', '').lower()
+            content = note_plain_text(note.note_data).lower()
             tags = note.note_data.get('tags', [])
             
             if query_lower in title or query_lower in content:
@@ -191,17 +193,12 @@ class SearchDialog(QDialog):
                         if note_id in self.manager.notes:
                             continue
                         
-                        # 先查缓存
-                        note_data = cache.get(note_id)
-                        if note_data is None:
-                            # 未命中，从磁盘读取并缓存
-                            note_file = os.path.join(notes_dir, filename)
-                            with open(note_file, 'r', encoding='utf-8') as f:
-                                note_data = json.load(f)
-                            cache.put(note_id, note_data)
+                        # 先查缓存（按文件 mtime/size 校验），未命中或过期则从磁盘读取
+                        note_file = os.path.join(notes_dir, filename)
+                        note_data = cache.load(note_id, note_file)
                         
                         title = note_data.get('title', '').lower()
-                        content = note_data.get('content', '').lower()
+                        content = note_plain_text(note_data).lower()
                         tags = note_data.get('tags', [])
                         
                         if query_lower in title or query_lower in content:
@@ -255,13 +252,13 @@ class SearchDialog(QDialog):
                 # 已打开的便签
                 note = note_data_or_note
                 title = note.note_data.get('title', f'便签 {note_id}')
-                content = note.note_data.get('content', '')
+                content = note_plain_text(note.note_data)
                 status = '[已打开]'
             else:
                 # 未打开的便签
                 note_data = note_data_or_note
                 title = note_data.get('title', f'便签 {note_id}')
-                content = note_data.get('content', '')
+                content = note_plain_text(note_data)
                 status = '[未打开]'
             
             # 截取内容预览
@@ -379,7 +376,7 @@ class SearchManager:
                         data = json.load(f)
                     self._note_index[note_id] = {
                         'title': data.get('title', '').lower(),
-                        'content': data.get('content', '').lower(),
+                        'content': note_plain_text(data).lower(),
                         'tags': data.get('tags', []),
                     }
                 except Exception as e:
@@ -424,7 +421,7 @@ class SearchManager:
         # 搜索已打开的便签
         for note_id, note in self.manager.notes.items():
             title = note.note_data.get('title', '').lower()
-            content = note.note_data.get('content', '').lower()
+            content = note_plain_text(note.note_data).lower()
             
             if query_lower in title or query_lower in content:
                 results.append((note_id, note.note_data, True))
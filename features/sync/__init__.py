@@ -8,5 +8,10 @@
 from features.sync.engine import SyncEngine
 from features.sync.metadata import SyncMetadata
 from features.sync.conflict import ConflictResolver
+from features.sync.hash_cache import FileHashCache
+from features.sync.manifest import RemoteManifest
+from features.sync.pack import PackIndex, PackStore
+from features.sync.profile import SyncProfile
 
-__all__ = ['SyncEngine', 'SyncMetadata', 'ConflictResolver']
+__all__ = ['SyncEngine', 'SyncMetadata', 'ConflictResolver', 'FileHashCache', 'RemoteManifest',
+           'PackIndex', 'PackStore', 'SyncProfile']
@@ -7,6 +7,7 @@ import os
 import shutil
 import logging
 from datetime import datetime
+from typing import Optional
 
 logger = logging.getLogger(__name__)
 
@@ -51,21 +52,26 @@ class ConflictResolver:
             return local_path
 
     @staticmethod
-    def create_conflict_copy(file_path: str, source: str) -> str:
+    def create_conflict_copy(file_path: str, source: str, target_dir: Optional[str] = None,
+                             name: Optional[str] = None) -> str:
         """
         创建冲突副本文件
 
         Args:
             file_path: 原始文件路径
             source: 'local' 或 'remote'
+            target_dir: 副本存放目录，默认与原文件同目录
+            name: 副本命名所依据的文件名，默认取 file_path 的文件名
 
         Returns:
             冲突副本文件路径
         """
-        base, ext = os.path.splitext(file_path)
+        base, ext = os.path.splitext(name or os.path.basename(file_path))
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        conflict_path = f'{base}.conflict_{source}_{timestamp}{ext}'
+        target_dir = target_dir or os.path.dirname(file_path)
+        conflict_path = os.path.join(target_dir, f'{base}.conflict_{source}_{timestamp}{ext}')
         try:
+            os.makedirs(target_dir, exist_ok=True)
             shutil.copy2(file_path, conflict_path)
             logger.info(f'创建冲突副本: {conflict_path}')
         except Exception as e:
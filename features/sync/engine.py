@@ -4,19 +4,63 @@
 
 核心同步逻辑：三向合并（local/remote/base hash），
 支持 WebDAV 和本地文件夹两种同步方式。
+
+便签保存/删除后由管理器调用 notify_note_changed / notify_note_deleted 登记脏便签，
+静默期结束后只同步这些便签；定时任务只做低频的全量对账。
+
+每个引擎对应一个 SyncProfile（选择性同步），多个引擎可并存：
+各自使用独立的元数据、哈希缓存、基准版本与清单缓存文件。
 """
 
 import os
+import json
+import hashlib
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Optional, Dict
 
 from PyQt5.QtCore import QObject, QThread, QTimer, pyqtSignal
 
+from core.errors import SyncConflictError
 from features.sync.metadata import SyncMetadata
 from features.sync.conflict import ConflictResolver
+from features.sync.manifest import MANIFEST_NAME, RemoteManifest
+from features.sync.pack import PackStore
+from features.sync.merge import SyncBaseStore, merge_note_data
+from features.sync.profile import NoteCatalog, SyncProfile
+from features.performance import get_note_cache
 
 logger = logging.getLogger(__name__)
 
+# 可并行执行的动作（互不依赖，只涉及单个文件的网络传输）
+TRANSFER_ACTIONS = ('upload', 'download', 'delete_remote')
+
+# 默认并发传输数
+DEFAULT_MAX_TRANSFERS = 4
+
+# 同步模式：逐文件同步 / pack 打包同步
+SYNC_MODE_FILES = 'files'
+SYNC_MODE_PACK = 'pack'
+
+# 各模式使用独立的元数据文件：两种模式的远端表示不同，
+# 共用基准哈希会让切换模式后的首次同步把本地便签误判为“远端已删除”
+METADATA_FILES = {
+    SYNC_MODE_FILES: 'sync_metadata.json',
+    SYNC_MODE_PACK: 'sync_pack_metadata.json',
+}
+
+# 保存/删除事件后的默认静默期（秒）：期间再有修改会重新计时
+DEFAULT_QUIET_PERIOD_SECONDS = 5
+
+
+def _read_json(path: str) -> Optional[dict]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else None
+    except (OSError, ValueError):
+        return None
+
 
 class SyncWorker(QThread):
     """同步工作线程"""
@@ -24,25 +68,47 @@ class SyncWorker(QThread):
     progress = pyqtSignal(int, int, str)  # (current, total, filename)
     completed = pyqtSignal(dict)  # summary
     error = pyqtSignal(str)
+    aborted = pyqtSignal()
 
-    def __init__(self, engine: 'SyncEngine'):
+    def __init__(self, engine: 'SyncEngine', only: Optional[set] = None):
         super().__init__()
         self.engine = engine
+        self.only = only  # 增量同步的文件名集合，None 表示全量
         self._abort = False
 
     def run(self):
         try:
-            summary = self.engine._do_sync()
+            summary = self.engine._do_sync(self.only)
             if not self._abort:
                 self.completed.emit(summary)
         except Exception as e:
             if not self._abort:
                 self.error.emit(str(e))
+        if self._abort:
+            self.aborted.emit()
 
     def abort(self):
         self._abort = True
 
 
+class RepackWorker(QThread):
+    """后台 repack 线程：回收 pack 模式下被替代的对象"""
+
+    completed = pyqtSignal(dict)
+    error = pyqtSignal(str)
+
+    def __init__(self, client):
+        super().__init__()
+        self.client = client
+
+    def run(self):
+        try:
+            self.completed.emit(PackStore(self.client).repack())
+        except Exception as e:
+            logger.error(f'repack 失败: {e}')
+            self.error.emit(str(e))
+
+
 class SyncEngine(QObject):
     """同步引擎"""
 
@@ -50,36 +116,180 @@ class SyncEngine(QObject):
     sync_progress = pyqtSignal(int, int, str)
     sync_completed = pyqtSignal(dict)
     sync_error = pyqtSignal(str)
+    repack_completed = pyqtSignal(dict)
 
-    def __init__(self, notes_dir: str, config=None):
+    def __init__(self, notes_dir: str, config=None, mode: Optional[str] = None,
+                 profile: Optional[SyncProfile] = None):
         super().__init__()
         self.notes_dir = notes_dir
         self.config = config
-        self.metadata_file = os.path.join(notes_dir, 'sync_metadata.json')
-        self.metadata = SyncMetadata(self.metadata_file)
+        if mode is None:
+            mode = config.get('sync.mode', SYNC_MODE_FILES) if config else SYNC_MODE_FILES
+        self.mode = mode if mode in METADATA_FILES else SYNC_MODE_FILES
+        self.profile = profile or SyncProfile()
+        self.metadata_file = self._profile_path(METADATA_FILES[self.mode])
+        self.metadata = SyncMetadata(self.metadata_file, self._profile_path('sync_hash_cache.json'))
+        self.base_store = SyncBaseStore(os.path.join(notes_dir, 'sync_base' + self.profile.file_suffix()))
+        self.conflicts_dir = os.path.join(notes_dir, 'sync_conflicts')
+        self.manifest_cache_file = self._profile_path('sync_manifest_cache.json')
+        # 便签属性目录：由管理器提供内存中的数据，否则按 stat 缓存读取便签文件
+        self._catalog_provider = None
+        self._note_catalog: Optional[NoteCatalog] = None
+        self.max_transfers = DEFAULT_MAX_TRANSFERS
+        if config:
+            self.max_transfers = int(config.get('sync.max_concurrent_transfers', DEFAULT_MAX_TRANSFERS))
+        quiet_seconds = DEFAULT_QUIET_PERIOD_SECONDS
+        if config:
+            quiet_seconds = config.get('sync.quiet_period_seconds', DEFAULT_QUIET_PERIOD_SECONDS)
+        self.quiet_period_ms = int(quiet_seconds * 1000)
         self._client = None
         self._worker: Optional[SyncWorker] = None
+        self._repack_worker: Optional[RepackWorker] = None
         self._auto_timer: Optional[QTimer] = None
 
+        # 待同步的脏便签：保存/删除事件登记，静默期结束后增量推送
+        self._dirty: set = set()
+        self._in_flight: set = set()
+        self._quiet_timer = QTimer(self)
+        self._quiet_timer.setSingleShot(True)
+        self._quiet_timer.timeout.connect(self._flush_dirty)
+
+    def _profile_path(self, filename: str) -> str:
+        """同步配置专属的文件路径（默认配置保持原文件名）"""
+        root, ext = os.path.splitext(filename)
+        return os.path.join(self.notes_dir, root + self.profile.file_suffix() + ext)
+
+    def set_catalog_provider(self, provider) -> None:
+        """
+        设置便签属性目录来源
+
+        Args:
+            provider: 无参可调用对象，返回 {filename: {'tags': [...], 'pinned': bool}}
+        """
+        self._catalog_provider = provider
+
+    def _exclusion_filter(self):
+        """当前同步配置的排除判断函数（在哈希之前调用），选择全部便签时为 None"""
+        if self.profile.selects_all:
+            return None
+        if self._note_catalog is None:
+            self._note_catalog = NoteCatalog(self.notes_dir)
+        catalog = self._catalog_provider() if self._catalog_provider is not None else {}
+        return self.profile.exclusion_filter(catalog, self._note_catalog)
+
     def set_client(self, client):
         """设置同步客户端（WebDAVClient 或 LocalSyncClient）"""
         self._client = client
+        # 监视同步目录的客户端：外部修改稳定后按脏便签增量同步
+        watcher = getattr(client, 'watcher', None)
+        if watcher is not None:
+            watcher.changed.connect(self._on_remote_changed)
+
+    def _on_remote_changed(self, names: set) -> None:
+        for name in names:
+            self._mark_dirty(name)
 
     def sync_now(self) -> None:
-        """执行一次同步（异步）"""
-        if self._worker and self._worker.isRunning():
+        """执行一次全量同步（异步）"""
+        if self._busy():
             logger.warning('同步正在进行中，忽略重复请求')
             return
+        # 全量扫描覆盖当前所有脏便签
+        self._quiet_timer.stop()
+        self._start_worker(None)
+
+    def notify_note_changed(self, filename: str) -> None:
+        """便签写入磁盘后调用：登记为脏便签，静默期后增量同步"""
+        self._mark_dirty(filename)
+
+    def notify_note_deleted(self, filename: str) -> None:
+        """便签删除后调用：登记为脏便签，静默期后同步删除到远端"""
+        self._mark_dirty(filename)
+
+    def pending_changes(self) -> set:
+        """尚未同步的脏便签"""
+        return set(self._dirty)
+
+    def _mark_dirty(self, filename: str) -> None:
+        filename = os.path.basename(filename)
+        if not (filename.startswith('note_') and filename.endswith('.json')):
+            return
+        self._dirty.add(filename)
+        if self._client:
+            self._quiet_timer.start(self.quiet_period_ms)
+
+    def _flush_dirty(self) -> None:
+        """静默期结束：只同步脏便签，同步或 repack 进行中时顺延"""
+        if not self._dirty or not self._client:
+            return
+        if self._busy():
+            self._quiet_timer.start(self.quiet_period_ms)
+            return
+        self._start_worker(set(self._dirty))
 
+    def _busy(self) -> bool:
+        if self._worker and self._worker.isRunning():
+            return True
+        if self._repack_worker and self._repack_worker.isRunning():
+            logger.info('repack 正在进行中，本次同步跳过')
+            return True
+        return False
+
+    def _start_worker(self, only: Optional[set]) -> None:
+        self._in_flight = set(self._dirty) if only is None else only
+        self._dirty -= self._in_flight
         self.sync_started.emit()
-        self._worker = SyncWorker(self)
+        self._worker = SyncWorker(self, only)
         self._worker.progress.connect(self.sync_progress.emit)
-        self._worker.completed.connect(self.sync_completed.emit)
-        self._worker.error.connect(self.sync_error.emit)
+        self._worker.completed.connect(self._on_sync_completed)
+        self._worker.error.connect(self._on_sync_error)
+        self._worker.aborted.connect(self._on_sync_aborted)
         self._worker.start()
 
-    def start_auto_sync(self, interval_minutes: int = 5) -> None:
-        """启动定时自动同步"""
+    def _on_sync_completed(self, summary: dict) -> None:
+        self._in_flight = set()
+        # 同步期间又有保存才重新计时；失败的便签留到下一次保存事件或全量对账时重试
+        resync = bool(self._dirty)
+        self._dirty.update(summary.get('failed', ()))
+        if summary.get('downloaded') or summary.get('merged') or summary.get('conflicts'):
+            # 本地便签文件被远端内容覆盖，旧的缓存条目全部作废
+            get_note_cache().bump_version()
+        self.sync_completed.emit(summary)
+        if summary.get('repack_needed'):
+            self.repack_now()
+        if resync:
+            self._quiet_timer.start(self.quiet_period_ms)
+
+    def _on_sync_error(self, message: str) -> None:
+        # 失败的脏便签留到下一次保存事件或全量对账时重试
+        self._dirty |= self._in_flight
+        self._in_flight = set()
+        self.sync_error.emit(message)
+
+    def _on_sync_aborted(self) -> None:
+        # 中止的同步不发出完成或失败信号，本次的脏便签全部留待重试
+        self._dirty |= self._in_flight
+        self._in_flight = set()
+
+    def repack_now(self) -> None:
+        """在后台线程中整理远端 pack（仅 pack 模式，且不与同步并发）"""
+        if self.mode != SYNC_MODE_PACK or not self._client:
+            return
+        if self._worker and self._worker.isRunning():
+            return
+        if self._repack_worker and self._repack_worker.isRunning():
+            return
+        self._repack_worker = RepackWorker(self._client)
+        self._repack_worker.completed.connect(self.repack_completed.emit)
+        self._repack_worker.start()
+
+    def start_auto_sync(self, interval_minutes: int = 30) -> None:
+        """
+        启动定时全量对账
+
+        日常修改由保存/删除事件增量同步，定时器只负责低频的全量扫描，
+        用于拉取其他设备的修改并兜底遗漏的事件。
+        """
         self.stop_auto_sync()
         self._auto_timer = QTimer(self)
         self._auto_timer.timeout.connect(self.sync_now)
@@ -91,78 +301,212 @@ class SyncEngine(QObject):
             self._auto_timer.stop()
             self._auto_timer = None
 
-    def _do_sync(self) -> dict:
-        """执行同步核心逻辑"""
+    def close(self) -> None:
+        """停止定时器与同步目录监视（重建同步引擎前调用）"""
+        self.stop_auto_sync()
+        self._quiet_timer.stop()
+        if hasattr(self._client, 'stop_watching'):
+            self._client.stop_watching()
+
+    def _aborted(self) -> bool:
+        return bool(self._worker and self._worker._abort)
+
+    def _emit_progress(self, current: int, total: int, filename: str) -> None:
+        if self._worker:
+            self._worker.progress.emit(current, total, filename)
+
+    def _do_sync(self, only: Optional[set] = None) -> dict:
+        """
+        执行同步核心逻辑
+
+        Args:
+            only: 只同步这些文件名（增量同步，不扫描、不哈希其他本地文件）；None 表示全量
+        """
         if not self._client:
             raise RuntimeError('同步客户端未设置')
+        if self.mode == SYNC_MODE_PACK:
+            return self._do_pack_sync(only)
 
-        summary = {'uploaded': 0, 'downloaded': 0, 'conflicts': 0, 'errors': 0}
+        summary = {'uploaded': 0, 'downloaded': 0, 'merged': 0, 'conflicts': 0, 'errors': 0, 'failed': []}
 
-        # 获取远端文件哈希
-        remote_hashes = self._client.get_file_hashes()
+        # 获取远端文件状态（ETag 或哈希），并通过远端清单还原为内容哈希
+        remote_state = self._client.get_file_hashes()
+        manifest = self._read_manifest()
+        remote_hashes = manifest.resolve_remote_hashes(remote_state)
+        # 清单未覆盖的文件（如上次同步中断、清单未写入）再用本地检查点还原
+        for filename, etag in remote_state.items():
+            if remote_hashes.get(filename) == etag:
+                known = self.metadata.known_remote_hash(filename, etag)
+                if known:
+                    remote_hashes[filename] = known
 
-        # 检测变更
-        changes = self.metadata.detect_changes(self.notes_dir, remote_hashes)
+        # 检测变更（被同步配置排除的本地便签不哈希、不比较）
+        changes = self.metadata.detect_changes(self.notes_dir, remote_hashes, only, self._exclusion_filter())
 
         total = len(changes)
         current = 0
+        uploaded = []
         strategy = 'newer'
         if self.config:
             strategy = self.config.get('sync.conflict_strategy', 'newer')
 
+        # 互不依赖的上传/下载/远端删除并行执行；网络传输在线程池中完成，
+        # 元数据、清单与进度只在本线程中按完成顺序更新
+        transfers = [(f, a) for f, a in changes.items() if a in TRANSFER_ACTIONS]
+        stale = []  # 上传时远端已被其他设备修改（412），改走合并流程
+        if transfers:
+            if hasattr(self._client, 'set_max_connections'):
+                self._client.set_max_connections(self.max_transfers)
+            max_workers = max(1, min(self.max_transfers, len(transfers)))
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='sync-transfer') as pool:
+                futures = {
+                    pool.submit(self._transfer, filename, action, remote_state): (filename, action)
+                    for filename, action in transfers
+                }
+                for future in as_completed(futures):
+                    filename, action = futures[future]
+                    if self._aborted():
+                        for pending in futures:
+                            pending.cancel()
+                    if future.cancelled():
+                        continue
+                    current += 1
+                    self._emit_progress(current, total, filename)
+                    try:
+                        etag = future.result()
+                        self._record_transfer(filename, action, etag, remote_state, manifest, uploaded, summary)
+                    except SyncConflictError as e:
+                        logger.info(f'{e}，转为合并处理')
+                        stale.append(filename)
+                    except Exception as e:
+                        logger.error(f'同步文件失败: {filename} - {e}')
+                        summary['errors'] += 1
+                        summary['failed'].append(filename)
+
+        for filename in stale:
+            changes[filename] = 'conflict'
+        total += len(stale)
+
         for filename, action in changes.items():
-            if self._worker and self._worker._abort:
+            if action in TRANSFER_ACTIONS:
+                continue
+            if self._aborted():
                 break
 
             current += 1
-            self._worker.progress.emit(current, total, filename)
+            self._emit_progress(current, total, filename)
 
             local_path = os.path.join(self.notes_dir, filename)
 
             try:
-                if action == 'upload':
-                    self._client.upload_file(local_path, filename)
-                    local_hash = SyncMetadata.compute_hash(local_path)
+                if action == 'conflict':
+                    # 下载远端版本到临时文件，三向合并后写回本地
+                    temp_path = local_path + '.remote_tmp'
+                    remote_etag = self._download(filename, temp_path)
+                    needs_upload = self._resolve_conflict(filename, local_path, temp_path, strategy, summary)
+                    if needs_upload:
+                        # 合并结果或本地版本写回远端，使两端内容一致；
+                        # 以刚下载版本的 ETag 为前置条件，期间远端再被修改时留待下次同步
+                        remote_etag = self._upload(local_path, filename, remote_etag or None)
+                    local_hash = self._snapshot_base(local_path)
                     self.metadata.update_file_meta(
                         filename, local_hash=local_hash,
                         remote_hash=local_hash, base_hash=local_hash,
+                        remote_etag=remote_etag,
                         status='synced'
                     )
+                    manifest.record(filename, local_hash, os.path.getsize(local_path),
+                                    etag=remote_etag, bump_version=needs_upload)
+                    if needs_upload and not remote_etag:
+                        uploaded.append(filename)
+
+                elif action == 'delete_local':
+                    if os.path.exists(local_path):
+                        os.remove(local_path)
+                    self.metadata.remove_file(filename)
+                    manifest.remove(filename)
+
+                elif filename in remote_state:
+                    # 两端一致：补全清单中缺失或过期的条目
+                    base_hash = self.metadata.get_file_meta(filename).get('base_hash', '')
+                    if base_hash and remote_hashes.get(filename) == base_hash:
+                        manifest.record(filename, base_hash, os.path.getsize(local_path),
+                                        etag=remote_state[filename])
+
+            except Exception as e:
+                logger.error(f'同步文件失败: {filename} - {e}')
+                summary['errors'] += 1
+                summary['failed'].append(filename)
+
+        self.metadata.save()
+        self._save_manifest(manifest, uploaded)
+        self._prune_bases(summary)
+        return summary
+
+    def _do_pack_sync(self, only: Optional[set] = None) -> dict:
+        """
+        pack 模式同步
+
+        请求数与便签数量无关：读取索引、按 pack 批量下载所需对象、
+        把所有待上传内容打成一个 pack 上传、条件写回索引。
+        其他设备同时修改了同一便签时放弃该便签的本次上传，下次同步按冲突处理。
+        上传与远端删除的元数据在索引写入成功后才提交，
+        避免失败时把本地便签误记为已同步。
+        """
+        summary = {'uploaded': 0, 'downloaded': 0, 'merged': 0, 'conflicts': 0, 'errors': 0, 'failed': []}
+        store = PackStore(self._client)
+        index = store.load_index()
+        remote_hashes = index.remote_hashes()
+        changes = self.metadata.detect_changes(self.notes_dir, remote_hashes, only, self._exclusion_filter())
+
+        strategy = 'newer'
+        if self.config:
+            strategy = self.config.get('sync.conflict_strategy', 'newer')
+
+        needed = {remote_hashes[f] for f, a in changes.items() if a in ('download', 'conflict')}
+        objects = store.fetch_objects(index, needed) if needed else {}
+
+        to_push: Dict[str, bytes] = {}
+        pending_meta = []  # [(filename, sha256 或 None 表示删除)]
+        total = len(changes)
+        current = 0
+
+        for filename, action in changes.items():
+            if self._aborted():
+                break
+            current += 1
+            self._emit_progress(current, total, filename)
+            local_path = os.path.join(self.notes_dir, filename)
+
+            try:
+                if action == 'upload':
+                    with open(local_path, 'rb') as f:
+                        data = f.read()
+                    sha = hashlib.sha256(data).hexdigest()
+                    to_push[sha] = data
+                    index.record(filename, sha, len(data))
+                    pending_meta.append((filename, sha))
                     summary['uploaded'] += 1
 
                 elif action == 'download':
-                    self._client.download_file(filename, local_path)
-                    local_hash = SyncMetadata.compute_hash(local_path)
-                    self.metadata.update_file_meta(
-                        filename, local_hash=local_hash,
-                        remote_hash=local_hash, base_hash=local_hash,
-                        status='synced'
-                    )
+                    sha = remote_hashes[filename]
+                    self._write_local(local_path, objects[sha])
+                    self._commit_meta(filename, sha, objects[sha])
                     summary['downloaded'] += 1
 
                 elif action == 'conflict':
-                    # 下载远端版本到临时文件
+                    remote_sha = remote_hashes[filename]
                     temp_path = local_path + '.remote_tmp'
-                    self._client.download_file(filename, temp_path)
-
-                    winner = ConflictResolver.resolve(local_path, temp_path, strategy)
-                    if winner == temp_path:
-                        import shutil
-                        shutil.move(temp_path, local_path)
+                    self._write_local(temp_path, objects[remote_sha])
+                    if self._resolve_conflict(filename, local_path, temp_path, strategy, summary):
+                        with open(local_path, 'rb') as f:
+                            data = f.read()
+                        sha = hashlib.sha256(data).hexdigest()
+                        to_push[sha] = data
+                        index.record(filename, sha, len(data))
+                        pending_meta.append((filename, sha))
                     else:
-                        if os.path.exists(temp_path):
-                            os.remove(temp_path)
-
-                    if strategy == 'both':
-                        ConflictResolver.create_conflict_copy(temp_path if os.path.exists(temp_path) else local_path, 'remote')
-
-                    local_hash = SyncMetadata.compute_hash(local_path)
-                    self.metadata.update_file_meta(
-                        filename, local_hash=local_hash,
-                        remote_hash=local_hash, base_hash=local_hash,
-                        status='synced'
-                    )
-                    summary['conflicts'] += 1
+                        self._commit_meta(filename, remote_sha, objects[remote_sha])
 
                 elif action == 'delete_local':
                     if os.path.exists(local_path):
@@ -170,12 +514,206 @@ class SyncEngine(QObject):
                     self.metadata.remove_file(filename)
 
                 elif action == 'delete_remote':
-                    self._client.delete_file(filename)
-                    self.metadata.remove_file(filename)
+                    index.remove(filename)
+                    pending_meta.append((filename, None))
 
             except Exception as e:
                 logger.error(f'同步文件失败: {filename} - {e}')
                 summary['errors'] += 1
+                summary['failed'].append(filename)
 
-        self.metadata.save()
+        try:
+            rejected = set()
+            if index.dirty:
+                store.push_objects(index, to_push)
+                rejected = set(store.save_index(index))
+            for filename, sha in pending_meta:
+                if filename in rejected:
+                    # 其他设备同时修改了该便签：不提交元数据，下次同步按冲突处理
+                    logger.warning(f'远端便签已被其他设备修改，推迟同步: {filename}')
+                    if changes[filename] == 'upload':
+                        summary['uploaded'] -= 1
+                    summary['errors'] += 1
+                    summary['failed'].append(filename)
+                    continue
+                if sha is None:
+                    self.metadata.remove_file(filename)
+                else:
+                    self._commit_meta(filename, sha, to_push.get(sha))
+        finally:
+            # 索引写入失败时仍保存已完成的下载
+            self.metadata.save()
+        self._prune_bases(summary)
+        summary['repack_needed'] = index.needs_repack()
         return summary
+
+    def _write_local(self, path: str, data: bytes) -> None:
+        """原子写入本地文件"""
+        tmp_path = path + '.sync_tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _commit_meta(self, filename: str, sha: str, data: Optional[bytes] = None) -> None:
+        if data is not None:
+            self.base_store.save(data)
+        self.metadata.update_file_meta(
+            filename, local_hash=sha, remote_hash=sha, base_hash=sha, status='synced')
+
+    def _snapshot_base(self, local_path: str) -> str:
+        """保存同步基准并返回内容哈希（只读取一次文件，同时更新哈希缓存）"""
+        try:
+            st = os.stat(local_path)
+        except OSError:
+            return ''
+        sha = self.base_store.save_file(local_path) or ''
+        if sha:
+            self.metadata.hash_cache.update(local_path, sha, st)
+        return sha
+
+    def _prune_bases(self, summary: dict) -> None:
+        if summary['uploaded'] or summary['downloaded'] or summary['conflicts'] or summary['merged']:
+            self.base_store.prune(self.metadata.base_hashes())
+
+    def _resolve_conflict(self, filename: str, local_path: str, remote_path: str,
+                          strategy: str, summary: dict) -> bool:
+        """
+        解决冲突：有基准版本时逐字段三向合并，文本修改重叠（或缺少基准）时
+        按策略保留一方，并把另一方保存为冲突副本（策略明确为 local / remote 时除外）。
+
+        结果写入 local_path，remote_path 被消耗。
+
+        Returns:
+            本地结果与远端不同、需要上传时为 True
+        """
+        prefer_local = ConflictResolver.resolve(local_path, remote_path, strategy) == local_path
+        base = self.base_store.load(self.metadata.get_file_meta(filename).get('base_hash', ''))
+        local = _read_json(local_path)
+        remote = _read_json(remote_path)
+
+        if base is not None and local is not None and remote is not None:
+            result = merge_note_data(base, local, remote, 'local' if prefer_local else 'remote')
+            if result.clean:
+                summary['merged'] += 1
+                self.metadata.record_merge(conflicted=False)
+                if result.merged == remote:
+                    os.replace(remote_path, local_path)
+                    return False
+                self._write_local(local_path, json.dumps(
+                    result.merged, ensure_ascii=False, indent=4).encode('utf-8'))
+                os.remove(remote_path)
+                return True
+            logger.info(f'便签合并冲突: {filename} - {result.conflicts}')
+
+        summary['conflicts'] += 1
+        self.metadata.record_merge(conflicted=True)
+        if strategy not in (ConflictResolver.STRATEGY_LOCAL, ConflictResolver.STRATEGY_REMOTE):
+            loser, source = (remote_path, 'remote') if prefer_local else (local_path, 'local')
+            ConflictResolver.create_conflict_copy(loser, source, target_dir=self.conflicts_dir, name=filename)
+        if prefer_local:
+            os.remove(remote_path)
+            return True
+        os.replace(remote_path, local_path)
+        return False
+
+    def _transfer(self, filename: str, action: str, remote_state: Dict[str, str]) -> str:
+        """
+        在传输线程中执行单个文件的网络操作（不触碰元数据）
+
+        Returns:
+            传输后远端文件的 ETag（未知时为空串）
+        """
+        local_path = os.path.join(self.notes_dir, filename)
+        if action == 'upload':
+            # 远端已有该文件时以列表中的 ETag 为前置条件，否则要求远端仍不存在
+            if filename in remote_state:
+                return self._upload(local_path, filename, remote_state[filename] or None)
+            return self._upload(local_path, filename, '')
+        if action == 'download':
+            return self._download(filename, local_path)
+        if action == 'delete_remote':
+            if not self._client.delete_file(filename):
+                raise IOError(f'删除远端文件失败: {filename}')
+        return ''
+
+    def _record_transfer(self, filename: str, action: str, etag: str, remote_state: Dict[str, str],
+                         manifest: RemoteManifest, uploaded: list, summary: dict) -> None:
+        """传输完成后更新元数据与清单（仅在同步线程中调用）"""
+        local_path = os.path.join(self.notes_dir, filename)
+        if action == 'delete_remote':
+            self.metadata.remove_file(filename)
+            manifest.remove(filename)
+            return
+
+        local_hash = self._snapshot_base(local_path)
+        if action == 'download':
+            etag = etag or remote_state.get(filename, '')
+        # 每个文件完成后立即写入检查点，中断后可从此处继续
+        self.metadata.update_file_meta(
+            filename, local_hash=local_hash,
+            remote_hash=local_hash, base_hash=local_hash,
+            remote_etag=etag,
+            status='synced'
+        )
+        manifest.record(filename, local_hash, os.path.getsize(local_path),
+                        etag=etag, bump_version=action == 'upload')
+        if action == 'upload':
+            # 服务器未在响应中返回 ETag 时，写清单前重新列出
+            if not etag:
+                uploaded.append(filename)
+            summary['uploaded'] += 1
+        else:
+            summary['downloaded'] += 1
+
+    def _upload(self, local_path: str, filename: str, expected_etag: Optional[str] = None) -> str:
+        """
+        条件上传，返回新 ETag
+
+        Args:
+            expected_etag: 远端当前 ETag（If-Match）；空串表示远端应不存在（If-None-Match: *）；
+                           None 表示无条件上传
+
+        Raises:
+            SyncConflictError: 远端已被其他设备修改
+        """
+        if expected_etag is None:
+            return self._client.put_file(local_path, filename)
+        if expected_etag:
+            return self._client.put_file(local_path, filename, if_match=expected_etag)
+        return self._client.put_file(local_path, filename, if_none_match='*')
+
+    def _download(self, filename: str, local_path: str) -> str:
+        """下载远端文件，返回其 ETag"""
+        return self._client.get_file(filename, local_path) or ''
+
+    def _read_manifest(self) -> RemoteManifest:
+        """读取远端清单；本地缓存的 ETag 仍有效时服务器返回 304，不重复下载"""
+        cached = _read_json(self.manifest_cache_file) or {}
+        data, etag = self._client.fetch_blob(MANIFEST_NAME, cached.get('etag', ''))
+        if data is None and etag:
+            return RemoteManifest.from_bytes(cached.get('data', '').encode('utf-8'))
+        if data and etag:
+            try:
+                tmp_path = self.manifest_cache_file + '.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(json.dumps({'etag': etag, 'data': data.decode('utf-8')}, ensure_ascii=False))
+                os.replace(tmp_path, self.manifest_cache_file)
+            except Exception as e:
+                logger.debug(f'缓存远端清单失败: {e}')
+        return RemoteManifest.from_bytes(data)
+
+    def _save_manifest(self, manifest: RemoteManifest, uploaded: list) -> None:
+        """记录上传后的远端 ETag 并原子写回清单（无变更时跳过）"""
+        if not manifest.dirty:
+            return
+        try:
+            if uploaded:
+                fresh_state = self._client.get_file_hashes()
+                for filename in uploaded:
+                    manifest.set_etag(filename, fresh_state.get(filename, ''))
+            manifest.generation += 1
+            self._client.write_manifest(manifest.to_bytes())
+            manifest.mark_saved()
+        except Exception as e:
+            # 清单写入失败只会导致下次同步多做一次比较，不影响数据
+            logger.error(f'写入远端清单失败: {e}')
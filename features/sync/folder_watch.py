@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+同步目录变更监视
+
+QFileSystemWatcher 监视目录（新增、删除、重命名，部分平台包含内容修改），
+同时按固定间隔轮询 stat 快照兜底：网络盘和云盘客户端写入的文件不一定触发系统通知。
+每次检查只做 scandir + stat，不读取文件内容。
+
+变化的文件需在 debounce 时间内 stat 不再变化才会报告，
+避免 OneDrive 等客户端分段写入时读到不完整的内容。
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+from PyQt5.QtCore import QObject, QTimer, QFileSystemWatcher, pyqtSignal
+
+logger = logging.getLogger(__name__)
+
+# 文件 stat 稳定多久（毫秒）后才视为写入完成
+DEFAULT_DEBOUNCE_MS = 2000
+
+# stat 快照轮询间隔（毫秒），作为系统通知的兜底
+DEFAULT_POLL_INTERVAL_MS = 30000
+
+
+def _is_note_file(name: str) -> bool:
+    return name.startswith('note_') and name.endswith('.json')
+
+
+class FolderWatcher(QObject):
+    """监视目录中的文件变更，报告已写入完成（stat 稳定）的文件名"""
+
+    changed = pyqtSignal(set)  # 已稳定的变更文件名（含新增、修改、删除）
+
+    def __init__(self, directory: str, debounce_ms: int = DEFAULT_DEBOUNCE_MS,
+                 poll_interval_ms: int = DEFAULT_POLL_INTERVAL_MS,
+                 name_filter: Callable[[str], bool] = _is_note_file, parent=None):
+        super().__init__(parent)
+        self.directory = directory
+        self.debounce_ms = debounce_ms
+        self.name_filter = name_filter
+        self._lock = threading.Lock()
+        self._snapshot: Dict[str, Tuple[int, int]] = {}  # {name: (size, mtime_ns)}
+        self._pending: Dict[str, float] = {}  # {name: 最近一次变化的时间}
+
+        self._fs_watcher = QFileSystemWatcher(self)
+        self._fs_watcher.directoryChanged.connect(self.rescan)
+        self._poll_timer = QTimer(self)
+        self._poll_timer.setInterval(poll_interval_ms)
+        self._poll_timer.timeout.connect(self.rescan)
+        self._settle_timer = QTimer(self)
+        self._settle_timer.setSingleShot(True)
+        self._settle_timer.timeout.connect(self.rescan)
+
+    def start(self) -> None:
+        """建立初始快照并开始监视（初始快照中的文件不报告）"""
+        with self._lock:
+            self._snapshot = self._scan()
+            self._pending.clear()
+        if os.path.isdir(self.directory) and self.directory not in self._fs_watcher.directories():
+            self._fs_watcher.addPath(self.directory)
+        self._poll_timer.start()
+
+    def stop(self) -> None:
+        self._poll_timer.stop()
+        self._settle_timer.stop()
+        if self._fs_watcher.directories():
+            self._fs_watcher.removePaths(self._fs_watcher.directories())
+
+    def is_settled(self, name: str) -> bool:
+        """文件是否没有尚未稳定的变更"""
+        with self._lock:
+            return name not in self._pending
+
+    def acknowledge(self, name: str) -> None:
+        """
+        记录本进程自身对文件的写入或删除
+
+        由同步客户端在写入完成后调用（可在任意线程），
+        使这次变更不会被当作外部修改再次报告。
+        """
+        path = os.path.join(self.directory, name)
+        try:
+            st = os.stat(path)
+            state = (st.st_size, st.st_mtime_ns)
+        except OSError:
+            state = None
+        with self._lock:
+            if state is None:
+                self._snapshot.pop(name, None)
+            else:
+                self._snapshot[name] = state
+            self._pending.pop(name, None)
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        result = {}
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if not self.name_filter(entry.name):
+                        continue
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    result[entry.name] = (st.st_size, st.st_mtime_ns)
+        except OSError as e:
+            logger.debug(f'扫描同步目录失败: {e}')
+        return result
+
+    def rescan(self, *_args) -> Optional[set]:
+        """
+        对比 stat 快照，返回本次已稳定的变更文件名（并发出 changed 信号）
+
+        Returns:
+            已稳定的变更集合，无变更时为 None
+        """
+        # 部分平台在目录被替换后会移除监视，需要重新添加
+        if os.path.isdir(self.directory) and self.directory not in self._fs_watcher.directories():
+            self._fs_watcher.addPath(self.directory)
+
+        current = self._scan()
+        now = time.monotonic()
+        settled = set()
+        with self._lock:
+            for name in set(current) | set(self._snapshot):
+                if current.get(name) != self._snapshot.get(name):
+                    self._pending[name] = now
+            self._snapshot = current
+            window = self.debounce_ms / 1000
+            for name, changed_at in list(self._pending.items()):
+                if now - changed_at >= window:
+                    settled.add(name)
+                    del self._pending[name]
+            next_due = min((changed_at + window - now for changed_at in self._pending.values()), default=None)
+
+        if next_due is not None:
+            # 最早一个待定文件到期时再检查
+            self._settle_timer.start(max(10, int(next_due * 1000) + 10))
+        if settled:
+            self.changed.emit(settled)
+            return settled
+        return None
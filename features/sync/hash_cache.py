@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+文件哈希缓存
+
+以 (路径, 大小, mtime_ns, inode) 为键持久化文件的 SHA-256，
+文件未变化时直接返回缓存值，避免每次同步都重新读取、哈希全部便签。
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from typing import Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# 缓存文件格式版本
+HASH_CACHE_VERSION = 1
+
+# mtime 距今小于该值（纳秒）的文件不写入缓存：
+# 同一 mtime 粒度内的后续修改无法通过 stat 区分（类似 git 的 racy-clean 问题）
+RACY_WINDOW_NS = 2_000_000_000
+
+
+def sha256_file(file_path: str) -> str:
+    """计算文件的 SHA-256 哈希，文件不存在或读取失败时返回空字符串"""
+    try:
+        h = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(65536), b''):
+                h.update(chunk)
+        return h.hexdigest()
+    except FileNotFoundError:
+        return ''
+    except Exception as e:
+        logger.error(f'计算哈希失败: {file_path} - {e}')
+        return ''
+
+
+def _cache_key(file_path: str) -> str:
+    return file_path if os.path.isabs(file_path) else os.path.abspath(file_path)
+
+
+class FileHashCache:
+    """
+    持久化文件哈希缓存。
+
+    条目按路径（相对路径转为绝对路径）索引，记录 size / mtime_ns / inode；stat 结果全部一致时
+    命中缓存，否则重新哈希并更新。线程安全。
+    """
+
+    def __init__(self, cache_file: Optional[str] = None):
+        """
+        Args:
+            cache_file: 缓存文件路径，None 表示仅在内存中缓存
+        """
+        self.cache_file = cache_file
+        self._entries: Dict[str, list] = {}  # {abs_path: [size, mtime_ns, inode, hash]}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+        self.load()
+
+    # ── 持久化 ──────────────────────────────────────────
+
+    def load(self) -> None:
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == HASH_CACHE_VERSION:
+                self._entries = data.get('entries', {})
+        except Exception as e:
+            logger.warning(f'加载哈希缓存失败: {e}')
+            self._entries = {}
+
+    def save(self) -> None:
+        """原子写入缓存文件（无变更时跳过）"""
+        if not self.cache_file:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {'version': HASH_CACHE_VERSION, 'entries': dict(self._entries)}
+            self._dirty = False
+        tmp_path = self.cache_file + '.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(tmp_path, self.cache_file)
+        except Exception as e:
+            logger.error(f'保存哈希缓存失败: {e}')
+            with self._lock:
+                self._dirty = True
+
+    # ── 查询 ──────────────────────────────────────────────
+
+    def get_hash(self, file_path: str) -> str:
+        """获取文件哈希：stat 未变化则命中缓存，否则重新计算。文件不存在返回空字符串"""
+        key = _cache_key(file_path)
+        try:
+            st = os.stat(key)
+        except OSError:
+            with self._lock:
+                if self._entries.pop(key, None) is not None:
+                    self._dirty = True
+            return ''
+        stamp = [st.st_size, st.st_mtime_ns, st.st_ino]
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[:3] == stamp:
+                self.hits += 1
+                return entry[3]
+            self.misses += 1
+        digest = sha256_file(key)
+        if digest:
+            self.update(key, digest, st)
+        return digest
+
+    def update(self, file_path: str, digest: str, st: Optional[os.stat_result] = None) -> None:
+        """
+        记录已知的文件哈希（如刚写入/下载的文件），避免随后再次读取哈希。
+
+        Args:
+            file_path: 文件路径
+            digest: 文件内容的 SHA-256
+            st: 计算哈希前获取的 stat 结果，省略时现取
+        """
+        key = _cache_key(file_path)
+        try:
+            st = st or os.stat(key)
+        except OSError:
+            return
+        if time.time_ns() - st.st_mtime_ns < RACY_WINDOW_NS:
+            # 刚修改的文件不缓存，防止同一时间戳内的再次修改被漏检
+            with self._lock:
+                if self._entries.pop(key, None) is not None:
+                    self._dirty = True
+            return
+        with self._lock:
+            self._entries[key] = [st.st_size, st.st_mtime_ns, st.st_ino, digest]
+            self._dirty = True
+
+    def invalidate(self, file_path: str) -> None:
+        key = _cache_key(file_path)
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._dirty = True
+
+    def prune(self, existing_paths: Iterable[str]) -> None:
+        """移除不在给定路径集合中的条目（已删除的文件）"""
+        keep = {_cache_key(p) for p in existing_paths}
+        with self._lock:
+            stale = [k for k in self._entries if k not in keep]
+            for k in stale:
+                del self._entries[k]
+            if stale:
+                self._dirty = True
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
@@ -3,23 +3,117 @@
 本地文件夹同步客户端
 
 用于将便签数据镜像到本地同步文件夹（如 OneDrive 同步目录）。
+
+文件经同目录临时文件复制后 os.replace 原子替换，读取方不会看到写了一半的内容。
+启用监视（watch=True）后由 FolderWatcher 增量发现外部修改，
+每次同步只重新哈希变化过的文件，而不是重新列出、校验整个目录。
 """
 
 import os
+import uuid
 import shutil
 import hashlib
 import logging
-from typing import List, Dict
+import threading
+from typing import List, Dict, Optional, Tuple
+
+from core.errors import SyncConflictError
+from features.sync.hash_cache import FileHashCache
+from features.sync.manifest import MANIFEST_NAME
 
 logger = logging.getLogger(__name__)
 
 
+def staged_copy(src: str, dest: str) -> str:
+    """
+    经目标目录中的临时文件复制，完成后 os.replace 原子替换
+
+    复制前后源文件 stat 不一致（正被其他程序写入）时放弃本次复制。
+
+    Returns:
+        复制内容的 SHA-256
+
+    Raises:
+        OSError: 读写失败或源文件在复制过程中被修改
+    """
+    before = os.stat(src)
+    tmp_path = os.path.join(os.path.dirname(dest), f'.{os.path.basename(dest)}.{uuid.uuid4().hex}.sync_tmp')
+    h = hashlib.sha256()
+    try:
+        with open(src, 'rb') as fin, open(tmp_path, 'wb') as fout:
+            for chunk in iter(lambda: fin.read(65536), b''):
+                h.update(chunk)
+                fout.write(chunk)
+        after = os.stat(src)
+        if (before.st_size, before.st_mtime_ns) != (after.st_size, after.st_mtime_ns):
+            raise OSError(f'文件在复制过程中被修改: {src}')
+        shutil.copystat(src, tmp_path)
+        os.replace(tmp_path, dest)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return h.hexdigest()
+
+
 class LocalSyncClient:
     """本地文件夹同步客户端"""
 
-    def __init__(self, sync_dir: str):
+    def __init__(self, sync_dir: str, hash_cache: Optional[FileHashCache] = None,
+                 watch: bool = False, debounce_ms: Optional[int] = None):
+        """
+        Args:
+            sync_dir: 同步目录
+            hash_cache: 哈希缓存；缓存记录 inode 等本机信息，不应存放在同步目录内，
+                        省略时仅在内存中缓存（进程内多次同步仍可复用）
+            watch: 监视同步目录，增量发现外部修改（需要在 Qt 主线程中创建）
+            debounce_ms: 外部写入后等待 stat 稳定的时间，默认 DEFAULT_DEBOUNCE_MS
+        """
         self.sync_dir = sync_dir
+        self.hash_cache = hash_cache if hash_cache is not None else FileHashCache()
         os.makedirs(sync_dir, exist_ok=True)
+        self.watcher = None
+        self._lock = threading.Lock()
+        self._hashes: Optional[Dict[str, str]] = None  # 监视模式下的目录哈希快照
+        self._changed: set = set()  # 监视器报告、尚未重新哈希的文件
+        if watch:
+            self.start_watching(debounce_ms)
+
+    def start_watching(self, debounce_ms: Optional[int] = None) -> None:
+        """开始监视同步目录"""
+        from features.sync.folder_watch import FolderWatcher, DEFAULT_DEBOUNCE_MS
+        if self.watcher is not None:
+            return
+        self.watcher = FolderWatcher(self.sync_dir, DEFAULT_DEBOUNCE_MS if debounce_ms is None else debounce_ms)
+        self.watcher.changed.connect(self._on_folder_changed)
+        self.watcher.start()
+
+    def stop_watching(self) -> None:
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+        with self._lock:
+            self._hashes = None
+            self._changed.clear()
+
+    def _on_folder_changed(self, names: set) -> None:
+        with self._lock:
+            self._changed |= names
+
+    def _after_write(self, filename: str, digest: Optional[str]) -> None:
+        """记录本客户端自身的写入/删除：更新哈希快照，且不当作外部修改"""
+        path = os.path.join(self.sync_dir, filename)
+        if digest:
+            self.hash_cache.update(path, digest)
+        else:
+            self.hash_cache.invalidate(path)
+        with self._lock:
+            if self._hashes is not None:
+                if digest:
+                    self._hashes[filename] = digest
+                else:
+                    self._hashes.pop(filename, None)
+        if self.watcher is not None:
+            self.watcher.acknowledge(filename)
 
     def list_files(self) -> List[str]:
         """列出同步目录中的便签文件"""
@@ -33,8 +127,7 @@ class LocalSyncClient:
     def copy_to_sync(self, local_path: str, filename: str) -> bool:
         """复制本地文件到同步目录"""
         try:
-            dest = os.path.join(self.sync_dir, filename)
-            shutil.copy2(local_path, dest)
+            self._after_write(filename, staged_copy(local_path, os.path.join(self.sync_dir, filename)))
             return True
         except Exception as e:
             logger.error(f'复制到同步目录失败: {filename} - {e}')
@@ -43,8 +136,7 @@ class LocalSyncClient:
     def copy_from_sync(self, filename: str, local_path: str) -> bool:
         """从同步目录复制到本地"""
         try:
-            src = os.path.join(self.sync_dir, filename)
-            shutil.copy2(src, local_path)
+            staged_copy(os.path.join(self.sync_dir, filename), local_path)
             return True
         except Exception as e:
             logger.error(f'从同步目录复制失败: {filename} - {e}')
@@ -56,29 +148,148 @@ class LocalSyncClient:
             path = os.path.join(self.sync_dir, filename)
             if os.path.exists(path):
                 os.remove(path)
+            self._after_write(filename, None)
             return True
         except Exception as e:
             logger.error(f'从同步目录删除失败: {filename} - {e}')
             return False
 
-    def get_file_hash(self, filename: str) -> str:
-        """获取同步目录中文件的哈希"""
-        path = os.path.join(self.sync_dir, filename)
-        if not os.path.exists(path):
-            return ''
+    # ── SyncEngine 客户端接口 ────────────────────────────
+
+    def upload_file(self, local_path: str, filename: str) -> bool:
+        return self.copy_to_sync(local_path, filename)
+
+    def download_file(self, filename: str, local_path: str) -> bool:
+        return self.copy_from_sync(filename, local_path)
+
+    def delete_file(self, filename: str) -> bool:
+        return self.delete_from_sync(filename)
+
+    def put_file(self, local_path: str, filename: str,
+                 if_match: Optional[str] = None, if_none_match: Optional[str] = None) -> str:
+        """
+        条件写入同步目录（ETag 即内容 SHA-256，与 get_file_hashes 一致）
+
+        Raises:
+            SyncConflictError: 同步目录中的文件已被其他设备修改
+        """
+        current = self.get_file_hash(filename)
+        if if_none_match == '*' and current:
+            raise SyncConflictError(f'同步目录中已存在: {filename}')
+        if if_match and current != if_match:
+            raise SyncConflictError(f'同步目录中的文件已被修改: {filename}')
+        digest = staged_copy(local_path, os.path.join(self.sync_dir, filename))
+        self._after_write(filename, digest)
+        return digest
+
+    def get_file(self, filename: str, local_path: str, if_none_match: Optional[str] = None) -> Optional[str]:
+        """条件复制到本地，内容哈希与 if_none_match 相同时不复制并返回 None"""
+        src = os.path.join(self.sync_dir, filename)
+        current = self.get_file_hash(filename)
+        if not current:
+            raise FileNotFoundError(src)
+        if if_none_match and current == if_none_match:
+            return None
+        if self.watcher is not None and not self.watcher.is_settled(filename):
+            raise OSError(f'同步目录中的文件仍在写入: {filename}')
+        return staged_copy(src, local_path)
+
+    def read_blob(self, name: str) -> Optional[bytes]:
+        """读取同步目录中的辅助文件（清单、pack 等），不存在时返回 None"""
         try:
-            h = hashlib.sha256()
-            with open(path, 'rb') as f:
-                for chunk in iter(lambda: f.read(8192), b''):
-                    h.update(chunk)
-            return h.hexdigest()
-        except Exception as e:
-            logger.error(f'计算哈希失败: {e}')
-            return ''
+            with open(os.path.join(self.sync_dir, name), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def fetch_blob(self, name: str, if_none_match: str = '') -> Tuple[Optional[bytes], str]:
+        """条件读取辅助文件，语义同 WebDAVClient.fetch_blob（ETag 为内容 SHA-256）"""
+        data = self.read_blob(name)
+        if data is None:
+            return None, ''
+        etag = hashlib.sha256(data).hexdigest()
+        if if_none_match and etag == if_none_match:
+            return None, etag
+        return data, etag
+
+    def write_blob(self, name: str, data: bytes, atomic: bool = False,
+                   if_match: Optional[str] = None, if_none_match: Optional[str] = None) -> str:
+        """
+        写入辅助文件，atomic=True 时经临时文件 os.replace 覆盖
+
+        条件语义同 WebDAVClient.write_blob（ETag 为内容 SHA-256）。
+
+        Returns:
+            新 ETag
+
+        Raises:
+            SyncConflictError: 同步目录中的文件已被其他设备修改
+        """
+        path = os.path.join(self.sync_dir, name)
+        if if_match or if_none_match:
+            current = self.fetch_blob(name)[1]
+            if if_none_match == '*' and current:
+                raise SyncConflictError(f'同步目录中已存在: {name}')
+            if if_match and current != if_match:
+                raise SyncConflictError(f'同步目录中的文件已被修改: {name}')
+        if not atomic:
+            with open(path, 'wb') as f:
+                f.write(data)
+        else:
+            tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return hashlib.sha256(data).hexdigest()
+
+    def delete_blob(self, name: str) -> None:
+        try:
+            os.remove(os.path.join(self.sync_dir, name))
+        except FileNotFoundError:
+            pass
+
+    def read_manifest(self) -> Optional[bytes]:
+        """读取同步目录中的内容清单，不存在时返回 None"""
+        return self.read_blob(MANIFEST_NAME)
+
+    def write_manifest(self, data: bytes) -> None:
+        """原子写入内容清单（临时文件 + os.replace）"""
+        self.write_blob(MANIFEST_NAME, data, atomic=True)
+
+    def get_file_hash(self, filename: str) -> str:
+        """获取同步目录中文件的哈希（文件未变化时使用缓存）"""
+        return self.hash_cache.get_hash(os.path.join(self.sync_dir, filename))
 
     def get_file_hashes(self) -> Dict[str, str]:
-        """获取同步目录中所有文件的哈希"""
-        result = {}
-        for filename in self.list_files():
-            result[filename] = self.get_file_hash(filename)
-        return result
+        """
+        获取同步目录中所有文件的哈希
+
+        监视模式下只在首次调用时完整扫描，之后仅重新哈希监视器报告变化的文件；
+        仍在写入（stat 未稳定）的文件保持上一次的哈希。
+        """
+        with self._lock:
+            snapshot = self._hashes
+        if self.watcher is None or snapshot is None:
+            result = {}
+            for filename in self.list_files():
+                result[filename] = self.get_file_hash(filename)
+            self.hash_cache.prune(os.path.join(self.sync_dir, f) for f in result)
+            self.hash_cache.save()
+            if self.watcher is not None:
+                with self._lock:
+                    self._hashes = dict(result)
+            return result
+
+        with self._lock:
+            changed, self._changed = self._changed, set()
+        for filename in changed:
+            digest = self.get_file_hash(filename)
+            with self._lock:
+                if digest:
+                    self._hashes[filename] = digest
+                else:
+                    self._hashes.pop(filename, None)
+        if changed:
+            self.hash_cache.save()
+        with self._lock:
+            return dict(self._hashes)
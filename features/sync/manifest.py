@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+远端内容清单
+
+远端同步目录中保存一份 sync_manifest.json，记录每篇便签的内容 SHA-256、
+大小、版本号以及写入时观察到的远端 ETag。
+
+WebDAV 的 ETag 与本地 SHA-256 无法直接比较；通过清单可以把远端列表中的
+ETag 还原为内容哈希，使变更检测始终以 SHA-256 对比 SHA-256。
+清单中 ETag 与当前远端不一致（文件被不经清单的客户端修改）时，
+仍以 ETag 作为远端哈希，按“已变化”保守处理。
+"""
+
+import json
+import logging
+from datetime import datetime
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'sync_manifest.json'
+MANIFEST_FORMAT = 1
+
+
+class RemoteManifest:
+    """远端内容清单"""
+
+    def __init__(self, files: Optional[Dict[str, dict]] = None, generation: int = 0):
+        self.files: Dict[str, dict] = files or {}
+        self.generation = generation
+        self._dirty = False
+
+    @classmethod
+    def from_bytes(cls, data: Optional[bytes]) -> 'RemoteManifest':
+        """解析清单内容，缺失或损坏时返回空清单"""
+        if not data:
+            return cls()
+        try:
+            raw = json.loads(data.decode('utf-8'))
+            if raw.get('format') != MANIFEST_FORMAT:
+                logger.warning(f'不支持的远端清单格式: {raw.get("format")}')
+                return cls()
+            return cls(raw.get('files', {}), raw.get('generation', 0))
+        except Exception as e:
+            logger.warning(f'解析远端清单失败: {e}')
+            return cls()
+
+    def to_bytes(self) -> bytes:
+        return json.dumps({
+            'format': MANIFEST_FORMAT,
+            'generation': self.generation,
+            'updated': datetime.now().isoformat(),
+            'files': self.files,
+        }, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    @property
+    def dirty(self) -> bool:
+        return self._dirty
+
+    def resolve_remote_hashes(self, remote_state: Dict[str, str]) -> Dict[str, str]:
+        """
+        将远端列表 {filename: etag} 转换为 {filename: sha256}
+
+        清单记录的 ETag 与当前一致时使用清单中的内容哈希，否则保留原值。
+        """
+        result = {}
+        for filename, etag in remote_state.items():
+            entry = self.files.get(filename)
+            if entry and etag and entry.get('etag') == etag and entry.get('sha256'):
+                result[filename] = entry['sha256']
+            else:
+                result[filename] = etag
+        return result
+
+    def record(self, filename: str, sha256: str, size: int, etag: str = '',
+               bump_version: bool = False) -> None:
+        """
+        记录文件的当前远端内容
+
+        Args:
+            bump_version: 本次同步向远端写入了新内容时为 True
+        """
+        entry = self.files.get(filename, {})
+        version = entry.get('version', 0)
+        if bump_version or not version:
+            version += 1
+        new_entry = {'sha256': sha256, 'size': size, 'version': version, 'etag': etag}
+        if new_entry != entry:
+            self.files[filename] = new_entry
+            self._dirty = True
+
+    def set_etag(self, filename: str, etag: str) -> None:
+        entry = self.files.get(filename)
+        if entry is not None and entry.get('etag') != etag:
+            entry['etag'] = etag
+            self._dirty = True
+
+    def remove(self, filename: str) -> None:
+        if self.files.pop(filename, None) is not None:
+            self._dirty = True
+
+    def mark_saved(self) -> None:
+        self._dirty = False
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+便签三向合并
+
+以上次同步时保存的基准版本为参照，逐字段合并本地与远端的便签 JSON：
+- 只有一方修改的字段直接采用修改方
+- 文本字段（content / plain_content / markdown_content）按行做 diff3 合并，
+  修改区域不重叠时自动合并；QTextEdit.toHtml() 每个段落单独一行，
+  因此富文本 HTML 同样可以按行合并
+- 标签列表按集合语义合并（双方的增删都保留）
+- geometry 等嵌套对象逐键合并
+- 双方都修改的其他标量字段（位置、透明度、主题等）采用优先方的值
+
+只有文本修改区域重叠时才视为冲突，由调用方回退到冲突副本。
+"""
+
+import os
+import json
+import hashlib
+import logging
+from difflib import SequenceMatcher
+from typing import Iterable, List, Optional, Tuple
+
+from features.html_text import html_to_text
+
+logger = logging.getLogger(__name__)
+
+# 按行 diff3 合并的文本字段
+TEXT_FIELDS = ('content', 'plain_content', 'markdown_content')
+
+# 按集合语义合并的列表字段
+SET_FIELDS = ('tags',)
+
+
+def _matching_regions(base: List[str], local: List[str], remote: List[str]) -> List[tuple]:
+    """三方都未修改的区域 [(base_start, base_end, local_start, remote_start)]，末尾附哨兵"""
+    local_blocks = SequenceMatcher(None, base, local, autojunk=False).get_matching_blocks()
+    remote_blocks = SequenceMatcher(None, base, remote, autojunk=False).get_matching_blocks()
+    regions = []
+    i = j = 0
+    while i < len(local_blocks) and j < len(remote_blocks):
+        l_base, l_start, l_len = local_blocks[i]
+        r_base, r_start, r_len = remote_blocks[j]
+        lo = max(l_base, r_base)
+        hi = min(l_base + l_len, r_base + r_len)
+        if lo < hi:
+            regions.append((lo, hi, l_start + lo - l_base, r_start + lo - r_base))
+        if l_base + l_len < r_base + r_len:
+            i += 1
+        else:
+            j += 1
+    regions.append((len(base), len(base), len(local), len(remote)))
+    return regions
+
+
+def diff3_merge(base: List[str], local: List[str], remote: List[str]) -> Tuple[List[str], int]:
+    """
+    按行三向合并
+
+    Returns:
+        (合并结果, 冲突块数)；存在冲突时冲突块采用本地内容
+    """
+    merged: List[str] = []
+    conflicts = 0
+    b_pos = l_pos = r_pos = 0
+    for b_start, b_end, l_start, r_start in _matching_regions(base, local, remote):
+        base_chunk = base[b_pos:b_start]
+        local_chunk = local[l_pos:l_start]
+        remote_chunk = remote[r_pos:r_start]
+        if base_chunk or local_chunk or remote_chunk:
+            if local_chunk == remote_chunk or remote_chunk == base_chunk:
+                merged.extend(local_chunk)
+            elif local_chunk == base_chunk:
+                merged.extend(remote_chunk)
+            else:
+                conflicts += 1
+                merged.extend(local_chunk)
+        merged.extend(base[b_start:b_end])
+        b_pos = b_end
+        l_pos = l_start + (b_end - b_start)
+        r_pos = r_start + (b_end - b_start)
+    return merged, conflicts
+
+
+def merge_text(base: str, local: str, remote: str) -> Optional[str]:
+    """合并文本，修改区域重叠时返回 None"""
+    if local == remote or remote == base:
+        return local
+    if local == base:
+        return remote
+    merged, conflicts = diff3_merge(base.splitlines(True), local.splitlines(True), remote.splitlines(True))
+    return None if conflicts else ''.join(merged)
+
+
+def _merge_set(base: list, local: list, remote: list) -> list:
+    base_set, local_set, remote_set = set(base), set(local), set(remote)
+    removed = (base_set - local_set) | (base_set - remote_set)
+    result = [item for item in local if item not in removed]
+    result += [item for item in remote if item not in removed and item not in result]
+    return result
+
+
+class MergeResult:
+    """合并结果"""
+
+    def __init__(self, merged: dict, conflicts: List[str], merged_fields: List[str]):
+        self.merged = merged
+        self.conflicts = conflicts          # 文本重叠无法合并的字段
+        self.merged_fields = merged_fields  # 双方都修改且已自动合并的字段
+
+    @property
+    def clean(self) -> bool:
+        return not self.conflicts
+
+
+def _merge_dict(base: dict, local: dict, remote: dict, prefer: str,
+                conflicts: List[str], merged_fields: List[str], prefix: str = '') -> dict:
+    result = {}
+    missing = object()
+    for key in list(local) + [k for k in remote if k not in local]:
+        b = base.get(key, missing)
+        lv = local.get(key, missing)
+        rv = remote.get(key, missing)
+        if lv == rv:
+            value = lv
+        elif rv == b:
+            value = lv
+        elif lv == b:
+            value = rv
+        else:
+            name = prefix + key
+            merged_fields.append(name)
+            if key in TEXT_FIELDS and isinstance(lv, str) and isinstance(rv, str):
+                text = merge_text(b if isinstance(b, str) else '', lv, rv)
+                if text is None:
+                    conflicts.append(name)
+                    text = lv if prefer == 'local' else rv
+                value = text
+            elif key in SET_FIELDS and isinstance(lv, list) and isinstance(rv, list):
+                value = _merge_set(b if isinstance(b, list) else [], lv, rv)
+            elif isinstance(lv, dict) and isinstance(rv, dict):
+                value = _merge_dict(b if isinstance(b, dict) else {}, lv, rv, prefer,
+                                    conflicts, merged_fields, name + '.')
+            else:
+                value = lv if prefer == 'local' else rv
+        if value is not missing:
+            result[key] = value
+    return result
+
+
+def merge_note_data(base: dict, local: dict, remote: dict, prefer: str = 'local') -> MergeResult:
+    """
+    三向合并便签数据
+
+    Args:
+        base: 上次同步时的版本
+        local: 本地当前版本
+        remote: 远端当前版本
+        prefer: 双方修改同一标量字段时采用的一方（'local' / 'remote'）
+    """
+    conflicts: List[str] = []
+    merged_fields: List[str] = []
+    merged = _merge_dict(base, local, remote, prefer, conflicts, merged_fields)
+    # 富文本合并后，纯文本以合并后的 HTML 为准，保证两者一致
+    if 'content' in merged_fields and 'content' not in conflicts and merged.get('content'):
+        merged['plain_content'] = html_to_text(merged['content'])
+        if 'plain_content' in conflicts:
+            conflicts.remove('plain_content')
+    return MergeResult(merged, conflicts, merged_fields)
+
+
+class SyncBaseStore:
+    """
+    同步基准版本存储
+
+    以内容 SHA-256 为文件名保存每篇便签上次同步时的内容，
+    与元数据中的 base_hash 对应，作为三向合并的基准。
+    """
+
+    def __init__(self, base_dir: str):
+        self.base_dir = base_dir
+
+    def save(self, data: bytes) -> str:
+        sha = hashlib.sha256(data).hexdigest()
+        path = os.path.join(self.base_dir, sha)
+        if not os.path.exists(path):
+            try:
+                os.makedirs(self.base_dir, exist_ok=True)
+                tmp_path = path + '.tmp'
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except Exception as e:
+                logger.warning(f'保存同步基准失败: {e}')
+        return sha
+
+    def save_file(self, file_path: str) -> Optional[str]:
+        try:
+            with open(file_path, 'rb') as f:
+                return self.save(f.read())
+        except OSError:
+            return None
+
+    def load(self, sha: str) -> Optional[dict]:
+        """读取基准版本，缺失或与哈希不符时返回 None"""
+        if not sha:
+            return None
+        try:
+            with open(os.path.join(self.base_dir, sha), 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        if hashlib.sha256(data).hexdigest() != sha:
+            return None
+        try:
+            return json.loads(data.decode('utf-8'))
+        except ValueError:
+            return None
+
+    def prune(self, keep: Iterable[str]) -> None:
+        """删除不再被任何基准哈希引用的版本"""
+        if not os.path.isdir(self.base_dir):
+            return
+        keep = set(keep)
+        for name in os.listdir(self.base_dir):
+            if name not in keep:
+                try:
+                    os.remove(os.path.join(self.base_dir, name))
+                except OSError:
+                    pass
@@ -3,24 +3,43 @@
 同步元数据管理
 
 跟踪每个文件的本地/远端/基准哈希值，用于三向合并冲突检测。
+
+每个文件的状态变化立即追加到日志文件（<metadata>.journal），
+同步中途被中断（进程被终止）时，下次加载重放日志即可从断点继续；
+save() 整体写入元数据后删除日志（压缩）。
 """
 
 import os
 import json
-import hashlib
 import logging
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Callable, Dict, Iterable, Optional
+
+from features.sync.hash_cache import FileHashCache, sha256_file
 
 logger = logging.getLogger(__name__)
 
+# 元数据文件中保存合并统计的保留键（便签文件名均以 note_ 开头，不会冲突）
+MERGE_STATS_KEY = '__merge_stats__'
+
 
 class SyncMetadata:
     """同步元数据跟踪器"""
 
-    def __init__(self, metadata_file: str):
+    def __init__(self, metadata_file: str, hash_cache_file: Optional[str] = None):
+        """
+        Args:
+            metadata_file: 元数据文件路径
+            hash_cache_file: 本地文件哈希缓存路径，默认与元数据文件同目录
+        """
         self.metadata_file = metadata_file
+        self.journal_file = metadata_file + '.journal'
         self._data: Dict[str, dict] = {}
+        self._dirty = False
+        self._journal = None
+        if hash_cache_file is None:
+            hash_cache_file = os.path.join(os.path.dirname(metadata_file), 'sync_hash_cache.json')
+        self.hash_cache = FileHashCache(hash_cache_file)
         self.load()
 
     def load(self) -> None:
@@ -31,14 +50,77 @@ class SyncMetadata:
             except Exception as e:
                 logger.warning(f'加载同步元数据失败: {e}')
                 self._data = {}
+        if self._replay_journal():
+            # 上次同步被中断：立即压缩，避免在不完整的日志末行后继续追加
+            self.save()
+
+    def _replay_journal(self) -> bool:
+        """重放检查点日志，存在日志时返回 True"""
+        if not os.path.exists(self.journal_file):
+            return False
+        applied = 0
+        try:
+            with open(self.journal_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # 进程被终止时最后一行可能不完整
+                        break
+                    if entry.get('meta') is None:
+                        self._data.pop(entry.get('file'), None)
+                    else:
+                        self._data[entry.get('file')] = entry['meta']
+                    applied += 1
+        except Exception as e:
+            logger.warning(f'读取同步检查点日志失败: {e}')
+        logger.info(f'从检查点日志恢复 {applied} 条同步状态')
+        self._dirty = True
+        return True
+
+    def _checkpoint(self, filename: str) -> None:
+        """把单个文件的最新状态追加到日志"""
+        try:
+            if self._journal is None:
+                os.makedirs(os.path.dirname(self.metadata_file), exist_ok=True)
+                self._journal = open(self.journal_file, 'a', encoding='utf-8')
+            self._journal.write(json.dumps(
+                {'file': filename, 'meta': self._data.get(filename)},
+                ensure_ascii=False, separators=(',', ':')) + '\n')
+            self._journal.flush()
+        except Exception as e:
+            logger.warning(f'写入同步检查点失败: {e}')
+
+    def _close_journal(self) -> None:
+        if self._journal is not None:
+            try:
+                self._journal.close()
+            except Exception:
+                pass
+            self._journal = None
 
     def save(self) -> None:
+        """保存元数据（无变更时跳过写入）及哈希缓存，并压缩检查点日志"""
+        self.hash_cache.save()
+        if not self._dirty:
+            return
         try:
             os.makedirs(os.path.dirname(self.metadata_file), exist_ok=True)
-            with open(self.metadata_file, 'w', encoding='utf-8') as f:
+            tmp_path = self.metadata_file + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
                 json.dump(self._data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.metadata_file)
+            self._dirty = False
         except Exception as e:
             logger.error(f'保存同步元数据失败: {e}')
+            return
+        # 日志内容已全部写入元数据文件
+        self._close_journal()
+        try:
+            if os.path.exists(self.journal_file):
+                os.remove(self.journal_file)
+        except OSError as e:
+            logger.warning(f'删除同步检查点日志失败: {e}')
 
     def get_file_meta(self, filename: str) -> dict:
         return self._data.get(filename, {
@@ -54,33 +136,77 @@ class SyncMetadata:
             self._data[filename] = {}
         self._data[filename].update(kwargs)
         self._data[filename]['last_sync_time'] = datetime.now().isoformat()
+        self._dirty = True
+        self._checkpoint(filename)
 
     def remove_file(self, filename: str) -> None:
         if filename in self._data:
             del self._data[filename]
+            self._dirty = True
+            self._checkpoint(filename)
+
+    def known_remote_hash(self, filename: str, etag: str) -> str:
+        """
+        远端 ETag 与上次同步记录一致时返回基准哈希，否则返回空串
+
+        远端清单尚未写入（例如上次同步被中断）时，用于把未变化的远端文件
+        还原为内容哈希，避免重复下载。
+        """
+        meta = self._data.get(filename)
+        if meta and etag and meta.get('remote_etag') == etag:
+            return meta.get('base_hash', '')
+        return ''
+
+    def base_hashes(self) -> set:
+        """所有文件的基准哈希"""
+        return {meta.get('base_hash') for key, meta in self._data.items()
+                if key != MERGE_STATS_KEY and meta.get('base_hash')}
+
+    def record_merge(self, conflicted: bool) -> None:
+        """记录一次冲突处理结果：自动合并成功或需要冲突副本"""
+        stats = self._data.setdefault(MERGE_STATS_KEY, {'merged': 0, 'conflicted': 0})
+        stats['conflicted' if conflicted else 'merged'] += 1
+        self._dirty = True
+        self._checkpoint(MERGE_STATS_KEY)
+
+    def merge_stats(self) -> dict:
+        """
+        累计合并统计
+
+        Returns:
+            {'merged', 'conflicted', 'conflict_rate'}，conflict_rate 为需要冲突副本的比例
+        """
+        stats = self._data.get(MERGE_STATS_KEY, {})
+        merged = stats.get('merged', 0)
+        conflicted = stats.get('conflicted', 0)
+        total = merged + conflicted
+        return {
+            'merged': merged,
+            'conflicted': conflicted,
+            'conflict_rate': conflicted / total if total else 0.0,
+        }
 
     @staticmethod
     def compute_hash(file_path: str) -> str:
-        """计算文件的 SHA-256 哈希"""
-        if not os.path.exists(file_path):
-            return ''
-        try:
-            h = hashlib.sha256()
-            with open(file_path, 'rb') as f:
-                for chunk in iter(lambda: f.read(8192), b''):
-                    h.update(chunk)
-            return h.hexdigest()
-        except Exception as e:
-            logger.error(f'计算哈希失败: {e}')
-            return ''
+        """计算文件的 SHA-256 哈希（不经过缓存）"""
+        return sha256_file(file_path)
+
+    def file_hash(self, file_path: str) -> str:
+        """获取本地文件哈希，文件未变化时直接返回缓存值"""
+        return self.hash_cache.get_hash(file_path)
 
-    def detect_changes(self, notes_dir: str, remote_files: Dict[str, str]) -> Dict[str, str]:
+    def detect_changes(self, notes_dir: str, remote_files: Dict[str, str],
+                       only: Optional[Iterable[str]] = None,
+                       is_excluded: Optional[Callable[[str], bool]] = None) -> Dict[str, str]:
         """
         检测文件变更状态
 
         Args:
             notes_dir: 本地便签目录
             remote_files: {filename: remote_hash} 远端文件哈希
+            only: 只检测这些文件（增量同步），None 表示扫描整个目录
+            is_excluded: 判断本地便签是否不属于本同步目标；被排除的便签既不哈希，
+                         也不与远端同名文件比较（只对本地存在的文件调用）
 
         Returns:
             {filename: 'upload'|'download'|'conflict'|'delete_local'|'delete_remote'|'none'}
@@ -89,12 +215,28 @@ class SyncMetadata:
 
         # 检查本地文件
         local_files = {}
-        for filename in os.listdir(notes_dir):
-            if filename.startswith('note_') and filename.endswith('.json'):
+        excluded = set()
+        if only is None:
+            scanned_paths = []
+            for filename in os.listdir(notes_dir):
+                if filename.startswith('note_') and filename.endswith('.json'):
+                    if is_excluded and is_excluded(filename):
+                        excluded.add(filename)
+                        continue
+                    file_path = os.path.join(notes_dir, filename)
+                    scanned_paths.append(file_path)
+                    local_files[filename] = self.file_hash(file_path)
+            self.hash_cache.prune(scanned_paths)
+            all_files = (set(local_files.keys()) | set(remote_files.keys())) - excluded
+        else:
+            all_files = set()
+            for filename in only:
                 file_path = os.path.join(notes_dir, filename)
-                local_files[filename] = self.compute_hash(file_path)
-
-        all_files = set(local_files.keys()) | set(remote_files.keys())
+                if os.path.isfile(file_path):
+                    if is_excluded and is_excluded(filename):
+                        continue
+                    local_files[filename] = self.file_hash(file_path)
+                all_files.add(filename)
 
         for filename in all_files:
             meta = self.get_file_meta(filename)
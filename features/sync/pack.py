@@ -0,0 +1,377 @@
+# -*- coding: utf-8 -*-
+"""
+Pack 同步存储
+
+可选的同步模式：便签内容以 SHA-256 寻址，打包压缩为 pack 对象上传，
+远端只保存若干 pack 文件和一份索引 pack_index.json（类似 git packfile）。
+每次同步的请求数与便签数量无关：读取索引 + 下载所需 pack + 上传一个新 pack + 写回索引。
+
+pack 文件格式（整体 zlib 压缩）：
+    PACK_MAGIC
+    重复： sha256(32 字节) | 长度(4 字节大端) | 内容
+
+pack 文件名由压缩后内容的哈希决定，写入后不再修改。
+索引以读取时的 ETag 条件写入（If-Match，远端尚无索引时 If-None-Match: *），
+其他设备抢先写入时重新读取索引、重放本地修改后重试，不会覆盖其他设备的更新。
+被新版本替代的对象由后台 repack 回收：存活对象重新打包，旧 pack 先标记为退役，
+超过宽限期（其他设备可能仍持有旧索引）后才真正删除。
+"""
+
+import json
+import time
+import zlib
+import struct
+import hashlib
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from core.errors import SyncConflictError
+
+logger = logging.getLogger(__name__)
+
+PACK_INDEX_NAME = 'pack_index.json'
+PACK_INDEX_FORMAT = 1
+PACK_MAGIC = b'SNPACK1\n'
+PACK_COMPRESS_LEVEL = 6
+
+# pack 数量超过该值时合并为一个
+REPACK_MAX_PACKS = 16
+# 单个 pack 中失效对象（字节）占比超过该值时重写
+REPACK_GARBAGE_RATIO = 0.5
+# 退役 pack 的删除宽限期（秒）
+RETIRED_PACK_GRACE_SECONDS = 3600
+# 索引条件写入冲突时的最大尝试次数
+INDEX_WRITE_ATTEMPTS = 5
+
+_ENTRY_HEADER = struct.Struct('>32sI')
+
+
+def build_pack(objects: Dict[str, bytes]) -> tuple:
+    """
+    打包对象
+
+    Args:
+        objects: {sha256_hex: 内容}
+
+    Returns:
+        (pack 文件名, 压缩后的 pack 字节)
+    """
+    raw = bytearray(PACK_MAGIC)
+    for sha, data in sorted(objects.items()):
+        raw += _ENTRY_HEADER.pack(bytes.fromhex(sha), len(data))
+        raw += data
+    packed = zlib.compress(bytes(raw), PACK_COMPRESS_LEVEL)
+    name = 'pack-' + hashlib.sha256(packed).hexdigest()[:40] + '.pack'
+    return name, packed
+
+
+def read_pack(data: bytes, wanted: Optional[Iterable[str]] = None) -> Dict[str, bytes]:
+    """
+    解包并校验对象内容哈希
+
+    Args:
+        data: pack 字节
+        wanted: 只返回这些对象，None 表示全部
+
+    Raises:
+        ValueError: 格式错误或内容与哈希不符
+    """
+    raw = zlib.decompress(data)
+    if not raw.startswith(PACK_MAGIC):
+        raise ValueError('无效的 pack 文件')
+    wanted = set(wanted) if wanted is not None else None
+    objects = {}
+    pos = len(PACK_MAGIC)
+    view = memoryview(raw)
+    while pos < len(raw):
+        digest, length = _ENTRY_HEADER.unpack_from(raw, pos)
+        pos += _ENTRY_HEADER.size
+        sha = digest.hex()
+        if wanted is None or sha in wanted:
+            content = bytes(view[pos:pos + length])
+            if hashlib.sha256(content).hexdigest() != sha:
+                raise ValueError(f'pack 对象校验失败: {sha}')
+            objects[sha] = content
+        pos += length
+    return objects
+
+
+class PackIndex:
+    """远端 pack 索引：便签 → 对象哈希，对象 → pack"""
+
+    def __init__(self, data: Optional[dict] = None):
+        data = data or {}
+        self.generation = data.get('generation', 0)
+        self.notes: Dict[str, dict] = data.get('notes', {})      # {filename: {sha256, size, version}}
+        self.objects: Dict[str, str] = data.get('objects', {})   # {sha256: pack_name}
+        self.packs: Dict[str, dict] = data.get('packs', {})      # {pack_name: {size, objects, bytes}}
+        self.retired: Dict[str, float] = data.get('retired', {})  # {pack_name: 退役时间}
+        self.etag = ''  # 读取时的远端 ETag，空串表示远端尚无索引
+        self._dirty = False
+        self._changes: list = []  # 本地修改记录，条件写入冲突时重放到最新索引上
+
+    @classmethod
+    def from_bytes(cls, data: Optional[bytes]) -> 'PackIndex':
+        if not data:
+            return cls()
+        raw = json.loads(data.decode('utf-8'))
+        if raw.get('format') != PACK_INDEX_FORMAT:
+            raise ValueError(f'不支持的 pack 索引格式: {raw.get("format")}')
+        return cls(raw)
+
+    def to_bytes(self) -> bytes:
+        return json.dumps({
+            'format': PACK_INDEX_FORMAT,
+            'generation': self.generation,
+            'updated': datetime.now().isoformat(),
+            'notes': self.notes,
+            'objects': self.objects,
+            'packs': self.packs,
+            'retired': self.retired,
+        }, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    @property
+    def dirty(self) -> bool:
+        return self._dirty
+
+    def remote_hashes(self) -> Dict[str, str]:
+        return {name: entry['sha256'] for name, entry in self.notes.items()}
+
+    def record(self, filename: str, sha256: str, size: int, bump_version: bool = True) -> None:
+        entry = self.notes.get(filename, {})
+        version = entry.get('version', 0) + (1 if bump_version or not entry else 0)
+        new_entry = {'sha256': sha256, 'size': size, 'version': version}
+        if new_entry != entry:
+            self.notes[filename] = new_entry
+            self._dirty = True
+            self._changes.append(('record', filename, entry.get('sha256'), new_entry))
+
+    def remove(self, filename: str) -> None:
+        entry = self.notes.pop(filename, None)
+        if entry is not None:
+            self._dirty = True
+            self._changes.append(('remove', filename, entry['sha256'], None))
+
+    def add_pack(self, name: str, packed_size: int, object_sizes: Dict[str, int]) -> None:
+        self._add_pack(name, packed_size, object_sizes)
+        self._changes.append(('add_pack', name, packed_size, dict(object_sizes)))
+
+    def _add_pack(self, name: str, packed_size: int, object_sizes: Dict[str, int]) -> None:
+        self.packs[name] = {
+            'size': packed_size,
+            'objects': len(object_sizes),
+            'bytes': sum(object_sizes.values()),
+        }
+        for sha in object_sizes:
+            self.objects[sha] = name
+        self._dirty = True
+
+    def rebase(self, remote: 'PackIndex') -> List[str]:
+        """
+        以其他设备写入的最新索引为基础重放本地修改（条件写入冲突后调用）
+
+        便签条目只在远端仍是本地修改前看到的版本时重放；
+        远端已被其他设备修改的便签放弃本次修改，留待下次同步按冲突处理。
+
+        Returns:
+            放弃修改的便签文件名
+        """
+        rejected = []
+        changes = self._changes
+        self.generation = remote.generation
+        self.notes = remote.notes
+        self.objects = remote.objects
+        self.packs = remote.packs
+        self.retired = remote.retired
+        self.etag = remote.etag
+        self._changes = []
+        self._dirty = False
+        for op, key, expected, value in changes:
+            if op == 'add_pack':
+                self.add_pack(key, expected, value)
+                continue
+            current = self.notes.get(key)
+            if (current or {}).get('sha256') != expected:
+                rejected.append(key)
+            elif op == 'record':
+                self.notes[key] = value
+                self._dirty = True
+                self._changes.append((op, key, expected, value))
+            elif current is not None:
+                del self.notes[key]
+                self._dirty = True
+                self._changes.append((op, key, expected, value))
+        return rejected
+
+    def live_objects(self) -> set:
+        return {entry['sha256'] for entry in self.notes.values()}
+
+    def packs_to_repack(self) -> list:
+        """需要重写的 pack：失效对象占比过高，或 pack 数量过多时全部合并"""
+        if len(self.packs) > REPACK_MAX_PACKS:
+            return list(self.packs)
+        live_bytes: Dict[str, int] = {}
+        for entry in self.notes.values():
+            pack = self.objects.get(entry['sha256'])
+            if pack:
+                live_bytes[pack] = live_bytes.get(pack, 0) + entry['size']
+        result = []
+        for name, info in self.packs.items():
+            total = info.get('bytes', 0)
+            if total and 1 - live_bytes.get(name, 0) / total > REPACK_GARBAGE_RATIO:
+                result.append(name)
+        return result
+
+    def needs_repack(self, now: Optional[float] = None) -> bool:
+        """是否有需要重写的 pack 或已过宽限期的退役 pack"""
+        now = now or time.time()
+        if any(now - retired_at >= RETIRED_PACK_GRACE_SECONDS for retired_at in self.retired.values()):
+            return True
+        return bool(self.packs_to_repack())
+
+    def mark_saved(self) -> None:
+        self._dirty = False
+        self._changes = []
+
+
+class PackStore:
+    """基于同步客户端 read_blob / write_blob / delete_blob 的 pack 存储"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def load_index(self) -> PackIndex:
+        data, etag = self.client.fetch_blob(PACK_INDEX_NAME)
+        index = PackIndex.from_bytes(data)
+        index.etag = etag if data else ''
+        return index
+
+    def save_index(self, index: PackIndex) -> List[str]:
+        """
+        条件写回索引；其他设备抢先写入时重新读取、重放本地修改后重试
+
+        Returns:
+            因其他设备并发修改而放弃本次修改的便签文件名
+
+        Raises:
+            SyncConflictError: 多次重试后索引仍被其他设备抢先修改
+        """
+        rejected: List[str] = []
+        for _ in range(INDEX_WRITE_ATTEMPTS):
+            try:
+                self._write_index(index)
+                return rejected
+            except SyncConflictError:
+                logger.info('pack 索引已被其他设备修改，重新读取后重放本地修改')
+                rejected.extend(index.rebase(self.load_index()))
+                if not index.dirty:
+                    return rejected
+        raise SyncConflictError('pack 索引持续被其他设备修改，稍后重试')
+
+    def _write_index(self, index: PackIndex) -> None:
+        """
+        以读取时的 ETag 为前置条件写入索引（远端尚无索引时要求仍不存在）
+
+        Raises:
+            SyncConflictError: 远端索引已被其他设备修改
+        """
+        index.generation += 1
+        if index.etag:
+            etag = self.client.write_blob(PACK_INDEX_NAME, index.to_bytes(), atomic=True,
+                                          if_match=index.etag)
+        else:
+            etag = self.client.write_blob(PACK_INDEX_NAME, index.to_bytes(), atomic=True,
+                                          if_none_match='*')
+        index.etag = etag or ''
+        index.mark_saved()
+
+    def fetch_objects(self, index: PackIndex, shas: Iterable[str]) -> Dict[str, bytes]:
+        """按 pack 分组下载所需对象，每个 pack 只请求一次"""
+        by_pack: Dict[str, set] = {}
+        for sha in shas:
+            pack = index.objects.get(sha)
+            if not pack:
+                raise KeyError(f'索引中缺少对象: {sha}')
+            by_pack.setdefault(pack, set()).add(sha)
+        objects = {}
+        for pack, wanted in by_pack.items():
+            data = self.client.read_blob(pack)
+            if data is None:
+                raise FileNotFoundError(f'远端缺少 pack: {pack}')
+            objects.update(read_pack(data, wanted))
+        return objects
+
+    def push_objects(self, index: PackIndex, objects: Dict[str, bytes]) -> Optional[str]:
+        """
+        上传远端尚不存在的对象为一个新 pack（索引需随后保存）
+
+        Returns:
+            新 pack 名称，无新对象时为 None
+        """
+        new_objects = {sha: data for sha, data in objects.items() if sha not in index.objects}
+        if not new_objects:
+            return None
+        name, packed = build_pack(new_objects)
+        self.client.write_blob(name, packed)
+        index.add_pack(name, len(packed), {sha: len(data) for sha, data in new_objects.items()})
+        return name
+
+    def repack(self, now: Optional[float] = None) -> dict:
+        """
+        回收失效对象：重写需要整理的 pack，删除超过宽限期的退役 pack
+
+        索引条件写入冲突时基于最新索引重新计算整理方案再写入。
+
+        Returns:
+            {'repacked': 重写的 pack 数, 'deleted': 删除的 pack 数}
+
+        Raises:
+            SyncConflictError: 多次重试后索引仍被其他设备抢先修改
+        """
+        now = now or time.time()
+        pushed = set()
+        for _ in range(INDEX_WRITE_ATTEMPTS):
+            index = self.load_index()
+            stats = {'repacked': 0, 'deleted': 0}
+
+            candidates = set(index.packs_to_repack())
+            if candidates:
+                live = {sha for sha in index.live_objects() if index.objects.get(sha) in candidates}
+                objects = self.fetch_objects(index, live)
+                for name in candidates:
+                    index.packs.pop(name, None)
+                    index.retired[name] = now
+                # 丢弃指向已退役 pack 的映射（存活对象随后重新指向新 pack）
+                index.objects = {sha: pack for sha, pack in index.objects.items() if pack not in candidates}
+                name = self.push_objects(index, objects)
+                if name:
+                    pushed.add(name)
+                index._dirty = True
+                stats['repacked'] = len(candidates)
+
+            expired = [name for name, retired_at in index.retired.items()
+                       if now - retired_at >= RETIRED_PACK_GRACE_SECONDS]
+            if index.dirty or expired:
+                for name in expired:
+                    del index.retired[name]
+                try:
+                    self._write_index(index)
+                except SyncConflictError:
+                    logger.info('pack 索引已被其他设备修改，基于最新索引重新 repack')
+                    continue
+            break
+        else:
+            raise SyncConflictError('pack 索引持续被其他设备修改，稍后重试')
+
+        # 先写索引再删除，确保任何时刻索引引用的 pack 都存在；
+        # 冲突重试前上传、最终未被索引引用的 pack 一并删除
+        orphans = [name for name in pushed if name not in index.packs and name not in index.retired]
+        for name in expired + orphans:
+            try:
+                self.client.delete_blob(name)
+                if name in expired:
+                    stats['deleted'] += 1
+            except Exception as e:
+                logger.warning(f'删除退役 pack 失败: {name} - {e}')
+        return stats
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+选择性同步配置
+
+每个同步目标（如公司 WebDAV、个人同步文件夹）对应一个 SyncProfile，
+按标签、置顶状态、便签 ID 决定哪些便签属于该目标。
+筛选在哈希之前完成：被排除的便签不参与列目录之外的任何计算。
+
+规则：
+- exclude_tags / exclude_ids 命中即排除
+- 设置了任一包含条件（include_tags / include_ids / include_pinned）时，
+  至少命中一项才包含；未设置包含条件时包含全部便签
+"""
+
+import os
+import json
+import logging
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILE_NAME = 'default'
+
+
+def note_id_from_filename(filename: str) -> str:
+    """note_12.json -> '12'"""
+    return filename[len('note_'):-len('.json')]
+
+
+class SyncProfile:
+    """单个同步目标的便签筛选条件"""
+
+    def __init__(self, name: str = DEFAULT_PROFILE_NAME,
+                 include_tags: Iterable[str] = (), exclude_tags: Iterable[str] = (),
+                 include_ids: Iterable = (), exclude_ids: Iterable = (),
+                 include_pinned: bool = False):
+        self.name = name or DEFAULT_PROFILE_NAME
+        self.include_tags = set(include_tags or ())
+        self.exclude_tags = set(exclude_tags or ())
+        self.include_ids = {str(i) for i in include_ids or ()}
+        self.exclude_ids = {str(i) for i in exclude_ids or ()}
+        self.include_pinned = bool(include_pinned)
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict]) -> 'SyncProfile':
+        data = data or {}
+        return cls(
+            name=data.get('name', DEFAULT_PROFILE_NAME),
+            include_tags=data.get('include_tags', ()),
+            exclude_tags=data.get('exclude_tags', ()),
+            include_ids=data.get('include_ids', ()),
+            exclude_ids=data.get('exclude_ids', ()),
+            include_pinned=data.get('include_pinned', False),
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            'name': self.name,
+            'include_tags': sorted(self.include_tags),
+            'exclude_tags': sorted(self.exclude_tags),
+            'include_ids': sorted(self.include_ids),
+            'exclude_ids': sorted(self.exclude_ids),
+            'include_pinned': self.include_pinned,
+        }
+
+    @property
+    def is_default(self) -> bool:
+        return self.name == DEFAULT_PROFILE_NAME
+
+    @property
+    def selects_all(self) -> bool:
+        """没有任何筛选条件（无需查询便签属性）"""
+        return not (self.include_tags or self.exclude_tags or self.include_ids
+                    or self.exclude_ids or self.include_pinned)
+
+    def file_suffix(self) -> str:
+        """各配置的元数据、基准版本等文件使用的后缀，默认配置为空以兼容已有文件"""
+        if self.is_default:
+            return ''
+        safe = ''.join(c if c.isalnum() or c in '-_' else '_' for c in self.name)
+        return '.' + safe
+
+    def exclusion_filter(self, catalog: Dict[str, dict],
+                         fallback: 'NoteCatalog') -> Optional[Callable[[str], bool]]:
+        """
+        构造排除判断函数，无筛选条件时返回 None
+
+        Args:
+            catalog: 内存中的便签属性 {filename: note_data}，查找为 O(1)
+            fallback: catalog 中没有的便签（如刚由其他同步目标下载）从文件读取属性
+        """
+        if self.selects_all:
+            return None
+
+        def is_excluded(filename: str) -> bool:
+            data = catalog.get(filename)
+            if data is None:
+                data = fallback.attrs(filename)
+            return not self.matches(note_id_from_filename(filename), data)
+
+        return is_excluded
+
+    def matches(self, note_id: str, note_data: dict) -> bool:
+        """便签是否属于该同步目标"""
+        tags = note_data.get('tags') or ()
+        if note_id in self.exclude_ids or self.exclude_tags.intersection(tags):
+            return False
+        if not (self.include_tags or self.include_ids or self.include_pinned):
+            return True
+        return (note_id in self.include_ids
+                or bool(self.include_tags.intersection(tags))
+                or (self.include_pinned and bool(note_data.get('pinned'))))
+
+
+class NoteCatalog:
+    """
+    便签属性目录（管理器内存中没有该便签时使用）
+
+    按 (size, mtime_ns) 缓存每篇便签的标签与置顶状态，
+    文件未变化时只需一次 stat，不重新读取 JSON。
+    """
+
+    def __init__(self, notes_dir: str):
+        self.notes_dir = notes_dir
+        self._entries: Dict[str, Tuple[Tuple[int, int], dict]] = {}
+
+    def attrs(self, filename: str) -> dict:
+        """{'tags': [...], 'pinned': bool}，文件不存在时返回空字典"""
+        path = os.path.join(self.notes_dir, filename)
+        try:
+            st = os.stat(path)
+        except OSError:
+            self._entries.pop(filename, None)
+            return {}
+        key = (st.st_size, st.st_mtime_ns)
+        cached = self._entries.get(filename)
+        if cached is None or cached[0] != key:
+            cached = (key, self._read_attrs(path))
+            self._entries[filename] = cached
+        return cached[1]
+
+    @staticmethod
+    def _read_attrs(path: str) -> dict:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return {'tags': list(data.get('tags') or []), 'pinned': bool(data.get('pinned'))}
+        except (OSError, ValueError, AttributeError):
+            return {'tags': [], 'pinned': False}
@@ -6,8 +6,15 @@ WebDAV 同步客户端
 """
 
 import os
+import uuid
 import logging
-from typing import List, Dict, Optional
+from email.utils import parsedate_to_datetime
+from typing import List, Dict, Optional, Tuple
+from urllib.parse import quote, unquote, urlsplit
+from xml.etree.ElementTree import XMLPullParser
+
+from core.errors import SyncConflictError
+from features.sync.manifest import MANIFEST_NAME
 
 logger = logging.getLogger(__name__)
 
@@ -18,6 +25,95 @@ except ImportError:
     HAS_WEBDAV = False
     logger.warning('webdavclient3 库未安装，WebDAV 同步不可用')
 
+try:
+    import requests
+    HAS_REQUESTS = True
+except ImportError:
+    HAS_REQUESTS = False
+
+# Depth: 1 PROPFIND 请求体：一次取回目录下所有文件的名称、ETag、大小与修改时间
+PROPFIND_BODY = (
+    '<?xml version="1.0" encoding="utf-8"?>'
+    '<d:propfind xmlns:d="DAV:"><d:prop>'
+    '<d:resourcetype/><d:getetag/><d:getcontentlength/><d:getlastmodified/>'
+    '</d:prop></d:propfind>'
+)
+
+_DAV = '{DAV:}'
+
+# 每个主机保持的长连接数上限（与并发传输数一致）
+DEFAULT_MAX_CONNECTIONS = 4
+
+
+def _condition_headers(if_match: Optional[str] = None, if_none_match: Optional[str] = None) -> dict:
+    """
+    构造条件请求头
+
+    If-Match 要求强比较，弱 ETag（W/ 前缀）无法使用，此时退化为无条件请求。
+    """
+    headers = {}
+    if if_match and not if_match.startswith('W/'):
+        headers['If-Match'] = if_match
+    if if_none_match:
+        headers['If-None-Match'] = if_none_match
+    return headers
+
+
+def parse_propfind_stream(chunks) -> Dict[str, dict]:
+    """
+    流式解析 PROPFIND multistatus 响应。
+
+    每解析完一个 <d:response> 即提取并释放对应元素，内存占用与文件数无关。
+
+    Args:
+        chunks: 响应体字节块的可迭代对象
+
+    Returns:
+        {href: {'etag', 'size', 'last_modified', 'is_dir'}}，href 已 URL 解码
+    """
+    parser = XMLPullParser(events=('end',))
+    entries = {}
+
+    def drain():
+        for _event, elem in parser.read_events():
+            if elem.tag != _DAV + 'response':
+                continue
+            href = unquote((elem.findtext(_DAV + 'href') or '').strip())
+            info = {'etag': '', 'size': 0, 'last_modified': None, 'is_dir': False}
+            for propstat in elem.iter(_DAV + 'propstat'):
+                status = propstat.findtext(_DAV + 'status') or ''
+                if status and ' 200 ' not in status + ' ':
+                    continue
+                prop = propstat.find(_DAV + 'prop')
+                if prop is None:
+                    continue
+                etag = prop.findtext(_DAV + 'getetag')
+                if etag:
+                    info['etag'] = etag.strip()
+                length = prop.findtext(_DAV + 'getcontentlength')
+                if length and length.strip().isdigit():
+                    info['size'] = int(length.strip())
+                modified = prop.findtext(_DAV + 'getlastmodified')
+                if modified:
+                    try:
+                        info['last_modified'] = parsedate_to_datetime(modified.strip()).timestamp()
+                    except (TypeError, ValueError):
+                        pass
+                resourcetype = prop.find(_DAV + 'resourcetype')
+                if resourcetype is not None and resourcetype.find(_DAV + 'collection') is not None:
+                    info['is_dir'] = True
+            if href:
+                entries[href] = info
+            elem.clear()
+
+    for chunk in chunks:
+        if chunk:
+            parser.feed(chunk)
+            drain()
+    parser.close()
+    drain()
+    return entries
+
 
 class WebDAVClient:
     """WebDAV 客户端封装"""
@@ -28,6 +124,8 @@ class WebDAVClient:
         self.password = password
         self.remote_path = remote_path.rstrip('/') + '/'
         self._client = None
+        self._session = None
+        self.max_connections = DEFAULT_MAX_CONNECTIONS
 
     def _ensure_client(self):
         if not HAS_WEBDAV:
@@ -41,6 +139,69 @@ class WebDAVClient:
             self._client = WebdavClient(options)
         return self._client
 
+    def _ensure_session(self):
+        """获取复用连接的 HTTP 会话（文件传输、PROPFIND 与清单读写共用）"""
+        if not HAS_REQUESTS:
+            raise RuntimeError('requests 库未安装')
+        if self._session is None:
+            session = requests.Session()
+            session.auth = (self.username, self.password)
+            # 连接池满时阻塞等待空闲连接，而不是临时新建连接再丢弃，保证 keep-alive 复用
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=1, pool_maxsize=self.max_connections, pool_block=True)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._session = session
+        return self._session
+
+    def set_max_connections(self, count: int) -> None:
+        """设置每主机长连接数，连接池大小变化时重建会话"""
+        count = max(1, count)
+        if count == self.max_connections:
+            return
+        self.max_connections = count
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def _remote_url(self, filename: str = '') -> str:
+        return self.url.rstrip('/') + quote(self.remote_path + filename)
+
+    def list_remote_files(self) -> Dict[str, dict]:
+        """
+        通过一次 Depth: 1 PROPFIND 获取远端目录中所有便签文件的状态
+
+        Returns:
+            {filename: {'etag', 'size', 'last_modified', 'is_dir'}}
+
+        Raises:
+            requests.RequestException: 网络错误或服务器返回非 207 状态
+        """
+        session = self._ensure_session()
+        resp = session.request(
+            'PROPFIND', self._remote_url(),
+            data=PROPFIND_BODY.encode('utf-8'),
+            headers={'Depth': '1', 'Content-Type': 'application/xml; charset=utf-8'},
+            stream=True, timeout=60,
+        )
+        try:
+            if resp.status_code != 207:
+                resp.raise_for_status()
+                raise requests.HTTPError(f'PROPFIND 返回异常状态: {resp.status_code}', response=resp)
+            entries = parse_propfind_stream(resp.iter_content(chunk_size=65536))
+        finally:
+            resp.close()
+
+        result = {}
+        for href, info in entries.items():
+            if info['is_dir']:
+                continue
+            # href 可能是绝对 URL 或绝对路径
+            filename = urlsplit(href).path.rstrip('/').rsplit('/', 1)[-1]
+            if filename.startswith('note_') and filename.endswith('.json'):
+                result[filename] = info
+        return result
+
     def check_connection(self) -> bool:
         """检查 WebDAV 连接"""
         try:
@@ -59,30 +220,76 @@ class WebDAVClient:
     def list_files(self) -> List[str]:
         """列出远端目录中的文件"""
         try:
-            client = self._ensure_client()
-            files = client.list(self.remote_path)
-            return [f for f in files if f.endswith('.json') and f.startswith('note_')]
+            return list(self.list_remote_files())
         except Exception as e:
             logger.error(f'列出远端文件失败: {e}')
             return []
 
+    def put_file(self, local_path: str, filename: str,
+                 if_match: Optional[str] = None, if_none_match: Optional[str] = None) -> str:
+        """
+        条件上传文件
+
+        Args:
+            if_match: 仅当远端 ETag 仍为该值时写入，防止覆盖其他设备的修改
+            if_none_match: '*' 表示仅当远端尚无该文件时写入
+
+        Returns:
+            服务器返回的新 ETag，未返回时为空串
+
+        Raises:
+            SyncConflictError: 前置条件不满足（412）
+        """
+        session = self._ensure_session()
+        with open(local_path, 'rb') as f:
+            resp = session.put(self._remote_url(filename), data=f, timeout=120,
+                               headers=_condition_headers(if_match, if_none_match))
+        if resp.status_code == 412:
+            raise SyncConflictError(f'远端文件已被修改: {filename}')
+        resp.raise_for_status()
+        return resp.headers.get('ETag', '')
+
+    def get_file(self, filename: str, local_path: str, if_none_match: Optional[str] = None) -> Optional[str]:
+        """
+        条件下载文件（先写临时文件，完成后原子替换）
+
+        Args:
+            if_none_match: 本地已持有的 ETag，远端未变化时服务器返回 304，不传输内容
+
+        Returns:
+            下载内容的 ETag；304 时返回 None，local_path 保持不变
+        """
+        tmp_path = local_path + '.download'
+        session = self._ensure_session()
+        try:
+            with session.get(self._remote_url(filename), stream=True, timeout=120,
+                             headers=_condition_headers(if_none_match=if_none_match)) as resp:
+                if resp.status_code == 304:
+                    return None
+                resp.raise_for_status()
+                with open(tmp_path, 'wb') as f:
+                    for chunk in resp.iter_content(chunk_size=65536):
+                        f.write(chunk)
+                etag = resp.headers.get('ETag', '')
+            os.replace(tmp_path, local_path)
+            return etag
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
     def upload_file(self, local_path: str, filename: str) -> bool:
         """上传文件到远端"""
         try:
-            client = self._ensure_client()
-            remote = self.remote_path + filename
-            client.upload(remote, local_path)
+            self.put_file(local_path, filename)
             return True
         except Exception as e:
             logger.error(f'上传文件失败: {filename} - {e}')
             return False
 
     def download_file(self, filename: str, local_path: str) -> bool:
-        """从远端下载文件"""
+        """从远端下载文件（先写临时文件，完成后原子替换）"""
         try:
-            client = self._ensure_client()
-            remote = self.remote_path + filename
-            client.download(remote, local_path)
+            self.get_file(filename, local_path)
             return True
         except Exception as e:
             logger.error(f'下载文件失败: {filename} - {e}')
@@ -91,32 +298,99 @@ class WebDAVClient:
     def delete_file(self, filename: str) -> bool:
         """删除远端文件"""
         try:
-            client = self._ensure_client()
-            remote = self.remote_path + filename
-            client.clean(remote)
+            session = self._ensure_session()
+            resp = session.delete(self._remote_url(filename), timeout=60)
+            if resp.status_code != 404:
+                resp.raise_for_status()
             return True
         except Exception as e:
             logger.error(f'删除远端文件失败: {filename} - {e}')
             return False
 
+    def read_blob(self, name: str) -> Optional[bytes]:
+        """读取远端辅助文件（清单、pack 等），不存在时返回 None"""
+        return self.fetch_blob(name)[0]
+
+    def fetch_blob(self, name: str, if_none_match: str = '') -> Tuple[Optional[bytes], str]:
+        """
+        条件读取远端辅助文件
+
+        Returns:
+            (内容, ETag)；远端未变化（304）时为 (None, if_none_match)，不存在时为 (None, '')
+        """
+        session = self._ensure_session()
+        resp = session.get(self._remote_url(name), timeout=120,
+                           headers=_condition_headers(if_none_match=if_none_match or None))
+        if resp.status_code == 304:
+            return None, if_none_match
+        if resp.status_code == 404:
+            return None, ''
+        resp.raise_for_status()
+        return resp.content, resp.headers.get('ETag', '')
+
+    def write_blob(self, name: str, data: bytes, atomic: bool = False,
+                   if_match: Optional[str] = None, if_none_match: Optional[str] = None) -> str:
+        """
+        写入远端辅助文件
+
+        atomic=True 时先 PUT 到临时文件再 MOVE 覆盖，读取方不会看到写了一半的内容；
+        服务器不支持 MOVE 时退化为直接 PUT。
+        指定 if_match / if_none_match 时直接对目标做条件 PUT（MOVE 无法以目标的 ETag 为前置条件），
+        服务器保证条件检查与写入的原子性。
+
+        Returns:
+            服务器返回的新 ETag，未返回时为空串
+
+        Raises:
+            SyncConflictError: 前置条件不满足（412）
+        """
+        session = self._ensure_session()
+        target_url = self._remote_url(name)
+        if if_match or if_none_match:
+            resp = session.put(target_url, data=data, timeout=120,
+                               headers=_condition_headers(if_match, if_none_match))
+            if resp.status_code == 412:
+                raise SyncConflictError(f'远端文件已被修改: {name}')
+            resp.raise_for_status()
+            return resp.headers.get('ETag', '')
+        if atomic:
+            tmp_url = self._remote_url(f'.{name}.{uuid.uuid4().hex}.tmp')
+            resp = session.put(tmp_url, data=data, timeout=120)
+            resp.raise_for_status()
+            resp = session.request('MOVE', tmp_url, timeout=60,
+                                   headers={'Destination': target_url, 'Overwrite': 'T'})
+            if resp.status_code in (201, 204):
+                return ''
+            logger.warning(f'WebDAV MOVE 失败（{resp.status_code}），直接写入 {name}')
+            session.delete(tmp_url, timeout=60)
+        resp = session.put(target_url, data=data, timeout=120)
+        resp.raise_for_status()
+        return resp.headers.get('ETag', '')
+
+    def delete_blob(self, name: str) -> None:
+        session = self._ensure_session()
+        resp = session.delete(self._remote_url(name), timeout=60)
+        if resp.status_code != 404:
+            resp.raise_for_status()
+
+    def read_manifest(self) -> Optional[bytes]:
+        """读取远端内容清单，不存在时返回 None"""
+        return self.read_blob(MANIFEST_NAME)
+
+    def write_manifest(self, data: bytes) -> None:
+        """原子写入远端内容清单"""
+        self.write_blob(MANIFEST_NAME, data, atomic=True)
+
     def get_file_hashes(self) -> Dict[str, str]:
         """
         获取远端所有文件的哈希值
 
-        注意：WebDAV 标准不直接提供文件哈希，这里通过 ETag 近似
+        注意：WebDAV 标准不直接提供文件哈希，这里通过 ETag 近似。
+        整个目录只发起一次 PROPFIND 请求。失败时抛出异常而不是返回空结果，
+        否则远端文件会被误判为已删除。
         """
-        result = {}
         try:
-            client = self._ensure_client()
-            files = self.list_files()
-            for filename in files:
-                remote = self.remote_path + filename
-                try:
-                    info = client.info(remote)
-                    etag = info.get('etag', '')
-                    result[filename] = etag
-                except Exception:
-                    result[filename] = ''
+            return {name: info['etag'] for name, info in self.list_remote_files().items()}
         except Exception as e:
             logger.error(f'获取远端文件信息失败: {e}')
-        return result
+            raise
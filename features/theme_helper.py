@@ -4,14 +4,21 @@
 
 为所有对话框（搜索、备份、设置等）提供深色/浅色主题自动适配，
 保持与便签窗口一致的视觉风格。
+
+ThemeRegistry 为进程级主题注册表：每个主题 CSS 只读取、分析一次，
+编译为以 objectName 限定作用域的样式表并合并安装到 QApplication，
+使用同一主题的便签共享同一份已解析的样式。
 """
 
 import os
 import re
+import hashlib
 import logging
-from typing import Optional
+import weakref
+from typing import Callable, Dict, Iterable, Optional, Set
 
-from PyQt5.QtCore import QFileSystemWatcher
+from PyQt5.QtCore import QFileSystemWatcher, QTimer
+from PyQt5.QtWidgets import QApplication
 
 from core import get_styles_dir
 
@@ -20,31 +27,60 @@ logger = logging.getLogger(__name__)
 # 缓存已解析的主题 CSS
 _theme_cache: dict = {}
 
+# 已加载主题的内容哈希 {css_filename: sha1}，用于热加载时判断内容是否真的变化
+_theme_hashes: Dict[str, str] = {}
+
 # 全局文件系统监视器（单例，共享给所有调用者）
 _theme_watcher: Optional[QFileSystemWatcher] = None
 
+# 热加载防抖延迟（毫秒）：编辑器保存一次可能触发多个文件事件
+THEME_RELOAD_DEBOUNCE_MS = 300
+
+_reload_timer: Optional[QTimer] = None
+_pending_paths: Set[str] = set()
+_reload_callback: Optional[Callable[[Set[str]], None]] = None
+
+# 已应用主题的对话框 {dialog: css_filename}，用于热加载时只刷新相关对话框
+_themed_dialogs: 'weakref.WeakKeyDictionary' = weakref.WeakKeyDictionary()
+
 
 def invalidate_cache():
     """清空主题 CSS 缓存，强制下次重新加载"""
     _theme_cache.clear()
+    _theme_hashes.clear()
+    get_theme_registry().invalidate()
     logger.debug('主题缓存已清空')
 
 
+def invalidate_theme(css_filename: str) -> None:
+    """仅使单个主题的 CSS 缓存与编译结果失效"""
+    _theme_cache.pop(css_filename, None)
+    get_theme_registry().invalidate(css_filename)
+
+
 def setup_theme_watcher(styles_dir: str, on_changed_callback) -> QFileSystemWatcher:
     """
     初始化主题文件监视器，监听 styles 目录中的 CSS 文件变更。
-    
+
+    文件事件先合并并防抖（THEME_RELOAD_DEBOUNCE_MS），再按内容哈希比对，
+    只有内容确实变化的已加载主题才会回调。
+
     Args:
         styles_dir: styles 目录路径
-        on_changed_callback: 文件变更时的回调函数
-        
+        on_changed_callback: 回调函数，参数为内容变化的主题文件名集合
+
     Returns:
         QFileSystemWatcher 实例
     """
-    global _theme_watcher
+    global _theme_watcher, _reload_timer, _reload_callback
     if _theme_watcher is not None:
         return _theme_watcher
-    
+
+    _reload_callback = on_changed_callback
+    _reload_timer = QTimer()
+    _reload_timer.setSingleShot(True)
+    _reload_timer.timeout.connect(_flush_pending_changes)
+
     _theme_watcher = QFileSystemWatcher()
     if os.path.exists(styles_dir):
         _theme_watcher.addPath(styles_dir)
@@ -52,30 +88,78 @@ def setup_theme_watcher(styles_dir: str, on_changed_callback) -> QFileSystemWatc
         for fname in os.listdir(styles_dir):
             if fname.endswith('.css'):
                 _theme_watcher.addPath(os.path.join(styles_dir, fname))
-    _theme_watcher.directoryChanged.connect(lambda path: _on_dir_changed(path, on_changed_callback))
-    _theme_watcher.fileChanged.connect(lambda path: _on_file_changed(path, on_changed_callback))
+    _theme_watcher.directoryChanged.connect(_on_dir_changed)
+    _theme_watcher.fileChanged.connect(_on_file_changed)
     logger.debug('主题文件监视器已启动')
     return _theme_watcher
 
 
-def _on_dir_changed(dir_path, callback):
-    """styles 目录变化（新增/删除文件）"""
-    global _theme_watcher
+def _schedule_reload(paths) -> None:
+    _pending_paths.update(paths)
+    if _reload_timer is not None:
+        _reload_timer.start(THEME_RELOAD_DEBOUNCE_MS)
+
+
+def _on_dir_changed(dir_path):
+    """styles 目录变化（新增/删除/替换文件）"""
     if _theme_watcher and os.path.exists(dir_path):
+        watched = set(_theme_watcher.files())
         for fname in os.listdir(dir_path):
             fpath = os.path.join(dir_path, fname)
-            if fname.endswith('.css') and fpath not in _theme_watcher.files():
+            if fname.endswith('.css') and fpath not in watched:
                 _theme_watcher.addPath(fpath)
-    invalidate_cache()
-    if callback:
-        callback()
+    # 新增文件无人使用；删除或原子替换的已加载主题需要比对
+    _schedule_reload(os.path.join(dir_path, name) for name in list(_theme_hashes))
 
 
-def _on_file_changed(file_path, callback):
+def _on_file_changed(file_path):
     """单个 CSS 文件内容变更"""
-    invalidate_cache()
-    if callback:
-        callback()
+    # 编辑器原子保存（写临时文件后重命名）会使路径从监视列表中移除，需重新添加
+    if _theme_watcher and os.path.exists(file_path) and file_path not in _theme_watcher.files():
+        _theme_watcher.addPath(file_path)
+    _schedule_reload([file_path])
+
+
+def _content_hash(content: str) -> str:
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+def _flush_pending_changes() -> None:
+    """防抖结束：比对内容哈希，仅对内容变化的已加载主题失效并回调"""
+    paths = set(_pending_paths)
+    _pending_paths.clear()
+    changed = collect_changed_themes(paths)
+    if changed:
+        logger.debug(f'主题文件内容已变化: {sorted(changed)}')
+        if _reload_callback:
+            _reload_callback(changed)
+
+
+def collect_changed_themes(paths) -> Set[str]:
+    """
+    比对给定 CSS 文件与已加载版本的内容哈希，返回内容变化的主题文件名，
+    并使这些主题的缓存失效。从未加载过的主题不在使用中，直接忽略。
+    """
+    changed = set()
+    for path in paths:
+        name = os.path.basename(path)
+        old_hash = _theme_hashes.get(name)
+        if old_hash is None and name not in get_theme_registry():
+            continue
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                new_hash = _content_hash(f.read())
+        except OSError:
+            new_hash = None  # 文件被删除
+        if new_hash == old_hash:
+            continue
+        if new_hash is None:
+            _theme_hashes.pop(name, None)
+        else:
+            _theme_hashes[name] = new_hash
+        invalidate_theme(name)
+        changed.add(name)
+    return changed
 
 
 def _load_theme_css(css_filename: str) -> str:
@@ -88,6 +172,7 @@ def _load_theme_css(css_filename: str) -> str:
             with open(css_path, 'r', encoding='utf-8') as f:
                 content = f.read()
             _theme_cache[css_filename] = content
+            _theme_hashes[css_filename] = _content_hash(content)
             return content
         except Exception as e:
             logger.warning(f'加载主题 CSS 失败: {e}')
@@ -118,6 +203,184 @@ def is_dark_theme_css(css_content: str) -> bool:
     return False
 
 
+# ==================== 主题注册表 ====================
+
+# 主题文件缺失或为空时使用的便签默认样式
+DEFAULT_NOTE_CSS = '''
+    StickyNote { background-color: #FFF9C4; }
+    QLineEdit {
+        background-color: #FFFDE7; border: 2px solid #E0D89C;
+        border-radius: 5px; padding: 5px; font-family: "Microsoft YaHei";
+        font-weight: bold; text-align: center; color: #333333;
+    }
+    QTextEdit {
+        background-color: #FFFDE7; border: 2px solid #E0D89C;
+        border-radius: 5px; padding: 5px; font-family: "Microsoft YaHei";
+        color: #333333;
+    }
+'''
+
+# 作用域根选择器的类型名（便签窗口类名）
+SCOPE_ROOT = 'StickyNote'
+
+_CSS_COMMENT_RE = re.compile(r'/\*.*?\*/', re.DOTALL)
+_CSS_RULE_RE = re.compile(r'([^{}]+)\{([^{}]*)\}')
+
+
+def theme_scope_name(css_filename: str) -> str:
+    """由主题文件名生成 objectName 作用域（如 soft_yellow.css → theme_soft_yellow）"""
+    stem = os.path.splitext(os.path.basename(css_filename))[0]
+    return 'theme_' + re.sub(r'[^0-9A-Za-z_]', '_', stem)
+
+
+def scope_stylesheet(css: str, scope: str, root: str = SCOPE_ROOT) -> str:
+    """
+    将样式表限定到 `root#scope` 作用域。
+
+    以 root 开头的选择器作用于根控件本身，其余选择器改写为其后代选择器。
+    例：`QPushButton:hover` → `StickyNote#theme_x QPushButton:hover`
+    """
+    scoped_root = f'{root}#{scope}'
+    rules = []
+    for selectors, body in _CSS_RULE_RE.findall(_CSS_COMMENT_RE.sub('', css)):
+        scoped = []
+        for sel in selectors.split(','):
+            sel = ' '.join(sel.split())
+            if not sel:
+                continue
+            if sel == root or (sel.startswith(root) and sel[len(root)] in ' :.[>'):
+                scoped.append(scoped_root + sel[len(root):])
+            else:
+                scoped.append(f'{scoped_root} {sel}')
+        if scoped:
+            rules.append(f'{", ".join(scoped)} {{{body.strip()}}}')
+    return '\n'.join(rules)
+
+
+class CompiledTheme:
+    """已编译主题：原始 CSS、深浅色判定与作用域样式表"""
+
+    def __init__(self, css_filename: str, css: str, is_dark: bool, stylesheet: str, is_fallback: bool):
+        self.css_filename = css_filename
+        self.scope = theme_scope_name(css_filename)
+        self.css = css
+        self.is_dark = is_dark
+        self.stylesheet = stylesheet
+        self.is_fallback = is_fallback
+        self._dialog_stylesheet: Optional[str] = None
+
+    @property
+    def dialog_stylesheet(self) -> str:
+        """对话框样式表（首次访问时生成）"""
+        if self._dialog_stylesheet is None:
+            self._dialog_stylesheet = generate_dialog_stylesheet(self.css_filename)
+        return self._dialog_stylesheet
+
+
+class ThemeRegistry:
+    """
+    进程级主题注册表。
+
+    - get(): 每个主题文件只加载、分析、编译一次
+    - install(): 将所有已编译主题合并为一份应用级样式表，仅在内容变化时调用
+      QApplication.setStyleSheet，便签通过 objectName 选择自己的主题
+    """
+
+    def __init__(self):
+        self._themes: Dict[str, CompiledTheme] = {}
+        self._installed_stylesheet: Optional[str] = None
+        self._base_stylesheet: Optional[str] = None
+        self._extra_css_provider: Optional[Callable[[bool], str]] = None
+
+    def set_extra_css_provider(self, provider: Optional[Callable[[bool], str]]) -> None:
+        """
+        设置补充 CSS 生成函数（接收 is_dark，返回未限定作用域的 CSS），
+        其输出会与每个主题一起编译。更换后已编译的主题全部失效。
+        """
+        if provider is not self._extra_css_provider:
+            self._extra_css_provider = provider
+            self._themes.clear()
+
+    def get(self, css_filename: str) -> CompiledTheme:
+        """获取已编译主题（未编译则加载并编译）"""
+        theme = self._themes.get(css_filename)
+        if theme is not None:
+            return theme
+        css = _load_theme_css(css_filename)
+        is_fallback = not css.strip()
+        if is_fallback:
+            logger.warning(f'主题样式文件不存在或为空: {css_filename}，使用默认样式')
+            css = DEFAULT_NOTE_CSS
+        is_dark = is_dark_theme_css(css)
+        extra_css = self._extra_css_provider(is_dark) if self._extra_css_provider else ''
+        full_css = css + extra_css
+        stylesheet = scope_stylesheet(full_css, theme_scope_name(css_filename))
+        theme = CompiledTheme(css_filename, css, is_dark, stylesheet, is_fallback)
+        self._themes[css_filename] = theme
+        logger.debug(f'主题已编译: {css_filename} ({len(stylesheet)} 字符)')
+        return theme
+
+    def __contains__(self, css_filename: str) -> bool:
+        return css_filename in self._themes
+
+    def compiled_themes(self) -> Iterable[CompiledTheme]:
+        return list(self._themes.values())
+
+    def compose_stylesheet(self) -> str:
+        """合并所有已编译主题的作用域样式表"""
+        parts = [self._base_stylesheet] if self._base_stylesheet else []
+        parts.extend(theme.stylesheet for theme in self._themes.values())
+        return '\n'.join(parts)
+
+    def install(self, app: Optional[QApplication] = None) -> bool:
+        """
+        将合并后的样式表安装到 QApplication。
+
+        Returns:
+            样式表是否发生变化（变化时 Qt 会对所有控件统一重新应用样式）
+        """
+        app = app or QApplication.instance()
+        if app is None:
+            return False
+        if self._base_stylesheet is None:
+            # 保留应用原有的全局样式表
+            self._base_stylesheet = app.styleSheet() or ''
+        stylesheet = self.compose_stylesheet()
+        if stylesheet == self._installed_stylesheet:
+            return False
+        app.setStyleSheet(stylesheet)
+        self._installed_stylesheet = stylesheet
+        return True
+
+    def invalidate(self, css_filename: Optional[str] = None) -> None:
+        """使指定主题（None 表示全部）的编译结果失效"""
+        if css_filename is None:
+            self._themes.clear()
+        else:
+            self._themes.pop(css_filename, None)
+
+
+_theme_registry: Optional[ThemeRegistry] = None
+
+
+def get_theme_registry() -> ThemeRegistry:
+    """获取全局主题注册表单例"""
+    global _theme_registry
+    if _theme_registry is None:
+        _theme_registry = ThemeRegistry()
+    return _theme_registry
+
+
+def repolish_widget_tree(widget) -> None:
+    """对控件及其所有子控件重新应用样式（objectName 变化后调用）"""
+    from PyQt5.QtWidgets import QWidget
+    for w in [widget] + widget.findChildren(QWidget):
+        style = w.style()
+        style.unpolish(w)
+        style.polish(w)
+    widget.update()
+
+
 def _extract_color(css_content: str, selector: str, prop: str, fallback: str) -> str:
     """从 CSS 内容中提取指定选择器和属性的颜色值"""
     pattern = rf'{re.escape(selector)}\s*\{{[^}}]*{re.escape(prop)}:\s*([^;]+);'
@@ -523,13 +786,37 @@ def apply_dialog_theme(dialog, css_filename: str):
         css_filename: 当前主题 CSS 文件名
     """
     try:
-        stylesheet = generate_dialog_stylesheet(css_filename)
+        stylesheet = get_theme_registry().get(css_filename).dialog_stylesheet
         if stylesheet:
             dialog.setStyleSheet(stylesheet)
+        _themed_dialogs[dialog] = css_filename
     except Exception as e:
         logger.warning(f'应用对话框主题失败: {e}')
 
 
+def refresh_dialog_themes(changed_themes: Set[str]) -> int:
+    """
+    重新为使用了已变化主题的打开中对话框应用样式。
+
+    Returns:
+        刷新的对话框数量
+    """
+    count = 0
+    for dialog, css_filename in list(_themed_dialogs.items()):
+        if css_filename not in changed_themes:
+            continue
+        try:
+            if not dialog.isVisible():
+                continue
+        except RuntimeError:
+            # 底层 C++ 对象已销毁
+            _themed_dialogs.pop(dialog, None)
+            continue
+        apply_dialog_theme(dialog, css_filename)
+        count += 1
+    return count
+
+
 def get_current_theme_css(manager) -> str:
     """
     从 manager 获取当前默认主题的 CSS 文件名。
@@ -0,0 +1,797 @@
+# -*- coding: utf-8 -*-
+"""备份与恢复的单元测试"""
+import unittest
+import os
+import json
+import time
+import tempfile
+import zipfile
+from types import SimpleNamespace
+from unittest.mock import patch
+
+
+def _spy_zip_open(opened):
+    """记录 ZipFile.open 打开的条目名"""
+    real_open = zipfile.ZipFile.open
+
+    def spy(zf, name, *args, **kwargs):
+        opened.append(name if isinstance(name, str) else name.filename)
+        return real_open(zf, name, *args, **kwargs)
+    return patch.object(zipfile.ZipFile, 'open', spy)
+
+
+def _write(path, data, age=3600):
+    """写入 JSON 文件并把 mtime 调到过去（避开哈希缓存的 racy 窗口）"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    old = time.time() - age
+    os.utime(path, (old, old))
+    return path
+
+
+def _read(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+class TestBackupStore(unittest.TestCase):
+    """测试内容寻址的增量备份存储"""
+
+    def setUp(self):
+        from features.backup_store import BackupStore
+        root = tempfile.mkdtemp()
+        self.notes_dir = os.path.join(root, 'notes')
+        self.store = BackupStore(os.path.join(root, 'store'))
+        for i in range(20):
+            _write(os.path.join(self.notes_dir, f'note_{i}.json'), {'id': i, 'content': '正文 ' * 200})
+
+    def _files(self):
+        return [(f'notes/{f}', os.path.join(self.notes_dir, f)) for f in sorted(os.listdir(self.notes_dir))]
+
+    def test_second_snapshot_stores_only_changes(self):
+        """再次快照只写入变化文件的对象，未变化的文件不读取"""
+        first = self.store.create_snapshot('s1', self._files())
+        self.assertEqual(first['added_objects'], 20 + len(set(first['tree'])))
+
+        _write(os.path.join(self.notes_dir, 'note_3.json'), {'id': 3, 'content': '已修改'})
+        from features.sync import hash_cache
+        with patch.object(hash_cache, 'sha256_file', wraps=hash_cache.sha256_file) as digest:
+            second = self.store.create_snapshot('s2', self._files())
+        # 变化的便签及其所在的文件表分桶
+        self.assertEqual(second['added_objects'], 2)
+        self.assertEqual(digest.call_count, 1)
+        self.assertEqual(second['count'], 20)
+        self.assertLess(second['added_bytes'], first['added_bytes'] / 10)
+
+    def test_restore_any_snapshot(self):
+        """每个快照都能按清单还原为当时的内容"""
+        self.store.create_snapshot('s1', self._files())
+        _write(os.path.join(self.notes_dir, 'note_0.json'), {'id': 0, 'content': 'v2'})
+        os.remove(os.path.join(self.notes_dir, 'note_1.json'))
+        self.store.create_snapshot('s2', self._files())
+
+        old = json.loads(self.store.read_file('s1', 'notes/note_0.json'))
+        self.assertEqual(old['content'], '正文 ' * 200)
+        self.assertIsNotNone(self.store.read_file('s1', 'notes/note_1.json'))
+        self.assertIsNone(self.store.read_file('s2', 'notes/note_1.json'))
+
+        dest = tempfile.mkdtemp()
+        self.assertTrue(self.store.extract_snapshot('s2', dest))
+        self.assertEqual(len(os.listdir(os.path.join(dest, 'notes'))), 19)
+        with open(os.path.join(dest, 'notes', 'note_0.json'), encoding='utf-8') as f:
+            self.assertEqual(json.load(f)['content'], 'v2')
+
+    def test_gc_keeps_shared_objects(self):
+        """删除快照只回收不再被引用的对象"""
+        self.store.create_snapshot('s1', self._files())
+        _write(os.path.join(self.notes_dir, 'note_0.json'), {'id': 0, 'content': 'v2'})
+        self.store.create_snapshot('s2', self._files())
+        self.store.delete_snapshot('s1')
+        dest = tempfile.mkdtemp()
+        self.assertTrue(self.store.extract_snapshot('s2', dest))
+        self.assertEqual(len(os.listdir(os.path.join(dest, 'notes'))), 20)
+        # 旧版 note_0 的对象已回收
+        self.assertEqual(self.store.gc(), 0)
+        manifest = self.store.load_manifest('s2')
+        objects = sum(len(files) for _, _, files in os.walk(self.store.objects_dir))
+        self.assertEqual(objects, 20 + len(set(manifest['tree'])))
+
+    def test_gc_waits_for_snapshot_in_progress(self):
+        """回收对象等待正在创建的快照写完清单，不删除其已写入的对象"""
+        import threading
+        from features.backup_store import BackupStore
+        started = threading.Event()
+        release = threading.Event()
+
+        def describe(arcname, data):
+            started.set()
+            release.wait(5)
+            return {}
+
+        creator = threading.Thread(
+            target=lambda: self.store.create_snapshot('s1', self._files(), describe=describe))
+        creator.start()
+        self.assertTrue(started.wait(5))
+        removed = []
+        other = BackupStore(self.store.root)  # 同一目录的另一个实例共用锁
+        collector = threading.Thread(target=lambda: removed.append(other.gc()))
+        collector.start()
+        collector.join(0.2)
+        self.assertEqual(removed, [])
+        release.set()
+        creator.join()
+        collector.join()
+        self.assertEqual(removed, [0])
+        self.assertTrue(self.store.verify_snapshot('s1')['ok'])
+
+    def test_corrupt_object_detected(self):
+        """对象内容与哈希不符时读取失败"""
+        self.store.create_snapshot('s1', self._files())
+        sha = self.store.snapshot_files('s1')['notes/note_0.json']['sha']
+        with open(self.store.object_path(sha), 'r+b') as f:
+            f.seek(5)
+            f.write(b'\x00\x00')
+        with self.assertRaises(Exception):
+            self.store.read_file('s1', 'notes/note_0.json')
+
+
+class TestBackupManager(unittest.TestCase):
+    """测试备份管理器的增量备份与 zip 备份"""
+
+    @classmethod
+    def setUpClass(cls):
+        from PyQt5.QtCore import QCoreApplication
+        cls.app = QCoreApplication.instance() or QCoreApplication([])
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.data_dir = os.path.join(root, 'data')
+        self.styles_dir = os.path.join(root, 'styles')
+        notes_dir = os.path.join(self.data_dir, 'notes')
+        for i in range(5):
+            _write(os.path.join(notes_dir, f'note_{i}.json'), {'id': i})
+        _write(os.path.join(self.styles_dir, 'x.css'), {})
+        settings_file = _write(os.path.join(self.data_dir, 'settings.json'), {'a': 1})
+        self.manager = SimpleNamespace(notes_dir=notes_dir, settings_file=settings_file)
+        for target in ('get_user_data_dir', 'get_styles_dir'):
+            patcher = patch(f'features.backup.{target}',
+                            return_value=self.data_dir if target == 'get_user_data_dir' else self.styles_dir)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        from features.backup import BackupManager
+        self.backups = BackupManager(self.manager)
+        self.backups.auto_backup_timer.stop()
+        self.addCleanup(self.backups.shutdown)
+        # 投递完工作线程排队的信号，避免线程对象释放后仍有待处理事件
+        self.addCleanup(self.app.processEvents)
+
+    def test_incremental_backup_and_restore(self):
+        """默认创建增量备份，可列出、恢复与导出"""
+        path = self.backups.create_backup('stickynote_backup_a')
+        self.assertTrue(self.backups.is_snapshot(path))
+        listed = self.backups.get_backup_list()
+        self.assertEqual([(b['filename'], b['kind']) for b in listed], [('stickynote_backup_a', 'snapshot')])
+
+        os.remove(os.path.join(self.manager.notes_dir, 'note_0.json'))
+        self.assertTrue(self.backups.restore_backup_internal(path))
+        self.assertEqual(len(os.listdir(self.manager.notes_dir)), 5)
+
+        zip_path = os.path.join(tempfile.mkdtemp(), 'out.zip')
+        self.backups.export_backup(path, zip_path)
+        with zipfile.ZipFile(zip_path) as zf:
+            self.assertIn('notes/note_0.json', zf.namelist())
+            self.assertIn('styles/x.css', zf.namelist())
+            self.assertIn('settings.json', zf.namelist())
+
+    def test_cleanup_counts_both_formats(self):
+        """清理旧备份同时计算 zip 与增量备份"""
+        self.backups.backup_format = 'zip'
+        self.backups.create_backup('stickynote_backup_1')
+        self.backups.backup_format = 'incremental'
+        for i in (2, 3):
+            self.backups.create_backup(f'stickynote_backup_{i}')
+            time.sleep(0.01)
+        self.backups.retention_policy = 'count'
+        self.backups.max_backup_count = 2
+        self.backups.cleanup_old_backups()
+        names = [b['filename'] for b in self.backups.get_backup_list()]
+        self.assertEqual(names, ['stickynote_backup_3', 'stickynote_backup_2'])
+
+
+    def test_delete_collects_objects_in_background(self):
+        """删除增量备份后在后台线程回收对象；备份或恢复进行中时拒绝删除"""
+        import threading
+        first = self.backups.create_backup('stickynote_backup_1')
+        _write(os.path.join(self.manager.notes_dir, 'note_0.json'), {'id': 0, 'v': 2})
+        second = self.backups.create_backup('stickynote_backup_2')
+
+        release = threading.Event()
+        with patch.object(self.backups, 'restore_backup_internal', side_effect=lambda *a: release.wait(5)):
+            restore = self.backups.start_restore(second)
+            with self.assertRaises(RuntimeError):
+                self.backups.delete_backup(first)
+            release.set()
+            restore.wait()
+        self.assertIn('stickynote_backup_1', self.backups.store.list_snapshots())
+
+        threads = []
+        real_gc = self.backups.store.gc
+
+        def gc():
+            threads.append(threading.current_thread() is threading.main_thread())
+            return real_gc()
+
+        with patch.object(self.backups.store, 'gc', side_effect=gc):
+            self.backups.delete_backup(first)
+            self.backups.gc_worker.wait()
+        self.assertEqual(threads, [False])
+        self.assertTrue(self.backups.store.verify_snapshot('stickynote_backup_2')['ok'])
+        objects = sum(len(files) for _, _, files in os.walk(self.backups.store.objects_dir))
+        files = self.backups.store.snapshot_files('stickynote_backup_2')
+        tree = self.backups.store.load_manifest('stickynote_backup_2')['tree']
+        self.assertEqual(objects, len({e['sha'] for e in files.values()} | set(tree)))
+
+    def test_auto_backup_runs_on_worker_thread(self):
+        """自动备份在后台线程执行，备份前写出待保存的修改，无变化时跳过"""
+        import threading
+        self.manager.flush_pending_saves = lambda: calls.append('flush')
+        calls = []
+        real = self.backups.create_backup_internal
+
+        def create(*args):
+            calls.append(threading.current_thread() is threading.main_thread())
+            return real(*args)
+
+        with patch.object(self.backups, 'create_backup_internal', side_effect=create):
+            completed = []
+            worker = self.backups.auto_backup(
+                setup=lambda w: w.backup_completed.connect(completed.append))
+            worker.wait()
+            self.app.processEvents()
+            self.assertEqual(calls, ['flush', False])
+            self.assertEqual(len(completed), 1)
+            self.assertEqual(len(self.backups.get_backup_list()), 1)
+
+            skipped = []
+            worker = self.backups.auto_backup(
+                setup=lambda w: w.backup_skipped.connect(lambda: skipped.append(True)))
+            worker.wait()
+            self.app.processEvents()
+            self.assertEqual(skipped, [True])
+            self.assertEqual(calls, ['flush', False, 'flush'])
+
+    def test_no_auto_backup_while_busy(self):
+        """手动备份或恢复进行中时不启动新的任务"""
+        import threading
+        release = threading.Event()
+        with patch.object(self.backups, 'restore_backup_internal', side_effect=lambda *a: release.wait(5)):
+            restore = self.backups.start_restore('x')
+            self.assertTrue(self.backups.is_busy())
+            self.assertIsNone(self.backups.auto_backup())
+            self.assertIsNone(self.backups.start_backup())
+            release.set()
+            restore.wait()
+        self.assertFalse(self.backups.is_busy())
+        worker = self.backups.start_backup('stickynote_backup_manual')
+        self.assertIsNotNone(worker)
+        worker.wait()
+
+class TestSingleNoteRestore(unittest.TestCase):
+    """测试从备份恢复单个便签"""
+
+    @classmethod
+    def setUpClass(cls):
+        from PyQt5.QtCore import QCoreApplication
+        cls.app = QCoreApplication.instance() or QCoreApplication([])
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.data_dir = os.path.join(root, 'data')
+        notes_dir = os.path.join(self.data_dir, 'notes')
+        for i in range(1, 6):
+            _write(os.path.join(notes_dir, f'note_{i}.json'), {'id': i, 'title': f'标题 {i}', 'v': 1})
+        settings_file = _write(os.path.join(self.data_dir, 'settings.json'), {})
+        self.loaded = []
+        self.manager = SimpleNamespace(
+            notes_dir=notes_dir, settings_file=settings_file,
+            notes={i: SimpleNamespace(note_data={'title': f'标题 {i}'}) for i in range(1, 6)},
+            hot_load_note=lambda note_id, data: self.loaded.append((note_id, data)),
+        )
+        patchers = [patch('features.backup.get_user_data_dir', return_value=self.data_dir),
+                    patch('features.backup.get_styles_dir', return_value=os.path.join(root, 'styles'))]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        from features.backup import BackupManager
+        self.backups = BackupManager(self.manager)
+        self.backups.auto_backup_timer.stop()
+        self.addCleanup(self.backups.shutdown)
+
+    def _delete_and_edit(self):
+        """删除便签 3，并修改便签 1（恢复后不应丢失）"""
+        os.remove(os.path.join(self.manager.notes_dir, 'note_3.json'))
+        del self.manager.notes[3]
+        _write(os.path.join(self.manager.notes_dir, 'note_1.json'), {'id': 1, 'v': 2})
+
+    def _check_restored(self, backup_path):
+        notes = self.backups.list_backup_notes(backup_path)
+        self.assertEqual([n['note_id'] for n in notes], [1, 2, 3, 4, 5])
+        deleted = [n for n in notes if not n['exists']]
+        self.assertEqual([(n['note_id'], n['title']) for n in deleted], [(3, '标题 3')])
+
+        self.assertEqual(self.backups.restore_notes(backup_path, [3]), [3])
+        with open(os.path.join(self.manager.notes_dir, 'note_3.json'), encoding='utf-8') as f:
+            self.assertEqual(json.load(f)['title'], '标题 3')
+        with open(os.path.join(self.manager.notes_dir, 'note_1.json'), encoding='utf-8') as f:
+            self.assertEqual(json.load(f)['v'], 2)
+        self.assertEqual([note_id for note_id, _ in self.loaded], [3])
+        self.assertFalse([f for f in os.listdir(self.manager.notes_dir) if f.endswith('.tmp')])
+        self.assertFalse(os.path.exists(os.path.join(self.backups.backup_dir, 'temp_restore')))
+
+    def test_restore_from_snapshot(self):
+        """从增量备份恢复单个已删除的便签，其他便签的新修改保留"""
+        path = self.backups.create_backup('stickynote_backup_a')
+        self._delete_and_edit()
+        self._check_restored(path)
+
+    def test_restore_from_zip_reads_index_only(self):
+        """zip 备份列出便签时只读取中央目录，只解压已删除便签"""
+        self.backups.backup_format = 'zip'
+        path = self.backups.create_backup('stickynote_backup_a')
+        self._delete_and_edit()
+        opened = []
+        with _spy_zip_open(opened):
+            self.backups.list_backup_notes(path)
+        self.assertEqual(opened, ['notes/note_3.json'])
+        self._check_restored(path)
+
+    def test_restore_invalidates_note_cache(self):
+        """单便签恢复与整体恢复后便签数据缓存失效"""
+        from features.performance import get_note_cache
+        cache = get_note_cache()
+        path = self.backups.create_backup('stickynote_backup_a')
+        cache.put(3, {'id': 3})
+        self.assertEqual(self.backups.restore_notes(path, [3]), [3])
+        self.assertIsNone(cache.get(3))
+        cache.put(3, {'id': 3})
+        self.assertTrue(self.backups.restore_backup_internal(path))
+        self.assertIsNone(cache.get(3))
+
+    def test_missing_note_not_restored(self):
+        """备份中不存在的便签返回空结果"""
+        path = self.backups.create_backup('stickynote_backup_a')
+        self.assertEqual(self.backups.restore_notes(path, [99]), [])
+        self.assertEqual(self.loaded, [])
+
+    def test_hot_load_replaces_open_note(self):
+        """管理器载入恢复的便签：关闭同 ID 的旧窗口（不回写）并重建"""
+        from unittest.mock import MagicMock
+        from core.manager import StickyNoteManager
+        with patch('core.manager.StickyNoteManager.__init__', return_value=None):
+            mgr = StickyNoteManager.__new__(StickyNoteManager)
+        old = MagicMock()
+        mgr.notes = {3: old}
+        mgr.notes_dir = self.manager.notes_dir
+        mgr.sync_engines = []
+        mgr.get_default_theme_css = lambda: 'soft_yellow.css'
+        mgr.update_tray_menu = lambda: None
+        with patch('core.manager.StickyNote') as note_cls:
+            mgr.hot_load_note(3, {'id': 3, 'title': 'x'})
+        self.assertTrue(old.is_deleted)
+        old.close.assert_called_once()
+        note_cls.assert_called_once()
+        self.assertEqual(note_cls.call_args.kwargs['preloaded_data'], {'id': 3, 'title': 'x'})
+        self.assertIs(mgr.notes[3], note_cls.return_value)
+
+    def test_open_note_saves_stopped_before_write(self):
+        """写入恢复的文件前先停止同 ID 便签的写盘"""
+        path = self.backups.create_backup('stickynote_backup_a')
+        note_file = os.path.join(self.manager.notes_dir, 'note_3.json')
+        _write(note_file, {'id': 3, 'title': '新内容'})
+        events = []
+        self.manager.suspend_note_saves = lambda note_id: events.append((note_id, _read(note_file)['title']))
+        self.assertEqual(self.backups.restore_notes(path, [3]), [3])
+        self.assertEqual(events, [(3, '新内容')])
+        self.assertEqual(_read(note_file)['title'], '标题 3')
+
+    def test_failed_write_resumes_open_note(self):
+        """恢复文件写入失败时旧窗口恢复保存"""
+        from unittest.mock import MagicMock
+        path = self.backups.create_backup('stickynote_backup_a')
+        held = MagicMock(is_deleted=True)
+        self.manager.suspend_note_saves = lambda note_id: held
+        with patch('features.backup.write_note_file', side_effect=OSError('disk full')):
+            self.assertEqual(self.backups.restore_notes(path, [3]), [])
+        self.assertFalse(held.is_deleted)
+        held.save_note.assert_called_once()
+        self.assertEqual(self.loaded, [])
+
+    def test_suspend_waits_for_inflight_save(self):
+        """停止便签写盘时取消防抖保存并等待进行中的后台写入"""
+        from unittest.mock import MagicMock
+        from core.manager import StickyNoteManager
+        with patch('core.manager.StickyNoteManager.__init__', return_value=None):
+            mgr = StickyNoteManager.__new__(StickyNoteManager)
+        old = MagicMock()
+        mgr.notes = {3: old}
+        self.assertIs(mgr.suspend_note_saves(3), old)
+        self.assertTrue(old.is_deleted)
+        old._save_timer.stop.assert_called_once()
+        old._save_worker.wait.assert_called_once()
+        self.assertIsNone(mgr.suspend_note_saves(4))
+
+
+class TestBackupVerify(unittest.TestCase):
+    """测试备份清单与完整性校验"""
+
+    @classmethod
+    def setUpClass(cls):
+        from PyQt5.QtCore import QCoreApplication
+        cls.app = QCoreApplication.instance() or QCoreApplication([])
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.data_dir = os.path.join(root, 'data')
+        notes_dir = os.path.join(self.data_dir, 'notes')
+        for i in range(10):
+            _write(os.path.join(notes_dir, f'note_{i}.json'), {'id': i, 'content': f'正文 {i} ' * 500})
+        settings_file = _write(os.path.join(self.data_dir, 'settings.json'), {})
+        self.manager = SimpleNamespace(notes_dir=notes_dir, settings_file=settings_file)
+        patchers = [patch('features.backup.get_user_data_dir', return_value=self.data_dir),
+                    patch('features.backup.get_styles_dir', return_value=os.path.join(root, 'styles'))]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        from features.backup import BackupManager
+        self.backups = BackupManager(self.manager)
+        self.backups.auto_backup_timer.stop()
+        self.addCleanup(self.backups.shutdown)
+        self.addCleanup(self.app.processEvents)
+
+    def _zip_backup(self, name='stickynote_backup_a'):
+        self.backups.backup_format = 'zip'
+        return self.backups.create_backup(name)
+
+    def _damage(self, path, offset):
+        with open(path, 'r+b') as f:
+            f.seek(offset)
+            byte = f.read(1)
+            f.seek(offset)
+            f.write(bytes([byte[0] ^ 0xFF]))
+
+    def test_zip_manifest_contents(self):
+        """zip 备份内嵌逐文件哈希、便签数量与程序版本"""
+        import hashlib
+        from core import __version__
+        from features.backup import ZIP_MANIFEST_NAME
+        path = self._zip_backup()
+        with zipfile.ZipFile(path) as zf:
+            manifest = json.loads(zf.read(ZIP_MANIFEST_NAME))
+            data = zf.read('notes/note_3.json')
+        self.assertEqual(manifest['app_version'], __version__)
+        self.assertEqual(manifest['note_count'], 10)
+        self.assertEqual(manifest['files']['notes/note_3.json'],
+                         {'sha256': hashlib.sha256(data).hexdigest(), 'size': len(data), 'title': ''})
+        result = self.backups.verify_backup(path)
+        self.assertTrue(result['ok'], result['errors'])
+        self.assertEqual(result['files'], 11)
+
+    def test_damaged_zip_flagged(self):
+        """位翻转与截断的 zip 均校验失败，并在备份列表中标记"""
+        path = self._zip_backup()
+        self._damage(path, 200)
+        self.assertFalse(self.backups.verify_backup(path)['ok'])
+
+        truncated = self._zip_backup('stickynote_backup_b')
+        with open(truncated, 'r+b') as f:
+            f.truncate(os.path.getsize(truncated) // 2)
+        self.assertFalse(self.backups.verify_backup(truncated)['ok'])
+
+        flags = {b['filename']: b['verify']['ok'] for b in self.backups.get_backup_list()}
+        self.assertEqual(flags, {'stickynote_backup_a.zip': False, 'stickynote_backup_b.zip': False})
+
+    def test_legacy_zip_checked_by_crc(self):
+        """没有清单的旧版 zip 仍按 CRC 校验"""
+        path = os.path.join(self.backups.backup_dir, 'stickynote_backup_old.zip')
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED) as zf:
+            zf.writestr('notes/note_1.json', 'x' * 1000)
+        result = self.backups.verify_backup(path)
+        self.assertTrue(result['ok'])
+        self.assertFalse(result['has_manifest'])
+        self._damage(path, 100)
+        self.assertFalse(self.backups.verify_backup(path)['ok'])
+
+    def test_damaged_snapshot_flagged(self):
+        """增量备份的对象损坏或缺失时校验失败"""
+        path = self.backups.create_backup('stickynote_backup_a')
+        self.assertTrue(self.backups.verify_backup(path)['ok'])
+        files = self.backups.store.snapshot_files('stickynote_backup_a')
+        self._damage(self.backups.store.object_path(files['notes/note_1.json']['sha']), 10)
+        os.remove(self.backups.store.object_path(files['notes/note_2.json']['sha']))
+        result = self.backups.verify_backup(path)
+        self.assertFalse(result['ok'])
+        self.assertEqual(len(result['errors']), 2)
+
+    def test_verify_memory_bounded(self):
+        """校验大文件时内存占用与文件大小无关"""
+        import tracemalloc
+        big = os.path.join(self.manager.notes_dir, 'note_99.json')
+        with open(big, 'wb') as f:
+            for _ in range(32):
+                f.write(os.urandom(1024 * 1024))
+        path = self._zip_backup()
+        tracemalloc.start()
+        try:
+            self.assertTrue(self.backups.verify_backup(path)['ok'])
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertLess(peak, 8 * 1024 * 1024)
+
+    def test_newest_backups_verified_after_creation(self):
+        """备份完成后在后台校验最新的备份"""
+        worker = self.backups.start_backup('stickynote_backup_a')
+        worker.wait()
+        self.app.processEvents()
+        self.assertIsNotNone(self.backups.verify_worker)
+        self.backups.verify_worker.wait()
+        status = self.backups.get_verify_status(self.backups.store.snapshot_path('stickynote_backup_a'))
+        self.assertTrue(status['ok'])
+
+class TestBackupDiff(unittest.TestCase):
+    """测试两个备份之间的比较"""
+
+    @classmethod
+    def setUpClass(cls):
+        from PyQt5.QtCore import QCoreApplication
+        cls.app = QCoreApplication.instance() or QCoreApplication([])
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.data_dir = os.path.join(root, 'data')
+        self.notes_dir = os.path.join(self.data_dir, 'notes')
+        for i in range(1, 51):
+            self._note(i, f'标题 {i}', f'第一行\n第 {i} 篇\n')
+        settings_file = _write(os.path.join(self.data_dir, 'settings.json'), {})
+        self.manager = SimpleNamespace(notes_dir=self.notes_dir, settings_file=settings_file)
+        patchers = [patch('features.backup.get_user_data_dir', return_value=self.data_dir),
+                    patch('features.backup.get_styles_dir', return_value=os.path.join(root, 'styles'))]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        from features.backup import BackupManager
+        self.backups = BackupManager(self.manager)
+        self.backups.auto_backup_timer.stop()
+        self.addCleanup(self.backups.shutdown)
+
+    def _note(self, note_id, title, text):
+        _write(os.path.join(self.notes_dir, f'note_{note_id}.json'),
+               {'id': note_id, 'title': title, 'plain_content': text})
+
+    def _edit(self):
+        self._note(1, '新标题', '第一行\n第 1 篇\n')
+        self._note(2, '标题 2', '第一行\n改过的第 2 篇\n')
+        os.remove(os.path.join(self.notes_dir, 'note_3.json'))
+        self._note(99, '新便签', '')
+
+    def _expected(self):
+        return [
+            {'note_id': 1, 'status': 'modified', 'old_title': '标题 1', 'new_title': '新标题'},
+            {'note_id': 2, 'status': 'modified', 'old_title': '标题 2', 'new_title': '标题 2'},
+            {'note_id': 3, 'status': 'removed', 'old_title': '标题 3', 'new_title': ''},
+            {'note_id': 99, 'status': 'added', 'old_title': '', 'new_title': '新便签'},
+        ]
+
+    def test_snapshot_diff_reads_only_changed_buckets(self):
+        """两个增量备份之间只读取有差异的文件表分桶，不读取便签内容"""
+        from features.backup_store import tree_bucket
+        old = self.backups.create_backup('stickynote_backup_1')
+        self._edit()
+        new = self.backups.create_backup('stickynote_backup_2')
+        # 未变化的便签沿用上一次快照中的标题
+        files = self.backups.store.snapshot_files('stickynote_backup_2')
+        self.assertEqual(files['notes/note_10.json']['title'], '标题 10')
+
+        changed = {tree_bucket(f'notes/note_{i}.json') for i in (1, 2, 3, 99)}
+        store = self.backups.store
+        with patch.object(store, 'load_bucket', wraps=store.load_bucket) as buckets:
+            rows = self.backups.diff_backups(old, new)
+        self.assertEqual(rows, self._expected())
+        self.assertEqual(buckets.call_count, 2 * len(changed))
+
+    def test_zip_and_mixed_diff(self):
+        """zip 备份之间、zip 与增量备份之间均按清单比较"""
+        self.backups.backup_format = 'zip'
+        old_zip = self.backups.create_backup('stickynote_backup_1')
+        self.backups.backup_format = 'incremental'
+        old_snapshot = self.backups.create_backup('stickynote_backup_2')
+        self._edit()
+        self.backups.backup_format = 'zip'
+        new_zip = self.backups.create_backup('stickynote_backup_3')
+        opened = []
+        with _spy_zip_open(opened):
+            self.assertEqual(self.backups.diff_backups(old_zip, new_zip), self._expected())
+        self.assertEqual(set(opened), {'backup_manifest.json'})
+        self.assertEqual(self.backups.diff_backups(old_snapshot, new_zip), self._expected())
+
+    def test_text_diff_on_demand(self):
+        """按需计算修改便签的纯文本差异"""
+        old = self.backups.create_backup('stickynote_backup_1')
+        self._edit()
+        new = self.backups.create_backup('stickynote_backup_2')
+        diff = self.backups.diff_note_text(old, new, 2)
+        self.assertIn('-第 2 篇', diff)
+        self.assertIn('+改过的第 2 篇', diff)
+        self.assertEqual(self.backups.diff_note_text(old, new, 1), '')
+
+
+class TestTieredRetention(unittest.TestCase):
+    """测试分级保留与备份索引"""
+
+    @classmethod
+    def setUpClass(cls):
+        from PyQt5.QtCore import QCoreApplication
+        cls.app = QCoreApplication.instance() or QCoreApplication([])
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.data_dir = os.path.join(root, 'data')
+        notes_dir = os.path.join(self.data_dir, 'notes')
+        for i in range(5):
+            _write(os.path.join(notes_dir, f'note_{i}.json'), {'id': i})
+        settings_file = _write(os.path.join(self.data_dir, 'settings.json'), {})
+        self.manager = SimpleNamespace(notes_dir=notes_dir, settings_file=settings_file)
+        patcher = patch('features.backup.get_user_data_dir', return_value=self.data_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        from features.backup import BackupManager
+        self.backups = BackupManager(self.manager)
+        self.backups.auto_backup_timer.stop()
+        self.addCleanup(self.backups.shutdown)
+        self.addCleanup(self.app.processEvents)
+
+    def test_tiered_selection(self):
+        """每小时/每天/每周各保留最新一个，超出一年的删除"""
+        from features.backup import select_tiered_retention
+        now = time.mktime((2026, 6, 15, 12, 30, 0, 0, 0, -1))
+        stamps = {}
+        # 最近 48 小时每 15 分钟一个，之后一年多每天一个
+        for i in range(48 * 4):
+            stamps[f'q{i}'] = now - i * 900
+        for d in range(2, 420):
+            stamps[f'd{d}'] = now - d * 86400
+        keep = select_tiered_retention(stamps, now)
+        self.assertIn('q0', keep)
+        ages = sorted((now - stamps[name]) / 86400 for name in keep)
+        hourly = [a for a in ages if a < 1]
+        daily = [a for a in ages if 1 <= a < 30]
+        weekly = [a for a in ages if a >= 30]
+        self.assertIn(len(hourly), (24, 25))
+        self.assertIn(len(daily), (29, 30))
+        self.assertTrue(45 <= len(weekly) <= 48)
+        self.assertLess(max(ages), 52 * 7)
+        self.assertLess(len(keep), 110)
+
+    def test_cleanup_applies_tiers(self):
+        """清理时按分级保留删除同一小时内较旧的备份"""
+        for i in range(3):
+            self.backups.create_backup(f'stickynote_backup_{i}')
+        self.backups.cleanup_old_backups()
+        names = [b['filename'] for b in self.backups.get_backup_list()]
+        self.assertEqual(len(names), 1)
+        self.assertEqual(self.backups.store.list_snapshots(), names)
+
+    def test_list_reads_index_without_stat(self):
+        """备份列表从索引读取，不逐个 stat 备份文件"""
+        self.backups.backup_format = 'zip'
+        for i in range(3):
+            self.backups.create_backup(f'stickynote_backup_{i}')
+        real_stat = os.stat
+        statted = []
+
+        def spy_stat(path, *args, **kwargs):
+            statted.append(str(path))
+            return real_stat(path, *args, **kwargs)
+        with patch('os.stat', spy_stat), \
+                patch.object(self.backups.store, 'load_manifest', side_effect=AssertionError('manifest')):
+            listed = self.backups.get_backup_list()
+        self.assertEqual(len(listed), 3)
+        self.assertFalse([p for p in statted if p.endswith('.zip')])
+
+    def test_index_reconciles_with_directory(self):
+        """手动放入的 zip 被补录，已不存在的备份从索引中移除"""
+        path = self.backups.create_backup('stickynote_backup_a')
+        self.backups.backup_format = 'zip'
+        zip_path = self.backups.create_backup('stickynote_backup_b')
+        dropped = os.path.join(self.backups.backup_dir, 'stickynote_backup_imported.zip')
+        os.rename(zip_path, dropped)
+        self.backups.store.delete_snapshot(self.backups._snapshot_name(path))
+
+        from features.backup import BackupManager
+        reopened = BackupManager(self.manager)
+        reopened.auto_backup_timer.stop()
+        names = [b['filename'] for b in reopened.get_backup_list()]
+        self.assertEqual(names, ['stickynote_backup_imported.zip'])
+
+
+class TestAdaptiveCompression(unittest.TestCase):
+    """测试按条目自适应选择压缩方式"""
+
+    @classmethod
+    def setUpClass(cls):
+        from PyQt5.QtCore import QCoreApplication
+        cls.app = QCoreApplication.instance() or QCoreApplication([])
+
+    def setUp(self):
+        import base64
+        root = tempfile.mkdtemp()
+        self.data_dir = os.path.join(root, 'data')
+        notes_dir = os.path.join(self.data_dir, 'notes')
+        _write(os.path.join(notes_dir, 'note_1.json'), {'id': 1, 'content': '<p>会议记录</p>' * 2000})
+        image = base64.b64encode(os.urandom(200 * 1024)).decode('ascii')
+        _write(os.path.join(notes_dir, 'note_2.json'), {'id': 2, 'content': f'<img src="data:image/png;base64,{image}">'})
+        with open(os.path.join(notes_dir, 'note_3.json'), 'wb') as f:
+            f.write(os.urandom(100 * 1024))
+        settings_file = _write(os.path.join(self.data_dir, 'settings.json'), {})
+        self.manager = SimpleNamespace(notes_dir=notes_dir, settings_file=settings_file)
+        patcher = patch('features.backup.get_user_data_dir', return_value=self.data_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        from features.backup import BackupManager
+        self.backups = BackupManager(self.manager)
+        self.backups.auto_backup_timer.stop()
+        self.addCleanup(self.backups.shutdown)
+        self.addCleanup(self.app.processEvents)
+
+    def _read_note(self, note_id):
+        with open(os.path.join(self.manager.notes_dir, f'note_{note_id}.json'), 'rb') as f:
+            return f.read()
+
+    def test_mode_follows_content(self):
+        """文本用高压缩级别，base64 图片只做 Huffman 编码，随机数据原样保存"""
+        from features import backup_compression as bc
+        self.assertEqual(bc.choose_mode(self._read_note(1)), bc.STRONG)
+        self.assertEqual(bc.choose_mode(self._read_note(2)), bc.FAST)
+        self.assertEqual(bc.choose_mode(self._read_note(3)), bc.STORE)
+        data = self._read_note(2)
+        fast = bc.compress(data, bc.FAST)
+        self.assertLess(len(fast), len(data) * 0.8)
+        import zlib
+        self.assertEqual(zlib.decompress(fast), data)
+
+    def test_zip_entries_use_chosen_mode(self):
+        """zip 备份逐条目选择压缩方式，内容完整且通过校验"""
+        self.backups.backup_format = 'zip'
+        path = self.backups.create_backup('stickynote_backup_a')
+        with zipfile.ZipFile(path) as zf:
+            self.assertIsNone(zf.testzip())
+            self.assertEqual(zf.getinfo('notes/note_3.json').compress_type, zipfile.ZIP_STORED)
+            self.assertEqual(zf.getinfo('notes/note_2.json').compress_type, zipfile.ZIP_DEFLATED)
+            for note_id in (1, 2, 3):
+                self.assertEqual(zf.read(f'notes/note_{note_id}.json'), self._read_note(note_id))
+        self.assertTrue(self.backups.verify_backup(path)['ok'])
+
+    def test_large_entries_stream(self):
+        """超过并行压缩上限的文件流式写入"""
+        self.backups.backup_format = 'zip'
+        with patch('features.backup.PARALLEL_ENTRY_LIMIT', 1024):
+            path = self.backups.create_backup('stickynote_backup_a')
+        with zipfile.ZipFile(path) as zf:
+            self.assertEqual(zf.getinfo('notes/note_3.json').compress_type, zipfile.ZIP_STORED)
+            self.assertEqual(zf.read('notes/note_2.json'), self._read_note(2))
+        self.assertTrue(self.backups.verify_backup(path)['ok'])
+
+    def test_store_keeps_incompressible_objects_raw(self):
+        """增量备份中不可压缩的对象原样保存，读取与校验不受影响"""
+        path = self.backups.create_backup('stickynote_backup_a')
+        store = self.backups.store
+        sha = store.snapshot_files('stickynote_backup_a')['notes/note_3.json']['sha']
+        with open(store.object_path(sha), 'rb') as f:
+            self.assertEqual(f.read(1), b'R')
+        self.assertEqual(store.read_file('stickynote_backup_a', 'notes/note_3.json'), self._read_note(3))
+        self.assertTrue(self.backups.verify_backup(path)['ok'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""HTML 纯文本提取的单元测试"""
+import unittest
+
+
+class TestHtmlToText(unittest.TestCase):
+    """测试 html_text 与 QTextDocument.toPlainText 的一致性"""
+
+    @classmethod
+    def setUpClass(cls):
+        from PyQt5.QtWidgets import QApplication
+        cls.app = QApplication.instance()
+        if cls.app is None:
+            cls.app = QApplication([])
+
+    def _qt_roundtrip(self, html):
+        """返回 (Qt 方言 HTML, toPlainText 结果)"""
+        from PyQt5.QtGui import QTextDocument
+        doc = QTextDocument()
+        doc.setHtml(html)
+        return doc.toHtml(), doc.toPlainText()
+
+    def test_matches_qt_plain_text(self):
+        """Qt 生成的 HTML 提取结果与 toPlainText 一致"""
+        from features.html_text import extract_text
+        samples = [
+            '<p>Hello &amp; <b>world</b></p><p>line1<br>line2&nbsp;x</p>',
+            '<h1>T</h1><ol><li>one</li><li><p>two</p></li></ol><pre>a\n  b</pre>tail',
+            '<table><tr><td>c1</td><td>c2</td></tr></table>',
+            '<p>中文&lt;tag&gt; [[链接]]</p><hr/><p>z</p>',
+            '<p><b>x</b> <i>y</i></p>',
+        ]
+        for sample in samples:
+            html, expected = self._qt_roundtrip(sample)
+            self.assertEqual(extract_text(html), expected)
+
+    def test_whitespace_between_inline_tags(self):
+        """内联元素之间的纯空白折叠为一个空格，而不是被丢弃"""
+        from features.html_text import extract_text
+        samples = [
+            '<b>bold</b> <i>it</i>',
+            '<p><b>a </b> <i>b</i></p>',
+            '<p>a\n<b>b</b>\n</p><p>c</p>',
+        ]
+        for sample in samples:
+            _, expected = self._qt_roundtrip(sample)
+            self.assertEqual(extract_text(sample), expected)
+        self.assertEqual(extract_text('<b>bold</b> <i>it</i>'), 'bold it')
+
+    def test_empty_paragraphs_and_whitespace(self):
+        """Qt 空段落与 pre-wrap 空白被保留"""
+        from PyQt5.QtGui import QTextDocument
+        from features.html_text import extract_text
+        doc = QTextDocument()
+        doc.setPlainText('a\n\n  b  c\n')
+        self.assertEqual(extract_text(doc.toHtml()), 'a\n\n  b  c\n')
+
+    def test_plain_text_passthrough(self):
+        """非 HTML 内容不经解析器，只解析字符实体"""
+        from features.html_text import html_to_text
+        self.assertEqual(html_to_text('a < b'), 'a < b')
+        self.assertEqual(html_to_text('plain'), 'plain')
+        self.assertEqual(html_to_text('Tom &amp; Jerry&nbsp;!'), 'Tom & Jerry !')
+        self.assertEqual(html_to_text(''), '')
+
+    def test_note_plain_text_prefers_html(self):
+        """note_plain_text 从 HTML 提取，忽略过期的 plain_content"""
+        from features.html_text import note_plain_text
+        data = {'content': '<p>fresh</p>', 'plain_content': 'stale'}
+        self.assertEqual(note_plain_text(data), 'fresh')
+        data = {'content': '', 'plain_content': 'only plain'}
+        self.assertEqual(note_plain_text(data), 'only plain')
+        data = {'edit_mode': 'markdown', 'markdown_content': '# md', 'content': '<p>x</p>'}
+        self.assertEqual(note_plain_text(data), '# md')
+
+    def test_parse_links_across_tags(self):
+        """链接解析不受内联标签影响"""
+        from features.linking import NoteLinkManager
+        html = '<p>see [[<b>Alpha</b>]] and [[Beta &amp; Co]]</p>'
+        self.assertEqual(NoteLinkManager.parse_links(html), ['Alpha', 'Beta & Co'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -296,5 +296,40 @@ class TestStickyNoteBorderPen(unittest.TestCase):
             shutil.rmtree(temp_dir)
 
 
+
+class TestStickyNoteFontStyleSheet(unittest.TestCase):
+    """StickyNote — 字体样式表"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance()
+        if cls.app is None:
+            cls.app = QApplication([])
+
+    def test_content_font_size_replaces_style_sheet(self):
+        """反复调整内容字号时样式表被替换而不是追加"""
+        from core.note import StickyNote
+        temp_dir = tempfile.mkdtemp()
+        try:
+            with patch('core.note.get_position_manager') as mp:
+                mp.return_value.get_smart_position.return_value = QPoint(100, 100)
+                mp.return_value.is_position_valid.return_value = True
+                note = StickyNote(773, temp_dir, manager=None)
+                note.font_settings = {'family': 'Arial', 'size': 12, 'bold': False, 'italic': False}
+                note.apply_font()
+                length = len(note.text_edit.styleSheet())
+                for _ in range(5):
+                    note.increase_font_size()
+                sheet = note.text_edit.styleSheet()
+                self.assertEqual(sheet.count('font-size'), 1)
+                self.assertIn('font-size: 17pt', sheet)
+                self.assertEqual(len(sheet), length)
+                self.assertIn('font-size: 12pt', note.title_edit.styleSheet())
+                note.is_deleted = True
+                note.close()
+        finally:
+            shutil.rmtree(temp_dir)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -194,6 +194,7 @@ class TestNoteLinkManager(unittest.TestCase):
         self.lm = NoteLinkManager(self.temp_dir)
 
     def tearDown(self):
+        self.lm.save_index()
         shutil.rmtree(self.temp_dir)
 
     def test_parse_links(self):
@@ -221,6 +222,328 @@ class TestNoteLinkManager(unittest.TestCase):
     def test_no_links(self):
         self.assertEqual(len(self.lm.parse_links("普通文本")), 0)
 
+    def test_backlinks_follow_edits(self):
+        """出链变化时反向索引同步更新，重新加载后由索引文件重建"""
+        self.lm.update_index(1, "便签A", ["便签B", "便签C"])
+        self.lm.update_index(2, "便签D", ["便签B"])
+        self.lm.update_index(1, "便签A", ["便签C"])
+        self.assertEqual(self.lm.get_backlinks("便签B"), [(2, "便签D")])
+        self.assertEqual(self.lm.get_backlinks("便签C"), [(1, "便签A")])
+        self.lm.remove_note(2)
+        self.assertEqual(self.lm.get_backlinks("便签B"), [])
+
+        self.lm.save_index()
+        from features.linking import NoteLinkManager
+        reloaded = NoteLinkManager(self.temp_dir)
+        self.assertEqual(reloaded.get_backlinks("便签C"), [(1, "便签A")])
+
+    def test_bulk_relink_single_write(self):
+        """事务内批量重建 5000 篇便签的链接只写盘一次"""
+        with patch('features.linking.os.replace', wraps=os.replace) as replace:
+            with self.lm.transaction():
+                for i in range(5000):
+                    self.lm.update_index(i, f"便签{i}", [f"便签{(i + 1) % 5000}"])
+                with self.lm.transaction():
+                    self.lm.remove_note(0)
+                self.assertEqual(replace.call_count, 0)
+            self.assertEqual(replace.call_count, 1)
+        with open(os.path.join(self.temp_dir, 'links_index.json'), encoding='utf-8') as f:
+            self.assertEqual(len(json.load(f)), 4999)
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir, 'links_index.json.tmp')))
+
+    def test_changes_flushed_in_background(self):
+        """事务外的变更合并为一次延迟写盘"""
+        import time
+        with patch('features.linking.SAVE_DELAY', 0.05), \
+                patch('features.linking.os.replace', wraps=os.replace) as replace:
+            for i in range(20):
+                self.lm.update_index(i, f"便签{i}", ["目标"])
+            self.assertEqual(replace.call_count, 0)
+            deadline = time.time() + 5
+            while replace.call_count == 0 and time.time() < deadline:
+                time.sleep(0.01)
+            time.sleep(0.1)
+            self.assertEqual(replace.call_count, 1)
+        from features.linking import NoteLinkManager
+        self.assertEqual(len(NoteLinkManager(self.temp_dir).get_backlinks("目标")), 20)
+
+    def test_failed_write_keeps_previous_index(self):
+        """写盘失败时保留原索引文件，变更留待下次写入"""
+        self.lm.update_index(1, "便签A", ["便签B"])
+        self.lm.save_index()
+        self.lm.update_index(2, "便签C", ["便签B"])
+        with patch('features.linking.json.dump', side_effect=OSError('disk full')):
+            self.lm.save_index()
+        with open(os.path.join(self.temp_dir, 'links_index.json'), encoding='utf-8') as f:
+            self.assertEqual(list(json.load(f)), ['1'])
+        self.lm.save_index()
+        with open(os.path.join(self.temp_dir, 'links_index.json'), encoding='utf-8') as f:
+            self.assertEqual(sorted(json.load(f)), ['1', '2'])
+
+    def test_concurrent_saves_keep_newest(self):
+        """定时器线程与其他线程同时保存时，较旧的快照不会覆盖较新的快照"""
+        import threading
+        real_dump = json.dump
+        entered = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def slow_dump(obj, f, **kwargs):
+            calls.append(obj)
+            if len(calls) == 1:
+                entered.set()
+                release.wait(5)
+            return real_dump(obj, f, **kwargs)
+
+        self.lm.update_index(1, "便签A", ["便签B"])
+        with patch('features.linking.json.dump', side_effect=slow_dump):
+            older = threading.Thread(target=self.lm.save_index)
+            older.start()
+            self.assertTrue(entered.wait(5))
+            self.lm.update_index(2, "便签C", ["便签B"])
+            newer = threading.Thread(target=self.lm.save_index)
+            newer.start()
+            newer.join(0.2)
+            self.assertTrue(newer.is_alive())  # 等待前一次写入完成
+            release.set()
+            older.join()
+            newer.join()
+        self.assertEqual([sorted(obj) for obj in calls], [['1'], ['1', '2']])
+        with open(os.path.join(self.temp_dir, 'links_index.json'), encoding='utf-8') as f:
+            self.assertEqual(sorted(json.load(f)), ['1', '2'])
+
+    def test_unchanged_update_skips_write(self):
+        self.lm.update_index(1, "便签A", ["便签B"])
+        self.lm.save_index()
+        self.lm.update_index(1, "便签A", "引用 [[便签B]]")
+        self.assertFalse(self.lm._dirty)
+
+    def test_backlinks_10k_notes(self):
+        """1 万篇便签的链接图：反向索引结果与全量扫描一致，查询不遍历索引"""
+        import random
+        import time
+        rng = random.Random(7)
+        count = 10000
+        graph = {i: rng.sample(range(count), 5) for i in range(count)}
+        with self.lm.transaction():
+            for i, targets in graph.items():
+                self.lm.update_index(i, f"便签{i}", [f"便签{t}" for t in targets])
+            # 修改一部分便签的出链
+            for i in range(0, count, 10):
+                graph[i] = rng.sample(range(count), 3)
+                self.lm.update_index(i, f"便签{i}", [f"便签{t}" for t in graph[i]])
+        expected = {}
+        for i, targets in graph.items():
+            for t in targets:
+                expected.setdefault(t, []).append(i)
+        for t in range(0, count, 97):
+            self.assertEqual([nid for nid, _ in self.lm.get_backlinks(f"便签{t}")],
+                             sorted(set(expected.get(t, []))))
+
+        start = time.perf_counter()
+        for t in range(count):
+            self.lm.get_backlinks(f"便签{t}")
+        self.assertLess(time.perf_counter() - start, 1.0)
+
+    def test_note_save_updates_index(self):
+        """便签写盘后管理器按内存数据更新出链记录"""
+        from types import SimpleNamespace
+        from core.manager import StickyNoteManager
+        with patch('core.manager.StickyNoteManager.__init__', return_value=None):
+            mgr = StickyNoteManager.__new__(StickyNoteManager)
+        mgr._link_manager = self.lm
+        mgr.notes = {3: SimpleNamespace(note_id=3, note_data={'title': '便签A', 'content': '<p>见 [[便签B]]</p>'})}
+        mgr.notify_note_saved(os.path.join(self.temp_dir, 'note_3.json'))
+        self.assertEqual(self.lm.get_backlinks('便签B'), [(3, '便签A')])
+
+    def test_unindexed_notes_added_after_load(self):
+        """便签加载完成后补录未登记的便签，合并为一次写盘"""
+        from types import SimpleNamespace
+        from core.manager import StickyNoteManager
+        with patch('core.manager.StickyNoteManager.__init__', return_value=None):
+            mgr = StickyNoteManager.__new__(StickyNoteManager)
+        mgr._link_manager = self.lm
+        self.lm.update_index(1, '便签1', ['便签2'])
+        self.lm.save_index()
+        mgr.notes = {i: SimpleNamespace(note_id=i, note_data={'title': f'便签{i}', 'content': '[[便签1]]'})
+                     for i in range(1, 200)}
+        with patch('features.linking.os.replace', wraps=os.replace) as replace:
+            mgr._index_unlinked_notes()
+        self.assertEqual(replace.call_count, 1)
+        self.assertEqual(len(self.lm.get_backlinks('便签1')), 198)
+        self.assertEqual(self.lm.get_backlinks('便签2'), [(1, '便签1')])
+
+    def test_exit_writes_index_after_final_note_saves(self):
+        """退出时便签的最后一次保存更新的链接索引立即写盘，不依赖延迟定时器"""
+        from core.manager import StickyNoteManager
+        with patch('core.manager.StickyNoteManager.__init__', return_value=None):
+            mgr = StickyNoteManager.__new__(StickyNoteManager)
+        mgr._link_manager = self.lm
+        note_file = os.path.join(self.temp_dir, 'note_3.json')
+        note = MagicMock(note_id=3, note_data={'title': '便签A', 'content': '<p>见 [[便签B]]</p>'})
+        note.save_note_sync.side_effect = lambda: mgr.notify_note_saved(note_file)
+        mgr.notes = {3: note}
+        mgr.sync_engines = []
+        mgr.shortcut_manager = MagicMock()
+        mgr.backup_manager = MagicMock()
+        mgr.tray_icon = MagicMock()
+        with patch('core.manager.QCoreApplication.quit'):
+            mgr.exit_application()
+        note.save_note_sync.assert_called_once()
+        self.assertIsNone(self.lm._save_timer)
+        with open(self.lm.index_file, encoding='utf-8') as f:
+            self.assertIn('便签B', f.read())
+
+    def test_note_backlinks_dialog(self):
+        """便签的反向链接按钮按标题查询"""
+        from core.note import StickyNote
+        self.lm.update_index(5, "引用方", ["目标便签"])
+        with patch('core.note.get_position_manager') as mp:
+            from PyQt5.QtCore import QPoint
+            mp.return_value.get_smart_position.return_value = QPoint(100, 100)
+            mp.return_value.is_position_valid.return_value = True
+            note = StickyNote(996, self.temp_dir, manager=None)
+        # 只设置标题，不触发自动保存
+        note.title_edit.blockSignals(True)
+        note.title_edit.setText("目标便签")
+        note.title_edit.blockSignals(False)
+        note.manager = MagicMock(link_manager=self.lm)
+        with patch('core.note.QMessageBox.information') as info:
+            note._show_backlinks()
+        self.assertIn('引用方 (ID: 5)', info.call_args[0][2])
+        note.manager = None
+        note.is_deleted = True
+        note.close()
+
+
+class TestLinkRenamePropagation(unittest.TestCase):
+    """便签改名后同步更新其他便签中的链接"""
+
+    def setUp(self):
+        from core.manager import StickyNoteManager
+        from core.note import StickyNote
+        from features.linking import NoteLinkManager
+        self.temp_dir = tempfile.mkdtemp()
+        self.lm = NoteLinkManager(self.temp_dir)
+        with patch('core.manager.StickyNoteManager.__init__', return_value=None):
+            self.mgr = StickyNoteManager.__new__(StickyNoteManager)
+        self.mgr._link_manager = self.lm
+        self.mgr.notes_dir = self.temp_dir
+        self.mgr.sync_engines = []
+
+        # 已打开的便签：通过编辑器修改
+        with patch('core.note.get_position_manager') as mp:
+            from PyQt5.QtCore import QPoint
+            mp.return_value.get_smart_position.return_value = QPoint(100, 100)
+            mp.return_value.is_position_valid.return_value = True
+            self.open_note = StickyNote(1, self.temp_dir, manager=None)
+        self.open_note.text_edit.setPlainText('见 [[旧标题]] 与 [[旧标题]]')
+        self.open_note.save_note()
+        self.open_note._save_timer.stop()
+        # 与旧标题无关的便签不应被访问
+        self.unrelated = MagicMock()
+        self.mgr.notes = {1: self.open_note, 5: self.unrelated}
+
+        # 未打开的便签：直接改写文件
+        from core.note import write_note_file
+        self.closed_file = os.path.join(self.temp_dir, 'note_7.json')
+        write_note_file(self.closed_file, {
+            'id': 7, 'title': '关闭的便签',
+            'content': '<p>参考 [[旧标题]] 和 [[别的]]</p>', 'plain_content': '参考 [[旧标题]] 和 [[别的]]'})
+
+        with self.lm.transaction():
+            self.lm.update_index(1, '打开的便签', ['旧标题'])
+            self.lm.update_index(5, '无关便签', ['别的'])
+            self.lm.update_index(7, '关闭的便签', ['旧标题', '别的'])
+
+    def tearDown(self):
+        self.open_note._save_timer.stop()
+        self.open_note.is_deleted = True
+        self.open_note.close()
+        self.lm.save_index()
+        shutil.rmtree(self.temp_dir)
+
+    def _closed_data(self):
+        with open(self.closed_file, encoding='utf-8') as f:
+            return json.load(f)
+
+    def test_rename_rewrites_only_referencing_notes(self):
+        with patch('features.linking.os.replace', wraps=os.replace) as replace:
+            record = self.mgr.propagate_link_rename('旧标题', '新标题')
+        self.assertEqual(record['note_ids'], [1, 7])
+        self.assertEqual(self.open_note.text_edit.toPlainText(), '见 [[新标题]] 与 [[新标题]]')
+        self.assertIn('[[新标题]]', self.open_note.note_data['content'])
+        data = self._closed_data()
+        self.assertEqual(data['plain_content'], '参考 [[新标题]] 和 [[别的]]')
+        self.assertIn('[[新标题]]', data['content'])
+        self.assertEqual(self.unrelated.mock_calls, [])
+        # 链接索引随之更新，且只写盘一次
+        self.assertEqual([nid for nid, _ in self.lm.get_backlinks('新标题')], [1, 7])
+        self.assertEqual(self.lm.get_backlinks('旧标题'), [])
+        index_writes = [c for c in replace.call_args_list if c.args[1] == self.lm.index_file]
+        self.assertEqual(len(index_writes), 1)
+
+    def test_undo_restores_links(self):
+        record = self.mgr.propagate_link_rename('旧标题', '新标题')
+        self.mgr.undo_link_rename(record)
+        self.assertEqual(self.open_note.text_edit.toPlainText(), '见 [[旧标题]] 与 [[旧标题]]')
+        self.assertEqual(self._closed_data()['plain_content'], '参考 [[旧标题]] 和 [[别的]]')
+        self.assertEqual([nid for nid, _ in self.lm.get_backlinks('旧标题')], [1, 7])
+
+    def test_undo_keeps_existing_new_title_links(self):
+        """改名前已存在的 [[新标题]] 在撤销后保持不变"""
+        self.open_note.text_edit.setPlainText('见 [[旧标题]] 与 [[新标题]]')
+        self.open_note.save_note()
+        self.open_note._save_timer.stop()
+        from core.note import write_note_file
+        write_note_file(self.closed_file, {
+            'id': 7, 'title': '关闭的便签',
+            'content': '<p>参考 [[旧标题]] 和 [[新标题]]</p>', 'plain_content': '参考 [[旧标题]] 和 [[新标题]]'})
+        with self.lm.transaction():
+            self.lm.update_index(1, '打开的便签', ['旧标题', '新标题'])
+            self.lm.update_index(7, '关闭的便签', ['旧标题', '新标题'])
+
+        record = self.mgr.propagate_link_rename('旧标题', '新标题')
+        self.assertEqual(self.open_note.text_edit.toPlainText(), '见 [[新标题]] 与 [[新标题]]')
+        self.mgr.undo_link_rename(record)
+        self.assertEqual(self.open_note.text_edit.toPlainText(), '见 [[旧标题]] 与 [[新标题]]')
+        data = self._closed_data()
+        self.assertEqual(data['plain_content'], '参考 [[旧标题]] 和 [[新标题]]')
+        self.assertEqual(data['content'], '<p>参考 [[旧标题]] 和 [[新标题]]</p>')
+        self.assertEqual([nid for nid, _ in self.lm.get_backlinks('旧标题')], [1, 7])
+        self.assertEqual([nid for nid, _ in self.lm.get_backlinks('新标题')], [1, 7])
+
+    def test_open_note_undo_in_editor(self):
+        """已打开便签中的修改可用便签自身的撤销撤回"""
+        self.mgr.propagate_link_rename('旧标题', '新标题')
+        self.assertTrue(self.open_note.undo_redo_manager.undo())
+        self.assertEqual(self.open_note.text_edit.toPlainText(), '见 [[旧标题]] 与 [[旧标题]]')
+
+    def test_title_commit_offers_propagation(self):
+        """标题编辑完成时询问并更新引用旧标题的链接"""
+        self.open_note._committed_title = '旧标题'
+        self.open_note.title_edit.blockSignals(True)
+        self.open_note.title_edit.setText('新标题')
+        self.open_note.title_edit.blockSignals(False)
+        self.open_note.manager = self.mgr
+        try:
+            with patch('core.note.QMessageBox') as box:
+                box.question.return_value = box.Yes
+                self.open_note._on_title_committed()
+            box.question.assert_called_once()
+        finally:
+            self.open_note.manager = None
+        self.assertEqual(self._closed_data()['plain_content'], '参考 [[新标题]] 和 [[别的]]')
+        self.assertEqual(self.open_note._committed_title, '新标题')
+
+    def test_escaped_titles_in_html(self):
+        from features.linking import NoteLinkManager
+        content, count = NoteLinkManager.rename_link_in_html(
+            '<p>[[A &amp; B]] [[&quot;引号&quot;]]</p>', 'A & B', 'C & D')
+        self.assertEqual((content, count), ('<p>[[C &amp; D]] [[&quot;引号&quot;]]</p>', 1))
+        content, count = NoteLinkManager.rename_link_in_html(content, '"引号"', '新')
+        self.assertEqual((content, count), ('<p>[[C &amp; D]] [[新]]</p>', 1))
+
 
 # ==================== 4. 便签锁定/密码保护 ====================
 
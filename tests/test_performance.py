@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""性能模块的单元测试"""
+import unittest
+import tempfile
+import os
+import json
+import time
+
+
+class TestNoteDataCache(unittest.TestCase):
+    """测试 NoteDataCache 字节预算与文件校验"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def _write_note(self, note_id, data):
+        path = os.path.join(self.temp_dir, f'note_{note_id}.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        return path
+
+    def test_byte_budget_evicts_lru(self):
+        """超出字节预算时按 LRU 淘汰"""
+        from features.performance import NoteDataCache
+        cache = NoteDataCache(max_size=100, max_bytes=3000)
+        for i in range(3):
+            cache.put(i, {'content': 'x' * 1000})
+        self.assertIsNone(cache.get(0))
+        self.assertIsNotNone(cache.get(2))
+        stats = cache.stats()
+        self.assertGreaterEqual(stats['evictions'], 1)
+        self.assertLessEqual(stats['bytes'], 3000)
+
+    def test_oversized_entry_not_cached(self):
+        """单条超出预算的数据不进入缓存"""
+        from features.performance import NoteDataCache
+        cache = NoteDataCache(max_bytes=100)
+        cache.put(1, {'content': 'x' * 1000})
+        self.assertEqual(cache.size, 0)
+        self.assertEqual(cache.bytes_used, 0)
+
+    def test_stale_entry_revalidated_by_file_stamp(self):
+        """文件被外部修改后，缓存条目失效并重新加载"""
+        from features.performance import NoteDataCache
+        cache = NoteDataCache()
+        path = self._write_note(1, {'title': 'old'})
+        self.assertEqual(cache.load(1, path)['title'], 'old')
+        self.assertEqual(cache.load(1, path)['title'], 'old')
+        self.assertEqual(cache.stats()['hits'], 1)
+
+        time.sleep(0.01)
+        self._write_note(1, {'title': 'new title'})
+        self.assertEqual(cache.load(1, path)['title'], 'new title')
+        self.assertEqual(cache.stats()['stale'], 1)
+
+    def test_bump_version_invalidates_all(self):
+        """递增版本号使所有条目失效"""
+        from features.performance import NoteDataCache
+        cache = NoteDataCache()
+        cache.put(1, {'title': 'a'})
+        cache.bump_version()
+        self.assertIsNone(cache.get(1))
+
+    def test_stats_does_not_deadlock(self):
+        """stats() 在持锁状态下计算命中率"""
+        from features.performance import NoteDataCache
+        cache = NoteDataCache()
+        cache.put(1, {'title': 'a'})
+        cache.get(1)
+        cache.get(2)
+        self.assertAlmostEqual(cache.stats()['hit_rate'], 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,1121 @@
+# -*- coding: utf-8 -*-
+"""同步模块的单元测试"""
+import unittest
+import tempfile
+import os
+import shutil
+import json
+import time
+from unittest.mock import patch
+
+
+def _write(path, data, age=3600):
+    """写入文件并把 mtime 调到 age 秒之前（超出 racy 窗口）"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    if age:
+        old = time.time() - age
+        os.utime(path, (old, old))
+    return path
+
+
+class TestFileHashCache(unittest.TestCase):
+    """测试按 (size, mtime_ns, inode) 校验的哈希缓存"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir, ignore_errors=True)
+        self.cache_file = os.path.join(self.temp_dir, 'cache.json')
+
+    def test_unchanged_file_not_rehashed(self):
+        """文件未变化时不再读取哈希，且缓存可持久化"""
+        from features.sync.hash_cache import FileHashCache, sha256_file
+        path = _write(os.path.join(self.temp_dir, 'note_1.json'), {'a': 1})
+        cache = FileHashCache(self.cache_file)
+        digest = cache.get_hash(path)
+        self.assertEqual(digest, sha256_file(path))
+        cache.save()
+
+        reloaded = FileHashCache(self.cache_file)
+        with patch('features.sync.hash_cache.sha256_file') as hasher:
+            self.assertEqual(reloaded.get_hash(path), digest)
+        hasher.assert_not_called()
+        self.assertEqual(reloaded.hits, 1)
+
+    def test_modified_file_rehashed(self):
+        """大小或 mtime 变化时重新计算"""
+        from features.sync.hash_cache import FileHashCache
+        path = _write(os.path.join(self.temp_dir, 'note_1.json'), {'a': 1})
+        cache = FileHashCache()
+        first = cache.get_hash(path)
+        _write(path, {'a': 2}, age=1800)
+        self.assertNotEqual(cache.get_hash(path), first)
+        self.assertEqual(cache.misses, 2)
+
+    def test_recently_modified_file_not_cached(self):
+        """刚修改的文件不进入缓存，避免同一时间戳内的修改被漏检"""
+        from features.sync.hash_cache import FileHashCache
+        path = _write(os.path.join(self.temp_dir, 'note_1.json'), {'a': 1}, age=0)
+        cache = FileHashCache()
+        cache.get_hash(path)
+        self.assertEqual(len(cache), 0)
+
+    def test_missing_file_and_prune(self):
+        """文件不存在返回空哈希，prune 清理已删除文件的条目"""
+        from features.sync.hash_cache import FileHashCache
+        a = _write(os.path.join(self.temp_dir, 'note_1.json'), {'a': 1})
+        b = _write(os.path.join(self.temp_dir, 'note_2.json'), {'b': 1})
+        cache = FileHashCache()
+        cache.get_hash(a)
+        cache.get_hash(b)
+        cache.prune([a])
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.get_hash(os.path.join(self.temp_dir, 'missing.json')), '')
+
+
+class TestSyncNoop(unittest.TestCase):
+    """测试无变更同步不重复哈希、不重写元数据"""
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        self.notes_dir = os.path.join(root, 'notes')
+        self.sync_dir = os.path.join(root, 'sync')
+        os.makedirs(self.notes_dir)
+        for i in range(5):
+            _write(os.path.join(self.notes_dir, f'note_{i}.json'), {'id': i})
+
+    def _engine(self):
+        from features.sync.engine import SyncEngine
+        from features.sync.local_client import LocalSyncClient
+        engine = SyncEngine(self.notes_dir)
+        engine.set_client(LocalSyncClient(self.sync_dir))
+        return engine
+
+    def test_second_sync_uses_cache(self):
+        """首次同步上传全部文件，再次同步无变更且不读取本地文件"""
+        summary = self._engine()._do_sync()
+        self.assertEqual(summary['uploaded'], 5)
+        self.assertEqual(len([f for f in os.listdir(self.sync_dir) if f.startswith('note_')]), 5)
+
+        engine = self._engine()
+        # 远端由新客户端（内存缓存）计算，本地完全命中持久化缓存
+        summary = engine._do_sync()
+        self.assertEqual(summary, {'uploaded': 0, 'downloaded': 0, 'merged': 0, 'conflicts': 0, 'errors': 0,
+                                   'failed': []})
+        self.assertEqual(engine.metadata.hash_cache.hits, 5)
+        self.assertEqual(engine.metadata.hash_cache.misses, 0)
+
+    def test_noop_sync_skips_metadata_write(self):
+        """无变更时不重写元数据文件"""
+        self._engine()._do_sync()
+        metadata_file = os.path.join(self.notes_dir, 'sync_metadata.json')
+        mtime = os.stat(metadata_file).st_mtime_ns
+        engine = self._engine()
+        with patch('features.sync.metadata.json.dump') as dump:
+            engine._do_sync()
+        dump.assert_not_called()
+        self.assertEqual(os.stat(metadata_file).st_mtime_ns, mtime)
+
+
+class TestWebDAVListing(unittest.TestCase):
+    """测试一次 PROPFIND 获取远端状态"""
+
+    def setUp(self):
+        from webdav_server import WebDAVTestServer
+        self.server = WebDAVTestServer().start()
+        self.addCleanup(self.server.stop)
+        for i in range(20):
+            self.server.put_file(f'/StickyNote/note_{i}.json', b'{"id": %d}' % i)
+        self.server.put_file('/StickyNote/other.txt', b'x')
+        self.server.put_file('/StickyNote/note_空格 1.json', b'{}')
+
+    def _client(self):
+        from features.sync.webdav_client import WebDAVClient
+        return WebDAVClient(self.server.url, 'user', 'pass', '/StickyNote/')
+
+    def test_single_propfind_for_all_files(self):
+        """获取全部远端哈希只发起一次请求"""
+        from webdav_server import WebDAVTestServer
+        hashes = self._client().get_file_hashes()
+        self.assertEqual(len(hashes), 21)
+        self.assertEqual(hashes['note_3.json'], WebDAVTestServer.etag(b'{"id": 3}'))
+        self.assertIn('note_空格 1.json', hashes)
+        self.assertEqual(len(self.server.requests), 1)
+        method, path, headers = self.server.requests[0]
+        self.assertEqual((method, path, headers.get('Depth')), ('PROPFIND', '/StickyNote/', '1'))
+
+    def test_listing_includes_size_and_mtime(self):
+        """列表包含大小与修改时间，不包含目录本身"""
+        files = self._client().list_remote_files()
+        self.assertEqual(files['note_12.json']['size'], len(b'{"id": 12}'))
+        self.assertAlmostEqual(files['note_12.json']['last_modified'], time.time(), delta=60)
+        self.assertNotIn('StickyNote', files)
+
+    def test_listing_failure_raises(self):
+        """远端目录不可用时抛出异常，而非返回空结果导致误删本地文件"""
+        from features.sync.webdav_client import WebDAVClient
+        client = WebDAVClient(self.server.url, 'user', 'pass', '/Missing/')
+        with self.assertRaises(Exception):
+            client.get_file_hashes()
+
+    def test_streaming_parser_handles_split_chunks(self):
+        """响应体被任意切分时解析结果不变"""
+        import requests
+        from features.sync.webdav_client import PROPFIND_BODY, parse_propfind_stream
+        body = requests.request('PROPFIND', self.server.url + '/StickyNote/',
+                                data=PROPFIND_BODY, headers={'Depth': '1'}).content
+        whole = parse_propfind_stream([body])
+        split = parse_propfind_stream(body[i:i + 7] for i in range(0, len(body), 7))
+        self.assertEqual(whole, split)
+        self.assertEqual(len(whole), 23)
+
+
+class TestRemoteManifest(unittest.TestCase):
+    """测试远端清单使变更检测以内容哈希对比"""
+
+    def setUp(self):
+        from webdav_server import WebDAVTestServer
+        self.server = WebDAVTestServer().start()
+        self.addCleanup(self.server.stop)
+        self.notes_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.notes_dir, ignore_errors=True)
+        for i in range(5):
+            _write(os.path.join(self.notes_dir, f'note_{i}.json'), {'id': i})
+
+    def _engine(self):
+        from features.sync.engine import SyncEngine
+        from features.sync.webdav_client import WebDAVClient
+        engine = SyncEngine(self.notes_dir)
+        engine.set_client(WebDAVClient(self.server.url, 'user', 'pass', '/StickyNote/'))
+        return engine
+
+    def _manifest(self):
+        from features.sync.manifest import RemoteManifest
+        return RemoteManifest.from_bytes(self.server.files['/StickyNote/sync_manifest.json'][0])
+
+    def test_unchanged_notes_skip_transfers(self):
+        """ETag 经清单还原为 SHA-256 后，未变化的便签不再下载"""
+        self.assertEqual(self._engine()._do_sync()['uploaded'], 5)
+        manifest = self._manifest()
+        self.assertEqual(len(manifest.files), 5)
+        entry = manifest.files['note_0.json']
+        self.assertEqual(entry['version'], 1)
+        self.assertEqual(entry['size'], os.path.getsize(os.path.join(self.notes_dir, 'note_0.json')))
+
+        self.server.requests.clear()
+        summary = self._engine()._do_sync()
+        self.assertEqual(summary, {'uploaded': 0, 'downloaded': 0, 'merged': 0, 'conflicts': 0, 'errors': 0,
+                                   'failed': []})
+        methods = [m for m, _p, _h in self.server.requests]
+        self.assertEqual(methods, ['PROPFIND', 'GET'])  # 列表 + 读取清单
+
+    def test_foreign_remote_change_downloaded(self):
+        """绕过清单修改的远端文件按 ETag 判定为已变化"""
+        self._engine()._do_sync()
+        self.server.put_file('/StickyNote/note_2.json', b'{"id": 2, "edited": true}')
+        summary = self._engine()._do_sync()
+        self.assertEqual(summary['downloaded'], 1)
+        with open(os.path.join(self.notes_dir, 'note_2.json'), 'rb') as f:
+            self.assertEqual(f.read(), b'{"id": 2, "edited": true}')
+        self.assertEqual(self._manifest().files['note_2.json']['version'], 1)
+
+    def test_manifest_written_atomically_and_versioned(self):
+        """清单经临时文件 MOVE 覆盖写入，重新上传时版本号递增"""
+        self._engine()._do_sync()
+        self.assertEqual(self.server.count('MOVE'), 1)
+        self.assertFalse([p for p in self.server.files if p.endswith('.tmp')])
+        generation = self._manifest().generation
+
+        _write(os.path.join(self.notes_dir, 'note_1.json'), {'id': 1, 'v': 2}, age=1800)
+        self.assertEqual(self._engine()._do_sync()['uploaded'], 1)
+        manifest = self._manifest()
+        self.assertEqual(manifest.files['note_1.json']['version'], 2)
+        self.assertEqual(manifest.files['note_0.json']['version'], 1)
+        self.assertEqual(manifest.generation, generation + 1)
+
+
+class TestParallelTransfers(unittest.TestCase):
+    """测试并行传输池"""
+
+    def setUp(self):
+        from webdav_server import WebDAVTestServer
+        self.server = WebDAVTestServer(latency=0.05).start()
+        self.addCleanup(self.server.stop)
+        self.notes_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.notes_dir, ignore_errors=True)
+        for i in range(12):
+            _write(os.path.join(self.notes_dir, f'note_{i}.json'), {'id': i})
+
+    def _engine(self, max_transfers):
+        from features.sync.engine import SyncEngine
+        from features.sync.webdav_client import WebDAVClient
+        engine = SyncEngine(self.notes_dir)
+        engine.max_transfers = max_transfers
+        engine.set_client(WebDAVClient(self.server.url, 'user', 'pass', '/StickyNote/'))
+        return engine
+
+    def test_transfers_run_concurrently_on_bounded_connections(self):
+        """上传并行执行，且并发与连接数不超过上限"""
+        summary = self._engine(4)._do_sync()
+        self.assertEqual(summary['uploaded'], 12)
+        self.assertEqual(self.server.max_in_flight, 4)
+        self.assertLessEqual(len(self.server.connections), 4)
+
+    def test_bookkeeping_serialized_on_sync_thread(self):
+        """元数据更新只在同步线程中执行"""
+        import threading
+        engine = self._engine(4)
+        threads = set()
+        original = engine.metadata.update_file_meta
+
+        def record(*args, **kwargs):
+            threads.add(threading.get_ident())
+            original(*args, **kwargs)
+
+        engine.metadata.update_file_meta = record
+        engine._do_sync()
+        self.assertEqual(threads, {threading.get_ident()})
+
+    def test_parallel_download_roundtrip(self):
+        """并行下载的内容与远端一致"""
+        self._engine(4)._do_sync()
+        for i in range(12):
+            os.remove(os.path.join(self.notes_dir, f'note_{i}.json'))
+        os.remove(os.path.join(self.notes_dir, 'sync_metadata.json'))
+        summary = self._engine(4)._do_sync()
+        self.assertEqual(summary['downloaded'], 12)
+        with open(os.path.join(self.notes_dir, 'note_7.json'), 'rb') as f:
+            self.assertEqual(f.read(), self.server.files['/StickyNote/note_7.json'][0])
+
+
+class TestPackSync(unittest.TestCase):
+    """测试 pack 模式同步与 repack"""
+
+    def setUp(self):
+        from webdav_server import WebDAVTestServer
+        self.server = WebDAVTestServer().start()
+        self.addCleanup(self.server.stop)
+        self.notes_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.notes_dir, ignore_errors=True)
+        for i in range(30):
+            _write(os.path.join(self.notes_dir, f'note_{i}.json'), {'id': i, 'text': '内容' * 50})
+
+    def _client(self):
+        from features.sync.webdav_client import WebDAVClient
+        return WebDAVClient(self.server.url, 'user', 'pass', '/StickyNote/')
+
+    def _engine(self, notes_dir=None):
+        from features.sync.engine import SyncEngine
+        engine = SyncEngine(notes_dir or self.notes_dir, mode='pack')
+        engine.set_client(self._client())
+        return engine
+
+    def _packs(self):
+        return [p for p in self.server.files if p.endswith('.pack')]
+
+    def test_request_count_independent_of_note_count(self):
+        """首次上传与另一台设备的全量下载都只需少量请求"""
+        summary = self._engine()._do_sync()
+        self.assertEqual(summary['uploaded'], 30)
+        self.assertEqual(len(self._packs()), 1)
+        self.assertLessEqual(len(self.server.requests), 4)  # 读索引 + pack + 索引 PUT/MOVE
+
+        other_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, other_dir, ignore_errors=True)
+        self.server.requests.clear()
+        summary = self._engine(other_dir)._do_sync()
+        self.assertEqual(summary['downloaded'], 30)
+        self.assertEqual([m for m, _p, _h in self.server.requests], ['GET', 'GET'])
+        with open(os.path.join(other_dir, 'note_5.json'), 'rb') as a, \
+                open(os.path.join(self.notes_dir, 'note_5.json'), 'rb') as b:
+            self.assertEqual(a.read(), b.read())
+        self.assertTrue(os.path.exists(os.path.join(other_dir, 'sync_pack_metadata.json')))
+        self.assertFalse(os.path.exists(os.path.join(other_dir, 'sync_metadata.json')))
+
+    def test_incremental_sync_pushes_one_small_pack(self):
+        """只修改一篇便签时只上传包含该便签的新 pack"""
+        self._engine()._do_sync()
+        _write(os.path.join(self.notes_dir, 'note_3.json'), {'id': 3, 'text': 'changed'}, age=1800)
+        summary = self._engine()._do_sync()
+        self.assertEqual(summary['uploaded'], 1)
+        self.assertFalse(summary['repack_needed'])
+        self.assertEqual(len(self._packs()), 2)
+        self.assertEqual(self._engine()._do_sync()['uploaded'], 0)
+
+    def test_repack_collects_superseded_objects(self):
+        """大部分对象被替代后 repack 重写存活对象，退役 pack 过宽限期后删除"""
+        import time as _time
+        from features.sync.pack import PackStore, RETIRED_PACK_GRACE_SECONDS
+        self._engine()._do_sync()
+        first_pack = self._packs()[0]
+        for i in range(20):
+            _write(os.path.join(self.notes_dir, f'note_{i}.json'), {'id': i, 'v': 2}, age=1800)
+        self.assertTrue(self._engine()._do_sync()['repack_needed'])
+
+        store = PackStore(self._client())
+        self.assertEqual(store.repack()['repacked'], 1)
+        self.assertIn(first_pack, self.server.files)  # 宽限期内保留
+        stats = store.repack(now=_time.time() + RETIRED_PACK_GRACE_SECONDS + 1)
+        self.assertEqual(stats['deleted'], 1)
+        self.assertNotIn(first_pack, self.server.files)
+
+        other_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, other_dir, ignore_errors=True)
+        self.assertEqual(self._engine(other_dir)._do_sync()['downloaded'], 30)
+        with open(os.path.join(other_dir, 'note_25.json'), encoding='utf-8') as f:
+            self.assertEqual(json.load(f)['id'], 25)
+
+    def test_concurrent_index_writes_not_lost(self):
+        """两台设备基于同一索引写入时，后写入方重放修改而不是覆盖前者"""
+        from features.sync.pack import PackStore
+        self._engine()._do_sync()
+        self.server.requests.clear()
+        store = PackStore(self._client())
+        first = store.load_index()
+        second = store.load_index()
+        first.record('note_1.json', 'a' * 64, 1)
+        self.assertEqual(store.save_index(first), [])
+        second.record('note_2.json', 'b' * 64, 1)
+        second.remove('note_3.json')
+        self.assertEqual(store.save_index(second), [])
+
+        remote = store.load_index()
+        self.assertEqual(remote.notes['note_1.json']['sha256'], 'a' * 64)
+        self.assertEqual(remote.notes['note_2.json']['sha256'], 'b' * 64)
+        self.assertNotIn('note_3.json', remote.notes)
+        puts = [h for m, p, h in self.server.requests if m == 'PUT' and p.endswith('pack_index.json')]
+        self.assertEqual(len(puts), 3)  # 第二台设备冲突一次后重试
+        self.assertTrue(all('If-Match' in h for h in puts))
+
+    def test_concurrent_edit_of_same_note_rejected(self):
+        """其他设备已修改同一便签时放弃本地修改，留待下次同步按冲突处理"""
+        from features.sync.pack import PackStore
+        self._engine()._do_sync()
+        store = PackStore(self._client())
+        first = store.load_index()
+        second = store.load_index()
+        first.record('note_1.json', 'a' * 64, 1)
+        store.save_index(first)
+        second.record('note_1.json', 'b' * 64, 1)
+        self.assertEqual(store.save_index(second), ['note_1.json'])
+        self.assertEqual(store.load_index().notes['note_1.json']['sha256'], 'a' * 64)
+
+    def test_first_index_created_conditionally(self):
+        """两台设备同时创建索引时，后创建方不覆盖先创建的索引"""
+        from features.sync.pack import PackStore
+        store = PackStore(self._client())
+        first = store.load_index()
+        second = store.load_index()
+        self.assertEqual(first.etag, '')
+        first.record('note_1.json', 'a' * 64, 1)
+        store.save_index(first)
+        second.record('note_2.json', 'b' * 64, 1)
+        store.save_index(second)
+        self.assertEqual(set(store.load_index().notes), {'note_1.json', 'note_2.json'})
+        puts = [h for m, p, h in self.server.requests if m == 'PUT' and p.endswith('pack_index.json')]
+        self.assertEqual(puts[0].get('If-None-Match'), '*')
+
+    def test_pack_sync_keeps_other_device_changes(self):
+        """pack 同步期间其他设备写入索引，双方的便签都保留"""
+        from features.sync.pack import PackStore
+        self._engine()._do_sync()
+        other_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, other_dir, ignore_errors=True)
+        self._engine(other_dir)._do_sync()
+        _write(os.path.join(self.notes_dir, 'note_3.json'), {'id': 3, 'v': 2}, age=1800)
+        _write(os.path.join(other_dir, 'note_4.json'), {'id': 4, 'v': 2}, age=1800)
+
+        real_save = PackStore.save_index
+        calls = []
+
+        def racing_save(store, index):
+            if not calls:
+                calls.append(1)
+                self._engine(other_dir)._do_sync()
+            return real_save(store, index)
+
+        with patch('features.sync.pack.PackStore.save_index', racing_save):
+            summary = self._engine()._do_sync()
+        self.assertEqual((summary['uploaded'], summary['errors']), (1, 0))
+        self.assertEqual(self._engine()._do_sync()['downloaded'], 1)
+        with open(os.path.join(self.notes_dir, 'note_4.json'), encoding='utf-8') as f:
+            self.assertEqual(json.load(f)['v'], 2)
+        self.assertEqual(self._engine(other_dir)._do_sync()['downloaded'], 1)
+        with open(os.path.join(other_dir, 'note_3.json'), encoding='utf-8') as f:
+            self.assertEqual(json.load(f)['v'], 2)
+
+    def test_repack_retries_on_index_conflict(self):
+        """repack 写索引冲突时基于最新索引重新计算，不丢失其他设备的修改"""
+        from features.sync.pack import PackStore
+        self._engine()._do_sync()
+        for i in range(20):
+            _write(os.path.join(self.notes_dir, f'note_{i}.json'), {'id': i, 'v': 2}, age=1800)
+        self._engine()._do_sync()
+
+        store = PackStore(self._client())
+        real_load = store.load_index
+        loads = []
+
+        def racing_load():
+            index = real_load()
+            if not loads:
+                other = real_load()
+                other.record('note_new.json', 'c' * 64, 1)
+                PackStore(self._client()).save_index(other)
+            loads.append(index)
+            return index
+
+        with patch.object(store, 'load_index', side_effect=racing_load):
+            self.assertEqual(store.repack()['repacked'], 1)
+        self.assertEqual(len(loads), 2)
+        remote = store.load_index()
+        self.assertIn('note_new.json', remote.notes)
+        self.assertEqual(len(remote.packs), 2)
+        self.assertEqual(len(remote.retired), 1)
+        self.assertEqual(len(self._packs()), 3)  # 退役 pack 在宽限期内保留，冲突重试未留下孤立 pack
+
+    def test_corrupt_pack_rejected(self):
+        """pack 内容与哈希不符时拒绝解包"""
+        from features.sync.pack import build_pack, read_pack
+        import hashlib
+        data = b'{"id": 1}'
+        _name, packed = build_pack({hashlib.sha256(data).hexdigest(): data})
+        self.assertEqual(list(read_pack(packed).values()), [data])
+        with self.assertRaises(ValueError):
+            read_pack(build_pack({'00' * 32: data})[1])
+
+
+class TestThreeWayMerge(unittest.TestCase):
+    """测试便签逐字段三向合并"""
+
+    def test_diff3_non_overlapping_and_overlapping(self):
+        """不重叠的修改自动合并，重叠修改报告冲突"""
+        from features.sync.merge import merge_text
+        base = 'a\nb\nc\nd\n'
+        self.assertEqual(merge_text(base, 'A\nb\nc\nd\n', 'a\nb\nc\nD\n'), 'A\nb\nc\nD\n')
+        self.assertEqual(merge_text(base, 'a\nb\nc\nd\ne\n', 'x\na\nb\nc\nd\n'), 'x\na\nb\nc\nd\ne\n')
+        self.assertIsNone(merge_text(base, 'a\nB1\nc\nd\n', 'a\nB2\nc\nd\n'))
+
+    def test_fields_merged_independently(self):
+        """一端移动位置、另一端修改文本与标签时两者都保留"""
+        from features.sync.merge import merge_note_data
+        base = {'title': 't', 'plain_content': 'one\ntwo\n', 'tags': ['a', 'b'],
+                'geometry': {'x': 0, 'y': 0, 'width': 100, 'height': 100}}
+        local = dict(base, geometry={'x': 50, 'y': 60, 'width': 100, 'height': 100}, tags=['a', 'b', 'c'])
+        remote = dict(base, plain_content='one\ntwo\nthree\n', tags=['b'])
+        result = merge_note_data(base, local, remote)
+        self.assertTrue(result.clean)
+        self.assertEqual(result.merged['geometry']['x'], 50)
+        self.assertEqual(result.merged['plain_content'], 'one\ntwo\nthree\n')
+        self.assertEqual(result.merged['tags'], ['b', 'c'])
+
+    def test_scalar_both_changed_uses_preferred_side(self):
+        """双方修改同一标量字段时采用优先方，不视为冲突"""
+        from features.sync.merge import merge_note_data
+        result = merge_note_data({'opacity': 0.9}, {'opacity': 0.5}, {'opacity': 0.7}, prefer='remote')
+        self.assertTrue(result.clean)
+        self.assertEqual(result.merged['opacity'], 0.7)
+
+    def test_qt_rich_text_paragraphs_merge(self):
+        """Qt 富文本按段落合并，纯文本随合并后的 HTML 更新"""
+        from PyQt5.QtWidgets import QApplication
+        from PyQt5.QtGui import QTextDocument
+        from features.sync.merge import merge_note_data
+        app = QApplication.instance() or QApplication([])
+
+        def note(*paragraphs):
+            doc = QTextDocument()
+            doc.setHtml(''.join(f'<p>{p}</p>' for p in paragraphs))
+            return {'content': doc.toHtml(), 'plain_content': doc.toPlainText()}
+
+        base = note('第一段', '第二段', '第三段')
+        local = note('第一段（本地）', '第二段', '第三段')
+        remote = note('第一段', '第二段', '第三段（远端）')
+        result = merge_note_data(base, local, remote)
+        self.assertTrue(result.clean)
+        self.assertEqual(result.merged['plain_content'], '第一段（本地）\n第二段\n第三段（远端）')
+        del app
+
+
+class TestConflictMergeSync(unittest.TestCase):
+    """测试同步冲突走三向合并，仅重叠修改产生冲突副本"""
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        self.sync_dir = os.path.join(root, 'sync')
+        self.dir_a = os.path.join(root, 'a')
+        self.dir_b = os.path.join(root, 'b')
+        os.makedirs(self.dir_a)
+        os.makedirs(self.dir_b)
+        self.base = {'title': 't', 'plain_content': 'one\ntwo\nthree\n',
+                     'geometry': {'x': 0, 'y': 0, 'width': 100, 'height': 100}}
+        _write(os.path.join(self.dir_a, 'note_1.json'), self.base)
+        self._engine(self.dir_a)._do_sync()
+        self._engine(self.dir_b)._do_sync()
+
+    def _engine(self, notes_dir):
+        from features.sync.engine import SyncEngine
+        from features.sync.local_client import LocalSyncClient
+        engine = SyncEngine(notes_dir)
+        engine.set_client(LocalSyncClient(self.sync_dir))
+        return engine
+
+    def _read(self, notes_dir):
+        with open(os.path.join(notes_dir, 'note_1.json'), encoding='utf-8') as f:
+            return json.load(f)
+
+    def test_geometry_and_text_edits_merged(self):
+        """A 移动便签、B 修改文本，双方同步后内容一致且无冲突副本"""
+        _write(os.path.join(self.dir_a, 'note_1.json'),
+               dict(self.base, geometry={'x': 300, 'y': 0, 'width': 100, 'height': 100}), age=1800)
+        _write(os.path.join(self.dir_b, 'note_1.json'),
+               dict(self.base, plain_content='one\ntwo\nthree\nfour\n'), age=1800)
+        self._engine(self.dir_a)._do_sync()
+        engine_b = self._engine(self.dir_b)
+        summary = engine_b._do_sync()
+        self.assertEqual((summary['merged'], summary['conflicts']), (1, 0))
+        self._engine(self.dir_a)._do_sync()
+
+        for notes_dir in (self.dir_a, self.dir_b):
+            data = self._read(notes_dir)
+            self.assertEqual(data['geometry']['x'], 300)
+            self.assertEqual(data['plain_content'], 'one\ntwo\nthree\nfour\n')
+        self.assertFalse(os.path.exists(os.path.join(self.dir_b, 'sync_conflicts')))
+        self.assertEqual(engine_b.metadata.merge_stats()['conflict_rate'], 0.0)
+
+    def test_overlapping_edits_create_conflict_copy(self):
+        """同一行被双方修改时保留一方，另一方保存为冲突副本，并计入冲突率"""
+        _write(os.path.join(self.dir_a, 'note_1.json'),
+               dict(self.base, plain_content='one\nTWO-A\nthree\n'), age=1800)
+        _write(os.path.join(self.dir_b, 'note_1.json'),
+               dict(self.base, plain_content='one\nTWO-B\nthree\n'), age=1800)
+        self._engine(self.dir_a)._do_sync()
+        engine_b = self._engine(self.dir_b)
+        summary = engine_b._do_sync()
+        self.assertEqual((summary['merged'], summary['conflicts']), (0, 1))
+        copies = os.listdir(os.path.join(self.dir_b, 'sync_conflicts'))
+        self.assertEqual(len(copies), 1)
+        self.assertTrue(copies[0].startswith('note_1.conflict_'))
+        self.assertEqual(engine_b.metadata.merge_stats()['conflict_rate'], 1.0)
+
+
+class TestIncrementalSync(unittest.TestCase):
+    """测试保存/删除事件驱动的增量同步"""
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        self.notes_dir = os.path.join(root, 'notes')
+        self.sync_dir = os.path.join(root, 'sync')
+        os.makedirs(self.notes_dir)
+        for i in range(20):
+            _write(os.path.join(self.notes_dir, f'note_{i}.json'), {'id': i})
+        self.engine = self._engine()
+        self.engine._do_sync()
+
+    def _engine(self):
+        from features.sync.engine import SyncEngine
+        from features.sync.local_client import LocalSyncClient
+        engine = SyncEngine(self.notes_dir)
+        engine.set_client(LocalSyncClient(self.sync_dir))
+        return engine
+
+    def _remote(self, filename):
+        path = os.path.join(self.sync_dir, filename)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def test_only_dirty_notes_hashed(self):
+        """增量同步只读取脏便签，不扫描其他本地文件"""
+        _write(os.path.join(self.notes_dir, 'note_3.json'), {'id': 3, 'v': 2}, age=1800)
+        engine = self._engine()
+        real_listdir = os.listdir
+        with patch('features.sync.metadata.os.listdir', side_effect=real_listdir) as listdir:
+            summary = engine._do_sync({'note_3.json'})
+        self.assertNotIn(self.notes_dir, [c.args[0] for c in listdir.call_args_list])
+        self.assertEqual(summary['uploaded'], 1)
+        self.assertEqual(engine.metadata.hash_cache.hits + engine.metadata.hash_cache.misses, 1)
+        self.assertEqual(self._remote('note_3.json')['v'], 2)
+
+    def test_deleted_note_removed_remotely(self):
+        """删除事件把删除同步到远端"""
+        os.remove(os.path.join(self.notes_dir, 'note_5.json'))
+        summary = self._engine()._do_sync({'note_5.json'})
+        self.assertEqual(summary['errors'], 0)
+        self.assertIsNone(self._remote('note_5.json'))
+        self.assertIsNotNone(self._remote('note_6.json'))
+
+    def test_quiet_period_coalesces_saves(self):
+        """静默期内的多次保存合并为一次增量同步"""
+        from PyQt5.QtCore import QCoreApplication
+        app = QCoreApplication.instance() or QCoreApplication([])
+        engine = self.engine
+        engine.quiet_period_ms = 50
+        started = []
+        done = []
+        engine.sync_started.connect(lambda: started.append(set(engine._in_flight)))
+        engine.sync_completed.connect(done.append)
+
+        for v in range(3):
+            _write(os.path.join(self.notes_dir, 'note_1.json'), {'id': 1, 'v': v}, age=1800 - v)
+            engine.notify_note_changed(os.path.join(self.notes_dir, 'note_1.json'))
+        engine.notify_note_deleted('note_2.json')
+        os.remove(os.path.join(self.notes_dir, 'note_2.json'))
+        engine.notify_note_changed('sync_metadata.json')  # 非便签文件被忽略
+        self.assertEqual(engine.pending_changes(), {'note_1.json', 'note_2.json'})
+
+        deadline = time.time() + 10
+        while not done and time.time() < deadline:
+            app.processEvents()
+            time.sleep(0.01)
+        engine._worker.wait()
+        self.assertEqual(started, [{'note_1.json', 'note_2.json'}])
+        self.assertEqual(done[0]['uploaded'], 1)
+        self.assertEqual(engine.pending_changes(), set())
+        self.assertEqual(self._remote('note_1.json')['v'], 2)
+        self.assertIsNone(self._remote('note_2.json'))
+
+    def test_failed_notes_stay_dirty(self):
+        """上传失败的便签在同步完成后仍为脏便签，成功的便签不再待同步"""
+        from features.sync.local_client import LocalSyncClient
+        from PyQt5.QtCore import QCoreApplication
+        app = QCoreApplication.instance() or QCoreApplication([])
+        for i in (3, 4):
+            _write(os.path.join(self.notes_dir, f'note_{i}.json'), {'id': i, 'v': 2}, age=1800)
+            self.engine.notify_note_changed(f'note_{i}.json')
+        self.engine._quiet_timer.stop()
+        real_put = LocalSyncClient.put_file
+
+        def failing_put(client, local_path, filename, **conditions):
+            if filename == 'note_3.json':
+                raise OSError('磁盘已满')
+            return real_put(client, local_path, filename, **conditions)
+
+        done = []
+        self.engine.sync_completed.connect(done.append)
+        with patch.object(LocalSyncClient, 'put_file', failing_put):
+            self.engine._flush_dirty()
+            self.engine._worker.wait()
+        app.processEvents()
+        self.assertEqual(done[0]['failed'], ['note_3.json'])
+        self.assertEqual(self.engine.pending_changes(), {'note_3.json'})
+        self.assertFalse(self.engine._quiet_timer.isActive())
+
+    def test_aborted_sync_restores_dirty(self):
+        """中止的同步不发出完成信号，本次的脏便签全部留待重试"""
+        from PyQt5.QtCore import QCoreApplication
+        app = QCoreApplication.instance() or QCoreApplication([])
+        engine = self.engine
+        engine.notify_note_changed('note_1.json')
+        engine._quiet_timer.stop()
+
+        def aborted_sync(only):
+            engine._worker.abort()
+            return {}
+
+        with patch.object(engine, '_do_sync', side_effect=aborted_sync):
+            engine._flush_dirty()
+            self.assertEqual(engine.pending_changes(), set())
+            engine._worker.wait()
+        app.processEvents()
+        self.assertEqual(engine.pending_changes(), {'note_1.json'})
+        self.assertEqual(engine._in_flight, set())
+
+    def test_download_invalidates_note_cache(self):
+        """下载了远端内容的同步使便签数据缓存失效，纯上传不影响缓存"""
+        from features.performance import get_note_cache
+        cache = get_note_cache()
+        cache.put(1, {'id': 1})
+        self.engine._on_sync_completed({'uploaded': 1, 'downloaded': 0, 'merged': 0,
+                                        'conflicts': 0, 'errors': 0})
+        self.assertIsNotNone(cache.get(1))
+        self.engine._on_sync_completed({'uploaded': 0, 'downloaded': 1, 'merged': 0,
+                                        'conflicts': 0, 'errors': 0})
+        self.assertIsNone(cache.get(1))
+
+
+_SLOW_SYNC_SCRIPT = """
+import sys, time
+sys.path.insert(0, sys.argv[1])
+from features.sync.engine import SyncEngine
+from features.sync.local_client import LocalSyncClient
+
+class SlowClient(LocalSyncClient):
+    def put_file(self, local_path, filename, **conditions):
+        time.sleep(0.05)
+        return super().put_file(local_path, filename, **conditions)
+
+engine = SyncEngine(sys.argv[2])
+engine.max_transfers = 1
+engine.set_client(SlowClient(sys.argv[3]))
+engine._do_sync()
+"""
+
+
+class TestResumableSync(unittest.TestCase):
+    """测试同步中断后从检查点继续"""
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        self.notes_dir = os.path.join(root, 'notes')
+        self.sync_dir = os.path.join(root, 'sync')
+        os.makedirs(self.notes_dir)
+        self.names = {f'note_{i}.json' for i in range(60)}
+        for name in self.names:
+            _write(os.path.join(self.notes_dir, name), {'name': name})
+
+    def _remote_notes(self):
+        if not os.path.isdir(self.sync_dir):
+            return set()
+        return {f for f in os.listdir(self.sync_dir) if f.startswith('note_')}
+
+    def test_killed_sync_resumes_without_duplicate_transfers(self):
+        """同步进程被强制终止后，再次同步只传输剩余文件"""
+        import subprocess
+        import sys
+        from features.sync.engine import SyncEngine
+        from features.sync.local_client import LocalSyncClient
+
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        proc = subprocess.Popen([sys.executable, '-c', _SLOW_SYNC_SCRIPT, root, self.notes_dir, self.sync_dir])
+        deadline = time.time() + 30
+        while len(self._remote_notes()) < 15 and time.time() < deadline:
+            time.sleep(0.01)
+        proc.kill()
+        proc.wait()
+
+        transferred = self._remote_notes()
+        self.assertGreaterEqual(len(transferred), 15)
+        self.assertLess(len(transferred), len(self.names))
+        self.assertFalse(os.path.exists(os.path.join(self.notes_dir, 'sync_metadata.json')))
+        self.assertTrue(os.path.exists(os.path.join(self.notes_dir, 'sync_metadata.json.journal')))
+
+        uploads = []
+
+        class CountingClient(LocalSyncClient):
+            def put_file(self, local_path, filename, **conditions):
+                uploads.append(filename)
+                return super().put_file(local_path, filename, **conditions)
+
+            def get_file(self, filename, local_path, if_none_match=None):
+                raise AssertionError(f'不应下载: {filename}')
+
+        engine = SyncEngine(self.notes_dir)
+        engine.set_client(CountingClient(self.sync_dir))
+        summary = engine._do_sync()
+
+        self.assertEqual(summary['errors'], 0)
+        self.assertEqual(set(uploads), self.names - transferred)
+        self.assertEqual(len(uploads), len(set(uploads)))
+        self.assertEqual(self._remote_notes(), self.names)
+        self.assertFalse(os.path.exists(os.path.join(self.notes_dir, 'sync_metadata.json.journal')))
+
+    def test_truncated_journal_line_ignored(self):
+        """日志末行不完整时忽略该行，已完整写入的检查点仍然生效"""
+        from features.sync.metadata import SyncMetadata
+        metadata_file = os.path.join(self.notes_dir, 'sync_metadata.json')
+        metadata = SyncMetadata(metadata_file)
+        metadata.update_file_meta('note_1.json', base_hash='abc')
+        metadata._close_journal()
+        with open(metadata.journal_file, 'a', encoding='utf-8') as f:
+            f.write('{"file":"note_2.json","me')
+
+        reloaded = SyncMetadata(metadata_file)
+        self.assertEqual(reloaded.get_file_meta('note_1.json')['base_hash'], 'abc')
+        self.assertEqual(reloaded.get_file_meta('note_2.json')['status'], 'new')
+        # 加载时已压缩日志
+        self.assertFalse(os.path.exists(reloaded.journal_file))
+        self.assertTrue(os.path.exists(metadata_file))
+
+
+class TestConditionalRequests(unittest.TestCase):
+    """测试 WebDAV 条件请求：If-Match 防止覆盖，412 转入合并，If-None-Match 跳过下载"""
+
+    def setUp(self):
+        from webdav_server import WebDAVTestServer
+        self.server = WebDAVTestServer().start()
+        self.addCleanup(self.server.stop)
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        self.dir_a = os.path.join(root, 'a')
+        self.dir_b = os.path.join(root, 'b')
+        os.makedirs(self.dir_a)
+        os.makedirs(self.dir_b)
+        self.base = {'title': 't', 'plain_content': 'one\ntwo\nthree\n',
+                     'geometry': {'x': 0, 'y': 0, 'width': 100, 'height': 100}}
+        _write(os.path.join(self.dir_a, 'note_1.json'), self.base)
+        self._engine(self.dir_a)._do_sync()
+        self._engine(self.dir_b)._do_sync()
+
+    def _engine(self, notes_dir):
+        from features.sync.engine import SyncEngine
+        from features.sync.webdav_client import WebDAVClient
+        engine = SyncEngine(notes_dir)
+        engine.set_client(WebDAVClient(self.server.url, 'user', 'pass', '/StickyNote/'))
+        return engine
+
+    def _racing_engine(self, notes_dir, concurrent_write):
+        """列出远端之后、上传之前插入另一台设备的写入"""
+        engine = self._engine(notes_dir)
+        listing = engine._client.get_file_hashes
+
+        def list_then_race():
+            state = listing()
+            concurrent_write()
+            return state
+
+        engine._client.get_file_hashes = list_then_race
+        return engine
+
+    def _remote(self, filename):
+        return json.loads(self.server.files['/StickyNote/' + filename][0])
+
+    def test_stale_upload_rejected_and_merged(self):
+        """远端在列出后被修改：If-Match 上传返回 412，合并后再上传，双方修改都保留"""
+        _write(os.path.join(self.dir_a, 'note_1.json'),
+               dict(self.base, geometry={'x': 300, 'y': 0, 'width': 100, 'height': 100}), age=1800)
+        _write(os.path.join(self.dir_b, 'note_1.json'),
+               dict(self.base, plain_content='one\ntwo\nthree\nfour\n'), age=1800)
+        engine_b = self._racing_engine(self.dir_b, lambda: self._engine(self.dir_a)._do_sync())
+
+        summary = engine_b._do_sync()
+        self.assertEqual(self.server.status_count('PUT', 412), 1)
+        self.assertEqual((summary['merged'], summary['conflicts'], summary['errors']), (1, 0, 0))
+        remote = self._remote('note_1.json')
+        self.assertEqual(remote['geometry']['x'], 300)
+        self.assertEqual(remote['plain_content'], 'one\ntwo\nthree\nfour\n')
+
+    def test_new_note_does_not_overwrite_concurrent_create(self):
+        """新便签以 If-None-Match: * 上传，远端同名文件已被创建时保留冲突副本"""
+        _write(os.path.join(self.dir_b, 'note_2.json'), {'title': 'B'}, age=1800)
+        engine_b = self._racing_engine(
+            self.dir_b, lambda: self.server.put_file('/StickyNote/note_2.json', b'{"title": "A"}'))
+
+        summary = engine_b._do_sync()
+        self.assertEqual(self.server.status_count('PUT', 412), 1)
+        self.assertEqual(summary['conflicts'], 1)
+        copies = os.listdir(os.path.join(self.dir_b, 'sync_conflicts'))
+        self.assertEqual(len(copies), 1)
+        titles = {self._remote('note_2.json')['title']}
+        with open(os.path.join(self.dir_b, 'sync_conflicts', copies[0]), encoding='utf-8') as f:
+            titles.add(json.load(f)['title'])
+        self.assertEqual(titles, {'A', 'B'})
+
+    def test_unchanged_manifest_not_downloaded_again(self):
+        """远端清单未变化时 If-None-Match 命中 304，使用本地缓存"""
+        self.server.statuses.clear()
+        summary = self._engine(self.dir_b)._do_sync()
+        self.assertEqual(summary['errors'], 0)
+        self.assertEqual(self.server.status_count('GET', 304), 1)
+        self.assertEqual(self.server.status_count('GET', 200), 0)
+
+    def test_conditional_get_skips_body(self):
+        """get_file 持有相同 ETag 时不传输内容，本地文件保持不变"""
+        from features.sync.webdav_client import WebDAVClient
+        client = WebDAVClient(self.server.url, 'user', 'pass', '/StickyNote/')
+        target = os.path.join(self.dir_b, 'copy.json')
+        etag = client.get_file('note_1.json', target)
+        self.assertTrue(etag)
+        os.remove(target)
+        self.assertIsNone(client.get_file('note_1.json', target, if_none_match=etag))
+        self.assertFalse(os.path.exists(target))
+
+
+def _wait_for(app, predicate, timeout=10):
+    """处理 Qt 事件直到条件满足"""
+    deadline = time.time() + timeout
+    while not predicate() and time.time() < deadline:
+        app.processEvents()
+        time.sleep(0.01)
+    return predicate()
+
+
+class TestWatchedLocalSync(unittest.TestCase):
+    """测试监视同步目录的本地同步客户端"""
+
+    def setUp(self):
+        from PyQt5.QtCore import QCoreApplication
+        self.app = QCoreApplication.instance() or QCoreApplication([])
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        self.notes_dir = os.path.join(root, 'notes')
+        self.sync_dir = os.path.join(root, 'sync')
+        os.makedirs(self.notes_dir)
+        os.makedirs(self.sync_dir)
+        for i in range(10):
+            _write(os.path.join(self.sync_dir, f'note_{i}.json'), {'id': i})
+
+    def _client(self, debounce_ms=100):
+        from features.sync.local_client import LocalSyncClient
+        client = LocalSyncClient(self.sync_dir, watch=True, debounce_ms=debounce_ms)
+        self.addCleanup(client.stop_watching)
+        return client
+
+    def test_piecewise_write_reported_once_after_debounce(self):
+        """分段写入期间不报告，stat 稳定后只报告一次"""
+        client = self._client(debounce_ms=150)
+        reports = []
+        client.watcher.changed.connect(reports.append)
+        path = os.path.join(self.sync_dir, 'note_20.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            for piece in ('{"id": ', '20, ', '"v": 1}'):
+                f.write(piece)
+                f.flush()
+                _wait_for(self.app, lambda: False, timeout=0.05)
+                self.assertEqual(reports, [])
+                self.assertFalse(client.watcher.is_settled('note_20.json'))
+        self.assertTrue(_wait_for(self.app, lambda: reports))
+        _wait_for(self.app, lambda: False, timeout=0.3)
+        self.assertEqual(reports, [{'note_20.json'}])
+
+    def test_only_changed_files_rehashed(self):
+        """首次完整扫描后，只重新哈希外部修改过的文件；自身写入不视为外部修改"""
+        from features.sync.hash_cache import sha256_file
+        client = self._client()
+        first = client.get_file_hashes()
+        self.assertEqual(len(first), 10)
+
+        _write(os.path.join(self.sync_dir, 'note_3.json'), {'id': 3, 'v': 2}, age=1800)
+        self.assertTrue(_wait_for(self.app, lambda: client._changed))
+        with patch('features.sync.hash_cache.sha256_file', wraps=sha256_file) as hasher:
+            second = client.get_file_hashes()
+        self.assertEqual(hasher.call_count, 1)
+        self.assertNotEqual(second['note_3.json'], first['note_3.json'])
+        self.assertEqual({k: v for k, v in second.items() if k != 'note_3.json'},
+                         {k: v for k, v in first.items() if k != 'note_3.json'})
+
+        local = _write(os.path.join(self.notes_dir, 'note_5.json'), {'id': 5, 'v': 3})
+        client.put_file(local, 'note_5.json', if_match=second['note_5.json'])
+        _wait_for(self.app, lambda: False, timeout=0.3)
+        self.assertEqual(client._changed, set())
+
+    def test_copies_are_atomic(self):
+        """写入经临时文件 os.replace 完成，不留下临时文件"""
+        from features.sync import local_client
+        client = self._client()
+        local = _write(os.path.join(self.notes_dir, 'note_1.json'), {'id': 1, 'v': 2})
+        with patch.object(local_client.os, 'replace', wraps=os.replace) as replace:
+            client.put_file(local, 'note_1.json')
+            client.get_file('note_2.json', os.path.join(self.notes_dir, 'note_2.json'))
+        self.assertEqual(replace.call_count, 2)
+        for directory in (self.sync_dir, self.notes_dir):
+            self.assertFalse([f for f in os.listdir(directory) if f.endswith('.sync_tmp')])
+
+    def test_external_change_triggers_incremental_sync(self):
+        """外部修改稳定后，同步引擎只同步该便签"""
+        from features.sync.engine import SyncEngine
+        engine = SyncEngine(self.notes_dir)
+        engine.set_client(self._client())
+        engine.quiet_period_ms = 10
+        engine._do_sync()
+        runs = []
+        engine.sync_started.connect(lambda: runs.append(set(engine._in_flight)))
+
+        _write(os.path.join(self.sync_dir, 'note_4.json'), {'id': 4, 'v': 9}, age=1800)
+        self.assertTrue(_wait_for(self.app, lambda: runs and not engine._worker.isRunning()))
+        engine._worker.wait()
+        self.assertEqual(runs, [{'note_4.json'}])
+        with open(os.path.join(self.notes_dir, 'note_4.json'), encoding='utf-8') as f:
+            self.assertEqual(json.load(f)['v'], 9)
+
+
+class TestSelectiveSync(unittest.TestCase):
+    """测试按标签/置顶/ID 筛选的选择性同步"""
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        self.notes_dir = os.path.join(root, 'notes')
+        self.work_dir = os.path.join(root, 'work')
+        self.home_dir = os.path.join(root, 'home')
+        os.makedirs(self.notes_dir)
+        self.catalog = {}
+        for i in range(10):
+            data = {'id': i, 'tags': ['工作'] if i < 3 else ['生活'], 'pinned': i == 9}
+            _write(os.path.join(self.notes_dir, f'note_{i}.json'), data)
+            self.catalog[f'note_{i}.json'] = data
+
+    def _engine(self, sync_dir, profile=None, catalog=True):
+        from features.sync.engine import SyncEngine
+        from features.sync.local_client import LocalSyncClient
+        from features.sync.profile import SyncProfile
+        engine = SyncEngine(self.notes_dir, profile=SyncProfile.from_dict(profile) if profile else None)
+        if catalog:
+            engine.set_catalog_provider(lambda: self.catalog)
+        engine.set_client(LocalSyncClient(sync_dir))
+        return engine
+
+    def _remote(self, sync_dir):
+        return sorted(f for f in os.listdir(sync_dir) if f.startswith('note_'))
+
+    def test_profile_rules(self):
+        """排除条件优先；设置包含条件时至少命中一项"""
+        from features.sync.profile import SyncProfile
+        profile = SyncProfile(include_tags=['工作'], include_pinned=True, exclude_ids=[2], name='work')
+        self.assertTrue(profile.matches('1', {'tags': ['工作']}))
+        self.assertTrue(profile.matches('9', {'tags': [], 'pinned': True}))
+        self.assertFalse(profile.matches('2', {'tags': ['工作']}))
+        self.assertFalse(profile.matches('5', {'tags': ['生活']}))
+        self.assertTrue(SyncProfile(exclude_tags=['私密']).matches('5', {'tags': ['生活']}))
+        self.assertEqual(SyncProfile().file_suffix(), '')
+        self.assertEqual(SyncProfile(name='公司 盘').file_suffix(), '.公司_盘')
+
+    def test_excluded_notes_not_hashed(self):
+        """只上传匹配的便签，被排除的便签不计算哈希"""
+        from features.sync import hash_cache
+        engine = self._engine(self.work_dir, {'name': 'work', 'include_tags': ['工作']})
+        with patch.object(hash_cache, 'sha256_file', wraps=hash_cache.sha256_file) as digest:
+            summary = engine._do_sync()
+        self.assertEqual(summary['uploaded'], 3)
+        self.assertEqual(self._remote(self.work_dir), ['note_0.json', 'note_1.json', 'note_2.json'])
+        hashed = {os.path.basename(c.args[0]) for c in digest.call_args_list
+                  if os.path.dirname(c.args[0]) == self.notes_dir}
+        self.assertEqual(hashed, {'note_0.json', 'note_1.json', 'note_2.json'})
+
+    def test_profiles_run_side_by_side(self):
+        """多个同步目标使用各自的元数据文件，互不影响"""
+        work = self._engine(self.work_dir, {'name': 'work', 'include_tags': ['工作']})
+        home = self._engine(self.home_dir, {'name': 'home', 'exclude_tags': ['工作']})
+        self.assertEqual(work._do_sync()['uploaded'], 3)
+        self.assertEqual(home._do_sync()['uploaded'], 7)
+        self.assertNotEqual(work.metadata_file, home.metadata_file)
+        self.assertTrue(os.path.exists(work.metadata_file))
+        self.assertTrue(os.path.exists(home.metadata_file))
+
+        # 再次同步均无变更
+        for engine in (self._engine(self.work_dir, {'name': 'work', 'include_tags': ['工作']}),
+                       self._engine(self.home_dir, {'name': 'home', 'exclude_tags': ['工作']})):
+            summary = engine._do_sync()
+            self.assertEqual((summary['uploaded'], summary['downloaded']), (0, 0))
+        self.assertEqual(len(self._remote(self.home_dir)), 7)
+
+    def test_catalog_miss_falls_back_to_file(self):
+        """内存目录中没有的便签从文件读取标签（如刚由其他目标下载的便签）"""
+        engine = self._engine(self.work_dir, {'name': 'work', 'include_tags': ['工作']})
+        _write(os.path.join(self.notes_dir, 'note_20.json'), {'id': 20, 'tags': ['工作']})
+        _write(os.path.join(self.notes_dir, 'note_21.json'), {'id': 21, 'tags': []})
+        engine._do_sync()
+        remote = self._remote(self.work_dir)
+        self.assertIn('note_20.json', remote)
+        self.assertNotIn('note_21.json', remote)
+
+    def test_excluded_local_note_not_overwritten(self):
+        """远端同名文件不会覆盖被排除的本地便签"""
+        os.makedirs(self.work_dir)
+        _write(os.path.join(self.work_dir, 'note_5.json'), {'id': 5, 'remote': True})
+        _write(os.path.join(self.work_dir, 'note_30.json'), {'id': 30, 'tags': ['工作']})
+        engine = self._engine(self.work_dir, {'name': 'work', 'include_tags': ['工作']})
+        summary = engine._do_sync()
+        self.assertEqual(summary['downloaded'], 1)
+        with open(os.path.join(self.notes_dir, 'note_5.json'), encoding='utf-8') as f:
+            self.assertNotIn('remote', json.load(f))
+        self.assertTrue(os.path.exists(os.path.join(self.notes_dir, 'note_30.json')))
+
+
+if __name__ == '__main__':
+    unittest.main()
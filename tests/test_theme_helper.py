@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""主题注册表的单元测试"""
+import unittest
+import os
+import tempfile
+from unittest.mock import patch
+
+
+class TestScopeStylesheet(unittest.TestCase):
+    """测试样式表作用域改写"""
+
+    def test_root_and_descendant_selectors(self):
+        """根选择器作用于便签本身，其余改写为后代选择器"""
+        from features.theme_helper import scope_stylesheet
+        css = '/* Theme Name: X */\nStickyNote { color: red; }\nQPushButton:hover, QLineEdit { color: blue; }'
+        scoped = scope_stylesheet(css, 'theme_x')
+        self.assertIn('StickyNote#theme_x {color: red;}', scoped)
+        self.assertIn('StickyNote#theme_x QPushButton:hover, StickyNote#theme_x QLineEdit {color: blue;}', scoped)
+        self.assertNotIn('Theme Name', scoped)
+
+    def test_scope_name_sanitized(self):
+        """作用域名只包含合法字符"""
+        from features.theme_helper import theme_scope_name
+        self.assertEqual(theme_scope_name('soft_yellow.css'), 'theme_soft_yellow')
+        self.assertEqual(theme_scope_name('my theme-1.css'), 'theme_my_theme_1')
+
+
+class TestThemeRegistry(unittest.TestCase):
+    """测试 ThemeRegistry 只编译一次并共享应用级样式表"""
+
+    @classmethod
+    def setUpClass(cls):
+        from PyQt5.QtWidgets import QApplication
+        cls.app = QApplication.instance()
+        if cls.app is None:
+            cls.app = QApplication([])
+
+    def setUp(self):
+        from features.theme_helper import ThemeRegistry
+        self.registry = ThemeRegistry()
+        self.addCleanup(self.app.setStyleSheet, self.app.styleSheet())
+
+    def test_theme_loaded_once(self):
+        """同一主题只读取、编译一次"""
+        css = 'StickyNote { background-color: #222222; }'
+        with patch('features.theme_helper._load_theme_css', return_value=css) as loader:
+            first = self.registry.get('dark.css')
+            second = self.registry.get('dark.css')
+        self.assertIs(first, second)
+        self.assertEqual(loader.call_count, 1)
+        self.assertTrue(first.is_dark)
+        self.assertEqual(first.scope, 'theme_dark')
+
+    def test_missing_theme_falls_back_to_default(self):
+        """主题文件缺失时使用默认样式"""
+        with patch('features.theme_helper._load_theme_css', return_value=''):
+            theme = self.registry.get('missing.css')
+        self.assertTrue(theme.is_fallback)
+        self.assertFalse(theme.is_dark)
+        self.assertIn('StickyNote#theme_missing', theme.stylesheet)
+
+    def test_extra_css_compiled_into_scope(self):
+        """补充 CSS 与主题一起编译到作用域内"""
+        self.registry.set_extra_css_provider(
+            lambda is_dark: 'QLabel { color: %s; }' % ('white' if is_dark else 'black'))
+        with patch('features.theme_helper._load_theme_css', return_value='StickyNote { background-color: #fff; }'):
+            theme = self.registry.get('light.css')
+        self.assertIn('StickyNote#theme_light QLabel {color: black;}', theme.stylesheet)
+
+    def test_install_only_when_changed(self):
+        """样式表未变化时不重复安装"""
+        with patch('features.theme_helper._load_theme_css', return_value='StickyNote { color: red; }'):
+            self.registry.get('a.css')
+        self.assertTrue(self.registry.install(self.app))
+        self.assertFalse(self.registry.install(self.app))
+        self.assertIn('StickyNote#theme_a', self.app.styleSheet())
+
+
+class TestThemeHotReload(unittest.TestCase):
+    """测试主题热加载的哈希比对与事件合并"""
+
+    def setUp(self):
+        import features.theme_helper as theme_helper
+        self.theme_helper = theme_helper
+        self.styles_dir = tempfile.mkdtemp()
+        patcher = patch('features.theme_helper.get_styles_dir', return_value=self.styles_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        theme_helper.invalidate_cache()
+        self.addCleanup(theme_helper.invalidate_cache)
+
+    def _write(self, name, content):
+        path = os.path.join(self.styles_dir, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+    def test_unchanged_content_ignored(self):
+        """内容未变化（仅触碰文件）不视为变更"""
+        path = self._write('a.css', 'StickyNote { color: red; }')
+        self.theme_helper._load_theme_css('a.css')
+        self._write('a.css', 'StickyNote { color: red; }')
+        self.assertEqual(self.theme_helper.collect_changed_themes([path]), set())
+
+    def test_changed_content_detected_and_invalidated(self):
+        """内容变化的已加载主题被检出并失效"""
+        path = self._write('a.css', 'StickyNote { color: red; }')
+        self.assertIn('red', self.theme_helper._load_theme_css('a.css'))
+        self._write('a.css', 'StickyNote { color: blue; }')
+        self.assertEqual(self.theme_helper.collect_changed_themes([path]), {'a.css'})
+        self.assertIn('blue', self.theme_helper._load_theme_css('a.css'))
+
+    def test_unloaded_theme_ignored(self):
+        """未被加载（无人使用）的主题变化被忽略"""
+        path = self._write('unused.css', 'StickyNote { color: red; }')
+        self.assertEqual(self.theme_helper.collect_changed_themes([path]), set())
+
+    def test_events_coalesced_into_one_callback(self):
+        """多次文件事件合并为一次回调"""
+        path = self._write('a.css', 'StickyNote { color: red; }')
+        self.theme_helper._load_theme_css('a.css')
+        calls = []
+        with patch.object(self.theme_helper, '_reload_callback', calls.append):
+            self._write('a.css', 'StickyNote { color: blue; }')
+            for _ in range(3):
+                self.theme_helper._on_file_changed(path)
+            self.theme_helper._flush_pending_changes()
+        self.assertEqual(calls, [{'a.css'}])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+测试用本地 WebDAV 替身服务器
+
+基于 http.server 的最小 WebDAV 实现（PROPFIND / GET / PUT / DELETE / MOVE / MKCOL），
+文件保存在内存中，记录每个请求及响应状态，可注入固定延迟以模拟慢速网盘。
+GET 支持 If-None-Match（304），PUT 支持 If-Match / If-None-Match: *（412）。
+"""
+
+import hashlib
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, unquote, urlsplit
+from xml.sax.saxutils import escape
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # 响应头与响应体合并发送，避免 Nagle + 延迟确认给每个 keep-alive 请求额外增加 ~40ms
+    wbufsize = 65536
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def dav(self) -> 'WebDAVTestServer':
+        return self.server.dav
+
+    def _path(self) -> str:
+        return unquote(urlsplit(self.path).path)
+
+    def _begin(self) -> str:
+        path = self._path()
+        self.dav.record(self.command, path, dict(self.headers), self.client_address)
+        with self.dav.lock:
+            self.dav.in_flight += 1
+            self.dav.max_in_flight = max(self.dav.max_in_flight, self.dav.in_flight)
+        if self.dav.latency:
+            time.sleep(self.dav.latency)
+        return path
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _reply(self, status: int, body: bytes = b'', headers: dict = None):
+        with self.dav.lock:
+            self.dav.in_flight -= 1
+            self.dav.statuses.append((self.command, self._path(), status))
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body and self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def do_PROPFIND(self):
+        path = self._begin()
+        self._read_body()
+        collection = path.rstrip('/') + '/'
+        with self.dav.lock:
+            if collection not in self.dav.collections:
+                self._reply(404)
+                return
+            files = sorted(
+                (p, data, mtime) for p, (data, mtime) in self.dav.files.items()
+                if p.startswith(collection) and '/' not in p[len(collection):]
+            )
+        parts = ['<?xml version="1.0" encoding="utf-8"?><d:multistatus xmlns:d="DAV:">',
+                 '<d:response><d:href>%s</d:href><d:propstat><d:prop>'
+                 '<d:resourcetype><d:collection/></d:resourcetype></d:prop>'
+                 '<d:status>HTTP/1.1 200 OK</d:status></d:propstat></d:response>' % escape(quote(collection))]
+        for p, data, mtime in files:
+            parts.append(
+                '<d:response><d:href>%s</d:href><d:propstat><d:prop><d:resourcetype/>'
+                '<d:getetag>%s</d:getetag><d:getcontentlength>%d</d:getcontentlength>'
+                '<d:getlastmodified>%s</d:getlastmodified></d:prop>'
+                '<d:status>HTTP/1.1 200 OK</d:status></d:propstat></d:response>'
+                % (escape(quote(p)), escape(WebDAVTestServer.etag(data)), len(data),
+                   formatdate(mtime, usegmt=True)))
+        parts.append('</d:multistatus>')
+        self._reply(207, ''.join(parts).encode('utf-8'),
+                    {'Content-Type': 'application/xml; charset=utf-8'})
+
+    def do_GET(self):
+        path = self._begin()
+        with self.dav.lock:
+            entry = self.dav.files.get(path)
+        if entry is None:
+            self._reply(404)
+            return
+        etag = WebDAVTestServer.etag(entry[0])
+        if self.headers.get('If-None-Match') == etag:
+            self._reply(304, headers={'ETag': etag})
+            return
+        self._reply(200, entry[0], {'ETag': etag})
+
+    def do_PUT(self):
+        path = self._begin()
+        body = self._read_body()
+        if_match = self.headers.get('If-Match')
+        if_none_match = self.headers.get('If-None-Match')
+        with self.dav.lock:
+            entry = self.dav.files.get(path)
+            current = WebDAVTestServer.etag(entry[0]) if entry else None
+            if (if_match and if_match != current) or (if_none_match == '*' and entry):
+                self._reply(412)
+                return
+            self.dav.files[path] = (body, time.time())
+        self._reply(201, headers={'ETag': WebDAVTestServer.etag(body)})
+
+    def do_DELETE(self):
+        path = self._begin()
+        with self.dav.lock:
+            existed = self.dav.files.pop(path, None) is not None
+        self._reply(204 if existed else 404)
+
+    def do_MOVE(self):
+        path = self._begin()
+        self._read_body()
+        dest = unquote(urlsplit(self.headers.get('Destination', '')).path)
+        overwrite = self.headers.get('Overwrite', 'T').upper() != 'F'
+        with self.dav.lock:
+            entry = self.dav.files.get(path)
+            if entry is None:
+                self._reply(404)
+                return
+            existed = dest in self.dav.files
+            if existed and not overwrite:
+                self._reply(412)
+                return
+            self.dav.files[dest] = self.dav.files.pop(path)
+        self._reply(204 if existed else 201)
+
+    def do_MKCOL(self):
+        path = self._begin()
+        self._read_body()
+        with self.dav.lock:
+            self.dav.collections.add(path.rstrip('/') + '/')
+        self._reply(201)
+
+
+class WebDAVTestServer:
+    """
+    内存 WebDAV 替身服务器。
+
+    用法：
+        server = WebDAVTestServer(latency=0.01)
+        server.start()
+        client = WebDAVClient(server.url, 'u', 'p', '/StickyNote/')
+        ...
+        server.stop()
+    """
+
+    def __init__(self, latency: float = 0.0, collections=('/StickyNote/',)):
+        self.latency = latency
+        self.lock = threading.RLock()
+        self.files = {}  # {path: (bytes, mtime)}
+        self.collections = set(collections)
+        self.requests = []  # [(method, path, headers)]
+        self.statuses = []  # [(method, path, status)]
+        self.connections = set()  # 出现过的客户端地址，即建立过的 TCP 连接
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._httpd = None
+        self._thread = None
+
+    @staticmethod
+    def etag(data: bytes) -> str:
+        return '"%s"' % hashlib.md5(data).hexdigest()
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def record(self, method: str, path: str, headers: dict, client_address=None) -> None:
+        with self.lock:
+            self.requests.append((method, path, headers))
+            if client_address:
+                self.connections.add(client_address)
+
+    def count(self, method: str) -> int:
+        with self.lock:
+            return sum(1 for m, _p, _h in self.requests if m == method)
+
+    def status_count(self, method: str, status: int) -> int:
+        with self.lock:
+            return sum(1 for m, _p, s in self.statuses if m == method and s == status)
+
+    def put_file(self, path: str, data: bytes) -> None:
+        with self.lock:
+            self.files[path] = (data, time.time())
+
+    def start(self) -> 'WebDAVTestServer':
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.dav = self
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+备份格式基准：zip 全量备份 vs 增量备份（内容寻址对象 + 快照清单）
+
+在临时目录中生成 N 篇便签，依次测量：
+- zip 全量备份（每次自动备份的旧行为）
+- 首次增量快照（写入全部对象）
+- 修改少量便签后的增量快照（只写入变化的对象）
+输出耗时与新增磁盘字节。
+
+用法：
+    python tools/bench_backup.py [便签数量] [每次修改的便签数量]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import zipfile
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from features.backup_store import BackupStore
+
+
+def build_notes(notes_dir: str, count: int) -> None:
+    """生成便签文件，并把 mtime 调到过去（模拟已存在的便签库）"""
+    old = time.time() - 3600
+    for i in range(count):
+        path = os.path.join(notes_dir, f'note_{i}.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'id': i, 'title': f'便签 {i}',
+                       'content': '<p>' + f'第 {i} 篇便签的正文内容 ' * 60 + '</p>'}, f, ensure_ascii=False)
+        os.utime(path, (old, old))
+
+
+def modify_notes(notes_dir: str, count: int, round_no: int) -> None:
+    old = time.time() - 60
+    for i in range(count):
+        path = os.path.join(notes_dir, f'note_{i}.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'id': i, 'content': f'修改 {round_no}'}, f, ensure_ascii=False)
+        os.utime(path, (old, old))
+
+
+def list_files(notes_dir: str) -> list:
+    return [(f'notes/{f}', os.path.join(notes_dir, f)) for f in os.listdir(notes_dir)]
+
+
+def zip_backup(notes_dir: str, zip_path: str) -> None:
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        for arcname, path in list_files(notes_dir):
+            zipf.write(path, arcname)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    changed = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    root = tempfile.mkdtemp()
+    try:
+        notes_dir = os.path.join(root, 'notes')
+        os.makedirs(notes_dir)
+        build_notes(notes_dir, count)
+        print(f'{count} 篇便签，每次修改 {changed} 篇')
+
+        start = time.perf_counter()
+        zip_path = os.path.join(root, 'backup.zip')
+        zip_backup(notes_dir, zip_path)
+        elapsed = time.perf_counter() - start
+        print(f'zip 全量备份:     {elapsed * 1000:8.1f} ms  新增 {os.path.getsize(zip_path) / 1024:9.1f} KB')
+
+        store = BackupStore(os.path.join(root, 'store'))
+        start = time.perf_counter()
+        manifest = store.create_snapshot('s0', list_files(notes_dir))
+        elapsed = time.perf_counter() - start
+        print(f'首次增量快照:     {elapsed * 1000:8.1f} ms  新增 {manifest["added_bytes"] / 1024:9.1f} KB')
+
+        for round_no in range(1, 4):
+            modify_notes(notes_dir, changed, round_no)
+            snapshot_file = store.snapshot_path(f's{round_no}')
+            start = time.perf_counter()
+            manifest = store.create_snapshot(f's{round_no}', list_files(notes_dir))
+            elapsed = time.perf_counter() - start
+            added = manifest['added_bytes'] + os.path.getsize(snapshot_file)
+            print(f'增量快照 #{round_no}:      {elapsed * 1000:8.1f} ms  新增 {added / 1024:9.1f} KB'
+                  f'（对象 {manifest["added_objects"]}，含清单）')
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+备份自适应压缩基准
+
+分别生成以文本为主和以内嵌图片（base64）为主的便签库，比较：
+- 统一 ZIP_DEFLATED 的 zip 备份（默认级别，逐条目流式压缩，旧行为）
+- 自适应压缩的 zip 备份（线程池并行读取、哈希与抽样，按条目选择压缩方式与级别顺序写入）
+- 增量备份对象：统一 zlib 级别 6（旧行为） vs 自适应压缩
+输出耗时、备份大小与各压缩方式的条目数。
+
+用法：
+    python tools/bench_backup_compression.py [文本便签数量] [图片便签数量]
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import base64
+import random
+import shutil
+import tempfile
+from collections import Counter
+from types import SimpleNamespace
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtCore import QCoreApplication
+
+from features import backup_compression
+from features.backup import BackupManager
+
+WORDS = ['会议', '记录', '待办', '项目', '明天', '检查', '完成', '进度', 'review', 'todo',
+         'deadline', '<b>', '</b>', '<br/>', '客户', '需求', '文档', '测试', '发布', '周报']
+
+
+def build_text_notes(notes_dir: str, count: int) -> None:
+    rng = random.Random(1)
+    for i in range(count):
+        body = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(200, 1500)))
+        write_note(notes_dir, i, {'id': i, 'title': f'便签 {i}', 'content': f'<p>{body}</p>'})
+
+
+def build_image_notes(notes_dir: str, count: int, start: int) -> None:
+    for i in range(start, start + count):
+        image = base64.b64encode(os.urandom(random.randint(100, 400) * 1024)).decode('ascii')
+        write_note(notes_dir, i, {'id': i, 'title': f'截图 {i}',
+                                  'content': f'<p>截图</p><img src="data:image/jpeg;base64,{image}"/>'})
+
+
+def write_note(notes_dir: str, note_id: int, data: dict) -> None:
+    path = os.path.join(notes_dir, f'note_{note_id}.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    old = time.time() - 3600
+    os.utime(path, (old, old))
+
+
+def uniform_objects(files: list) -> int:
+    total = 0
+    for _, path in files:
+        with open(path, 'rb') as f:
+            total += len(zlib.compress(f.read(), 6)) + 1
+    return total
+
+
+def adaptive_objects(files: list) -> int:
+    total = 0
+    for _, path in files:
+        with open(path, 'rb') as f:
+            data = f.read()
+        total += len(backup_compression.compress(data, backup_compression.choose_mode(data))) + 1
+    return total
+
+
+def run(label: str, backups: BackupManager, root: str) -> None:
+    files = backups._collect_backup_files()
+    raw = sum(os.path.getsize(path) for _, path in files)
+    modes = Counter()
+    for _, path in files:
+        with open(path, 'rb') as f:
+            modes[backup_compression.choose_mode(f.read())] += 1
+    print(f'{label}：{len(files)} 个文件，原始 {raw / 1024 / 1024:.1f} MB，'
+          f'压缩方式 {dict(modes)}')
+
+    backups.backup_format = 'zip'
+    # 旧行为：全部条目流式写入，统一使用 ZIP_DEFLATED
+    with patch('features.backup.PARALLEL_ENTRY_LIMIT', -1), \
+            patch.object(backup_compression, 'sample_ratio', return_value=0.0):
+        start = time.perf_counter()
+        path = backups.create_backup(f'stickynote_backup_{label}_uniform')
+        elapsed = time.perf_counter() - start
+    print(f'  zip 统一压缩     {elapsed * 1000:8.1f} ms  {os.path.getsize(path) / 1024 / 1024:7.2f} MB')
+
+    start = time.perf_counter()
+    path = backups.create_backup(f'stickynote_backup_{label}')
+    elapsed = time.perf_counter() - start
+    print(f'  zip 自适应压缩   {elapsed * 1000:8.1f} ms  {os.path.getsize(path) / 1024 / 1024:7.2f} MB'
+          f'（{os.cpu_count()} 个线程）')
+
+    for name, func in (('对象 统一 zlib-6', uniform_objects), ('对象 自适应压缩', adaptive_objects)):
+        start = time.perf_counter()
+        size = func(files)
+        elapsed = time.perf_counter() - start
+        print(f'  {name:14s} {elapsed * 1000:8.1f} ms  {size / 1024 / 1024:7.2f} MB')
+
+
+def main():
+    text_count = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    image_count = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    app = QCoreApplication.instance() or QCoreApplication([])
+    root = tempfile.mkdtemp()
+    try:
+        for label, build in (('text', lambda d: build_text_notes(d, text_count)),
+                             ('image', lambda d: build_image_notes(d, image_count, 0))):
+            data_dir = os.path.join(root, label)
+            notes_dir = os.path.join(data_dir, 'notes')
+            os.makedirs(notes_dir)
+            build(notes_dir)
+            manager = SimpleNamespace(notes_dir=notes_dir, settings_file=os.path.join(data_dir, 'settings.json'))
+            with patch('features.backup.get_user_data_dir', return_value=data_dir), \
+                    patch('features.backup.get_styles_dir', return_value=os.path.join(root, 'styles')):
+                backups = BackupManager(manager)
+                backups.auto_backup_timer.stop()
+                run(label, backups, root)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+        del app
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+备份完整性校验基准
+
+在临时目录生成总计约 N MB 的 zip 备份（内嵌清单）与一个增量快照，
+测量 verify_backup 的吞吐与峰值内存（tracemalloc），验证流式校验的内存占用与备份大小无关。
+
+用法：
+    python tools/bench_backup_verify.py [备份总大小 MB，默认 1024]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import tracemalloc
+from types import SimpleNamespace
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtCore import QCoreApplication
+
+from features.backup import BackupManager
+
+# 单篇便签大小（含附带的不可压缩内容，模拟内嵌图片）
+NOTE_BYTES = 256 * 1024
+
+
+def build_notes(notes_dir: str, total_mb: int) -> int:
+    count = max(1, total_mb * 1024 * 1024 // NOTE_BYTES)
+    old = time.time() - 3600
+    for i in range(count):
+        path = os.path.join(notes_dir, f'note_{i}.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'id': i, 'image': os.urandom(NOTE_BYTES * 3 // 4).hex()[:NOTE_BYTES]}, f)
+        os.utime(path, (old, old))
+    return count
+
+
+def measure(backups: BackupManager, path: str) -> tuple:
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = backups.verify_backup(path)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    total_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 1024
+    app = QCoreApplication.instance() or QCoreApplication([])
+    root = tempfile.mkdtemp()
+    try:
+        data_dir = os.path.join(root, 'data')
+        notes_dir = os.path.join(data_dir, 'notes')
+        os.makedirs(notes_dir)
+        count = build_notes(notes_dir, total_mb)
+        manager = SimpleNamespace(notes_dir=notes_dir, settings_file=os.path.join(data_dir, 'settings.json'))
+        with patch('features.backup.get_user_data_dir', return_value=data_dir), \
+                patch('features.backup.get_styles_dir', return_value=os.path.join(root, 'styles')):
+            backups = BackupManager(manager)
+        backups.auto_backup_timer.stop()
+        print(f'{count} 篇便签，原始数据 {count * NOTE_BYTES / 1024 / 1024:.0f} MB')
+
+        for fmt in ('zip', 'incremental'):
+            backups.backup_format = fmt
+            path = backups.create_backup(f'stickynote_backup_{fmt}')
+            result, elapsed, peak = measure(backups, path)
+            mb = result['bytes'] / 1024 / 1024
+            print(f'{fmt:12s} 校验 {mb:7.0f} MB  {elapsed:6.2f} s  {mb / elapsed:7.1f} MB/s  '
+                  f'峰值内存 {peak / 1024 / 1024:5.1f} MB  {"通过" if result["ok"] else "失败"}')
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+        del app
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+无变更同步（sync-noop）性能基准
+
+在临时目录中生成 N 篇便签并通过 LocalSyncClient 完成首次同步，
+随后分别测量冷缓存（删除哈希缓存，等同于旧版每次全量哈希）与
+热缓存下再次同步的耗时。
+
+用法：
+    python tools/bench_sync_noop.py [便签数量]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from features.sync.engine import SyncEngine
+from features.sync.hash_cache import FileHashCache
+from features.sync.local_client import LocalSyncClient
+
+
+def build_notes(notes_dir: str, count: int) -> None:
+    """生成便签文件，并把 mtime 调到过去（模拟已存在的便签库）"""
+    old = time.time() - 3600
+    for i in range(count):
+        path = os.path.join(notes_dir, f'note_{i}.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'id': i, 'title': f'便签 {i}',
+                       'content': '<p>' + '正文内容 ' * 200 + '</p>'}, f, ensure_ascii=False)
+        os.utime(path, (old, old))
+
+
+def age_files(directory: str) -> None:
+    old = time.time() - 3600
+    for filename in os.listdir(directory):
+        if filename.startswith('note_'):
+            os.utime(os.path.join(directory, filename), (old, old))
+
+
+def timed_sync(notes_dir: str, sync_dir: str, client_cache: FileHashCache) -> tuple:
+    engine = SyncEngine(notes_dir)
+    engine.set_client(LocalSyncClient(sync_dir, hash_cache=client_cache))
+    start = time.perf_counter()
+    summary = engine._do_sync()
+    return time.perf_counter() - start, summary
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    root = tempfile.mkdtemp()
+    notes_dir = os.path.join(root, 'notes')
+    sync_dir = os.path.join(root, 'sync')
+    os.makedirs(notes_dir)
+    client_cache_file = os.path.join(root, 'client_hash_cache.json')
+    try:
+        build_notes(notes_dir, count)
+        elapsed, summary = timed_sync(notes_dir, sync_dir, FileHashCache(client_cache_file))
+        print(f'首次同步 {count} 篇: {elapsed * 1000:8.1f} ms  {summary}')
+        age_files(sync_dir)
+
+        # 冷缓存：删除两侧哈希缓存，每个文件都需重新读取哈希
+        for path in (os.path.join(notes_dir, 'sync_hash_cache.json'), client_cache_file):
+            if os.path.exists(path):
+                os.remove(path)
+        cold, summary = timed_sync(notes_dir, sync_dir, FileHashCache(client_cache_file))
+        print(f'无变更同步（冷缓存）: {cold * 1000:8.1f} ms  {summary}')
+
+        # 热缓存：重新从磁盘加载缓存，模拟下一轮自动同步 / 重启后同步
+        warm, summary = timed_sync(notes_dir, sync_dir, FileHashCache(client_cache_file))
+        print(f'无变更同步（热缓存）: {warm * 1000:8.1f} ms  {summary}')
+        print(f'加速比: {cold / warm:.1f}x')
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
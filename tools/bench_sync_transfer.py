@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+同步传输吞吐基准
+
+启动注入固定延迟的本地 WebDAV 替身服务器（tests/webdav_server.py），
+分别以不同并发数执行首次同步（全量上传）与全量下载，对比耗时与吞吐；
+最后一行为 pack 模式（请求数与便签数量无关）。
+
+用法：
+    python tools/bench_sync_transfer.py [便签数量] [单请求延迟毫秒]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'tests'))
+
+from features.sync.engine import SyncEngine
+from features.sync.webdav_client import WebDAVClient
+from webdav_server import WebDAVTestServer
+
+
+def build_notes(notes_dir: str, count: int) -> None:
+    for i in range(count):
+        with open(os.path.join(notes_dir, f'note_{i}.json'), 'w', encoding='utf-8') as f:
+            json.dump({'id': i, 'content': '<p>' + '正文 ' * 500 + '</p>'}, f, ensure_ascii=False)
+
+
+def run(count: int, latency: float, workers: int, mode: str = 'files') -> tuple:
+    server = WebDAVTestServer(latency=latency).start()
+    notes_dir = tempfile.mkdtemp()
+    try:
+        build_notes(notes_dir, count)
+        engine = SyncEngine(notes_dir, mode=mode)
+        engine.max_transfers = workers
+        engine.set_client(WebDAVClient(server.url, 'u', 'p', '/StickyNote/'))
+        start = time.perf_counter()
+        engine._do_sync()
+        upload = time.perf_counter() - start
+
+        # 清空本地后全量下载
+        shutil.rmtree(notes_dir)
+        os.makedirs(notes_dir)
+        engine = SyncEngine(notes_dir, mode=mode)
+        engine.max_transfers = workers
+        engine.set_client(WebDAVClient(server.url, 'u', 'p', '/StickyNote/'))
+        start = time.perf_counter()
+        engine._do_sync()
+        download = time.perf_counter() - start
+        return upload, download, len(server.connections)
+    finally:
+        server.stop()
+        shutil.rmtree(notes_dir, ignore_errors=True)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    latency = (int(sys.argv[2]) if len(sys.argv) > 2 else 30) / 1000
+    print(f'{count} 篇便签，单请求延迟 {latency * 1000:.0f} ms')
+    baseline = None
+    for workers in (1, 2, 4, 8):
+        upload, download, connections = run(count, latency, workers)
+        baseline = baseline or upload
+        print(f'并发 {workers}: 上传 {upload:6.2f} s ({count / upload:6.1f} 篇/s)  '
+              f'下载 {download:6.2f} s ({count / download:6.1f} 篇/s)  '
+              f'连接数 {connections:3d}  加速 {baseline / upload:.1f}x')
+    upload, download, connections = run(count, latency, 1, mode='pack')
+    print(f'pack 模式: 上传 {upload:6.2f} s ({count / upload:6.1f} 篇/s)  '
+          f'下载 {download:6.2f} s ({count / download:6.1f} 篇/s)  '
+          f'连接数 {connections:3d}  加速 {baseline / upload:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
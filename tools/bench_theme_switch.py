@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+主题切换性能基准
+
+创建 N 个便签窗口，测量把它们全部切换到另一主题的耗时
+（ThemeRegistry 共享应用级样式表 + objectName 作用域）。
+
+用法：
+    python tools/bench_theme_switch.py [便签数量]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from PyQt5.QtWidgets import QApplication
+
+from core.note import StickyNote
+from features.theme_helper import get_theme_registry
+
+
+def switch_all(notes, theme_css):
+    """与 StickyNoteManager.apply_theme_to_all_notes 相同的切换流程（不含保存）"""
+    theme = StickyNote.compile_theme(theme_css)
+    changed = []
+    for note in notes:
+        note.theme = theme_css
+        if note.apply_compiled_theme(theme):
+            changed.append(note)
+    if not get_theme_registry().install():
+        for note in changed:
+            note.repolish_theme()
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    app = QApplication.instance() or QApplication([])
+    work_dir = tempfile.mkdtemp()
+    os.chdir(work_dir)
+    notes = [StickyNote(i, notes_dir=os.path.join(work_dir, 'notes')) for i in range(count)]
+    for note in notes:
+        note.show()
+    app.processEvents()
+
+    for theme_css in ('dark_modern.css', 'fresh_blue.css', 'soft_yellow.css', 'dark_modern.css'):
+        start = time.perf_counter()
+        switch_all(notes, theme_css)
+        app.processEvents()
+        elapsed = time.perf_counter() - start
+        print(f'{count} 个便签切换到 {theme_css:<18}: {elapsed * 1000:8.1f} ms')
+
+    for note in notes:
+        note.is_deleted = True
+        note.close()
+
+
+if __name__ == '__main__':
+    main()